@@ -13,14 +13,16 @@ import os
 
 from agentpress.thread_manager import ThreadManager
 from services.supabase import DBConnection
-from services import redis
+from services import redis, response_stream
 from utils.auth_utils import get_current_user_id_from_jwt, get_user_id_from_stream_auth, verify_thread_access
 from utils.logger import logger, structlog
 from services.billing import check_billing_status, can_use_model
 from utils.config import config
-from sandbox.sandbox import create_sandbox, delete_sandbox, get_or_start_sandbox
+from sandbox.sandbox import create_sandbox, delete_sandbox
+from sandbox.registry import sandbox_registry
+from sandbox.workspace import upload_files
 from services.llm import make_llm_api_call
-from run_agent_background import run_agent_background, _cleanup_redis_response_list, update_agent_run_status
+from run_agent_background import run_agent_background, update_agent_run_status
 from utils.constants import MODEL_NAME_ALIASES
 from flags.flags import is_enabled
 
@@ -29,9 +31,6 @@ router = APIRouter()
 db = None
 instance_id = None # Global instance ID for this backend instance
 
-# TTL for Redis response lists (24 hours)
-REDIS_RESPONSE_LIST_TTL = 3600 * 24
-
 
 class AgentStartRequest(BaseModel):
     model_name: Optional[str] = None  # Will be set from config.MODEL_TO_USE in the endpoint
@@ -188,11 +187,10 @@ async def stop_agent_run(agent_run_id: str, error_message: Optional[str] = None)
     final_status = "failed" if error_message else "stopped"
 
     # Attempt to fetch final responses from Redis
-    response_list_key = f"agent_run:{agent_run_id}:responses"
+    stream_key = response_stream.agent_run_stream_key(agent_run_id)
     all_responses = []
     try:
-        all_responses_json = await redis.lrange(response_list_key, 0, -1)
-        all_responses = [json.loads(r) for r in all_responses_json]
+        all_responses = await response_stream.read_all(stream_key)
         logger.info(f"Fetched {len(all_responses)} responses from Redis for DB update on stop/fail: {agent_run_id}")
     except Exception as e:
         logger.error(f"Failed to fetch responses from Redis for {agent_run_id} during stop/fail: {e}")
@@ -206,6 +204,12 @@ async def stop_agent_run(agent_run_id: str, error_message: Optional[str] = None)
     if not update_success:
         logger.error(f"Failed to update database status for stopped/failed run {agent_run_id}")
 
+    # End the response stream for connected clients
+    try:
+        await response_stream.append_control(stream_key, "STOP")
+    except Exception as e:
+        logger.error(f"Failed to append STOP signal to response stream {stream_key}: {str(e)}")
+
     # Send STOP signal to the global control channel
     global_control_channel = f"agent_run:{agent_run_id}:control"
     try:
@@ -233,8 +237,8 @@ async def stop_agent_run(agent_run_id: str, error_message: Optional[str] = None)
             else:
                  logger.warning(f"Unexpected key format found: {key}")
 
-        # Clean up the response list immediately on stop/fail
-        await _cleanup_redis_response_list(agent_run_id)
+        # Set TTL on the response stream immediately on stop/fail
+        await response_stream.expire(stream_key)
 
     except Exception as e:
         logger.error(f"Failed to find or signal active instances for {agent_run_id}: {str(e)}")
@@ -559,7 +563,7 @@ async def start_agent(
             raise HTTPException(status_code=404, detail="No sandbox found for this project")
             
         sandbox_id = sandbox_info['id']
-        sandbox = await get_or_start_sandbox(sandbox_id)
+        sandbox = await sandbox_registry.get_sandbox(sandbox_id, refresh=True)
         logger.info(f"Successfully started sandbox {sandbox_id} for project {project_id}")
     except Exception as e:
         logger.error(f"Failed to start sandbox for project {project_id}: {str(e)}")
@@ -766,9 +770,15 @@ async def get_thread_agent(thread_id: str, user_id: str = Depends(get_current_us
 async def stream_agent_run(
     agent_run_id: str,
     token: Optional[str] = None,
+    last_event_id: Optional[str] = None,
     request: Request = None
 ):
-    """Stream the responses of an agent run using Redis Lists and Pub/Sub."""
+    """Stream the responses of an agent run from its Redis stream.
+
+    Each event carries its stream entry ID as SSE event ID. Reconnecting
+    clients resume after the Last-Event-ID header (or the last_event_id query
+    parameter) instead of replaying the whole run.
+    """
     logger.info(f"Starting stream for agent run: {agent_run_id}")
     client = await db.client
 
@@ -780,172 +790,42 @@ async def stream_agent_run(
         user_id=user_id,
     )
 
-    response_list_key = f"agent_run:{agent_run_id}:responses"
-    response_channel = f"agent_run:{agent_run_id}:new_response"
-    control_channel = f"agent_run:{agent_run_id}:control" # Global control channel
+    stream_key = response_stream.agent_run_stream_key(agent_run_id)
+    resume_from = (request.headers.get("last-event-id") if request else None) or last_event_id
+
+    async def is_running() -> bool:
+        run_status = await client.table('agent_runs').select('status', 'thread_id').eq("id", agent_run_id).maybe_single().execute()
+        current_status = run_status.data.get('status') if run_status.data else None
+        if current_status != 'running':
+            logger.info(f"Agent run {agent_run_id} is not running (status: {current_status}).")
+            return False
+        structlog.contextvars.bind_contextvars(
+            thread_id=run_status.data.get('thread_id'),
+        )
+        return True
+
+    def is_final_response(response: Dict[str, Any]) -> bool:
+        if response.get('type') == 'status' and response.get('status') in ['completed', 'failed', 'stopped']:
+            logger.info(f"Detected run completion via status message in stream: {response.get('status')}")
+            return True
+        return False
 
     async def stream_generator():
-        logger.debug(f"Streaming responses for {agent_run_id} using Redis list {response_list_key} and channel {response_channel}")
-        last_processed_index = -1
-        pubsub_response = None
-        pubsub_control = None
-        listener_task = None
-        terminate_stream = False
+        logger.debug(f"Streaming responses for {agent_run_id} from Redis stream {stream_key} after {resume_from or 'start'}")
         initial_yield_complete = False
-
         try:
-            # 1. Fetch and yield initial responses from Redis list
-            initial_responses_json = await redis.lrange(response_list_key, 0, -1)
-            initial_responses = []
-            if initial_responses_json:
-                initial_responses = [json.loads(r) for r in initial_responses_json]
-                logger.debug(f"Sending {len(initial_responses)} initial responses for {agent_run_id}")
-                for response in initial_responses:
-                    yield f"data: {json.dumps(response)}\n\n"
-                last_processed_index = len(initial_responses) - 1
-            initial_yield_complete = True
-
-            # 2. Check run status *after* yielding initial data
-            run_status = await client.table('agent_runs').select('status', 'thread_id').eq("id", agent_run_id).maybe_single().execute()
-            current_status = run_status.data.get('status') if run_status.data else None
-
-            if current_status != 'running':
-                logger.info(f"Agent run {agent_run_id} is not running (status: {current_status}). Ending stream.")
-                yield f"data: {json.dumps({'type': 'status', 'status': 'completed'})}\n\n"
-                return
-          
-            structlog.contextvars.bind_contextvars(
-                thread_id=run_status.data.get('thread_id'),
-            )
-
-            # 3. Set up Pub/Sub listeners for new responses and control signals
-            pubsub_response = await redis.create_pubsub()
-            await pubsub_response.subscribe(response_channel)
-            logger.debug(f"Subscribed to response channel: {response_channel}")
-
-            pubsub_control = await redis.create_pubsub()
-            await pubsub_control.subscribe(control_channel)
-            logger.debug(f"Subscribed to control channel: {control_channel}")
-
-            # Queue to communicate between listeners and the main generator loop
-            message_queue = asyncio.Queue()
-
-            async def listen_messages():
-                response_reader = pubsub_response.listen()
-                control_reader = pubsub_control.listen()
-                tasks = [asyncio.create_task(response_reader.__anext__()), asyncio.create_task(control_reader.__anext__())]
-
-                while not terminate_stream:
-                    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
-                    for task in done:
-                        try:
-                            message = task.result()
-                            if message and isinstance(message, dict) and message.get("type") == "message":
-                                channel = message.get("channel")
-                                data = message.get("data")
-                                if isinstance(data, bytes): data = data.decode('utf-8')
-
-                                if channel == response_channel and data == "new":
-                                    await message_queue.put({"type": "new_response"})
-                                elif channel == control_channel and data in ["STOP", "END_STREAM", "ERROR"]:
-                                    logger.info(f"Received control signal '{data}' for {agent_run_id}")
-                                    await message_queue.put({"type": "control", "data": data})
-                                    return # Stop listening on control signal
-
-                        except StopAsyncIteration:
-                            logger.warning(f"Listener {task} stopped.")
-                            # Decide how to handle listener stopping, maybe terminate?
-                            await message_queue.put({"type": "error", "data": "Listener stopped unexpectedly"})
-                            return
-                        except Exception as e:
-                            logger.error(f"Error in listener for {agent_run_id}: {e}")
-                            await message_queue.put({"type": "error", "data": "Listener failed"})
-                            return
-                        finally:
-                            # Reschedule the completed listener task
-                            if task in tasks:
-                                tasks.remove(task)
-                                if message and isinstance(message, dict) and message.get("channel") == response_channel:
-                                     tasks.append(asyncio.create_task(response_reader.__anext__()))
-                                elif message and isinstance(message, dict) and message.get("channel") == control_channel:
-                                     tasks.append(asyncio.create_task(control_reader.__anext__()))
-
-                # Cancel pending listener tasks on exit
-                for p_task in pending: p_task.cancel()
-                for task in tasks: task.cancel()
-
-
-            listener_task = asyncio.create_task(listen_messages())
-
-            # 4. Main loop to process messages from the queue
-            while not terminate_stream:
-                try:
-                    queue_item = await message_queue.get()
-
-                    if queue_item["type"] == "new_response":
-                        # Fetch new responses from Redis list starting after the last processed index
-                        new_start_index = last_processed_index + 1
-                        new_responses_json = await redis.lrange(response_list_key, new_start_index, -1)
-
-                        if new_responses_json:
-                            new_responses = [json.loads(r) for r in new_responses_json]
-                            num_new = len(new_responses)
-                            # logger.debug(f"Received {num_new} new responses for {agent_run_id} (index {new_start_index} onwards)")
-                            for response in new_responses:
-                                yield f"data: {json.dumps(response)}\n\n"
-                                # Check if this response signals completion
-                                if response.get('type') == 'status' and response.get('status') in ['completed', 'failed', 'stopped']:
-                                    logger.info(f"Detected run completion via status message in stream: {response.get('status')}")
-                                    terminate_stream = True
-                                    break # Stop processing further new responses
-                            last_processed_index += num_new
-                        if terminate_stream: break
-
-                    elif queue_item["type"] == "control":
-                        control_signal = queue_item["data"]
-                        terminate_stream = True # Stop the stream on any control signal
-                        yield f"data: {json.dumps({'type': 'status', 'status': control_signal})}\n\n"
-                        break
-
-                    elif queue_item["type"] == "error":
-                        logger.error(f"Listener error for {agent_run_id}: {queue_item['data']}")
-                        terminate_stream = True
-                        yield f"data: {json.dumps({'type': 'status', 'status': 'error'})}\n\n"
-                        break
-
-                except asyncio.CancelledError:
-                     logger.info(f"Stream generator main loop cancelled for {agent_run_id}")
-                     terminate_stream = True
-                     break
-                except Exception as loop_err:
-                    logger.error(f"Error in stream generator main loop for {agent_run_id}: {loop_err}", exc_info=True)
-                    terminate_stream = True
-                    yield f"data: {json.dumps({'type': 'status', 'status': 'error', 'message': f'Stream failed: {loop_err}'})}\n\n"
-                    break
-
+            async for event in response_stream.sse_events(stream_key, resume_from, is_running, is_final_response):
+                initial_yield_complete = True
+                yield event
+        except asyncio.CancelledError:
+            logger.info(f"Stream generator cancelled for {agent_run_id}")
         except Exception as e:
-            logger.error(f"Error setting up stream for agent run {agent_run_id}: {e}", exc_info=True)
-            # Only yield error if initial yield didn't happen
+            logger.error(f"Error streaming agent run {agent_run_id}: {e}", exc_info=True)
             if not initial_yield_complete:
-                 yield f"data: {json.dumps({'type': 'status', 'status': 'error', 'message': f'Failed to start stream: {e}'})}\n\n"
+                yield f"data: {json.dumps({'type': 'status', 'status': 'error', 'message': f'Failed to start stream: {e}'})}\n\n"
+            else:
+                yield f"data: {json.dumps({'type': 'status', 'status': 'error', 'message': f'Stream failed: {e}'})}\n\n"
         finally:
-            terminate_stream = True
-            # Graceful shutdown order: unsubscribe → close → cancel
-            if pubsub_response: await pubsub_response.unsubscribe(response_channel)
-            if pubsub_control: await pubsub_control.unsubscribe(control_channel)
-            if pubsub_response: await pubsub_response.close()
-            if pubsub_control: await pubsub_control.close()
-
-            if listener_task:
-                listener_task.cancel()
-                try:
-                    await listener_task  # Reap inner tasks & swallow their errors
-                except asyncio.CancelledError:
-                    pass
-                except Exception as e:
-                    logger.debug(f"listener_task ended with: {e}")
-            # Wait briefly for tasks to cancel
-            await asyncio.sleep(0.1)
             logger.debug(f"Streaming cleanup complete for agent run: {agent_run_id}")
 
     return StreamingResponse(stream_generator(), media_type="text/event-stream", headers={
@@ -1073,13 +953,13 @@ async def initiate_agent_with_files(
         sandbox_id = None
         try:
           sandbox_pass = str(uuid.uuid4())
-          sandbox = create_sandbox(sandbox_pass, project_id)
+          sandbox = await create_sandbox(sandbox_pass, project_id)
           sandbox_id = sandbox.id
           logger.info(f"Created new sandbox {sandbox_id} for project {project_id}")
           
           # Get preview links
-          vnc_link = sandbox.get_preview_link(6080)
-          website_link = sandbox.get_preview_link(8080)
+          vnc_link = await sandbox.get_preview_link(6080)
+          website_link = await sandbox.get_preview_link(8080)
           vnc_url = vnc_link.url if hasattr(vnc_link, 'url') else str(vnc_link).split("url='")[1].split("'")[0]
           website_url = website_link.url if hasattr(website_link, 'url') else str(website_link).split("url='")[1].split("'")[0]
           token = None
@@ -1154,52 +1034,26 @@ async def initiate_agent_with_files(
         # 4. Upload Files to Sandbox (if any)
         message_content = prompt
         if files:
-            successful_uploads = []
+            uploads = []
             failed_uploads = []
             for file in files:
                 if file.filename:
-                    try:
-                        safe_filename = file.filename.replace('/', '_').replace('\\', '_')
-                        target_path = f"/workspace/{safe_filename}"
-                        logger.info(f"Attempting to upload {safe_filename} to {target_path} in sandbox {sandbox_id}")
-                        content = await file.read()
-                        upload_successful = False
-                        try:
-                            if hasattr(sandbox, 'fs') and hasattr(sandbox.fs, 'upload_file'):
-                                import inspect
-                                if inspect.iscoroutinefunction(sandbox.fs.upload_file):
-                                    await sandbox.fs.upload_file(content, target_path)
-                                else:
-                                    sandbox.fs.upload_file(content, target_path)
-                                logger.debug(f"Called sandbox.fs.upload_file for {target_path}")
-                                upload_successful = True
-                            else:
-                                raise NotImplementedError("Suitable upload method not found on sandbox object.")
-                        except Exception as upload_error:
-                            logger.error(f"Error during sandbox upload call for {safe_filename}: {str(upload_error)}", exc_info=True)
-
-                        if upload_successful:
-                            try:
-                                await asyncio.sleep(0.2)
-                                parent_dir = os.path.dirname(target_path)
-                                files_in_dir = sandbox.fs.list_files(parent_dir)
-                                file_names_in_dir = [f.name for f in files_in_dir]
-                                if safe_filename in file_names_in_dir:
-                                    successful_uploads.append(target_path)
-                                    logger.info(f"Successfully uploaded and verified file {safe_filename} to sandbox path {target_path}")
-                                else:
-                                    logger.error(f"Verification failed for {safe_filename}: File not found in {parent_dir} after upload attempt.")
-                                    failed_uploads.append(safe_filename)
-                            except Exception as verify_error:
-                                logger.error(f"Error verifying file {safe_filename} after upload: {str(verify_error)}", exc_info=True)
-                                failed_uploads.append(safe_filename)
-                        else:
-                            failed_uploads.append(safe_filename)
-                    except Exception as file_error:
-                        logger.error(f"Error processing file {file.filename}: {str(file_error)}", exc_info=True)
-                        failed_uploads.append(file.filename)
-                    finally:
-                        await file.close()
+                    safe_filename = file.filename.replace('/', '_').replace('\\', '_')
+                    uploads.append((f"/workspace/{safe_filename}", file.file))
+
+            try:
+                logger.info(f"Uploading {len(uploads)} files to sandbox {sandbox_id}")
+                successful_uploads, failed_paths = await upload_files(sandbox, uploads)
+                failed_uploads.extend(os.path.basename(path) for path in failed_paths)
+                if failed_paths:
+                    logger.error(f"Verification failed for {len(failed_paths)} uploaded files in sandbox {sandbox_id}: {failed_paths}")
+            except Exception as upload_error:
+                logger.error(f"Error uploading files to sandbox {sandbox_id}: {str(upload_error)}", exc_info=True)
+                successful_uploads = []
+                failed_uploads.extend(os.path.basename(path) for path, _ in uploads)
+            finally:
+                for file in files:
+                    await file.close()
 
             if successful_uploads:
                 message_content += "\n\n" if message_content else ""
@@ -1213,8 +1067,7 @@ async def initiate_agent_with_files(
         message_payload = {"role": "user", "content": message_content}
         await client.table('messages').insert({
             "message_id": message_id, "thread_id": thread_id, "type": "user",
-            "is_llm_message": True, "content": json.dumps(message_payload),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "is_llm_message": True, "content": json.dumps(message_payload)
         }).execute()
 
         # 6. Start Agent Run
@@ -353,7 +353,7 @@ You have the ability to execute operations using both Python and CLI tools:
         - Only if you need specific details not found in search results:
           * Use scrape-webpage on specific URLs from web-search results
         - Only if scrape-webpage fails or if the page requires interaction:
-          * Use direct browser tools (browser_navigate_to, browser_go_back, browser_wait, browser_click_element, browser_input_text, browser_send_keys, browser_switch_tab, browser_close_tab, browser_scroll_down, browser_scroll_up, browser_scroll_to_text, browser_get_dropdown_options, browser_select_dropdown_option, browser_drag_drop, browser_click_coordinates etc.)
+          * Use direct browser tools (browser_navigate_to, browser_go_back, browser_wait, browser_click_element, browser_input_text, browser_send_keys, browser_switch_tab, browser_close_tab, browser_scroll_down, browser_scroll_up, browser_scroll_to_text, browser_get_dropdown_options, browser_select_dropdown_option, browser_drag_drop, browser_click_coordinates, browser_get_page_text etc.)
           * This is needed for:
             - Dynamic content loading
             - JavaScript-heavy sites
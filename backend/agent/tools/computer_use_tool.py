@@ -8,7 +8,8 @@ from typing import Optional, Dict
 import os
 
 from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
-from sandbox.tool_base import SandboxToolsBase, Sandbox
+from sandbox.client import AsyncSandbox
+from sandbox.tool_base import SandboxToolsBase
 
 KEYBOARD_KEYS = [
     'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm',
@@ -25,15 +26,24 @@ KEYBOARD_KEYS = [
 class ComputerUseTool(SandboxToolsBase):
     """Computer automation tool for controlling the sandbox browser and GUI."""
     
-    def __init__(self, sandbox: Sandbox):
+    def __init__(self, sandbox: AsyncSandbox):
         """Initialize automation tool with sandbox connection."""
-        super().__init__(sandbox)
+        super().__init__(project_id=None)
+        self._sandbox = sandbox
+        self._sandbox_id = sandbox.id
         self.session = None
         self.mouse_x = 0  # Track current mouse position
         self.mouse_y = 0
-        # Get automation service URL using port 8000
-        self.api_base_url = self.sandbox.get_preview_link(8000)
-        logging.info(f"Initialized Computer Use Tool with API URL: {self.api_base_url}")
+        # Resolved on the first request, as getting the preview link is a sandbox call
+        self.api_base_url: Optional[str] = None
+    
+    async def _get_api_base_url(self) -> str:
+        """Get the URL of the automation service on port 8000."""
+        if self.api_base_url is None:
+            preview_link = await self.sandbox.get_preview_link(8000)
+            self.api_base_url = preview_link.url if hasattr(preview_link, 'url') else str(preview_link)
+            logging.info(f"Computer Use Tool API URL: {self.api_base_url}")
+        return self.api_base_url
     
     async def _get_session(self) -> aiohttp.ClientSession:
         """Get or create aiohttp session for API requests."""
@@ -45,7 +55,7 @@ class ComputerUseTool(SandboxToolsBase):
         """Send request to automation service API."""
         try:
             session = await self._get_session()
-            url = f"{self.api_base_url}/api{endpoint}"
+            url = f"{await self._get_api_base_url()}/api{endpoint}"
             
             logging.debug(f"API request: {method} {url} {data}")
             
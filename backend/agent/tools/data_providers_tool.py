@@ -1,13 +1,16 @@
 import json
 from typing import Union, Dict, Any
 
-from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema, cacheable
 from agent.tools.data_providers.LinkedinProvider import LinkedinProvider
 from agent.tools.data_providers.YahooFinanceProvider import YahooFinanceProvider
 from agent.tools.data_providers.AmazonProvider import AmazonProvider
 from agent.tools.data_providers.ZillowProvider import ZillowProvider
 from agent.tools.data_providers.TwitterProvider import TwitterProvider
 
+# How long data provider responses are reused (seconds)
+DATA_PROVIDER_CACHE_TTL = 3600
+
 class DataProvidersTool(Tool):
     """Tool for making requests to various data providers."""
 
@@ -85,6 +88,7 @@ Use this tool when you need to discover what endpoints are available.
                 simplified_message += "..."
             return self.fail_response(simplified_message)
 
+    @cacheable(ttl=DATA_PROVIDER_CACHE_TTL)
     @openapi_schema({
         "type": "function",
         "function": {
@@ -1,22 +1,32 @@
 import traceback
 import json
 import base64
+import hashlib
 import io
+from typing import Optional, Tuple
 from PIL import Image
 
 from agentpress.tool import ToolResult, openapi_schema, xml_schema
 from agentpress.thread_manager import ThreadManager
 from sandbox.tool_base import SandboxToolsBase
 from utils.logger import logger
-from utils.s3_upload_utils import upload_base64_image
+from utils.s3_upload_utils import upload_image
+
+# Ask the browser API to leave screenshots in the sandbox instead of inlining them as base64
+SCREENSHOT_TRANSFER_HEADER = "X-Screenshot-Transfer: file"
 
 
 class SandboxBrowserTool(SandboxToolsBase):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities."""
     
-    def __init__(self, project_id: str, thread_id: str, thread_manager: ThreadManager):
+    def __init__(self, project_id: str, thread_id: str, thread_manager: ThreadManager, fast_navigation: Optional[bool] = None):
         super().__init__(project_id, thread_manager)
         self.thread_id = thread_id
+        # Default for browser_navigate_to's fast mode, from the agent's sb_browser_tool config;
+        # None leaves it to the sandbox's BROWSER_FAST_MODE
+        self.fast_navigation = fast_navigation
+        # (SHA-256 of the image, image_url) of the last uploaded screenshot
+        self._last_screenshot: Optional[Tuple[str, str]] = None
 
     def _validate_base64_image(self, base64_string: str, max_size_mb: int = 10) -> tuple[bool, str]:
         """
@@ -57,51 +67,112 @@ class SandboxBrowserTool(SandboxToolsBase):
             except Exception as e:
                 return False, f"Base64 decoding failed: {str(e)}"
             
-            # Check decoded data size
-            if len(image_data) == 0:
-                return False, "Decoded image data is empty"
+            return self._validate_image_data(image_data, max_size_mb)
             
-            # Check if decoded data size exceeds limit
-            max_size_bytes = max_size_mb * 1024 * 1024
-            if len(image_data) > max_size_bytes:
-                return False, f"Image size ({len(image_data)} bytes) exceeds limit ({max_size_bytes} bytes)"
+        except Exception as e:
+            logger.error(f"Unexpected error during base64 image validation: {e}")
+            return False, f"Validation error: {str(e)}"
+
+    def _validate_image_data(self, image_data: bytes, max_size_mb: int = 10) -> tuple[bool, str]:
+        """
+        Validate decoded image bytes, opening the image only once.
+        
+        Args:
+            image_data (bytes): The encoded image
+            max_size_mb (int): Maximum allowed image size in megabytes
             
-            # Validate that decoded data is actually a valid image using PIL
-            try:
-                image_stream = io.BytesIO(image_data)
-                with Image.open(image_stream) as img:
-                    # Verify the image by attempting to load it
-                    img.verify()
-                    
-                    # Check if image format is supported
-                    supported_formats = {'JPEG', 'PNG', 'GIF', 'BMP', 'WEBP', 'TIFF'}
-                    if img.format not in supported_formats:
-                        return False, f"Unsupported image format: {img.format}"
+        Returns:
+            tuple[bool, str]: (is_valid, error_message)
+        """
+        # Check decoded data size
+        if len(image_data) == 0:
+            return False, "Decoded image data is empty"
+        
+        # Check if decoded data size exceeds limit
+        max_size_bytes = max_size_mb * 1024 * 1024
+        if len(image_data) > max_size_bytes:
+            return False, f"Image size ({len(image_data)} bytes) exceeds limit ({max_size_bytes} bytes)"
+        
+        # Validate that decoded data is actually a valid image using PIL
+        try:
+            with Image.open(io.BytesIO(image_data)) as img:
+                # Check if image format is supported
+                supported_formats = {'JPEG', 'PNG', 'GIF', 'BMP', 'WEBP', 'TIFF'}
+                if img.format not in supported_formats:
+                    return False, f"Unsupported image format: {img.format}"
+                
+                # Format and size come from the header, so check them before verify() closes the image
+                width, height = img.size
+                
+                # Check reasonable dimension limits
+                max_dimension = 8192  # 8K resolution limit
+                if width > max_dimension or height > max_dimension:
+                    return False, f"Image dimensions ({width}x{height}) exceed limit ({max_dimension}x{max_dimension})"
+                
+                # Check minimum dimensions
+                if width < 1 or height < 1:
+                    return False, f"Invalid image dimensions: {width}x{height}"
+                
+                # Verify the image data itself
+                img.verify()
+                
+                logger.debug(f"Valid image detected: {img.format}, {width}x{height}, {len(image_data)} bytes")
                     
-                    # Re-open for dimension checks (verify() closes the image)
-                    image_stream.seek(0)
-                    with Image.open(image_stream) as img_check:
-                        width, height = img_check.size
-                        
-                        # Check reasonable dimension limits
-                        max_dimension = 8192  # 8K resolution limit
-                        if width > max_dimension or height > max_dimension:
-                            return False, f"Image dimensions ({width}x{height}) exceed limit ({max_dimension}x{max_dimension})"
-                        
-                        # Check minimum dimensions
-                        if width < 1 or height < 1:
-                            return False, f"Invalid image dimensions: {width}x{height}"
-                        
-                        logger.debug(f"Valid image detected: {img.format}, {width}x{height}, {len(image_data)} bytes")
-                        
-            except Exception as e:
-                return False, f"Invalid image data: {str(e)}"
+        except Exception as e:
+            return False, f"Invalid image data: {str(e)}"
+        
+        return True, "Valid image"
+
+    def _reuse_last_screenshot(self, result: dict, screenshot_hash: str) -> bool:
+        """Point the result at the previous upload if the screenshot is identical to it."""
+        if self._last_screenshot and self._last_screenshot[0] == screenshot_hash:
+            result["image_url"] = self._last_screenshot[1]
+            logger.debug("Screenshot unchanged, reusing the previous image")
+            return True
+        return False
+
+    async def _attach_screenshot(self, result: dict):
+        """Replace the screenshot of a browser result with an uploaded image_url.
+        
+        A screenshot with exactly the same bytes as the previous one reuses its
+        image_url instead of being validated and uploaded again. Any visual
+        change, however small (e.g. text typed into a field), is uploaded.
+        """
+        screenshot_hash = result.pop("screenshot_hash", None)
+        screenshot_path = result.pop("screenshot_path", None)
+        screenshot_data = result.pop("screenshot_base64", None)
+        try:
+            if screenshot_hash and self._reuse_last_screenshot(result, screenshot_hash):
+                return
+            
+            if screenshot_path:
+                # Binary transfer: the browser API left the encoded image in the sandbox
+                image_data = await self.sandbox.fs.download_file(screenshot_path)
+                is_valid, validation_message = self._validate_image_data(image_data)
+            elif screenshot_data:
+                is_valid, validation_message = self._validate_base64_image(screenshot_data)
+                image_data = base64.b64decode(screenshot_data.split(',', 1)[-1]) if is_valid else None
+            else:
+                return
             
-            return True, "Valid image"
+            if is_valid and not screenshot_hash:
+                screenshot_hash = hashlib.sha256(image_data).hexdigest()
+                if self._reuse_last_screenshot(result, screenshot_hash):
+                    return
             
+            if is_valid:
+                logger.debug(f"Screenshot validation passed: {validation_message}")
+                image_url = await upload_image(image_data)
+                result["image_url"] = image_url
+                self._last_screenshot = (screenshot_hash, image_url)
+                logger.debug(f"Uploaded screenshot to {image_url}")
+            else:
+                logger.warning(f"Screenshot validation failed: {validation_message}")
+                result["image_validation_error"] = validation_message
+                
         except Exception as e:
-            logger.error(f"Unexpected error during base64 image validation: {e}")
-            return False, f"Validation error: {str(e)}"
+            logger.error(f"Failed to process screenshot: {e}")
+            result["image_upload_error"] = str(e)
 
     async def _execute_browser_action(self, endpoint: str, params: dict = None, method: str = "POST") -> ToolResult:
         """Execute a browser automation action through the API
@@ -124,9 +195,9 @@ class SandboxBrowserTool(SandboxToolsBase):
             if method == "GET" and params:
                 query_params = "&".join([f"{k}={v}" for k, v in params.items()])
                 url = f"{url}?{query_params}"
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
+                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json' -H '{SCREENSHOT_TRANSFER_HEADER}'"
             else:
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
+                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json' -H '{SCREENSHOT_TRANSFER_HEADER}'"
                 if params:
                     json_data = json.dumps(params)
                     curl_cmd += f" -d '{json_data}'"
@@ -134,7 +205,7 @@ class SandboxBrowserTool(SandboxToolsBase):
             logger.debug("\033[95mExecuting curl command:\033[0m")
             logger.debug(f"{curl_cmd}")
             
-            response = self.sandbox.process.exec(curl_cmd, timeout=30)
+            response = await self.sandbox.process.exec(curl_cmd, timeout=30)
             
             if response.exit_code == 0:
                 try:
@@ -148,27 +219,8 @@ class SandboxBrowserTool(SandboxToolsBase):
 
                     logger.info("Browser automation request completed successfully")
 
-                    if "screenshot_base64" in result:
-                        try:
-                            # Comprehensive validation of the base64 image data
-                            screenshot_data = result["screenshot_base64"]
-                            is_valid, validation_message = self._validate_base64_image(screenshot_data)
-                            
-                            if is_valid:
-                                logger.debug(f"Screenshot validation passed: {validation_message}")
-                                image_url = await upload_base64_image(screenshot_data)
-                                result["image_url"] = image_url
-                                logger.debug(f"Uploaded screenshot to {image_url}")
-                            else:
-                                logger.warning(f"Screenshot validation failed: {validation_message}")
-                                result["image_validation_error"] = validation_message
-                                
-                            # Remove base64 data from result to keep it clean
-                            del result["screenshot_base64"]
-                            
-                        except Exception as e:
-                            logger.error(f"Failed to process screenshot: {e}")
-                            result["image_upload_error"] = str(e)
+                    if "screenshot_base64" in result or "screenshot_path" in result:
+                        await self._attach_screenshot(result)
 
                     added_message = await self.thread_manager.add_message(
                         thread_id=self.thread_id,
@@ -230,6 +282,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "url": {
                         "type": "string",
                         "description": "The url to navigate to"
+                    },
+                    "fast": {
+                        "type": "boolean",
+                        "description": "Load the page without images, media, fonts and ad/tracker requests. Much faster when only the page text is needed; leave off when the page's visuals matter"
                     }
                 },
                 "required": ["url"]
@@ -239,7 +295,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-navigate-to",
         mappings=[
-            {"param_name": "url", "node_type": "content", "path": "."}
+            {"param_name": "url", "node_type": "content", "path": "."},
+            {"param_name": "fast", "node_type": "attribute", "path": "."}
         ],
         example='''
         <function_calls>
@@ -249,16 +306,24 @@ class SandboxBrowserTool(SandboxToolsBase):
         </function_calls>
         '''
     )
-    async def browser_navigate_to(self, url: str) -> ToolResult:
+    async def browser_navigate_to(self, url: str, fast: Optional[bool] = None) -> ToolResult:
         """Navigate to a specific url
         
         Args:
             url (str): The url to navigate to
+            fast (bool, optional): Block images, media, fonts and trackers. Defaults to the agent's setting, then to the sandbox's BROWSER_FAST_MODE.
             
         Returns:
             dict: Result of the execution
         """
-        return await self._execute_browser_action("navigate_to", {"url": url})
+        if fast is None:
+            fast = self.fast_navigation
+        elif isinstance(fast, str):
+            fast = fast.strip().lower() == "true"
+        params = {"url": url}
+        if fast is not None:
+            params["fast"] = fast
+        return await self._execute_browser_action("navigate_to", params)
 
     # @openapi_schema({
     #     "type": "function",
@@ -687,6 +752,36 @@ class SandboxBrowserTool(SandboxToolsBase):
         
     #     return result
 
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "browser_get_page_text",
+            "description": "Read the text visible in the current browser viewport using OCR of a screenshot. Use this when the page text is needed and the element list does not contain it, e.g. text inside images, canvases or PDFs",
+            "parameters": {
+                "type": "object",
+                "properties": {}
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="browser-get-page-text",
+        mappings=[],
+        example='''
+        <function_calls>
+        <invoke name="browser_get_page_text">
+        </invoke>
+        </function_calls>
+        '''
+    )
+    async def browser_get_page_text(self) -> ToolResult:
+        """Read the visible page text via OCR
+        
+        Returns:
+            dict: Result of the execution
+        """
+        logger.debug(f"\033[95mExtracting visible page text with OCR\033[0m")
+        return await self._execute_browser_action("get_page_text", {})
+
     @openapi_schema({
         "type": "function",
         "function": {
@@ -1,5 +1,6 @@
 from agentpress.tool import ToolResult, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase    
+from sandbox.workspace import build_manifest, diff_manifests, fetch_files
 from utils.files_utils import should_exclude_file, clean_path
 from agentpress.thread_manager import ThreadManager
 from utils.logger import logger
@@ -12,6 +13,8 @@ class SandboxFilesTool(SandboxToolsBase):
         super().__init__(project_id, thread_manager)
         self.SNIPPET_LINES = 4  # Number of context lines to show around edits
         self.workspace_path = "/workspace"  # Ensure we're always operating in /workspace
+        self._workspace_manifest = {}  # Manifest of the last get_workspace_state call
+        self._workspace_files = {}  # Text files from that call, keyed by relative path
 
     def clean_path(self, path: str) -> str:
         """Clean and normalize a path to be relative to /workspace"""
@@ -21,44 +24,48 @@ class SandboxFilesTool(SandboxToolsBase):
         """Check if a file should be excluded based on path, name, or extension"""
         return should_exclude_file(rel_path)
 
-    def _file_exists(self, path: str) -> bool:
+    async def _file_exists(self, path: str) -> bool:
         """Check if a file exists in the sandbox"""
         try:
-            self.sandbox.fs.get_file_info(path)
+            await self.sandbox.fs.get_file_info(path)
             return True
         except Exception:
             return False
 
     async def get_workspace_state(self) -> dict:
-        """Get the current workspace state by reading all files"""
-        files_state = {}
+        """Get the current workspace state, downloading only files changed since the last call"""
         try:
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
             
-            files = self.sandbox.fs.list_files(self.workspace_path)
-            for file_info in files:
-                rel_path = file_info.name
-                
-                # Skip excluded files and directories
-                if self._should_exclude_file(rel_path) or file_info.is_dir:
-                    continue
+            manifest = await build_manifest(self.sandbox, self.workspace_path)
+            manifest = {path: entry for path, entry in manifest.items() if not self._should_exclude_file(path)}
+            changed, removed = diff_manifests(self._workspace_manifest, manifest)
+
+            for rel_path in removed:
+                self._workspace_files.pop(rel_path, None)
 
+            contents = await fetch_files(self.sandbox, self.workspace_path, changed)
+            for rel_path in changed:
+                size, mtime, _ = manifest[rel_path]
                 try:
-                    full_path = f"{self.workspace_path}/{rel_path}"
-                    content = self.sandbox.fs.download_file(full_path).decode()
-                    files_state[rel_path] = {
-                        "content": content,
-                        "is_dir": file_info.is_dir,
-                        "size": file_info.size,
-                        "modified": file_info.mod_time
+                    self._workspace_files[rel_path] = {
+                        "content": contents[rel_path].decode(),
+                        "is_dir": False,
+                        "size": size,
+                        "modified": mtime
                     }
-                except Exception as e:
-                    print(f"Error reading file {rel_path}: {e}")
+                except KeyError:
+                    # Removed since the manifest was built; retry on the next call
+                    print(f"Error reading file {rel_path}: not in archive")
+                    self._workspace_files.pop(rel_path, None)
+                    del manifest[rel_path]
                 except UnicodeDecodeError:
                     print(f"Skipping binary file: {rel_path}")
+                    self._workspace_files.pop(rel_path, None)
 
-            return files_state
+            self._workspace_manifest = manifest
+            return dict(self._workspace_files)
         
         except Exception as e:
             print(f"Error getting workspace state: {str(e)}")
@@ -126,24 +133,24 @@ class SandboxFilesTool(SandboxToolsBase):
             
             file_path = self.clean_path(file_path)
             full_path = f"{self.workspace_path}/{file_path}"
-            if self._file_exists(full_path):
+            if await self._file_exists(full_path):
                 return self.fail_response(f"File '{file_path}' already exists. Use update_file to modify existing files.")
             
             # Create parent directories if needed
             parent_dir = '/'.join(full_path.split('/')[:-1])
             if parent_dir:
-                self.sandbox.fs.create_folder(parent_dir, "755")
+                await self.sandbox.fs.create_folder(parent_dir, "755")
             
             # Write the file content
-            self.sandbox.fs.upload_file(file_contents.encode(), full_path)
-            self.sandbox.fs.set_file_permissions(full_path, permissions)
+            await self.sandbox.fs.upload_file(file_contents.encode(), full_path)
+            await self.sandbox.fs.set_file_permissions(full_path, permissions)
             
             message = f"File '{file_path}' created successfully."
             
             # Check if index.html was created and add 8080 server info (only in root workspace)
             if file_path.lower() == 'index.html':
                 try:
-                    website_link = self.sandbox.get_preview_link(8080)
+                    website_link = await self.sandbox.get_preview_link(8080)
                     website_url = website_link.url if hasattr(website_link, 'url') else str(website_link).split("url='")[1].split("'")[0]
                     message += f"\n\n[Auto-detected index.html - HTTP server available at: {website_url}]"
                     message += "\n[Note: Use the provided HTTP server URL above instead of starting a new server]"
@@ -203,10 +210,10 @@ class SandboxFilesTool(SandboxToolsBase):
             
             file_path = self.clean_path(file_path)
             full_path = f"{self.workspace_path}/{file_path}"
-            if not self._file_exists(full_path):
+            if not await self._file_exists(full_path):
                 return self.fail_response(f"File '{file_path}' does not exist")
             
-            content = self.sandbox.fs.download_file(full_path).decode()
+            content = (await self.sandbox.fs.download_file(full_path)).decode()
             old_str = old_str.expandtabs()
             new_str = new_str.expandtabs()
             
@@ -219,7 +226,7 @@ class SandboxFilesTool(SandboxToolsBase):
             
             # Perform replacement
             new_content = content.replace(old_str, new_str)
-            self.sandbox.fs.upload_file(new_content.encode(), full_path)
+            await self.sandbox.fs.upload_file(new_content.encode(), full_path)
             
             # Show snippet around the edit
             replacement_line = content.split(old_str)[0].count('\n')
@@ -291,18 +298,18 @@ class SandboxFilesTool(SandboxToolsBase):
             
             file_path = self.clean_path(file_path)
             full_path = f"{self.workspace_path}/{file_path}"
-            if not self._file_exists(full_path):
+            if not await self._file_exists(full_path):
                 return self.fail_response(f"File '{file_path}' does not exist. Use create_file to create a new file.")
             
-            self.sandbox.fs.upload_file(file_contents.encode(), full_path)
-            self.sandbox.fs.set_file_permissions(full_path, permissions)
+            await self.sandbox.fs.upload_file(file_contents.encode(), full_path)
+            await self.sandbox.fs.set_file_permissions(full_path, permissions)
             
             message = f"File '{file_path}' completely rewritten successfully."
             
             # Check if index.html was rewritten and add 8080 server info (only in root workspace)
             if file_path.lower() == 'index.html':
                 try:
-                    website_link = self.sandbox.get_preview_link(8080)
+                    website_link = await self.sandbox.get_preview_link(8080)
                     website_url = website_link.url if hasattr(website_link, 'url') else str(website_link).split("url='")[1].split("'")[0]
                     message += f"\n\n[Auto-detected index.html - HTTP server available at: {website_url}]"
                     message += "\n[Note: Use the provided HTTP server URL above instead of starting a new server]"
@@ -350,10 +357,10 @@ class SandboxFilesTool(SandboxToolsBase):
             
             file_path = self.clean_path(file_path)
             full_path = f"{self.workspace_path}/{file_path}"
-            if not self._file_exists(full_path):
+            if not await self._file_exists(full_path):
                 return self.fail_response(f"File '{file_path}' does not exist")
             
-            self.sandbox.fs.delete_file(full_path)
+            await self.sandbox.fs.delete_file(full_path)
             return self.success_response(f"File '{file_path}' deleted successfully.")
         except Exception as e:
             return self.fail_response(f"Error deleting file: {str(e)}")
@@ -1,10 +1,38 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+import asyncio
+import posixpath
+import shlex
 import time
 from uuid import uuid4
 from agentpress.tool import ToolResult, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
 
+# Output and exit code files of blocking commands
+COMMAND_LOG_DIR = "/tmp/suna_commands"
+
+# Backoff between completion checks of blocking commands, in seconds
+POLL_INITIAL_INTERVAL = 0.1
+POLL_MAX_INTERVAL = 2.0
+POLL_BACKOFF = 1.5
+
+# Bytes of new output fetched per check, and characters of output returned
+POLL_READ_LIMIT = 256 * 1024
+MAX_OUTPUT_CHARS = 100_000
+
+
+def wrap_blocking_command(command: str, cwd: str, log_file: str, exit_file: str) -> str:
+    """Shell line running a command with its output in log_file and exit code in exit_file.
+
+    The command is handed to bash -c as a single quoted argument, so a trailing
+    comment or unbalanced quote in it cannot swallow the rest of the line.
+    """
+    return (
+        f"mkdir -p {shlex.quote(posixpath.dirname(log_file))} && "
+        f"( ( cd {shlex.quote(cwd)} && bash -c {shlex.quote(command)} ) 2>&1; echo $? > {exit_file}.tmp ) | tee {log_file}; "
+        f"mv {exit_file}.tmp {exit_file}"
+    )
+
 class SandboxShellTool(SandboxToolsBase):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities. 
     Uses sessions for maintaining state between commands and provides comprehensive process management."""
@@ -20,7 +48,7 @@ class SandboxShellTool(SandboxToolsBase):
             session_id = str(uuid4())
             try:
                 await self._ensure_sandbox()  # Ensure sandbox is initialized
-                self.sandbox.process.create_session(session_id)
+                await self.sandbox.process.create_session(session_id)
                 self._sessions[session_name] = session_id
             except Exception as e:
                 raise RuntimeError(f"Failed to create session: {str(e)}")
@@ -31,7 +59,7 @@ class SandboxShellTool(SandboxToolsBase):
         if session_name in self._sessions:
             try:
                 await self._ensure_sandbox()  # Ensure sandbox is initialized
-                self.sandbox.process.delete_session(self._sessions[session_name])
+                await self.sandbox.process.delete_session(self._sessions[session_name])
                 del self._sessions[session_name]
             except Exception as e:
                 print(f"Warning: Failed to cleanup session {session_name}: {str(e)}")
@@ -137,49 +165,43 @@ class SandboxShellTool(SandboxToolsBase):
                 # Create a new tmux session
                 await self._execute_raw_command(f"tmux new-session -d -s {session_name}")
                 
-            # Ensure we're in the correct directory and send command to tmux
-            full_command = f"cd {cwd} && {command}"
-            wrapped_command = full_command.replace('"', '\\"')  # Escape double quotes
-            
-            # Send command to tmux session
-            await self._execute_raw_command(f'tmux send-keys -t {session_name} "{wrapped_command}" Enter')
-            
             if blocking:
-                # For blocking execution, wait and capture output
-                start_time = time.time()
-                while (time.time() - start_time) < timeout:
-                    # Wait a bit before checking
-                    time.sleep(2)
-                    
-                    # Check if session still exists (command might have exited)
-                    check_result = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'ended'")
-                    if "ended" in check_result.get("output", ""):
-                        break
-                        
-                    # Get current output and check for common completion indicators
-                    output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-                    current_output = output_result.get("output", "")
-                    
-                    # Check for prompt indicators that suggest command completion
-                    last_lines = current_output.split('\n')[-3:]
-                    completion_indicators = ['$', '#', '>', 'Done', 'Completed', 'Finished', '✓']
-                    if any(indicator in line for indicator in completion_indicators for line in last_lines):
-                        break
-                
-                # Capture final output
-                output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-                final_output = output_result.get("output", "")
-                
-                # Kill the session after capture
-                await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+                # Run the command so that its output goes to a log file and its exit
+                # code to a marker file, then wait for the marker
+                command_id = str(uuid4())[:8]
+                log_file = f"{COMMAND_LOG_DIR}/{command_id}.log"
+                exit_file = f"{COMMAND_LOG_DIR}/{command_id}.exit"
+                wrapped_command = wrap_blocking_command(command, cwd, log_file, exit_file)
+                await self._execute_raw_command(f"tmux send-keys -t {session_name} {shlex.quote(wrapped_command)} Enter")
+
+                exit_code, final_output = await self._wait_for_command(log_file, exit_file, timeout)
+                if exit_code is None:
+                    return self.success_response({
+                        "output": final_output,
+                        "session_name": session_name,
+                        "cwd": cwd,
+                        "message": f"Command still running after {timeout}s in tmux session '{session_name}'. Use check_command_output to view results.",
+                        "completed": False
+                    })
+
+                # Kill the session and remove the log once the command has finished
+                await self._execute_raw_command(f"tmux kill-session -t {session_name}; rm -f {log_file} {exit_file}")
                 
                 return self.success_response({
                     "output": final_output,
+                    "exit_code": exit_code,
                     "session_name": session_name,
                     "cwd": cwd,
                     "completed": True
                 })
             else:
+                # Ensure we're in the correct directory and send command to tmux
+                full_command = f"cd {cwd} && {command}"
+                wrapped_command = full_command.replace('"', '\\"')  # Escape double quotes
+                
+                # Send command to tmux session
+                await self._execute_raw_command(f'tmux send-keys -t {session_name} "{wrapped_command}" Enter')
+                
                 # For non-blocking, just return immediately
                 return self.success_response({
                     "session_name": session_name,
@@ -197,6 +219,55 @@ class SandboxShellTool(SandboxToolsBase):
                     pass
             return self.fail_response(f"Error executing command: {str(e)}")
 
+    async def _wait_for_command(self, log_file: str, exit_file: str, timeout: int) -> Tuple[Optional[int], str]:
+        """Wait for a blocking command's exit code file, reading its log incrementally.
+
+        Each check reads the exit code (if written yet), the current log size and the
+        log bytes after the previous offset in one exec. Returns (exit_code, output);
+        exit_code is None if the command did not finish within timeout.
+        """
+        offset = 0
+        chunks = []
+        interval = POLL_INITIAL_INTERVAL
+        deadline = time.monotonic() + timeout
+        exit_code = None
+
+        while True:
+            # The exit file is written after tee has closed the log, so once it is
+            # present the size read after it is final
+            script = (
+                f"cat {exit_file} 2>/dev/null || echo running; "
+                f"size=$(stat -c %s {log_file} 2>/dev/null || echo 0); echo $size; "
+                f"n=$((size - {offset})); [ $n -gt {POLL_READ_LIMIT} ] && n={POLL_READ_LIMIT}; "
+                f"[ $n -gt 0 ] && tail -c +{offset + 1} {log_file} | head -c $n"
+            )
+            response = await self.sandbox.process.exec(f"/bin/sh -c {shlex.quote(script)}", timeout=30)
+            status, size, data = ((response.result or "").split("\n", 2) + ["", ""])[:3]
+
+            size = int(size) if size.strip().isdigit() else offset
+            read = min(size - offset, POLL_READ_LIMIT)
+            if read > 0:
+                chunks.append(data)
+                offset += read
+
+            if status.strip().lstrip("-").isdigit():
+                exit_code = int(status)
+                if offset >= size or read <= 0:
+                    break
+                # Log larger than one read; fetch the rest right away
+                continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+
+        output = "".join(chunks)
+        if len(output) > MAX_OUTPUT_CHARS:
+            output = "[output truncated]\n" + output[-MAX_OUTPUT_CHARS:]
+        return exit_code, output
+
     async def _execute_raw_command(self, command: str) -> Dict[str, Any]:
         """Execute a raw command directly in the sandbox."""
         # Ensure session exists for raw commands
@@ -210,13 +281,13 @@ class SandboxShellTool(SandboxToolsBase):
             cwd=self.workspace_path
         )
         
-        response = self.sandbox.process.execute_session_command(
+        response = await self.sandbox.process.execute_session_command(
             session_id=session_id,
             req=req,
             timeout=30  # Short timeout for utility commands
         )
         
-        logs = self.sandbox.process.get_session_command_logs(
+        logs = await self.sandbox.process.get_session_command_logs(
             session_id=session_id,
             command_id=response.cmd_id
         )
@@ -1,13 +1,20 @@
 import os
+import asyncio
 import base64
+import hashlib
 import mimetypes
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
 from io import BytesIO
 from PIL import Image
 
 from agentpress.tool import ToolResult, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
+from services import redis
+from utils.config import config
+from utils.logger import logger
+from utils.s3_upload_utils import create_signed_image_url, upload_private_image
 import json
 
 # Add common image MIME types if mimetypes module is limited
@@ -27,6 +34,109 @@ DEFAULT_MAX_HEIGHT = 1080
 DEFAULT_JPEG_QUALITY = 85
 DEFAULT_PNG_COMPRESS_LEVEL = 6
 
+# Compressed images are cached per project by the hash of the original bytes
+CACHE_KEY_PREFIX = "vision_image"
+
+# Decoding, resizing and encoding run here; PIL releases the GIL for the heavy parts
+vision_executor = ThreadPoolExecutor(
+    max_workers=config.VISION_MAX_WORKERS,
+    thread_name_prefix="vision",
+)
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """Content hash of an image file."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def image_cache_key(project_id: str, mime_type: str, digest: str) -> str:
+    """Cache key of the compressed form of an image in a project."""
+    return f"{CACHE_KEY_PREFIX}:{project_id}:{mime_type}:{digest}"
+
+
+async def get_cached_image(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        cached = await redis.get(key)
+    except Exception as e:
+        logger.warning(f"Vision image cache lookup failed for {key}: {str(e)}")
+        return None
+    return json.loads(cached) if cached is not None else None
+
+
+async def set_cached_image(key: str, entry: Dict[str, Any]):
+    try:
+        await redis.set(key, json.dumps(entry), ex=config.VISION_IMAGE_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to cache vision image {key}: {str(e)}")
+
+
+def compress_image(image_bytes: bytes, mime_type: str, file_path: str) -> Tuple[bytes, str]:
+    """Compress an image to reduce its size while maintaining reasonable quality.
+
+    Runs in vision_executor, off the event loop.
+    
+    Args:
+        image_bytes: Original image bytes
+        mime_type: MIME type of the image
+        file_path: Path to the image file (for logging)
+        
+    Returns:
+        Tuple of (compressed_bytes, new_mime_type)
+    """
+    try:
+        # Open image from bytes
+        img = Image.open(BytesIO(image_bytes))
+        
+        # Convert RGBA to RGB if necessary (for JPEG)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            # Create a white background
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+            img = background
+        
+        # Calculate new dimensions while maintaining aspect ratio
+        width, height = img.size
+        if width > DEFAULT_MAX_WIDTH or height > DEFAULT_MAX_HEIGHT:
+            ratio = min(DEFAULT_MAX_WIDTH / width, DEFAULT_MAX_HEIGHT / height)
+            new_width = int(width * ratio)
+            new_height = int(height * ratio)
+            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            print(f"[SeeImage] Resized image from {width}x{height} to {new_width}x{new_height}")
+        
+        # Save to bytes with compression
+        output = BytesIO()
+        
+        # Determine output format based on original mime type
+        if mime_type == 'image/gif':
+            # Keep GIFs as GIFs to preserve animation
+            img.save(output, format='GIF', optimize=True)
+            output_mime = 'image/gif'
+        elif mime_type == 'image/png':
+            # Compress PNG
+            img.save(output, format='PNG', optimize=True, compress_level=DEFAULT_PNG_COMPRESS_LEVEL)
+            output_mime = 'image/png'
+        else:
+            # Convert everything else to JPEG for better compression
+            img.save(output, format='JPEG', quality=DEFAULT_JPEG_QUALITY, optimize=True)
+            output_mime = 'image/jpeg'
+        
+        compressed_bytes = output.getvalue()
+        
+        # Log compression results
+        original_size = len(image_bytes)
+        compressed_size = len(compressed_bytes)
+        compression_ratio = (1 - compressed_size / original_size) * 100
+        print(f"[SeeImage] Compressed '{file_path}' from {original_size / 1024:.1f}KB to {compressed_size / 1024:.1f}KB ({compression_ratio:.1f}% reduction)")
+        
+        return compressed_bytes, output_mime
+        
+    except Exception as e:
+        print(f"[SeeImage] Failed to compress image: {str(e)}. Using original.")
+        return image_bytes, mime_type
+
+
 class SandboxVisionTool(SandboxToolsBase):
     """Tool for allowing the agent to 'see' images within the sandbox."""
 
@@ -36,70 +146,6 @@ class SandboxVisionTool(SandboxToolsBase):
         # Make thread_manager accessible within the tool instance
         self.thread_manager = thread_manager
 
-    def compress_image(self, image_bytes: bytes, mime_type: str, file_path: str) -> Tuple[bytes, str]:
-        """Compress an image to reduce its size while maintaining reasonable quality.
-        
-        Args:
-            image_bytes: Original image bytes
-            mime_type: MIME type of the image
-            file_path: Path to the image file (for logging)
-            
-        Returns:
-            Tuple of (compressed_bytes, new_mime_type)
-        """
-        try:
-            # Open image from bytes
-            img = Image.open(BytesIO(image_bytes))
-            
-            # Convert RGBA to RGB if necessary (for JPEG)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # Create a white background
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # Calculate new dimensions while maintaining aspect ratio
-            width, height = img.size
-            if width > DEFAULT_MAX_WIDTH or height > DEFAULT_MAX_HEIGHT:
-                ratio = min(DEFAULT_MAX_WIDTH / width, DEFAULT_MAX_HEIGHT / height)
-                new_width = int(width * ratio)
-                new_height = int(height * ratio)
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                print(f"[SeeImage] Resized image from {width}x{height} to {new_width}x{new_height}")
-            
-            # Save to bytes with compression
-            output = BytesIO()
-            
-            # Determine output format based on original mime type
-            if mime_type == 'image/gif':
-                # Keep GIFs as GIFs to preserve animation
-                img.save(output, format='GIF', optimize=True)
-                output_mime = 'image/gif'
-            elif mime_type == 'image/png':
-                # Compress PNG
-                img.save(output, format='PNG', optimize=True, compress_level=DEFAULT_PNG_COMPRESS_LEVEL)
-                output_mime = 'image/png'
-            else:
-                # Convert everything else to JPEG for better compression
-                img.save(output, format='JPEG', quality=DEFAULT_JPEG_QUALITY, optimize=True)
-                output_mime = 'image/jpeg'
-            
-            compressed_bytes = output.getvalue()
-            
-            # Log compression results
-            original_size = len(image_bytes)
-            compressed_size = len(compressed_bytes)
-            compression_ratio = (1 - compressed_size / original_size) * 100
-            print(f"[SeeImage] Compressed '{file_path}' from {original_size / 1024:.1f}KB to {compressed_size / 1024:.1f}KB ({compression_ratio:.1f}% reduction)")
-            
-            return compressed_bytes, output_mime
-            
-        except Exception as e:
-            print(f"[SeeImage] Failed to compress image: {str(e)}. Using original.")
-            return image_bytes, mime_type
-
     @openapi_schema({
         "type": "function",
         "function": {
@@ -132,7 +178,7 @@ class SandboxVisionTool(SandboxToolsBase):
         '''
     )
     async def see_image(self, file_path: str) -> ToolResult:
-        """Reads an image file, compresses it, converts it to base64, and adds it as a temporary message."""
+        """Reads an image file, compresses it, uploads it, and adds its URL as a temporary message."""
         try:
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
@@ -143,7 +189,7 @@ class SandboxVisionTool(SandboxToolsBase):
 
             # Check if file exists and get info
             try:
-                file_info = self.sandbox.fs.get_file_info(full_path)
+                file_info = await self.sandbox.fs.get_file_info(full_path)
                 if file_info.is_dir:
                     return self.fail_response(f"Path '{cleaned_path}' is a directory, not an image file.")
             except Exception as e:
@@ -155,7 +201,7 @@ class SandboxVisionTool(SandboxToolsBase):
 
             # Read image file content
             try:
-                image_bytes = self.sandbox.fs.download_file(full_path)
+                image_bytes = await self.sandbox.fs.download_file(full_path)
             except Exception as e:
                 return self.fail_response(f"Could not read image file: {cleaned_path}")
 
@@ -171,24 +217,54 @@ class SandboxVisionTool(SandboxToolsBase):
                 else:
                     return self.fail_response(f"Unsupported or unknown image format for file: '{cleaned_path}'. Supported: JPG, PNG, GIF, WEBP.")
 
-            # Compress the image
-            compressed_bytes, compressed_mime_type = self.compress_image(image_bytes, mime_type, cleaned_path)
-            
-            # Check if compressed image is still too large
-            if len(compressed_bytes) > MAX_COMPRESSED_SIZE:
-                return self.fail_response(f"Image file '{cleaned_path}' is still too large after compression ({len(compressed_bytes) / (1024*1024):.2f}MB). Maximum compressed size is {MAX_COMPRESSED_SIZE / (1024*1024)}MB.")
+            loop = asyncio.get_running_loop()
+            digest = await loop.run_in_executor(vision_executor, image_digest, image_bytes)
+            cache_key = image_cache_key(self.project_id, mime_type, digest)
+            cached = await get_cached_image(cache_key)
+            image_context_data = None
+            if cached is not None:
+                try:
+                    # Workspace files stay private; each view gets a fresh short-lived URL
+                    image_url = await create_signed_image_url(cached["storage_path"], config.VISION_IMAGE_URL_TTL)
+                    image_context_data = {
+                        "mime_type": cached["mime_type"],
+                        "compressed_size": cached["compressed_size"],
+                        "image_url": image_url,
+                    }
+                    logger.debug(f"Using cached compressed image for '{cleaned_path}'")
+                except Exception as e:
+                    logger.info(f"Cached image for '{cleaned_path}' is no longer in storage, uploading it again: {str(e)}")
+
+            if image_context_data is None:
+                compressed_bytes, compressed_mime_type = await loop.run_in_executor(
+                    vision_executor, compress_image, image_bytes, mime_type, cleaned_path
+                )
+
+                # Check if compressed image is still too large
+                if len(compressed_bytes) > MAX_COMPRESSED_SIZE:
+                    return self.fail_response(f"Image file '{cleaned_path}' is still too large after compression ({len(compressed_bytes) / (1024*1024):.2f}MB). Maximum compressed size is {MAX_COMPRESSED_SIZE / (1024*1024)}MB.")
 
-            # Convert to base64
-            base64_image = base64.b64encode(compressed_bytes).decode('utf-8')
+                image_context_data = {
+                    "mime_type": compressed_mime_type,
+                    "compressed_size": len(compressed_bytes)
+                }
+                try:
+                    # Store a signed URL in the message rather than the image itself
+                    storage_path = await upload_private_image(compressed_bytes, self.project_id, digest)
+                    image_context_data["image_url"] = await create_signed_image_url(storage_path, config.VISION_IMAGE_URL_TTL)
+                    await set_cached_image(cache_key, {**image_context_data, "storage_path": storage_path})
+                except Exception as e:
+                    logger.warning(f"Failed to upload image '{cleaned_path}', sending it inline: {str(e)}")
+                    image_context_data.pop("image_url", None)
+                    image_context_data["base64"] = base64.b64encode(compressed_bytes).decode('utf-8')
 
             # Prepare the temporary message content
             image_context_data = {
-                "mime_type": compressed_mime_type,
-                "base64": base64_image,
+                **image_context_data,
                 "file_path": cleaned_path, # Include path for context
-                "original_size": file_info.size,
-                "compressed_size": len(compressed_bytes)
+                "original_size": file_info.size
             }
+            compressed_size = image_context_data["compressed_size"]
 
             # Add the temporary message using the thread_manager callback
             # Use a distinct type like 'image_context'
@@ -200,7 +276,7 @@ class SandboxVisionTool(SandboxToolsBase):
             )
 
             # Inform the agent the image will be available next turn
-            return self.success_response(f"Successfully loaded and compressed the image '{cleaned_path}' (reduced from {file_info.size / 1024:.1f}KB to {len(compressed_bytes) / 1024:.1f}KB).")
+            return self.success_response(f"Successfully loaded and compressed the image '{cleaned_path}' (reduced from {file_info.size / 1024:.1f}KB to {compressed_size / 1024:.1f}KB).")
 
         except Exception as e:
             return self.fail_response(f"An unexpected error occurred while trying to see the image: {str(e)}") 
\ No newline at end of file
@@ -1,7 +1,8 @@
 from tavily import AsyncTavilyClient
 import httpx
 from dotenv import load_dotenv
-from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema, cacheable
+from agentpress.tool_result_cache import tool_result_cache
 from utils.config import config
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
@@ -13,6 +14,10 @@ import logging
 
 # TODO: add subpages, etc... in filters as sometimes its necessary 
 
+# How long search results and scraped pages are reused (seconds)
+SEARCH_CACHE_TTL = 3600
+SCRAPE_CACHE_TTL = 3600
+
 class SandboxWebSearchTool(SandboxToolsBase):
     """Tool for performing web searches using Tavily API and web scraping using Firecrawl."""
 
@@ -33,6 +38,7 @@ class SandboxWebSearchTool(SandboxToolsBase):
         # Tavily asynchronous search client
         self.tavily_client = AsyncTavilyClient(api_key=self.tavily_api_key)
 
+    @cacheable(ttl=SEARCH_CACHE_TTL)
     @openapi_schema({
         "type": "function",
         "function": {
@@ -264,6 +270,52 @@ class SandboxWebSearchTool(SandboxToolsBase):
             logging.error(f"Error in scrape_webpage: {error_message}")
             return self.fail_response(f"Error processing scrape request: {error_message[:200]}")
     
+    async def _fetch_firecrawl(self, url: str) -> dict:
+        """Scrape a URL with Firecrawl and return the raw response data."""
+        # ---------- Firecrawl scrape endpoint ----------
+        logging.info(f"Sending request to Firecrawl for URL: {url}")
+        async with httpx.AsyncClient() as client:
+            headers = {
+                "Authorization": f"Bearer {self.firecrawl_api_key}",
+                "Content-Type": "application/json",
+            }
+            payload = {
+                "url": url,
+                "formats": ["markdown"]
+            }
+            
+            # Use longer timeout and retry logic for more reliability
+            max_retries = 3
+            timeout_seconds = 120
+            retry_count = 0
+            
+            while retry_count < max_retries:
+                try:
+                    logging.info(f"Sending request to Firecrawl (attempt {retry_count + 1}/{max_retries})")
+                    response = await client.post(
+                        f"{self.firecrawl_url}/v1/scrape",
+                        json=payload,
+                        headers=headers,
+                        timeout=timeout_seconds,
+                    )
+                    response.raise_for_status()
+                    data = response.json()
+                    logging.info(f"Successfully received response from Firecrawl for {url}")
+                    break
+                except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ReadError) as timeout_err:
+                    retry_count += 1
+                    logging.warning(f"Request timed out (attempt {retry_count}/{max_retries}): {str(timeout_err)}")
+                    if retry_count >= max_retries:
+                        raise Exception(f"Request timed out after {max_retries} attempts with {timeout_seconds}s timeout")
+                    # Exponential backoff
+                    logging.info(f"Waiting {2 ** retry_count}s before retry")
+                    await asyncio.sleep(2 ** retry_count)
+                except Exception as e:
+                    # Don't retry on non-timeout errors
+                    logging.error(f"Error during scraping: {str(e)}")
+                    raise e
+        return data
+
     async def _scrape_single_url(self, url: str) -> dict:
         """
         Helper function to scrape a single URL and return the result information.
@@ -271,48 +323,12 @@ class SandboxWebSearchTool(SandboxToolsBase):
         logging.info(f"Scraping single URL: {url}")
         
         try:
-            # ---------- Firecrawl scrape endpoint ----------
-            logging.info(f"Sending request to Firecrawl for URL: {url}")
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "Authorization": f"Bearer {self.firecrawl_api_key}",
-                    "Content-Type": "application/json",
-                }
-                payload = {
-                    "url": url,
-                    "formats": ["markdown"]
-                }
-                
-                # Use longer timeout and retry logic for more reliability
-                max_retries = 3
-                timeout_seconds = 120
-                retry_count = 0
-                
-                while retry_count < max_retries:
-                    try:
-                        logging.info(f"Sending request to Firecrawl (attempt {retry_count + 1}/{max_retries})")
-                        response = await client.post(
-                            f"{self.firecrawl_url}/v1/scrape",
-                            json=payload,
-                            headers=headers,
-                            timeout=timeout_seconds,
-                        )
-                        response.raise_for_status()
-                        data = response.json()
-                        logging.info(f"Successfully received response from Firecrawl for {url}")
-                        break
-                    except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ReadError) as timeout_err:
-                        retry_count += 1
-                        logging.warning(f"Request timed out (attempt {retry_count}/{max_retries}): {str(timeout_err)}")
-                        if retry_count >= max_retries:
-                            raise Exception(f"Request timed out after {max_retries} attempts with {timeout_seconds}s timeout")
-                        # Exponential backoff
-                        logging.info(f"Waiting {2 ** retry_count}s before retry")
-                        await asyncio.sleep(2 ** retry_count)
-                    except Exception as e:
-                        # Don't retry on non-timeout errors
-                        logging.error(f"Error during scraping: {str(e)}")
-                        raise e
+            # The scrape itself is cached per account; the file is still written to this sandbox
+            cache_scope = self.thread_manager.account_id if self.thread_manager else None
+            cached = await tool_result_cache.get("firecrawl_scrape", {"url": url}, scope=cache_scope)
+            data = json.loads(cached.output) if cached else await self._fetch_firecrawl(url)
+            if not cached:
+                await tool_result_cache.set("firecrawl_scrape", {"url": url}, ToolResult(success=True, output=json.dumps(data)), SCRAPE_CACHE_TTL, scope=cache_scope)
 
             # Format the response
             title = data.get("data", {}).get("metadata", {}).get("title", "")
@@ -346,13 +362,13 @@ class SandboxWebSearchTool(SandboxToolsBase):
             
             # Save results to a file in the /workspace/scrape directory
             scrape_dir = f"{self.workspace_path}/scrape"
-            self.sandbox.fs.create_folder(scrape_dir, "755")
+            await self.sandbox.fs.create_folder(scrape_dir, "755")
             
             results_file_path = f"{scrape_dir}/{safe_filename}"
             json_content = json.dumps(formatted_result, ensure_ascii=False, indent=2)
             logging.info(f"Saving content to file: {results_file_path}, size: {len(json_content)} bytes")
             
-            self.sandbox.fs.upload_file(
+            await self.sandbox.fs.upload_file(
                 json_content.encode(),
                 results_file_path,
             )
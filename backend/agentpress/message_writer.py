@@ -0,0 +1,134 @@
+"""
+Write-behind persistence for non-LLM thread messages.
+
+Status rows (thread_run_start, tool_started, finish, assistant_response_end, ...)
+are only needed by the UI and billing after the fact, so awaiting an insert for
+each of them on the streaming hot path is wasted latency. The MessageWriter
+assigns message IDs client-side, returns the row immediately and persists queued
+rows in bulk inserts on a short interval or when flushed.
+
+created_at is left to the database default, like every other insert into the
+messages table, so all rows of a thread are stamped by one clock. Rows are
+ordered by the time they are inserted; callers writing other rows directly
+flush the queue first to keep that the order they were produced in.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from services.supabase import DBConnection
+from utils.logger import logger
+
+# Message types that are safe to persist asynchronously
+WRITE_BEHIND_MESSAGE_TYPES = {"status", "assistant_response_end"}
+
+DEFAULT_FLUSH_INTERVAL = 0.5   # Seconds between background flushes
+DEFAULT_MAX_BATCH_SIZE = 50    # Rows that trigger an immediate flush
+
+
+class MessageWriter:
+    """Buffers message rows and writes them to the messages table in batches."""
+
+    def __init__(
+        self,
+        db: Optional[DBConnection] = None,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE
+    ):
+        """Initialize the MessageWriter.
+
+        Args:
+            db: Database connection to write with
+            flush_interval: Maximum time in seconds a queued row waits before being written
+            max_batch_size: Number of queued rows that triggers an immediate flush
+        """
+        self.db = db or DBConnection()
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self._pending: List[Dict[str, Any]] = []
+        self._on_written: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def pending_count(self) -> int:
+        """Number of rows queued but not yet written."""
+        return len(self._pending)
+
+    def enqueue(self, data: Dict[str, Any], on_written: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None) -> Dict[str, Any]:
+        """Queue a row for insertion and return it as it will be stored.
+
+        Args:
+            data: Row to insert, without message_id or timestamps
+            on_written: Called with the row once it has been written
+
+        Returns:
+            The message row including its client-assigned message_id, with a
+            provisional created_at for streaming; the stored one is set by the
+            database when the row is written.
+        """
+        row = {'message_id': str(uuid.uuid4()), **data}
+        self._pending.append(row)
+        if on_written:
+            self._on_written[row['message_id']] = on_written
+
+        if len(self._pending) >= self.max_batch_size:
+            self._schedule_flush(delay=0)
+        else:
+            self._schedule_flush(delay=self.flush_interval)
+        timestamp = datetime.now(timezone.utc).isoformat()
+        return {**row, 'created_at': timestamp, 'updated_at': timestamp}
+
+    def _schedule_flush(self, delay: float):
+        """Start a background flush unless one is already scheduled."""
+        if self._flush_task and not self._flush_task.done():
+            if delay > 0:
+                return
+        self._flush_task = asyncio.create_task(self._delayed_flush(delay))
+
+    async def _delayed_flush(self, delay: float):
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Background message flush failed: {str(e)}")
+
+    async def flush(self):
+        """Write all queued rows, preserving the order they were queued in."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+
+            client = await self.db.client
+            written = batch
+            try:
+                await client.table('messages').insert(batch, returning='minimal').execute()
+                logger.debug(f"Flushed {len(batch)} queued messages")
+            except Exception as e:
+                # One bad row should not lose the rest of the batch
+                logger.warning(f"Bulk insert of {len(batch)} queued messages failed, retrying row by row: {str(e)}")
+                written = []
+                for row in batch:
+                    try:
+                        await client.table('messages').insert(row, returning='minimal').execute()
+                        written.append(row)
+                    except Exception as row_e:
+                        self._on_written.pop(row['message_id'], None)
+                        logger.error(f"Failed to write queued message {row['message_id']} to thread {row.get('thread_id')}: {str(row_e)}")
+
+            for row in written:
+                callback = self._on_written.pop(row['message_id'], None)
+                if callback is None:
+                    continue
+                try:
+                    await callback(dict(row))
+                except Exception as e:
+                    logger.error(f"Callback for written message {row['message_id']} failed: {str(e)}")
+
+    async def close(self):
+        """Write what is left; a scheduled background flush then finds nothing to do."""
+        await self.flush()
@@ -0,0 +1,123 @@
+"""
+Prompt-cache-stable context layout for Anthropic models.
+
+Anthropic prompt caching only pays off if the start of the prompt is
+byte-identical from one call to the next. Compressing the whole history on
+every turn rewrites messages in the middle of it as the thread grows, so the
+cached prefix rarely survives. Instead, the messages sent on a turn are frozen
+as rendered (compressed or not) and reused verbatim as the prefix of the next
+turns; compression only works on the messages that came after it. When the
+frozen prefix no longer leaves room for the rest of the conversation, the
+layout is rebuilt once with headroom and frozen again.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Threads whose frozen prefix is kept per process
+DEFAULT_MAX_THREADS = 1024
+
+# Fraction of the budget a rebuilt layout is compressed to, so the following
+# turns fit behind the frozen prefix before the next rebuild
+REBUILD_TARGET_RATIO = 0.8
+
+
+def is_prompt_cache_model(llm_model: str) -> bool:
+    """Whether the model supports Anthropic-style cache_control breakpoints."""
+    model = llm_model.lower()
+    return "claude" in model or "anthropic" in model
+
+
+def match_frozen_prefix(frozen: List[Dict[str, Any]], messages: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """Match a frozen prefix to the thread history by message_id.
+
+    The frozen prefix may skip messages of the history, where they were dropped
+    or cut out of the middle when it was rendered. Frozen messages are kept up
+    to the first one that is no longer in the history, in order.
+
+    Returns:
+        The number of frozen messages still valid and the number of history
+        messages they cover, i.e. the index of the first message after them.
+    """
+    positions = {msg['message_id']: i for i, msg in enumerate(messages) if msg.get('message_id')}
+    count = covered = 0
+    for frozen_msg in frozen:
+        position = positions.get(frozen_msg.get('message_id'))
+        if position is None or position < covered:
+            break
+        count += 1
+        covered = position + 1
+    return count, covered
+
+
+class StablePrefixCache:
+    """LRU of the frozen, rendered prompt prefix of each thread."""
+
+    def __init__(self, max_threads: int = DEFAULT_MAX_THREADS):
+        self.max_threads = max_threads
+        self._prefixes: "OrderedDict[Tuple[str, str], List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, thread_id: str, llm_model: str) -> List[Dict[str, Any]]:
+        """Get the frozen prefix of a thread (without the system prompt)."""
+        with self._lock:
+            prefix = self._prefixes.get((thread_id, llm_model))
+            if prefix is None:
+                return []
+            self._prefixes.move_to_end((thread_id, llm_model))
+            return list(prefix)
+
+    def set(self, thread_id: str, llm_model: str, messages: List[Dict[str, Any]]):
+        """Freeze the rendered messages as the prefix of the thread's next prompts."""
+        with self._lock:
+            self._prefixes[(thread_id, llm_model)] = [dict(msg) for msg in messages]
+            self._prefixes.move_to_end((thread_id, llm_model))
+            while len(self._prefixes) > self.max_threads:
+                self._prefixes.popitem(last=False)
+
+    def invalidate(self, thread_id: str):
+        """Forget the frozen prefix of a thread for all models."""
+        with self._lock:
+            for key in [key for key in self._prefixes if key[0] == thread_id]:
+                del self._prefixes[key]
+
+
+def add_cache_control(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of the message with a cache breakpoint on its last text block."""
+    content = message.get("content")
+    if isinstance(content, str):
+        return {**message, "content": [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}]}
+    if isinstance(content, list):
+        new_content = list(content)
+        for i in range(len(new_content) - 1, -1, -1):
+            item = new_content[i]
+            if isinstance(item, dict) and item.get("type") == "text":
+                new_content[i] = {**item, "cache_control": {"type": "ephemeral"}}
+                return {**message, "content": new_content}
+    return message
+
+
+def apply_cache_breakpoints(messages: List[Dict[str, Any]], breakpoints: List[int], max_breakpoints: int = 4) -> Tuple[List[Dict[str, Any]], int]:
+    """Mark the messages at the given indices as cache breakpoints.
+
+    The input messages are not modified, since prefix messages are reused on
+    later turns. Returns the new message list and the number of breakpoints set.
+    """
+    result = list(messages)
+    applied = 0
+    for index in sorted(set(breakpoints)):
+        if applied >= max_breakpoints:
+            break
+        if not 0 <= index < len(result):
+            continue
+        marked = add_cache_control(result[index])
+        if marked is not result[index]:
+            result[index] = marked
+            applied += 1
+    return result, applied
+
+
+# Process-wide store shared by all ThreadManager instances, so a new run of a
+# thread on the same worker continues with the prefix of the previous run
+stable_prefix_cache = StablePrefixCache()
@@ -19,6 +19,8 @@ from utils.logger import logger
 from agentpress.tool import ToolResult
 from agentpress.tool_registry import ToolRegistry
 from agentpress.xml_tool_parser import XMLToolParser
+from agentpress.xml_stream_scanner import StreamingXMLScanner
+from agentpress.tool_result_cache import tool_result_cache
 from langfuse.client import StatefulTraceClient
 from services.langfuse import langfuse
 from agentpress.utils.json_helpers import (
@@ -86,7 +88,7 @@ class ProcessorConfig:
 class ResponseProcessor:
     """Processes LLM responses, extracting and executing tool calls."""
     
-    def __init__(self, tool_registry: ToolRegistry, add_message_callback: Callable, trace: Optional[StatefulTraceClient] = None, is_agent_builder: bool = False, target_agent_id: Optional[str] = None, agent_config: Optional[dict] = None):
+    def __init__(self, tool_registry: ToolRegistry, add_message_callback: Callable, trace: Optional[StatefulTraceClient] = None, is_agent_builder: bool = False, target_agent_id: Optional[str] = None, agent_config: Optional[dict] = None, account_id: Optional[str] = None):
         """Initialize the ResponseProcessor.
         
         Args:
@@ -94,6 +96,7 @@ class ResponseProcessor:
             add_message_callback: Callback function to add messages to the thread.
                 MUST return the full saved message object (dict) or None.
             agent_config: Optional agent configuration with version information
+            account_id: Optional account ID used to scope cached tool results
         """
         self.tool_registry = tool_registry
         self.add_message = add_message_callback
@@ -105,6 +108,8 @@ class ResponseProcessor:
         self.is_agent_builder = is_agent_builder
         self.target_agent_id = target_agent_id
         self.agent_config = agent_config
+        self.account_id = account_id
+        self.tool_result_cache = tool_result_cache
 
     async def _yield_message(self, message_obj: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         """Helper to yield a message with proper formatting.
@@ -162,7 +167,7 @@ class ResponseProcessor:
         """
         accumulated_content = ""
         tool_calls_buffer = {}
-        current_xml_content = ""
+        xml_scanner = StreamingXMLScanner(self.tool_registry.xml_tools.keys())
         xml_chunks_buffer = []
         pending_tool_executions = []
         yielded_tool_indices = set() # Stores indices of tools whose *status* has been yielded
@@ -233,6 +238,11 @@ class ResponseProcessor:
                         streaming_metadata["usage"]["completion_tokens"] = chunk.usage.completion_tokens
                     if hasattr(chunk.usage, 'total_tokens') and chunk.usage.total_tokens is not None:
                         streaming_metadata["usage"]["total_tokens"] = chunk.usage.total_tokens
+                    # Anthropic prompt cache usage, kept to track cache hit rates
+                    for cache_field in ('cache_creation_input_tokens', 'cache_read_input_tokens'):
+                        cache_tokens = getattr(chunk.usage, cache_field, None)
+                        if cache_tokens is not None:
+                            streaming_metadata["usage"][cache_field] = cache_tokens
 
                 if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'finish_reason') and chunk.choices[0].finish_reason:
                     finish_reason = chunk.choices[0].finish_reason
@@ -255,7 +265,6 @@ class ResponseProcessor:
                         chunk_content = delta.content
                         # print(chunk_content, end='', flush=True)
                         accumulated_content += chunk_content
-                        current_xml_content += chunk_content
 
                         if not (config.max_xml_tool_calls > 0 and xml_tool_call_count >= config.max_xml_tool_calls):
                             # Yield ONLY content chunk (don't save)
@@ -275,9 +284,9 @@ class ResponseProcessor:
 
                         # --- Process XML Tool Calls (if enabled and limit not reached) ---
                         if config.xml_tool_calling and not (config.max_xml_tool_calls > 0 and xml_tool_call_count >= config.max_xml_tool_calls):
-                            xml_chunks = self._extract_xml_chunks(current_xml_content)
+                            # Only the new delta is scanned; complete blocks are emitted as soon as they close
+                            xml_chunks = xml_scanner.feed(chunk_content)
                             for xml_chunk in xml_chunks:
-                                current_xml_content = current_xml_content.replace(xml_chunk, "", 1)
                                 xml_chunks_buffer.append(xml_chunk)
                                 result = self._parse_xml_tool_call(xml_chunk)
                                 if result:
@@ -412,6 +421,12 @@ class ResponseProcessor:
                     self.trace.event(name="failed_to_calculate_usage", level="WARNING", status_message=(f"Failed to calculate usage: {str(e)}"))
 
 
+            if 'cache_read_input_tokens' in streaming_metadata["usage"] or 'cache_creation_input_tokens' in streaming_metadata["usage"]:
+                cache_read = streaming_metadata["usage"].get('cache_read_input_tokens') or 0
+                cache_creation = streaming_metadata["usage"].get('cache_creation_input_tokens') or 0
+                logger.info(f"Prompt cache for thread {thread_id}: read={cache_read}, created={cache_creation}, prompt={streaming_metadata['usage']['prompt_tokens']}")
+                self.trace.event(name="prompt_cache_usage", level="DEFAULT", status_message=(f"Prompt cache read {cache_read} tokens, created {cache_creation} tokens"), metadata={"cache_read_input_tokens": cache_read, "cache_creation_input_tokens": cache_creation, "prompt_tokens": streaming_metadata["usage"]["prompt_tokens"]})
+
             # Wait for pending tool executions from streaming phase
             tool_results_buffer = [] # Stores (tool_call, result, tool_index, context)
             if pending_tool_executions:
@@ -559,9 +574,8 @@ class ResponseProcessor:
                  # Gather XML tool calls from buffer (up to limit)
                 parsed_xml_data = []
                 if config.xml_tool_calling:
-                    # Reparse remaining content just in case (should be empty if processed correctly)
-                    xml_chunks = self._extract_xml_chunks(current_xml_content)
-                    xml_chunks_buffer.extend(xml_chunks)
+                    # The streaming scanner has already emitted every complete block;
+                    # an unclosed block left in xml_scanner.pending is not a tool call
                     # Process only chunks not already handled in the stream loop
                     remaining_limit = config.max_xml_tool_calls - xml_tool_call_count if config.max_xml_tool_calls > 0 else len(xml_chunks_buffer)
                     xml_chunks_to_process = xml_chunks_buffer[:remaining_limit] # Ensure limit is respected
@@ -1368,9 +1382,19 @@ class ResponseProcessor:
                 span.end(status_message="tool_not_found", level="ERROR")
                 return ToolResult(success=False, output=f"Tool function '{function_name}' not found")
             
+            # Idempotent tools declare a TTL; serve repeated calls from the cache
+            cache_ttl = getattr(tool_fn, 'tool_cache_ttl', None)
+            if cache_ttl:
+                cached_result = await self.tool_result_cache.get(function_name, arguments, scope=self.account_id)
+                if cached_result is not None:
+                    span.end(status_message="tool_result_cached", output=cached_result)
+                    return cached_result
+
             logger.debug(f"Found tool function for '{function_name}', executing...")
             result = await tool_fn(**arguments)
             logger.info(f"Tool execution complete: {function_name} -> {result}")
+            if cache_ttl:
+                await self.tool_result_cache.set(function_name, arguments, result, cache_ttl, scope=self.account_id)
             span.end(status_message="tool_executed", output=result)
             return result
         except Exception as e:
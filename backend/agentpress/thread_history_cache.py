@@ -0,0 +1,215 @@
+"""
+Incremental cache of the LLM message history of threads.
+
+ThreadManager.get_llm_messages is called before every LLM call of a run. Instead
+of downloading and parsing the whole history each time, the cache is seeded
+once, extended by ThreadManager.add_message as messages are written, and
+reconciled against the thread's current list of message IDs: only rows whose
+IDs are not cached yet are fetched, and cached messages that were deleted are
+dropped. Comparing IDs rather than timestamps does not depend on which clock
+stamped a row or when it became visible. An optional Redis tier lets a new run
+on any worker seed from the previous run's history instead of the database.
+"""
+
+import copy
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from services import redis
+from services.supabase import DBConnection
+from utils.logger import logger
+
+# Rows fetched per request when loading history from the database
+FETCH_BATCH_SIZE = 1000
+
+# Message IDs per request when fetching missing rows by ID
+FETCH_BY_ID_BATCH_SIZE = 100
+
+# Redis list holding the raw rows of a thread's LLM history
+REDIS_KEY_PREFIX = "thread_history"
+REDIS_HISTORY_TTL = 3600 * 6
+
+
+@dataclass
+class _ThreadHistory:
+    """Cached LLM messages of one thread, in database order."""
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    message_ids: Set[str] = field(default_factory=set)
+
+
+class ThreadHistoryCache:
+    """Keeps the parsed LLM messages of threads and fetches only what changed."""
+
+    def __init__(self, db: Optional[DBConnection] = None, use_redis: bool = False):
+        """Initialize the ThreadHistoryCache.
+
+        Args:
+            db: Database connection used to load and reconcile history
+            use_redis: Also store history in Redis so other workers and later
+                       runs can seed from it
+        """
+        self.db = db or DBConnection()
+        self.use_redis = use_redis
+        self._threads: Dict[str, _ThreadHistory] = {}
+
+    @staticmethod
+    def _parse_row(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Turn a messages row into the LLM message dict (with message_id)."""
+        content = row['content']
+        if isinstance(content, str):
+            try:
+                content = json.loads(content)
+            except json.JSONDecodeError:
+                logger.error(f"Failed to parse message: {content}")
+                return None
+        else:
+            content = copy.deepcopy(content)
+        if not isinstance(content, dict):
+            logger.error(f"Unexpected message content type for message {row.get('message_id')}: {type(content)}")
+            return None
+        content['message_id'] = row['message_id']
+        return content
+
+    def _add_rows(self, history: _ThreadHistory, rows: List[Dict[str, Any]]) -> int:
+        """Append rows to the history, skipping known ones. Returns rows added."""
+        added = 0
+        for row in rows:
+            message_id = row.get('message_id')
+            if not message_id or message_id in history.message_ids:
+                continue
+            message = self._parse_row(row)
+            if message is None:
+                continue
+            history.messages.append(message)
+            history.message_ids.add(message_id)
+            added += 1
+        return added
+
+    async def _fetch_rows(self, thread_id: str, columns: str = 'message_id, content, created_at') -> List[Dict[str, Any]]:
+        """Load the LLM message rows of a thread in created_at order."""
+        client = await self.db.client
+        rows = []
+        offset = 0
+        while True:
+            result = await client.table('messages').select(columns).eq('thread_id', thread_id).eq('is_llm_message', True) \
+                .order('created_at').order('message_id').range(offset, offset + FETCH_BATCH_SIZE - 1).execute()
+
+            if not result.data:
+                break
+            rows.extend(result.data)
+            if len(result.data) < FETCH_BATCH_SIZE:
+                break
+            offset += FETCH_BATCH_SIZE
+        return rows
+
+    async def _fetch_rows_by_id(self, thread_id: str, message_ids: List[str]) -> List[Dict[str, Any]]:
+        """Load the LLM message rows of a thread with the given IDs."""
+        client = await self.db.client
+        rows = []
+        for start in range(0, len(message_ids), FETCH_BY_ID_BATCH_SIZE):
+            batch = message_ids[start:start + FETCH_BY_ID_BATCH_SIZE]
+            result = await client.table('messages').select('message_id, content, created_at') \
+                .eq('thread_id', thread_id).in_('message_id', batch).execute()
+            rows.extend(result.data or [])
+        return rows
+
+    async def _reconcile(self, thread_id: str, history: _ThreadHistory):
+        """Bring the history in line with the message IDs currently in the database."""
+        message_ids = [row['message_id'] for row in await self._fetch_rows(thread_id, columns='message_id')]
+        missing = [message_id for message_id in message_ids if message_id not in history.message_ids]
+        removed = history.message_ids.difference(message_ids)
+        cached_order = [message['message_id'] for message in history.messages]
+        if not missing and not removed and cached_order == message_ids:
+            return
+
+        position = {message_id: index for index, message_id in enumerate(message_ids)}
+        new_rows = await self._fetch_rows_by_id(thread_id, missing) if missing else []
+        new_rows.sort(key=lambda row: position[row['message_id']])
+        self._add_rows(history, new_rows)
+        by_id = {message['message_id']: message for message in history.messages}
+        history.messages = [by_id[message_id] for message_id in message_ids if message_id in by_id]
+        history.message_ids = {message['message_id'] for message in history.messages}
+        logger.debug(f"Reconciled history of thread {thread_id}: {len(new_rows)} new, {len(removed)} removed messages")
+
+        if self.use_redis:
+            if removed or cached_order != message_ids[:len(cached_order)]:
+                # Appending cannot express this; let the next seed load from the database
+                await self._drop_from_redis(thread_id)
+            else:
+                await self._push_to_redis(thread_id, new_rows)
+
+    async def _load_from_redis(self, thread_id: str) -> List[Dict[str, Any]]:
+        try:
+            raw_rows = await redis.lrange(f"{REDIS_KEY_PREFIX}:{thread_id}", 0, -1)
+            return [json.loads(raw) for raw in raw_rows]
+        except Exception as e:
+            logger.warning(f"Failed to read cached history of thread {thread_id} from Redis: {str(e)}")
+            return []
+
+    async def _drop_from_redis(self, thread_id: str):
+        try:
+            await redis.delete(f"{REDIS_KEY_PREFIX}:{thread_id}")
+        except Exception as e:
+            logger.warning(f"Failed to drop cached history of thread {thread_id} from Redis: {str(e)}")
+
+    async def _push_to_redis(self, thread_id: str, rows: List[Dict[str, Any]], replace: bool = False):
+        if not rows and not replace:
+            return
+        key = f"{REDIS_KEY_PREFIX}:{thread_id}"
+        try:
+            redis_client = await redis.get_client()
+            pipe = redis_client.pipeline()
+            if replace:
+                pipe.delete(key)
+            if rows:
+                pipe.rpush(key, *[
+                    json.dumps({'message_id': row['message_id'], 'content': row['content'], 'created_at': row['created_at']}, default=str)
+                    for row in rows
+                ])
+            pipe.expire(key, REDIS_HISTORY_TTL)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to write history of thread {thread_id} to Redis: {str(e)}")
+
+    async def get_messages(self, thread_id: str) -> List[Dict[str, Any]]:
+        """Get the LLM messages of a thread, fetching only rows not seen yet.
+
+        Returns deep copies, so callers may modify messages and their content
+        without touching the cache.
+        """
+        history = self._threads.get(thread_id)
+        needs_reconcile = True
+
+        if history is None:
+            history = _ThreadHistory()
+            seed_rows = await self._load_from_redis(thread_id) if self.use_redis else []
+            if seed_rows:
+                self._add_rows(history, seed_rows)
+                logger.debug(f"Seeded history of thread {thread_id} with {len(seed_rows)} rows from Redis")
+            else:
+                rows = await self._fetch_rows(thread_id)
+                self._add_rows(history, rows)
+                if self.use_redis:
+                    await self._push_to_redis(thread_id, rows, replace=True)
+                logger.debug(f"Seeded history of thread {thread_id} with {len(rows)} rows from the database")
+                needs_reconcile = False
+            self._threads[thread_id] = history
+
+        if needs_reconcile:
+            await self._reconcile(thread_id, history)
+
+        return copy.deepcopy(history.messages)
+
+    async def append(self, row: Dict[str, Any]):
+        """Add a freshly inserted LLM message row to a cached thread."""
+        thread_id = row.get('thread_id')
+        history = self._threads.get(thread_id)
+        if history is None:
+            return
+        if self._add_rows(history, [row]) and self.use_redis:
+            await self._push_to_redis(thread_id, [row])
+
+    def invalidate(self, thread_id: str):
+        """Forget the cached history of a thread."""
+        self._threads.pop(thread_id, None)
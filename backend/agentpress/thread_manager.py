@@ -11,7 +11,7 @@ This module provides comprehensive conversation management, including:
 """
 
 import json
-from typing import List, Dict, Any, Optional, Type, Union, AsyncGenerator, Literal
+from typing import List, Dict, Any, Optional, Type, Union, AsyncGenerator, Literal, Tuple
 from services.llm import make_llm_api_call
 from agentpress.tool import Tool
 from agentpress.tool_registry import ToolRegistry
@@ -22,10 +22,20 @@ from agentpress.response_processor import (
 )
 from services.supabase import DBConnection
 from utils.logger import logger
+from utils.config import config
 from langfuse.client import StatefulGenerationClient, StatefulTraceClient
 from services.langfuse import langfuse
+from services.billing import calculate_message_cost, record_assistant_usage
 import datetime
-from litellm import token_counter
+from agentpress.utils.token_cache import token_count_cache
+from agentpress.message_writer import MessageWriter, WRITE_BEHIND_MESSAGE_TYPES
+from agentpress.thread_history_cache import ThreadHistoryCache
+from agentpress.prompt_cache import (
+    REBUILD_TARGET_RATIO,
+    match_frozen_prefix,
+    is_prompt_cache_model,
+    stable_prefix_cache
+)
 
 # Type alias for tool choice
 ToolChoice = Literal["auto", "required", "none"]
@@ -38,7 +48,7 @@ class ThreadManager:
     XML-based tool execution patterns.
     """
 
-    def __init__(self, trace: Optional[StatefulTraceClient] = None, is_agent_builder: bool = False, target_agent_id: Optional[str] = None, agent_config: Optional[dict] = None):
+    def __init__(self, trace: Optional[StatefulTraceClient] = None, is_agent_builder: bool = False, target_agent_id: Optional[str] = None, agent_config: Optional[dict] = None, account_id: Optional[str] = None):
         """Initialize ThreadManager.
 
         Args:
@@ -46,13 +56,17 @@ class ThreadManager:
             is_agent_builder: Whether this is an agent builder session
             target_agent_id: ID of the agent being built (if in agent builder mode)
             agent_config: Optional agent configuration with version information
+            account_id: Optional ID of the account that owns the thread
         """
         self.db = DBConnection()
+        self.message_writer = MessageWriter(self.db)
+        self.history_cache = ThreadHistoryCache(self.db, use_redis=config.THREAD_HISTORY_REDIS_CACHE)
         self.tool_registry = ToolRegistry()
         self.trace = trace
         self.is_agent_builder = is_agent_builder
         self.target_agent_id = target_agent_id
         self.agent_config = agent_config
+        self.account_id = account_id
         if not self.trace:
             self.trace = langfuse.trace(name="anonymous:thread_manager")
         self.response_processor = ResponseProcessor(
@@ -61,9 +75,12 @@ class ThreadManager:
             trace=self.trace,
             is_agent_builder=self.is_agent_builder,
             target_agent_id=self.target_agent_id,
-            agent_config=self.agent_config
+            agent_config=self.agent_config,
+            account_id=self.account_id
         )
         self.context_manager = ContextManager()
+        self.token_cache = token_count_cache
+        self.prefix_cache = stable_prefix_cache
 
     def _is_tool_result_message(self, msg: Dict[str, Any]) -> bool:
         if not ("content" in msg and msg['content']):
@@ -126,70 +143,6 @@ class ThreadManager:
             else:
                 return msg_content
   
-    def _compress_tool_result_messages(self, messages: List[Dict[str, Any]], llm_model: str, max_tokens: Optional[int], token_threshold: Optional[int] = 1000) -> List[Dict[str, Any]]:
-        """Compress the tool result messages except the most recent one."""
-        uncompressed_total_token_count = token_counter(model=llm_model, messages=messages)
-
-        if uncompressed_total_token_count > (max_tokens or (100 * 1000)):
-            _i = 0 # Count the number of ToolResult messages
-            for msg in reversed(messages): # Start from the end and work backwards
-                if self._is_tool_result_message(msg): # Only compress ToolResult messages
-                    _i += 1 # Count the number of ToolResult messages
-                    msg_token_count = token_counter(messages=[msg]) # Count the number of tokens in the message
-                    if msg_token_count > token_threshold: # If the message is too long
-                        if _i > 1: # If this is not the most recent ToolResult message
-                            message_id = msg.get('message_id') # Get the message_id
-                            if message_id:
-                                msg["content"] = self._compress_message(msg["content"], message_id, token_threshold * 3)
-                            else:
-                                logger.warning(f"UNEXPECTED: Message has no message_id {str(msg)[:100]}")
-                        else:
-                            msg["content"] = self._safe_truncate(msg["content"], int(max_tokens * 2))
-        return messages
-
-    def _compress_user_messages(self, messages: List[Dict[str, Any]], llm_model: str, max_tokens: Optional[int], token_threshold: Optional[int] = 1000) -> List[Dict[str, Any]]:
-        """Compress the user messages except the most recent one."""
-        uncompressed_total_token_count = token_counter(model=llm_model, messages=messages)
-
-        if uncompressed_total_token_count > (max_tokens or (100 * 1000)):
-            _i = 0 # Count the number of User messages
-            for msg in reversed(messages): # Start from the end and work backwards
-                if msg.get('role') == 'user': # Only compress User messages
-                    _i += 1 # Count the number of User messages
-                    msg_token_count = token_counter(messages=[msg]) # Count the number of tokens in the message
-                    if msg_token_count > token_threshold: # If the message is too long
-                        if _i > 1: # If this is not the most recent User message
-                            message_id = msg.get('message_id') # Get the message_id
-                            if message_id:
-                                msg["content"] = self._compress_message(msg["content"], message_id, token_threshold * 3)
-                            else:
-                                logger.warning(f"UNEXPECTED: Message has no message_id {str(msg)[:100]}")
-                        else:
-                            msg["content"] = self._safe_truncate(msg["content"], int(max_tokens * 2))
-        return messages
-
-    def _compress_assistant_messages(self, messages: List[Dict[str, Any]], llm_model: str, max_tokens: Optional[int], token_threshold: Optional[int] = 1000) -> List[Dict[str, Any]]:
-        """Compress the assistant messages except the most recent one."""
-        uncompressed_total_token_count = token_counter(model=llm_model, messages=messages)
-        if uncompressed_total_token_count > (max_tokens or (100 * 1000)):
-            _i = 0 # Count the number of Assistant messages
-            for msg in reversed(messages): # Start from the end and work backwards
-                if msg.get('role') == 'assistant': # Only compress Assistant messages
-                    _i += 1 # Count the number of Assistant messages
-                    msg_token_count = token_counter(messages=[msg]) # Count the number of tokens in the message
-                    if msg_token_count > token_threshold: # If the message is too long
-                        if _i > 1: # If this is not the most recent Assistant message
-                            message_id = msg.get('message_id') # Get the message_id
-                            if message_id:
-                                msg["content"] = self._compress_message(msg["content"], message_id, token_threshold * 3)
-                            else:
-                                logger.warning(f"UNEXPECTED: Message has no message_id {str(msg)[:100]}")
-                        else:
-                            msg["content"] = self._safe_truncate(msg["content"], int(max_tokens * 2))
-                            
-        return messages
-
-
     def _remove_meta_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Remove meta messages from the messages."""
         result: List[Dict[str, Any]] = []
@@ -215,117 +168,210 @@ class ThreadManager:
                 result.append(msg)
         return result
 
-    def _compress_messages(self, messages: List[Dict[str, Any]], llm_model: str, max_tokens: Optional[int] = 41000, token_threshold: Optional[int] = 4096, max_iterations: int = 5) -> List[Dict[str, Any]]:
-        """Compress the messages.
-            token_threshold: must be a power of 2
-        """
-
-        if 'sonnet' in llm_model.lower():
-            max_tokens = 200 * 1000 - 64000 - 28000
-        elif 'gpt' in llm_model.lower():
-            max_tokens = 128 * 1000 - 28000
-        elif 'gemini' in llm_model.lower():
-            max_tokens = 1000 * 1000 - 300000
-        elif 'deepseek' in llm_model.lower():
-            max_tokens = 128 * 1000 - 28000
-        else:
-            max_tokens = 41 * 1000 - 10000
-
-        result = messages
-        result = self._remove_meta_messages(result)
-
-        uncompressed_total_token_count = token_counter(model=llm_model, messages=result)
-
-        result = self._compress_tool_result_messages(result, llm_model, max_tokens, token_threshold)
-        result = self._compress_user_messages(result, llm_model, max_tokens, token_threshold)
-        result = self._compress_assistant_messages(result, llm_model, max_tokens, token_threshold)
-
-        compressed_token_count = token_counter(model=llm_model, messages=result)
-
-        logger.info(f"_compress_messages: {uncompressed_total_token_count} -> {compressed_token_count}") # Log the token compression for debugging later
+    def _get_context_budget(self, llm_model: str) -> int:
+        """Get the prompt token budget of a model, leaving room for the response."""
+        model = llm_model.lower()
+        if 'sonnet' in model:
+            return 200 * 1000 - 64000 - 28000
+        elif 'gpt' in model:
+            return 128 * 1000 - 28000
+        elif 'gemini' in model:
+            return 1000 * 1000 - 300000
+        elif 'deepseek' in model:
+            return 128 * 1000 - 28000
+        return 41 * 1000 - 10000
+
+    def _compress_messages(
+            self,
+            messages: List[Dict[str, Any]],
+            llm_model: str,
+            max_tokens: Optional[int] = None,
+            token_threshold: int = 4096,
+            compressed_length: int = 3000,
+            max_messages: int = 320
+        ) -> List[Dict[str, Any]]:
+        """Compress the messages to fit the model's token budget in a single pass.
 
-        if max_iterations <= 0:
-            logger.warning(f"_compress_messages: Max iterations reached, omitting messages")
-            result = self._compress_messages_by_omitting_messages(messages, llm_model, max_tokens)
-            return result
+        Every message is measured once. While the total is over budget, message
+        contents are replaced by a truncated copy that points to the expand-message
+        tool: tool results first, then user and then assistant messages, messages
+        above token_threshold before smaller ones, oldest first. If that is not
+        enough, the oldest messages are dropped.
 
-        if (compressed_token_count > max_tokens):
-            logger.warning(f"Further token compression is needed: {compressed_token_count} > {max_tokens}")
-            result = self._compress_messages(messages, llm_model, max_tokens, int(token_threshold / 2), max_iterations - 1)
+        The system prompt, the latest user turn and the most recent tool result and
+        assistant message are always kept; they are only truncated in the middle
+        when they are oversized on their own.
 
-        return self._middle_out_messages(result)
-    
-    def _compress_messages_by_omitting_messages(
-            self, 
-            messages: List[Dict[str, Any]], 
-            llm_model: str, 
-            max_tokens: Optional[int] = 41000,
-            removal_batch_size: int = 10,
-            min_messages_to_keep: int = 10
-        ) -> List[Dict[str, Any]]:
-        """Compress the messages by omitting messages from the middle.
-        
         Args:
-            messages: List of messages to compress
-            llm_model: Model name for token counting
-            max_tokens: Maximum allowed tokens
-            removal_batch_size: Number of messages to remove per iteration
-            min_messages_to_keep: Minimum number of messages to preserve
+            messages: Messages to compress, system prompt first
+            llm_model: Model name for token counting and the default budget
+            max_tokens: Token budget, defaults to the model's budget
+            token_threshold: Messages above this many tokens are compressed first
+            compressed_length: Characters kept from a compressed message
+            max_messages: Messages kept at most, cut from the middle
         """
-        if not messages:
-            return messages
-            
-        result = messages
-        result = self._remove_meta_messages(result)
-
-        # Early exit if no compression needed
-        initial_token_count = token_counter(model=llm_model, messages=result)
-        max_allowed_tokens = max_tokens or (100 * 1000)
-        
-        if initial_token_count <= max_allowed_tokens:
+        max_tokens = max_tokens or self._get_context_budget(llm_model)
+        result = self._remove_meta_messages(messages)
+        if not result:
             return result
 
-        # Separate system message (assumed to be first) from conversation messages
-        system_message = messages[0] if messages and messages[0].get('role') == 'system' else None
-        conversation_messages = result[1:] if system_message else result
-        
-        safety_limit = 500
-        current_token_count = initial_token_count
-        
-        while current_token_count > max_allowed_tokens and safety_limit > 0:
-            safety_limit -= 1
-            
-            if len(conversation_messages) <= min_messages_to_keep:
-                logger.warning(f"Cannot compress further: only {len(conversation_messages)} messages remain (min: {min_messages_to_keep})")
-                break
-
-            # Calculate removal strategy based on current message count
-            if len(conversation_messages) > (removal_batch_size * 2):
-                # Remove from middle, keeping recent and early context
-                middle_start = len(conversation_messages) // 2 - (removal_batch_size // 2)
-                middle_end = middle_start + removal_batch_size
-                conversation_messages = conversation_messages[:middle_start] + conversation_messages[middle_end:]
+        token_counts = [self.token_cache.count_message(msg, llm_model) for msg in result]
+        uncompressed_total_token_count = total_token_count = sum(token_counts)
+        if total_token_count <= max_tokens:
+            return self._middle_out_messages(result, max_messages)
+
+        # Find the messages that are never compressed or dropped
+        kinds: List[Optional[int]] = []  # 0: tool result, 1: user, 2: assistant
+        latest = {}
+        for i, msg in enumerate(result):
+            if self._is_tool_result_message(msg):
+                kind = 0
             else:
-                # Remove from earlier messages, preserving recent context
-                messages_to_remove = min(removal_batch_size, len(conversation_messages) // 2)
-                if messages_to_remove > 0:
-                    conversation_messages = conversation_messages[messages_to_remove:]
-                else:
-                    # Can't remove any more messages
+                kind = {'user': 1, 'assistant': 2}.get(msg.get('role'))
+            kinds.append(kind)
+            if kind is not None:
+                latest[kind] = i
+        pinned = set(latest.values())
+        if result[0].get('role') == 'system':
+            pinned.add(0)
+
+        def replace_content(i: int, content: Union[str, dict]):
+            nonlocal total_token_count
+            result[i] = {**result[i], 'content': content}
+            new_count = self.token_cache.count_message(result[i], llm_model)
+            total_token_count -= token_counts[i] - new_count
+            token_counts[i] = new_count
+
+        for i in latest.values():
+            content = result[i].get('content')
+            if isinstance(content, (str, dict)) and token_counts[i] > max_tokens // 2:
+                truncated = self._safe_truncate(content, int(max_tokens * 2))
+                if truncated is not content:
+                    replace_content(i, truncated)
+
+        # Compression candidates: large then small, each by kind, oldest first
+        buckets: List[List[int]] = [[] for _ in range(6)]
+        for i, msg in enumerate(result):
+            if i in pinned or kinds[i] is None or not isinstance(msg.get('content'), (str, dict)):
+                continue
+            is_large = token_counts[i] > token_threshold
+            buckets[kinds[i] if is_large else 3 + kinds[i]].append(i)
+
+        compressed_count = 0
+        for bucket in buckets:
+            for i in bucket:
+                if total_token_count <= max_tokens:
                     break
+                message_id = result[i].get('message_id')
+                if not message_id:
+                    logger.warning(f"UNEXPECTED: Message has no message_id {str(result[i])[:100]}")
+                    continue
+                content = result[i]['content']
+                compressed = self._compress_message(content, message_id, compressed_length)
+                if compressed is not content:
+                    replace_content(i, compressed)
+                    compressed_count += 1
+
+        # Drop the oldest messages, together with the tool messages answering them
+        if total_token_count > max_tokens:
+            keep = [True] * len(result)
+            i = 0
+            while total_token_count > max_tokens and i < len(result):
+                end = i + 1
+                while end < len(result) and result[end].get('role') == 'tool':
+                    end += 1
+                if not any(j in pinned for j in range(i, end)):
+                    for j in range(i, end):
+                        keep[j] = False
+                        total_token_count -= token_counts[j]
+                i = end
+            result = [msg for msg, kept in zip(result, keep) if kept]
+            if total_token_count > max_tokens:
+                logger.warning(f"_compress_messages: {total_token_count} tokens left after compression, over the budget of {max_tokens}")
+
+        logger.info(f"_compress_messages: {uncompressed_total_token_count} -> {total_token_count} tokens ({len(messages)} -> {len(result)} messages, {compressed_count} compressed)")
+
+        return self._middle_out_messages(result, max_messages)
+
+    def _insert_temporary_message(self, messages: List[Dict[str, Any]], temp_msg: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert the temporary message before the last user message, or at the end if there is none."""
+        if not temp_msg:
+            return list(messages)
+
+        # Find the last user message index
+        last_user_index = -1
+        for i, msg in enumerate(messages):
+            if msg.get('role') == 'user':
+                last_user_index = i
+
+        if last_user_index >= 0:
+            logger.debug("Added temporary message before the last user message")
+            return messages[:last_user_index] + [temp_msg] + messages[last_user_index:]
+        logger.debug("Added temporary message to the end of prepared messages")
+        return list(messages) + [temp_msg]
+
+    def _prepare_cache_stable_messages(
+            self,
+            thread_id: str,
+            system_prompt: Dict[str, Any],
+            messages: List[Dict[str, Any]],
+            temp_msg: Optional[Dict[str, Any]],
+            llm_model: str,
+            max_messages: int = 320
+        ) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """Prepare the prompt so its start stays identical across turns.
+
+        Messages sent on earlier turns are reused exactly as they were rendered
+        then (the frozen prefix) and only the messages after them are compressed.
+        The frozen prefix is matched to the history by message_id, since it skips
+        messages that were dropped when it was rendered. When the messages after
+        it no longer fit the remaining token budget or message limit, the whole
+        history is compressed again with headroom and becomes the new prefix. The temporary
+        message is appended at the end rather than before the last user message.
 
-            # Recalculate token count
-            messages_to_count = ([system_message] + conversation_messages) if system_message else conversation_messages
-            current_token_count = token_counter(model=llm_model, messages=messages_to_count)
+        Returns:
+            The prepared messages and the indices of the cache breakpoints: the
+            system prompt, the last message of the frozen prefix and the last
+            message of this turn that is frozen for the next ones.
+        """
+        budget = self._get_context_budget(llm_model)
+        temp_tokens = self.token_cache.count_message(temp_msg, llm_model) if temp_msg else 0
+
+        frozen = self.prefix_cache.get(thread_id, llm_model)
+        stable_count, covered = match_frozen_prefix(frozen, messages)
+        prefix = frozen[:stable_count]
+        prefix_tokens = self.token_cache.count_messages([system_prompt] + prefix, llm_model)
+        tail_budget = budget - prefix_tokens - temp_tokens
+        tail_limit = max_messages - len(prefix)
+
+        if prefix and (tail_budget < budget * (1 - REBUILD_TARGET_RATIO) or len(messages) - covered > tail_limit):
+            logger.info(f"Rebuilding cached prompt prefix of thread {thread_id} ({stable_count} messages, {prefix_tokens} tokens)")
+            prefix, covered = [], 0
+            tail_budget = int(budget * REBUILD_TARGET_RATIO) - self.token_cache.count_message(system_prompt, llm_model) - temp_tokens
+        if not prefix and len(messages) > max_messages:
+            # Cut to below the limit so the next turns fit behind the new prefix
+            tail_limit = int(max_messages * REBUILD_TARGET_RATIO)
+
+        tail = self._compress_messages(messages[covered:], llm_model, max_tokens=max(tail_budget, 1), max_messages=tail_limit)
+
+        # Freeze everything up to the first message that is not part of the thread
+        new_frozen = list(prefix)
+        for msg in tail:
+            if not msg.get('message_id'):
+                break
+            new_frozen.append(msg)
+        self.prefix_cache.set(thread_id, llm_model, new_frozen)
+
+        # The temporary message changes every turn, so it goes after everything cached
+        prepared_messages = [system_prompt] + prefix + tail + ([temp_msg] if temp_msg else [])
+        cache_breakpoints = [0]
+        if prefix:
+            cache_breakpoints.append(len(prefix))
+        if len(new_frozen) > len(prefix):
+            cache_breakpoints.append(len(new_frozen))
+        logger.debug(f"Cache-stable layout for thread {thread_id}: {len(prefix)} frozen + {len(tail)} new messages, breakpoints at {cache_breakpoints}")
+        return prepared_messages, cache_breakpoints
 
-        # Prepare final result
-        final_messages = ([system_message] + conversation_messages) if system_message else conversation_messages
-        final_token_count = token_counter(model=llm_model, messages=final_messages)
-        
-        logger.info(f"_compress_messages_by_omitting_messages: {initial_token_count} -> {final_token_count} tokens ({len(messages)} -> {len(final_messages)} messages)")
-            
-        return final_messages
-    
     def _middle_out_messages(self, messages: List[Dict[str, Any]], max_messages: int = 320) -> List[Dict[str, Any]]:
         """Remove messages from the middle of the list, keeping max_messages total."""
         if len(messages) <= max_messages:
@@ -367,7 +413,6 @@ class ThreadManager:
             agent_version_id: Optional ID of the specific agent version used.
         """
         logger.debug(f"Adding message of type '{type}' to thread {thread_id} (agent: {agent_id}, version: {agent_version_id})")
-        client = await self.db.client
 
         # Prepare data for insertion
         data_to_insert = {
@@ -384,12 +429,33 @@ class ThreadManager:
         if agent_version_id:
             data_to_insert['agent_version_id'] = agent_version_id
 
+        # Price each response on its own; the usage rollup trigger sums this cost
+        if type == "assistant_response_end" and isinstance(content, dict):
+            data_to_insert['metadata'] = {**data_to_insert['metadata'], 'cost': calculate_message_cost(content)}
+
+        # Keep the account's usage ledger current so billing checks need not re-price the month
+        record_usage = type == "assistant_response_end" and self.account_id and isinstance(content, dict)
+
+        # Status rows are written behind; they get their ID and timestamp here
+        if not is_llm_message and type in WRITE_BEHIND_MESSAGE_TYPES:
+            # Usage is recorded once the row is written, as reconciliation reads it from the database
+            return self.message_writer.enqueue(data_to_insert, on_written=self._record_usage if record_usage else None)
+
+        # created_at comes from the database on insert; queued rows go first so it follows production order
+        await self.message_writer.flush()
+
+        client = await self.db.client
+
         try:
             # Add returning='representation' to get the inserted row data including the id
             result = await client.table('messages').insert(data_to_insert, returning='representation').execute()
             logger.info(f"Successfully added message to thread {thread_id}")
 
             if result.data and len(result.data) > 0 and isinstance(result.data[0], dict) and 'message_id' in result.data[0]:
+                if is_llm_message:
+                    await self.history_cache.append(result.data[0])
+                if record_usage:
+                    await self._record_usage(result.data[0])
                 return result.data[0]
             else:
                 logger.error(f"Insert operation failed or did not return expected data structure for thread {thread_id}. Result data: {result.data}")
@@ -398,11 +464,19 @@ class ThreadManager:
             logger.error(f"Failed to add message to thread {thread_id}: {str(e)}", exc_info=True)
             raise
 
+    async def _record_usage(self, message: Dict[str, Any]):
+        """Add a written assistant_response_end to the account's usage ledger."""
+        await record_assistant_usage(await self.db.client, self.account_id, message)
+
+    async def flush_messages(self):
+        """Write all queued status messages to the database."""
+        await self.message_writer.flush()
+
     async def get_llm_messages(self, thread_id: str) -> List[Dict[str, Any]]:
         """Get all messages for a thread.
 
-        This method uses the SQL function which handles context truncation
-        by considering summary messages.
+        Messages come from the thread history cache, which only queries the
+        database for messages created since it was last reconciled.
 
         Args:
             thread_id: The ID of the thread to get messages for.
@@ -411,53 +485,10 @@ class ThreadManager:
             List of message objects.
         """
         logger.debug(f"Getting messages for thread {thread_id}")
-        client = await self.db.client
 
         try:
-            # result = await client.rpc('get_llm_formatted_messages', {'p_thread_id': thread_id}).execute()
-            
-            # Fetch messages in batches of 1000 to avoid overloading the database
-            all_messages = []
-            batch_size = 1000
-            offset = 0
-            
-            while True:
-                result = await client.table('messages').select('message_id, content').eq('thread_id', thread_id).eq('is_llm_message', True).order('created_at').range(offset, offset + batch_size - 1).execute()
-                
-                if not result.data or len(result.data) == 0:
-                    break
-                    
-                all_messages.extend(result.data)
-                
-                # If we got fewer than batch_size records, we've reached the end
-                if len(result.data) < batch_size:
-                    break
-                    
-                offset += batch_size
-            
-            # Use all_messages instead of result.data in the rest of the method
-            result_data = all_messages
-
-            # Parse the returned data which might be stringified JSON
-            if not result_data:
-                return []
-
-            # Return properly parsed JSON objects
-            messages = []
-            for item in result_data:
-                if isinstance(item['content'], str):
-                    try:
-                        parsed_item = json.loads(item['content'])
-                        parsed_item['message_id'] = item['message_id']
-                        messages.append(parsed_item)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse message: {item['content']}")
-                else:
-                    content = item['content']
-                    content['message_id'] = item['message_id']
-                    messages.append(content)
-
-            return messages
+            # History is loaded once per run; later calls only fetch messages added since
+            return await self.history_cache.get_messages(thread_id)
 
         except Exception as e:
             logger.error(f"Failed to get messages for thread {thread_id}: {str(e)}", exc_info=True)
@@ -568,6 +599,9 @@ Here are the XML tools available with examples:
         auto_continue = True
         auto_continue_count = 0
 
+        # Keep the prompt prefix byte-stable across turns so Anthropic prompt caching hits
+        use_stable_prompt_layout = config.PROMPT_CACHE_STABLE_LAYOUT and is_prompt_cache_model(llm_model)
+
         # Define inner function to handle a single run
         async def _run_once(temp_msg=None):
             try:
@@ -582,7 +616,7 @@ Here are the XML tools available with examples:
                 token_count = 0
                 try:
                     # Use the potentially modified working_system_prompt for token counting
-                    token_count = token_counter(model=llm_model, messages=[working_system_prompt] + messages)
+                    token_count = self.token_cache.count_messages([working_system_prompt] + messages, llm_model)
                     token_threshold = self.context_manager.token_threshold
                     logger.info(f"Thread {thread_id} token count: {token_count}/{token_threshold} ({(token_count/token_threshold)*100:.1f}%)")
 
@@ -598,7 +632,7 @@ Here are the XML tools available with examples:
                     #         logger.info("Summarization complete, fetching updated messages with summary")
                     #         messages = await self.get_llm_messages(thread_id)
                     #         # Recount tokens after summarization, using the modified prompt
-                    #         new_token_count = token_counter(model=llm_model, messages=[working_system_prompt] + messages)
+                    #         new_token_count = self.token_cache.count_messages([working_system_prompt] + messages, llm_model)
                     #         logger.info(f"After summarization: token count reduced from {token_count} to {new_token_count}")
                     #     else:
                     #         logger.warning("Summarization failed or wasn't needed - proceeding with original messages")
@@ -610,26 +644,13 @@ Here are the XML tools available with examples:
 
                 # 3. Prepare messages for LLM call + add temporary message if it exists
                 # Use the working_system_prompt which may contain the XML examples
-                prepared_messages = [working_system_prompt]
-
-                # Find the last user message index
-                last_user_index = -1
-                for i, msg in enumerate(messages):
-                    if msg.get('role') == 'user':
-                        last_user_index = i
-
-                # Insert temporary message before the last user message if it exists
-                if temp_msg and last_user_index >= 0:
-                    prepared_messages.extend(messages[:last_user_index])
-                    prepared_messages.append(temp_msg)
-                    prepared_messages.extend(messages[last_user_index:])
-                    logger.debug("Added temporary message before the last user message")
+                cache_breakpoints = None
+                if use_stable_prompt_layout:
+                    prepared_messages, cache_breakpoints = self._prepare_cache_stable_messages(
+                        thread_id, working_system_prompt, messages, temp_msg, llm_model
+                    )
                 else:
-                    # If no user message or no temporary message, just add all messages
-                    prepared_messages.extend(messages)
-                    if temp_msg:
-                        prepared_messages.append(temp_msg)
-                        logger.debug("Added temporary message to the end of prepared messages")
+                    prepared_messages = [working_system_prompt] + self._insert_temporary_message(messages, temp_msg)
 
                 # 4. Prepare tools for LLM call
                 openapi_tool_schemas = None
@@ -637,7 +658,8 @@ Here are the XML tools available with examples:
                     openapi_tool_schemas = self.tool_registry.get_openapi_schemas()
                     logger.debug(f"Retrieved {len(openapi_tool_schemas) if openapi_tool_schemas else 0} OpenAPI tool schemas")
 
-                prepared_messages = self._compress_messages(prepared_messages, llm_model)
+                if not use_stable_prompt_layout:
+                    prepared_messages = self._compress_messages(prepared_messages, llm_model)
 
                 # 5. Make LLM API call
                 logger.debug("Making LLM API call")
@@ -665,7 +687,8 @@ Here are the XML tools available with examples:
                         tool_choice=tool_choice if processor_config.native_tool_calling else None,
                         stream=stream,
                         enable_thinking=enable_thinking,
-                        reasoning_effort=reasoning_effort
+                        reasoning_effort=reasoning_effort,
+                        cache_breakpoints=cache_breakpoints
                     )
                     logger.debug("Successfully received raw LLM API response stream/object")
 
@@ -706,6 +729,14 @@ Here are the XML tools available with examples:
                     "message": str(e)
                 }
 
+        # Never leave queued status rows behind when the run finishes
+        async def _flush_after(response_gen):
+            try:
+                async for chunk in response_gen:
+                    yield chunk
+            finally:
+                await self.flush_messages()
+
         # Define a wrapper generator that handles auto-continue logic
         async def auto_continue_wrapper():
             nonlocal auto_continue, auto_continue_count
@@ -747,6 +778,9 @@ Here are the XML tools available with examples:
                             # Otherwise just yield the chunk normally
                             yield chunk
 
+                        # Persist this turn's queued status rows before the next one starts
+                        await self.flush_messages()
+
                         # If not auto-continuing, we're done
                         if not auto_continue:
                             break
@@ -781,7 +815,10 @@ Here are the XML tools available with examples:
         if native_max_auto_continues == 0:
             logger.info("Auto-continue is disabled (native_max_auto_continues=0)")
             # Pass the potentially modified system prompt and temp message
-            return await _run_once(temporary_message)
+            response = await _run_once(temporary_message)
+            if isinstance(response, dict):
+                return response
+            return _flush_after(response)
 
         # Otherwise return the auto-continue wrapper generator
-        return auto_continue_wrapper()
+        return _flush_after(auto_continue_wrapper())
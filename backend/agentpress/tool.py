@@ -238,3 +238,18 @@ def custom_schema(schema: Dict[str, Any]):
             schema=schema
         ))
     return decorator
+
+def cacheable(ttl: int):
+    """Decorator marking a tool function as idempotent so its results can be cached.
+
+    Successful results are stored by the ResponseProcessor, keyed by function
+    name and normalized arguments and scoped to the account, for ttl seconds.
+
+    Args:
+        ttl: Time in seconds a cached result stays valid
+    """
+    def decorator(func):
+        logger.debug(f"Marking function {func.__name__} as cacheable with ttl={ttl}s")
+        func.tool_cache_ttl = ttl
+        return func
+    return decorator
@@ -0,0 +1,119 @@
+"""
+Redis-backed result cache for idempotent tool calls.
+
+Tools opt in with the ``cacheable`` decorator from agentpress.tool. Results are
+keyed by function name plus normalized arguments and scoped to an account, so
+repeated searches or data provider calls within a run, or across threads of the
+same account, are served without calling the external API again.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from agentpress.tool import ToolResult
+from services import redis
+from utils.logger import logger
+
+CACHE_KEY_PREFIX = "tool_result_cache"
+STATS_KEY = f"{CACHE_KEY_PREFIX}:stats"
+
+
+def _normalize(value: Any) -> Any:
+    """Normalize arguments so equivalent calls map to the same key.
+
+    XML tool calls pass every parameter as a string while native calls pass
+    typed JSON, so scalars are compared by their stripped string form.
+    """
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        stripped = value.strip()
+        # JSON payloads passed as strings should match their parsed form
+        if stripped[:1] in ('{', '['):
+            try:
+                return _normalize(json.loads(stripped))
+            except json.JSONDecodeError:
+                pass
+        return stripped
+    if value is None:
+        return None
+    return str(value)
+
+
+class ToolResultCache:
+    """Stores ToolResults in Redis with a per-function TTL."""
+
+    def __init__(self, prefix: str = CACHE_KEY_PREFIX):
+        self.prefix = prefix
+
+    def make_key(self, function_name: str, arguments: Dict[str, Any], scope: Optional[str] = None) -> str:
+        """Build the cache key for a call."""
+        normalized = json.dumps(_normalize(arguments or {}), sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        return f"{self.prefix}:{scope or 'global'}:{function_name}:{digest}"
+
+    async def _record(self, function_name: str, outcome: str):
+        try:
+            redis_client = await redis.get_client()
+            await redis_client.hincrby(STATS_KEY, f"{function_name}:{outcome}", 1)
+        except Exception as e:
+            logger.debug(f"Failed to record tool cache {outcome} for {function_name}: {str(e)}")
+
+    async def _delete(self, key: str):
+        try:
+            await redis.delete(key)
+        except Exception as e:
+            logger.debug(f"Failed to delete tool cache entry {key}: {str(e)}")
+
+    async def get(self, function_name: str, arguments: Dict[str, Any], scope: Optional[str] = None) -> Optional[ToolResult]:
+        """Return the cached result of a call, or None on a miss."""
+        key = self.make_key(function_name, arguments, scope)
+        try:
+            cached = await redis.get(key)
+        except Exception as e:
+            logger.warning(f"Tool result cache lookup failed for {function_name}: {str(e)}")
+            return None
+
+        if cached is not None:
+            try:
+                data = json.loads(cached)
+                result = ToolResult(success=data['success'], output=data['output'])
+            except Exception as e:
+                # A corrupt or old-format entry is a miss; drop it so the next result replaces it
+                logger.warning(f"Discarding unreadable cached result of {function_name}: {str(e)}")
+                await self._delete(key)
+                cached = None
+
+        if cached is None:
+            await self._record(function_name, "misses")
+            return None
+
+        await self._record(function_name, "hits")
+        logger.info(f"Tool result cache hit for {function_name}")
+        return result
+
+    async def set(self, function_name: str, arguments: Dict[str, Any], result: ToolResult, ttl: int, scope: Optional[str] = None):
+        """Store a successful result of a call for ttl seconds."""
+        if not result or not result.success:
+            return
+        key = self.make_key(function_name, arguments, scope)
+        try:
+            await redis.set(key, json.dumps({'success': result.success, 'output': result.output}), ex=ttl)
+        except Exception as e:
+            logger.warning(f"Failed to cache result of {function_name}: {str(e)}")
+
+    async def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get hit/miss counters per function name."""
+        redis_client = await redis.get_client()
+        raw = await redis_client.hgetall(STATS_KEY)
+        stats: Dict[str, Dict[str, int]] = {}
+        for field, count in raw.items():
+            function_name, _, outcome = field.rpartition(':')
+            stats.setdefault(function_name, {"hits": 0, "misses": 0})[outcome] = int(count)
+        return stats
+
+
+tool_result_cache = ToolResultCache()
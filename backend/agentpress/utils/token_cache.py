@@ -0,0 +1,90 @@
+"""
+Per-message token count cache for AgentPress.
+
+Counting tokens with litellm is expensive for long messages, and the context
+compression code needs the count of the same messages many times per turn
+(and again on every following turn). This module caches counts per message,
+keyed by model, message_id and a hash of the message body, so each message is
+only tokenized once for as long as its content does not change.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from litellm import token_counter
+
+# Maximum number of cached entries kept per process
+DEFAULT_MAX_ENTRIES = 50000
+
+
+class TokenCountCache:
+    """LRU cache of per-message token counts.
+
+    Entries are keyed by ``(model, message_id, content_hash)``. A message whose
+    content is rewritten (e.g. by compression) hashes differently and is
+    counted again, while untouched messages are served from the cache across
+    compression passes and turns.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept before evicting the
+                         least recently used ones
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Optional[str], str], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _hash_message(msg: Dict[str, Any]) -> str:
+        """Hash everything in the message that is sent to the LLM."""
+        payload = {k: v for k, v in msg.items() if k != 'message_id'}
+        serialized = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.blake2b(serialized.encode('utf-8'), digest_size=16).hexdigest()
+
+    def count_message(self, msg: Dict[str, Any], model: str = "") -> int:
+        """Get the token count of a single message, counting it on a cache miss."""
+        key = (model, msg.get('message_id'), self._hash_message(msg))
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+
+        count = token_counter(model=model, messages=[msg])
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = count
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return count
+
+    def count_messages(self, messages: List[Dict[str, Any]], model: str = "") -> int:
+        """Get the total token count of a list of messages.
+
+        The total is the sum of the per-message counts, which is slightly
+        conservative compared to counting the whole list at once.
+        """
+        return sum(self.count_message(msg, model) for msg in messages)
+
+    def clear(self):
+        """Drop all cached entries and reset the hit/miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Process-wide cache shared by all ThreadManager instances
+token_count_cache = TokenCountCache()
@@ -0,0 +1,130 @@
+"""
+Incremental XML tool call scanner for streaming LLM responses.
+
+This module detects complete XML tool call blocks in a stream of content
+deltas without rescanning the accumulated response. It supports both the
+Cursor-style ``<function_calls>`` blocks and the legacy per-tool tags
+registered in the ToolRegistry (e.g. ``<create-file>...</create-file>``).
+"""
+
+import re
+from typing import Iterable, List, Optional
+
+
+class StreamingXMLScanner:
+    """Stateful scanner that emits complete XML tool call blocks as they close.
+
+    Every call to ``feed`` only searches the newly appended text plus a short
+    lookback window (long enough to catch a tag split across two deltas), so
+    the total work is linear in the length of the response.
+
+    Block boundaries follow the same rules as
+    ``ResponseProcessor._extract_xml_chunks``:
+    - ``<function_calls>`` blocks end at the first ``</function_calls>``.
+    - Legacy tool tags end at the matching closing tag, taking nested tags
+      of the same name into account.
+    """
+
+    FUNCTION_CALLS_OPEN = '<function_calls>'
+    FUNCTION_CALLS_CLOSE = '</function_calls>'
+
+    def __init__(self, xml_tags: Optional[Iterable[str]] = None):
+        """Initialize the scanner.
+
+        Args:
+            xml_tags: Legacy XML tag names to detect in addition to
+                      ``<function_calls>`` blocks
+        """
+        tags = sorted(set(xml_tags or []), key=len, reverse=True)
+        open_alternatives = [re.escape(self.FUNCTION_CALLS_OPEN)]
+        if tags:
+            open_alternatives.append(r'<(' + '|'.join(re.escape(tag) for tag in tags) + r')(?=[\s>/])')
+        self._open_re = re.compile('|'.join(open_alternatives))
+
+        longest = max([len(tag) for tag in tags] + [len('function_calls')])
+        # Longest pattern we may need to match across a delta boundary is a
+        # closing tag "</tag>" or an opening tag "<tag" plus one boundary char
+        self._lookback = longest + 2
+
+        self._window = ""   # Text not yet fully scanned (plus lookback)
+        self._pos = 0       # Position in the window to resume searching from
+        self._parts: List[str] = []  # Already-scanned text of the open block
+        self._tag: Optional[str] = None  # Open legacy tag, or None
+        self._in_block = False
+        self._depth = 0
+        self._inner_re: Optional[re.Pattern] = None
+
+    @property
+    def in_block(self) -> bool:
+        """Whether a tool call block is currently open."""
+        return self._in_block
+
+    def feed(self, text: str) -> List[str]:
+        """Append a content delta and return the blocks completed by it."""
+        chunks: List[str] = []
+        self._window += text
+
+        while True:
+            if not self._in_block:
+                match = self._open_re.search(self._window, self._pos)
+                if not match:
+                    # Nothing starts here; keep only enough for a split tag
+                    keep_from = max(self._pos, len(self._window) - self._lookback)
+                    self._window = self._window[keep_from:]
+                    self._pos = 0
+                    return chunks
+
+                self._in_block = True
+                self._parts = []
+                self._window = self._window[match.start():]
+                self._pos = match.end() - match.start()
+                if match.group(0) == self.FUNCTION_CALLS_OPEN:
+                    self._tag = None
+                    self._inner_re = re.compile(re.escape(self.FUNCTION_CALLS_CLOSE))
+                else:
+                    self._tag = match.group(1)
+                    escaped = re.escape(self._tag)
+                    self._inner_re = re.compile(r'(</' + escaped + r'>)|<' + escaped + r'(?=[\s>/])')
+                self._depth = 1
+                continue
+
+            chunk = self._scan_block()
+            if chunk is None:
+                # Block still open; move the scanned text out of the window
+                keep_from = max(self._pos, len(self._window) - self._lookback)
+                if keep_from > 0:
+                    self._parts.append(self._window[:keep_from])
+                    self._window = self._window[keep_from:]
+                self._pos = 0
+                return chunks
+            chunks.append(chunk)
+
+    def _scan_block(self) -> Optional[str]:
+        """Look for the end of the open block; return it if complete."""
+        while True:
+            match = self._inner_re.search(self._window, self._pos)
+            if not match:
+                return None
+            self._pos = match.end()
+
+            if self._tag is None or match.group(1):
+                self._depth -= 1
+            else:
+                self._depth += 1
+
+            if self._depth == 0:
+                chunk = ''.join(self._parts) + self._window[:match.end()]
+                self._parts = []
+                self._window = self._window[match.end():]
+                self._pos = 0
+                self._in_block = False
+                self._tag = None
+                self._inner_re = None
+                return chunk
+
+    @property
+    def pending(self) -> str:
+        """Text of the block that is currently open (empty if none)."""
+        if not self._in_block:
+            return ""
+        return ''.join(self._parts) + self._window
@@ -23,6 +23,7 @@ from services import billing as billing_api
 from flags import api as feature_flags_api
 from services import transcription as transcription_api
 from services.mcp_custom import discover_custom_tools
+from utils.auth_utils import verify_admin_api_key
 import sys
 from services import email_api
 
@@ -179,6 +180,22 @@ async def health_check():
         "instance_id": instance_id
     }
 
+@app.get("/api/tool-cache/stats", dependencies=[Depends(verify_admin_api_key)])
+async def tool_cache_stats():
+    """Hit/miss counters of the tool result cache, per tool function, across all accounts. Admin only."""
+    from agentpress.tool_result_cache import tool_result_cache
+    try:
+        return {"tools": await tool_result_cache.get_stats()}
+    except Exception as e:
+        logger.error(f"Error getting tool cache stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/sandbox/latency-stats", dependencies=[Depends(verify_admin_api_key)])
+async def sandbox_latency_stats():
+    """Latency histograms of the Daytona calls made by this API process, per operation. Admin only."""
+    from sandbox.client import get_latency_stats
+    return {"instance_id": instance_id, "operations": get_latency_stats()}
+
 class CustomMCPDiscoverRequest(BaseModel):
     type: str
     config: Dict[str, Any]
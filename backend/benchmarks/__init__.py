@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for the AgentPress turn loop.
+
+Run with ``uv run python -m benchmarks.turn_loop`` from the backend directory.
+"""
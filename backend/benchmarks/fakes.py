@@ -0,0 +1,112 @@
+"""
+In-memory stand-ins used to run the turn loop without network access.
+
+- InMemorySupabase (from utils/supabase_fake.py) mimics the async Supabase
+  query builder and counts every executed query, so benchmarks can report
+  database round trips.
+- replay_llm_stream turns recorded LiteLLM streaming chunks back into objects
+  with the attribute shape ResponseProcessor reads.
+- BenchmarkTool is a registered tool with deterministic, instant results.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any, AsyncGenerator, Dict, List
+
+from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from utils.supabase_fake import InMemorySupabase, InMemoryQuery, QueryResult  # noqa: F401
+
+
+def _to_namespace(value: Any) -> Any:
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+def build_chunks(chunk_dicts: List[Dict[str, Any]]) -> List[Any]:
+    """Turn recorded chunk dicts (LiteLLM ``model_dump()`` output) into chunk objects."""
+    return [_to_namespace(chunk) for chunk in chunk_dicts]
+
+
+async def replay_llm_stream(chunks: List[Any]) -> AsyncGenerator[Any, None]:
+    """Yield prepared chunks, handing control to the loop between them like a socket read would."""
+    for chunk in chunks:
+        await asyncio.sleep(0)
+        yield chunk
+
+
+class BenchmarkTool(Tool):
+    """Tool with deterministic results for benchmark fixtures."""
+
+    # Size of the web_search result, which dominates history growth in tool-heavy runs
+    search_result_size = 4000
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "create_file",
+            "description": "Create a file in the workspace.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "file_path": {"type": "string", "description": "Path of the file to create"},
+                    "file_contents": {"type": "string", "description": "Content of the file"}
+                },
+                "required": ["file_path", "file_contents"]
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="create-file",
+        mappings=[
+            {"param_name": "file_path", "node_type": "attribute", "path": "."},
+            {"param_name": "file_contents", "node_type": "content", "path": "."}
+        ],
+        example='''
+        <function_calls>
+        <invoke name="create_file">
+        <parameter name="file_path">src/main.py</parameter>
+        <parameter name="file_contents">print("hello")</parameter>
+        </invoke>
+        </function_calls>
+        '''
+    )
+    async def create_file(self, file_path: str, file_contents: str) -> ToolResult:
+        return self.success_response(f"File '{file_path}' created successfully ({len(file_contents)} characters).")
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "web_search",
+            "description": "Search the web.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "The search query"}
+                },
+                "required": ["query"]
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="web-search",
+        mappings=[
+            {"param_name": "query", "node_type": "attribute", "path": "."}
+        ],
+        example='''
+        <function_calls>
+        <invoke name="web_search">
+        <parameter name="query">latest AI research</parameter>
+        </invoke>
+        </function_calls>
+        '''
+    )
+    async def web_search(self, query: str) -> ToolResult:
+        snippet = f"Result for {query}. "
+        results = [
+            {"title": f"{query} #{i}", "url": f"https://example.com/{i}", "content": snippet * 8}
+            for i in range(max(1, self.search_result_size // (len(snippet) * 8 + 60)))
+        ]
+        return self.success_response({"query": query, "results": results})
@@ -0,0 +1,193 @@
+"""
+Streaming fixtures for the turn loop benchmarks.
+
+A fixture is a list of JSON records, stored one per line in a ``.jsonl`` file:
+
+    {"kind": "history", "message": {"role": "user", "content": "..."}}
+    {"kind": "user", "turn": 0, "content": "..."}
+    {"kind": "chunk", "turn": 0, "chunk": {<LiteLLM chunk model_dump()>}}
+
+``history`` records seed the thread before the run, ``user`` records are added
+as a user message before their turn and ``chunk`` records are the LLM stream
+of that turn, replayed in order. Real streams can be captured with
+``record_stream``; the built-in scenarios are generated deterministically in
+the same format so they need no stored files.
+"""
+
+import itertools
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+BENCHMARK_MODEL = "anthropic/claude-sonnet-4-20250514"
+
+# Delta sizes cycled through when splitting text, close to what providers stream
+DELTA_SIZES = (3, 7, 12, 5, 18, 9, 24, 4)
+
+
+@dataclass
+class Turn:
+    """One LLM call of a scenario."""
+    user_message: Optional[str] = None
+    chunks: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class Scenario:
+    """A replayable conversation."""
+    name: str
+    history: List[Dict[str, Any]] = field(default_factory=list)
+    turns: List[Turn] = field(default_factory=list)
+
+    @property
+    def chunk_count(self) -> int:
+        return sum(len(turn.chunks) for turn in self.turns)
+
+
+def scenario_from_records(name: str, records: List[Dict[str, Any]]) -> Scenario:
+    """Group fixture records into a Scenario."""
+    scenario = Scenario(name=name)
+    turns: Dict[int, Turn] = {}
+    for record in records:
+        kind = record.get('kind')
+        if kind == 'history':
+            scenario.history.append(record['message'])
+        elif kind == 'user':
+            turns.setdefault(record.get('turn', 0), Turn()).user_message = record['content']
+        elif kind == 'chunk':
+            turns.setdefault(record.get('turn', 0), Turn()).chunks.append(record['chunk'])
+        else:
+            raise ValueError(f"Unknown fixture record kind: {kind}")
+    scenario.turns = [turns[index] for index in sorted(turns)]
+    return scenario
+
+
+def load_fixture(path: str) -> Scenario:
+    """Load a scenario from a .jsonl fixture file."""
+    fixture_path = Path(path)
+    with fixture_path.open() as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return scenario_from_records(fixture_path.stem, records)
+
+
+async def record_stream(llm_response: AsyncGenerator, path: str, turn: int = 0) -> AsyncGenerator:
+    """Pass a LiteLLM stream through unchanged while appending its chunks to a fixture.
+
+    Wrap the response of make_llm_api_call with this to capture a real
+    conversation for replay.
+    """
+    with open(path, 'a') as f:
+        async for chunk in llm_response:
+            data = chunk.model_dump() if hasattr(chunk, 'model_dump') else dict(chunk)
+            f.write(json.dumps({"kind": "chunk", "turn": turn, "chunk": data}, default=str) + "\n")
+            yield chunk
+
+
+def _split(text: str) -> List[str]:
+    parts = []
+    position = 0
+    for size in itertools.cycle(DELTA_SIZES):
+        if position >= len(text):
+            break
+        parts.append(text[position:position + size])
+        position += size
+    return parts
+
+
+def _chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, usage: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    chunk = {
+        "id": "chatcmpl-benchmark",
+        "created": 1735689600,
+        "model": BENCHMARK_MODEL,
+        "object": "chat.completion.chunk",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage is not None:
+        chunk["usage"] = usage
+    return chunk
+
+
+def stream_records(turn: int, text: str, prompt_tokens: int = 1000) -> List[Dict[str, Any]]:
+    """Build the chunk records of an assistant reply streamed as text deltas."""
+    deltas = _split(text)
+    records = [
+        {"kind": "chunk", "turn": turn, "chunk": _chunk({"role": "assistant", "content": delta})}
+        for delta in deltas
+    ]
+    completion_tokens = max(1, len(text) // 4)
+    records.append({"kind": "chunk", "turn": turn, "chunk": _chunk(
+        {"content": ""},
+        finish_reason="stop",
+        usage={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+    )})
+    return records
+
+
+def tool_call_xml(function_name: str, **parameters: str) -> str:
+    """Render a tool call in the <function_calls> format the agent prompt asks for."""
+    rendered = "".join(
+        f'<parameter name="{name}">{value}</parameter>\n' for name, value in parameters.items()
+    )
+    return f'<function_calls>\n<invoke name="{function_name}">\n{rendered}</invoke>\n</function_calls>'
+
+
+def _prose(sentences: int, seed: int = 0) -> str:
+    words = ("the", "agent", "reads", "files", "and", "runs", "commands", "to", "verify", "each",
+             "change", "before", "reporting", "results", "with", "clear", "notes", "on", "next", "steps")
+    out = []
+    for i in range(sentences):
+        length = 8 + (i + seed) % 9
+        sentence = " ".join(words[(i * 7 + j * 3 + seed) % len(words)] for j in range(length))
+        out.append(sentence.capitalize() + ".")
+    return " ".join(out)
+
+
+def _history(pairs: int, tool_output_size: int) -> List[Dict[str, Any]]:
+    """Alternating user/assistant/tool-result messages of a prior conversation."""
+    history = []
+    for i in range(pairs):
+        history.append({"role": "user", "content": _prose(2, seed=i)})
+        history.append({"role": "assistant", "content": _prose(4, seed=i + 1) + "\n" + tool_call_xml("web_search", query=f"topic {i}")})
+        history.append({"role": "user", "content": "<tool_result> " + ("x" * tool_output_size) + " </tool_result>"})
+        history.append({"role": "assistant", "content": _prose(6, seed=i + 2)})
+    return history
+
+
+def small_conversation() -> Scenario:
+    """A short thread and a single plain-text reply."""
+    records = [{"kind": "history", "message": message} for message in _history(pairs=2, tool_output_size=200)]
+    records.append({"kind": "user", "turn": 0, "content": "Summarize what we found so far."})
+    records.extend(stream_records(0, _prose(20)))
+    return scenario_from_records("small", records)
+
+
+def large_conversation() -> Scenario:
+    """A long thread with big tool outputs and a reply that writes a large file."""
+    records = [{"kind": "history", "message": message} for message in _history(pairs=60, tool_output_size=6000)]
+    records.append({"kind": "user", "turn": 0, "content": "Write the full report to report.md."})
+    report = "\n".join(f"## Section {i}\n{_prose(6, seed=i)}" for i in range(120))
+    text = _prose(3) + "\n" + tool_call_xml("create_file", file_path="report.md", file_contents=report)
+    records.extend(stream_records(0, text, prompt_tokens=120000))
+    return scenario_from_records("large", records)
+
+
+def tool_heavy_conversation() -> Scenario:
+    """Several turns that each stream multiple tool calls between prose."""
+    records = [{"kind": "history", "message": message} for message in _history(pairs=5, tool_output_size=1000)]
+    records.append({"kind": "user", "turn": 0, "content": "Research the topic and keep notes as you go."})
+    for turn in range(8):
+        parts = []
+        for call in range(3):
+            parts.append(_prose(2, seed=turn * 3 + call))
+            parts.append(tool_call_xml("web_search", query=f"turn {turn} query {call}"))
+        parts.append(tool_call_xml("create_file", file_path=f"notes/turn_{turn}.md", file_contents=_prose(10, seed=turn)))
+        records.extend(stream_records(turn, "\n".join(parts), prompt_tokens=20000 + turn * 4000))
+    return scenario_from_records("tool_heavy", records)
+
+
+BUILTIN_SCENARIOS = {
+    "small": small_conversation,
+    "large": large_conversation,
+    "tool_heavy": tool_heavy_conversation,
+}
@@ -0,0 +1,248 @@
+"""
+Replay benchmark for ThreadManager.run_thread and ResponseProcessor.
+
+Each scenario seeds an in-memory thread, then replays its recorded LLM
+streams through the real turn loop (history loading, compression, streaming
+XML tool detection, tool execution and message persistence) with the LLM call
+and Supabase replaced by offline stand-ins. Reported per scenario:
+
+- cpu_ms:            CPU time of the whole replay (median of --repeat runs)
+- ttfy_ms:           mean wall time from calling run_thread to its first yield
+- per_chunk_us:      cpu_ms spread over the streamed LLM chunks
+- db_calls:          executed Supabase queries, total and per table.operation
+- peak_kb:           peak traced Python memory (separate tracemalloc run)
+
+Usage (from the backend directory):
+
+    uv run python -m benchmarks.turn_loop
+    uv run python -m benchmarks.turn_loop --scenario large --repeat 10
+    uv run python -m benchmarks.turn_loop --fixture recorded.jsonl --output results.json
+    uv run python -m benchmarks.turn_loop --baseline baseline.json --tolerance 0.25
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+import structlog
+
+# The turn loop never talks to these services here, but config validation requires them
+for _key in ("SUPABASE_URL", "SUPABASE_ANON_KEY", "SUPABASE_SERVICE_ROLE_KEY", "REDIS_HOST",
+             "DAYTONA_API_KEY", "DAYTONA_SERVER_URL", "DAYTONA_TARGET",
+             "TAVILY_API_KEY", "RAPID_API_KEY", "FIRECRAWL_API_KEY"):
+    os.environ.setdefault(_key, "benchmark")
+
+# utils.logger caches each logger on first use, which already happens while the
+# app modules below are imported, so --log-level must take effect before them
+if __name__ == "__main__":
+    _log_parser = argparse.ArgumentParser(add_help=False)
+    _log_parser.add_argument("--log-level", default="WARNING")
+    _log_level = _log_parser.parse_known_args()[0].log_level
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(getattr(logging, _log_level.upper())))
+
+from agentpress import thread_manager as thread_manager_module  # noqa: E402
+from agentpress.response_processor import ProcessorConfig  # noqa: E402
+from agentpress.thread_manager import ThreadManager  # noqa: E402
+from agentpress.utils.token_cache import token_count_cache  # noqa: E402
+from services.supabase import DBConnection  # noqa: E402
+
+from benchmarks.fakes import BenchmarkTool, InMemorySupabase, build_chunks, replay_llm_stream  # noqa: E402
+from benchmarks.fixtures import BENCHMARK_MODEL, BUILTIN_SCENARIOS, Scenario, load_fixture  # noqa: E402
+
+THREAD_ID = "00000000-0000-0000-0000-00000000b001"
+SYSTEM_PROMPT = {"role": "system", "content": "You are a benchmark agent. " * 200}
+
+
+def _install_client(client: InMemorySupabase):
+    """Point the DBConnection singleton at the in-memory client."""
+    db = DBConnection()
+    db._client = client
+    db._initialized = True
+
+
+def _seed(client: InMemorySupabase, scenario: Scenario):
+    for index, message in enumerate(scenario.history):
+        timestamp = f"2025-01-01T00:{index // 60 % 60:02d}:{index % 60:02d}.{index:06d}+00:00"
+        client.store('messages', {
+            'thread_id': THREAD_ID,
+            'type': message.get('role', 'user'),
+            'content': message,
+            'is_llm_message': True,
+            'metadata': {},
+            'created_at': timestamp,
+            'updated_at': timestamp,
+        })
+
+
+async def replay(scenario: Scenario) -> Dict[str, Any]:
+    """Run every turn of a scenario through the real turn loop once."""
+    client = InMemorySupabase()
+    _install_client(client)
+    _seed(client, scenario)
+    client.reset_calls()
+    token_count_cache.clear()
+
+    turn_chunks = [build_chunks(turn.chunks) for turn in scenario.turns]
+    pending_streams: List[List[Any]] = []
+
+    async def fake_make_llm_api_call(messages, model_name, **kwargs):
+        return replay_llm_stream(pending_streams.pop(0))
+
+    original_llm_call = thread_manager_module.make_llm_api_call
+    thread_manager_module.make_llm_api_call = fake_make_llm_api_call
+    try:
+        manager = ThreadManager()
+        manager.add_tool(BenchmarkTool)
+
+        yielded = 0
+        first_yield: List[float] = []
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+
+        for turn, chunks in zip(scenario.turns, turn_chunks):
+            if turn.user_message:
+                await manager.add_message(THREAD_ID, 'user', {"role": "user", "content": turn.user_message}, is_llm_message=True)
+            pending_streams.append(chunks)
+
+            turn_start = time.perf_counter()
+            response = await manager.run_thread(
+                thread_id=THREAD_ID,
+                system_prompt=SYSTEM_PROMPT,
+                stream=True,
+                llm_model=BENCHMARK_MODEL,
+                processor_config=ProcessorConfig(
+                    xml_tool_calling=True,
+                    native_tool_calling=False,
+                    execute_tools=True,
+                    execute_on_stream=True,
+                    tool_execution_strategy="parallel",
+                    xml_adding_strategy="user_message",
+                ),
+                native_max_auto_continues=0,
+            )
+            first = True
+            async for _ in response:
+                if first:
+                    first_yield.append(time.perf_counter() - turn_start)
+                    first = False
+                yielded += 1
+
+        await manager.message_writer.close()
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+    finally:
+        thread_manager_module.make_llm_api_call = original_llm_call
+
+    return {
+        "cpu_s": cpu,
+        "wall_s": wall,
+        "ttfy_s": statistics.mean(first_yield) if first_yield else 0.0,
+        "yielded": yielded,
+        "db_calls": dict(client.calls),
+    }
+
+
+def run_scenario(scenario: Scenario, repeat: int, measure_memory: bool = True) -> Dict[str, Any]:
+    """Replay a scenario `repeat` times and summarize the measurements."""
+    asyncio.run(replay(scenario))  # warm-up: imports, tokenizer load, regex compilation
+
+    runs = [asyncio.run(replay(scenario)) for _ in range(repeat)]
+    cpu_ms = statistics.median(run["cpu_s"] for run in runs) * 1000
+    chunks = scenario.chunk_count
+
+    result = {
+        "scenario": scenario.name,
+        "turns": len(scenario.turns),
+        "history_messages": len(scenario.history),
+        "chunks": chunks,
+        "yielded": runs[0]["yielded"],
+        "cpu_ms": round(cpu_ms, 2),
+        "wall_ms": round(statistics.median(run["wall_s"] for run in runs) * 1000, 2),
+        "ttfy_ms": round(statistics.median(run["ttfy_s"] for run in runs) * 1000, 3),
+        "per_chunk_us": round(cpu_ms * 1000 / chunks, 2) if chunks else 0.0,
+        "db_calls_total": sum(runs[0]["db_calls"].values()),
+        "db_calls": runs[0]["db_calls"],
+    }
+
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            asyncio.run(replay(scenario))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result["peak_kb"] = round(peak / 1024, 1)
+
+    return result
+
+
+def compare_to_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return a description of every metric that regressed beyond the tolerance.
+
+    CPU time and memory may grow by `tolerance` (a fraction); database call
+    counts are deterministic and may not grow at all.
+    """
+    regressions = []
+    for result in results:
+        reference = baseline.get(result["scenario"])
+        if not reference:
+            continue
+        for metric in ("cpu_ms", "peak_kb"):
+            if metric in reference and metric in result and result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{result['scenario']}: {metric} {result[metric]} > {reference[metric]} (+{tolerance:.0%})")
+        if "db_calls_total" in reference and result["db_calls_total"] > reference["db_calls_total"]:
+            regressions.append(f"{result['scenario']}: db_calls_total {result['db_calls_total']} > {reference['db_calls_total']}")
+    return regressions
+
+
+def _print_table(results: List[Dict[str, Any]]):
+    columns = ("scenario", "turns", "chunks", "cpu_ms", "wall_ms", "ttfy_ms", "per_chunk_us", "db_calls_total", "peak_kb")
+    widths = [max(len(column), *(len(str(result.get(column, '-'))) for result in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result.get(column, '-')).ljust(width) for column, width in zip(columns, widths)))
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay benchmark for the AgentPress turn loop")
+    parser.add_argument("--scenario", action="append", choices=sorted(BUILTIN_SCENARIOS), help="Built-in scenario to run (default: all)")
+    parser.add_argument("--fixture", action="append", default=[], help="Recorded .jsonl fixture to replay")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per scenario")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="JSON results to compare against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed CPU/memory growth over the baseline")
+    # Applied at import time, see above
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the code under test")
+    args = parser.parse_args(argv)
+
+    scenarios = [BUILTIN_SCENARIOS[name]() for name in (args.scenario or ([] if args.fixture else sorted(BUILTIN_SCENARIOS)))]
+    scenarios.extend(load_fixture(path) for path in args.fixture)
+
+    results = [run_scenario(scenario, repeat=args.repeat, measure_memory=not args.no_memory) for scenario in scenarios]
+    _print_table(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({result["scenario"]: result for result in results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -41,6 +41,8 @@ except ImportError:
         Tool = Any
         ToolResult = Any
 
+from mcp_local.session_pool import MCPSessionPool, mcp_session_pool
+from mcp_local.tool_cache import mcp_tool_cache
 from utils.logger import logger
 import os
 
@@ -61,9 +63,11 @@ class MCPConnection:
 class MCPManager:
     """Manages connections to multiple MCP servers"""
     
-    def __init__(self):
+    def __init__(self, session_pool: Optional[MCPSessionPool] = None):
         self.connections: Dict[str, MCPConnection] = {}
         self._sessions: Dict[str, Tuple[Any, Any, Any]] = {}  # Store streams for cleanup
+        # Sessions stay open in the pool, so tool calls skip the connect and initialize round trips
+        self.session_pool = session_pool or mcp_session_pool
         
     async def connect_server(self, mcp_config: Dict[str, Any]) -> MCPConnection:
         """
@@ -102,26 +106,21 @@ class MCPManager:
             # Create server URL
             url = f"{SMITHERY_SERVER_BASE_URL}/{qualified_name}/mcp?config={config_b64}&api_key={SMITHERY_API_KEY}"
             
-            # Test connection and get available tools
-            async with streamablehttp_client(url) as (read_stream, write_stream, _):
-                async with ClientSession(read_stream, write_stream) as session:
-                    # Initialize the connection
-                    await session.initialize()
-                    logger.info(f"MCP session initialized for {qualified_name}")
-                    
-                    # List available tools
-                    tools_result = await session.list_tools()
-            tools = tools_result.tools if hasattr(tools_result, 'tools') else tools_result
+            # Cached tools let the run start without connecting; the session opens on first use
+            tools = await mcp_tool_cache.get_tools(
+                qualified_name, "http", {"url": url},
+                lambda: self.session_pool.list_tools("http", {"url": url})
+            )
             
             logger.info(f"Available tools from {qualified_name}: {[t.name for t in tools]}")
             
-            # Create connection object (without persistent session)
+            # Create connection object (the session itself lives in the pool)
             connection = MCPConnection(
                 qualified_name=qualified_name,
                 name=mcp_config["name"],
                 config=mcp_config["config"],
                 enabled_tools=mcp_config.get("enabledTools", []),
-                session=None,  # No persistent session
+                session=None,  # Pooled by server config
                 tools=tools
             )
             
@@ -211,52 +210,45 @@ class MCPManager:
             raise ValueError("SMITHERY_API_KEY environment variable is not set")
         
         try:
-            # Create fresh connection for this tool call
+            # Reuse the pooled session for this server config
             config_json = json.dumps(conn.config)
             config_b64 = base64.b64encode(config_json.encode()).decode()
             url = f"{SMITHERY_SERVER_BASE_URL}/{qualified_name}/mcp?config={config_b64}&api_key={SMITHERY_API_KEY}"
             
-            # Use the documented pattern with proper context management
-            async with streamablehttp_client(url) as (read_stream, write_stream, _):
-                async with ClientSession(read_stream, write_stream) as session:
-                    # Initialize the connection
-                    await session.initialize()
-                    
-                    # Call the tool
-                    result = await session.call_tool(original_tool_name, arguments)
+            result = await self.session_pool.call_tool("http", {"url": url}, original_tool_name, arguments, timeout=None)
             
-                    # Convert result to dict - handle MCP response properly
-                    if hasattr(result, 'content'):
-                        # Handle content which might be a list of TextContent objects
-                        content = result.content
-                        if isinstance(content, list):
-                            # Extract text from TextContent objects
-                            text_parts = []
-                            for item in content:
-                                if hasattr(item, 'text'):
-                                    text_parts.append(item.text)
-                                elif hasattr(item, 'content'):
-                                    text_parts.append(str(item.content))
-                                else:
-                                    text_parts.append(str(item))
-                            content_str = "\n".join(text_parts)
-                        elif hasattr(content, 'text'):
-                            # Single TextContent object
-                            content_str = content.text
-                        elif hasattr(content, 'content'):
-                            content_str = str(content.content)
+            # Convert result to dict - handle MCP response properly
+            if hasattr(result, 'content'):
+                # Handle content which might be a list of TextContent objects
+                content = result.content
+                if isinstance(content, list):
+                    # Extract text from TextContent objects
+                    text_parts = []
+                    for item in content:
+                        if hasattr(item, 'text'):
+                            text_parts.append(item.text)
+                        elif hasattr(item, 'content'):
+                            text_parts.append(str(item.content))
                         else:
-                            content_str = str(content)
-                        
-                        is_error = getattr(result, 'isError', False)
-                    else:
-                        content_str = str(result)
-                        is_error = False
-                        
-                return {
-                        "content": content_str,
-                        "isError": is_error
-                }
+                            text_parts.append(str(item))
+                    content_str = "\n".join(text_parts)
+                elif hasattr(content, 'text'):
+                    # Single TextContent object
+                    content_str = content.text
+                elif hasattr(content, 'content'):
+                    content_str = str(content.content)
+                else:
+                    content_str = str(content)
+                
+                is_error = getattr(result, 'isError', False)
+            else:
+                content_str = str(result)
+                is_error = False
+                
+            return {
+                "content": content_str,
+                "isError": is_error
+            }
                 
         except Exception as e:
             logger.error(f"Error executing MCP tool {tool_name}: {str(e)}")
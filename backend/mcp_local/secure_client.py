@@ -38,6 +38,7 @@ except ImportError:
         Tool = Any
         ToolResult = Any
 
+from .session_pool import MCPSessionPool, mcp_session_pool
 from utils.logger import logger
 from .credential_manager import credential_manager
 from .template_manager import template_manager
@@ -62,9 +63,10 @@ class SecureMCPConnection:
 class SecureMCPManager:
     """Manages secure connections to multiple MCP servers using encrypted credentials"""
     
-    def __init__(self):
+    def __init__(self, session_pool: Optional[MCPSessionPool] = None):
         self.connections: Dict[str, SecureMCPConnection] = {}
         self._sessions: Dict[str, Tuple[Any, Any, Any]] = {}
+        self.session_pool = session_pool or mcp_session_pool
         
     async def connect_from_agent_instance(self, instance_id: str, account_id: str) -> None:
         """
@@ -144,27 +146,19 @@ class SecureMCPManager:
             # Create server URL
             url = f"{SMITHERY_SERVER_BASE_URL}/{qualified_name}/mcp?config={config_b64}&api_key={SMITHERY_API_KEY}"
             
-            # Test connection and get available tools
-            async with streamablehttp_client(url) as (read_stream, write_stream, _):
-                async with ClientSession(read_stream, write_stream) as session:
-                    # Initialize the connection
-                    await session.initialize()
-                    logger.info(f"Secure MCP session initialized for {qualified_name}")
-                    
-                    # List available tools
-                    tools_result = await session.list_tools()
-            
-            tools = tools_result.tools if hasattr(tools_result, 'tools') else tools_result
+            # Open a pooled session and get available tools
+            tools = await self.session_pool.list_tools("http", {"url": url})
+            logger.info(f"Secure MCP session initialized for {qualified_name}")
             
             logger.info(f"Available tools from {qualified_name}: {[t.name for t in tools]}")
             
-            # Create connection object (without persistent session)
+            # Create connection object (the session itself lives in the pool)
             connection = SecureMCPConnection(
                 qualified_name=qualified_name,
                 name=mcp_config["name"],
                 credential_id="", # We don't store credential_id in mcp_config anymore
                 enabled_tools=mcp_config.get("enabledTools", []),
-                session=None,  # No persistent session
+                session=None,  # Pooled by server config
                 tools=tools
             )
             
@@ -209,27 +203,19 @@ class SecureMCPManager:
             # Create server URL
             url = f"{SMITHERY_SERVER_BASE_URL}/{qualified_name}/mcp?config={config_b64}&api_key={SMITHERY_API_KEY}"
             
-            # Test connection and get available tools
-            async with streamablehttp_client(url) as (read_stream, write_stream, _):
-                async with ClientSession(read_stream, write_stream) as session:
-                    # Initialize the connection
-                    await session.initialize()
-                    logger.info(f"Legacy MCP session initialized for {qualified_name}")
-                    
-                    # List available tools
-                    tools_result = await session.list_tools()
-            
-            tools = tools_result.tools if hasattr(tools_result, 'tools') else tools_result
+            # Open a pooled session and get available tools
+            tools = await self.session_pool.list_tools("http", {"url": url})
+            logger.info(f"Legacy MCP session initialized for {qualified_name}")
             
             logger.info(f"Available tools from legacy {qualified_name}: {[t.name for t in tools]}")
             
-            # Create connection object (without persistent session)
+            # Create connection object (the session itself lives in the pool)
             connection = SecureMCPConnection(
                 qualified_name=qualified_name,
                 name=mcp_config["name"],
                 credential_id="legacy",
                 enabled_tools=mcp_config.get("enabledTools", []),
-                session=None,  # No persistent session
+                session=None,  # Pooled by server config
                 tools=tools
             )
             
@@ -315,7 +301,7 @@ class SecureMCPManager:
             # For now, we'll use a placeholder approach
             # In a full implementation, we'd need to pass the account_id and get the credential
             
-            # Create fresh connection for this tool call
+            # The pooled session for this URL is reused across calls
             # This is a simplified approach - in production, you'd want to cache credentials
             config = {}  # This would be retrieved from credential manager
             
@@ -323,50 +309,43 @@ class SecureMCPManager:
             config_b64 = base64.b64encode(config_json.encode()).decode()
             url = f"{SMITHERY_SERVER_BASE_URL}/{qualified_name}/mcp?config={config_b64}&api_key={SMITHERY_API_KEY}"
             
-            # Use the documented pattern with proper context management
-            async with streamablehttp_client(url) as (read_stream, write_stream, _):
-                async with ClientSession(read_stream, write_stream) as session:
-                    # Initialize the connection
-                    await session.initialize()
-                    
-                    # Call the tool
-                    result = await session.call_tool(original_tool_name, arguments)
-            
-                    # Convert result to dict - handle MCP response properly
-                    if hasattr(result, 'content'):
-                        # Handle content which might be a list of TextContent objects
-                        content = result.content
-                        if isinstance(content, list):
-                            # Extract text from TextContent objects
-                            text_parts = []
-                            for item in content:
-                                if hasattr(item, 'text'):
-                                    text_parts.append(item.text)
-                                elif hasattr(item, 'content'):
-                                    text_parts.append(str(item.content))
-                                else:
-                                    text_parts.append(str(item))
-                            content_str = "\n".join(text_parts)
-                        elif hasattr(content, 'text'):
-                            # Single TextContent object
-                            content_str = content.text
-                        elif hasattr(content, 'content'):
-                            content_str = str(content.content)
+            result = await self.session_pool.call_tool("http", {"url": url}, original_tool_name, arguments, timeout=None)
+            
+            # Convert result to dict - handle MCP response properly
+            if hasattr(result, 'content'):
+                # Handle content which might be a list of TextContent objects
+                content = result.content
+                if isinstance(content, list):
+                    # Extract text from TextContent objects
+                    text_parts = []
+                    for item in content:
+                        if hasattr(item, 'text'):
+                            text_parts.append(item.text)
+                        elif hasattr(item, 'content'):
+                            text_parts.append(str(item.content))
                         else:
-                            content_str = str(content)
-                        
-                        is_error = getattr(result, 'isError', False)
-                    else:
-                        content_str = str(result)
-                        is_error = False
-                    
-                    # Log tool usage
-                    await self._log_tool_usage(instance_id, qualified_name, original_tool_name, True)
-                        
-                    return {
-                        "content": content_str,
-                        "isError": is_error
-                    }
+                            text_parts.append(str(item))
+                    content_str = "\n".join(text_parts)
+                elif hasattr(content, 'text'):
+                    # Single TextContent object
+                    content_str = content.text
+                elif hasattr(content, 'content'):
+                    content_str = str(content.content)
+                else:
+                    content_str = str(content)
+                
+                is_error = getattr(result, 'isError', False)
+            else:
+                content_str = str(result)
+                is_error = False
+            
+            # Log tool usage
+            await self._log_tool_usage(instance_id, qualified_name, original_tool_name, True)
+                
+            return {
+                "content": content_str,
+                "isError": is_error
+            }
                 
         except Exception as e:
             logger.error(f"Error executing secure MCP tool {tool_name}: {str(e)}")
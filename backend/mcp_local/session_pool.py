@@ -0,0 +1,250 @@
+"""
+MCP Session Pool
+
+This module keeps initialized MCP client sessions open between tool calls:
+1. Sessions are keyed by a hash of the transport and server config
+2. Idle sessions are pinged before reuse and closed after MCP_SESSION_IDLE_TTL
+3. At most MCP_MAX_SESSIONS are pooled; beyond that calls use one-off sessions
+4. list_tools reconnects once and retries when it fails on a broken connection;
+   call_tool is never retried, as the tool may have run before the connection broke
+
+Each session is owned by its own task, which enters the transport and
+ClientSession contexts and exits them when the session is closed, as the
+anyio-based MCP transports require.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared.exceptions import McpError
+
+from utils.config import config
+from utils.logger import logger
+
+# Seconds to wait for a session to connect and initialize, and for a ping
+CONNECT_TIMEOUT = 30
+PING_TIMEOUT = 5
+
+# Sessions idle for longer than this are pinged before they are reused
+HEALTH_CHECK_INTERVAL = 30
+
+TRANSPORTS = ("sse", "http", "stdio")
+
+
+def server_key(transport: str, server_config: Dict[str, Any]) -> str:
+    """Pool key of an MCP server: a hash of its transport and config."""
+    payload = json.dumps({"transport": transport, "config": server_config}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@asynccontextmanager
+async def open_transport(transport: str, server_config: Dict[str, Any]):
+    """Open the (read, write) streams of an MCP server."""
+    if transport == "sse":
+        async with sse_client(server_config["url"], headers=server_config.get("headers") or None) as (read, write):
+            yield read, write
+    elif transport == "http":
+        async with streamablehttp_client(server_config["url"], headers=server_config.get("headers") or None) as (read, write, _):
+            yield read, write
+    elif transport == "stdio":
+        server_params = StdioServerParameters(
+            command=server_config["command"],
+            args=server_config.get("args", []),
+            env=server_config.get("env", {})
+        )
+        async with stdio_client(server_params) as (read, write):
+            yield read, write
+    else:
+        raise ValueError(f"Unsupported MCP transport: {transport}")
+
+
+class PooledSession:
+    """An initialized ClientSession kept open by a dedicated task."""
+
+    def __init__(self, key: str, transport: str, server_config: Dict[str, Any]):
+        self.key = key
+        self.transport = transport
+        self.server_config = server_config
+        self.session: Optional[ClientSession] = None
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.closed = False
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error: Optional[BaseException] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._ready.wait(), CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise TimeoutError(f"Timed out connecting to MCP server ({self.transport})")
+        if self._error is not None:
+            raise self._error
+
+    async def _run(self):
+        try:
+            async with AsyncExitStack() as stack:
+                read, write = await stack.enter_async_context(open_transport(self.transport, self.server_config))
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await session.initialize()
+                self.session = session
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            self._error = e
+            if self._ready.is_set():
+                logger.warning(f"MCP session {self.key[:12]} ({self.transport}) ended: {e}")
+        finally:
+            self.closed = True
+            self._ready.set()
+
+    async def ping(self) -> bool:
+        try:
+            await asyncio.wait_for(self.session.send_ping(), PING_TIMEOUT)
+            return True
+        except Exception as e:
+            logger.info(f"MCP session {self.key[:12]} failed its health check: {e}")
+            return False
+
+    async def close(self):
+        self._closing.set()
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(self._task, PING_TIMEOUT)
+            except (asyncio.TimeoutError, Exception):
+                self._task.cancel()
+        self.closed = True
+
+
+class MCPSessionPool:
+    """Long-lived MCP client sessions shared by tool calls."""
+
+    def __init__(self, max_sessions: Optional[int] = None, idle_ttl: Optional[float] = None):
+        self.max_sessions = config.MCP_MAX_SESSIONS if max_sessions is None else max_sessions
+        self.idle_ttl = config.MCP_SESSION_IDLE_TTL if idle_ttl is None else idle_ttl
+        self._sessions: Dict[str, PooledSession] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Sessions and locks from another event loop cannot be used or closed here
+            self._sessions.clear()
+            self._locks.clear()
+            self._loop = loop
+
+    async def _evict_idle(self):
+        now = time.monotonic()
+        for key, pooled in list(self._sessions.items()):
+            if pooled.closed or (pooled.in_use == 0 and now - pooled.last_used > self.idle_ttl):
+                del self._sessions[key]
+                await pooled.close()
+
+    async def _make_room(self) -> bool:
+        if len(self._sessions) < self.max_sessions:
+            return True
+        idle = [pooled for pooled in self._sessions.values() if pooled.in_use == 0]
+        if not idle:
+            return False
+        lru = min(idle, key=lambda pooled: pooled.last_used)
+        del self._sessions[lru.key]
+        await lru.close()
+        return True
+
+    async def _acquire(self, transport: str, server_config: Dict[str, Any]) -> PooledSession:
+        self._check_loop()
+        await self._evict_idle()
+        key = server_key(transport, server_config)
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            pooled = self._sessions.get(key)
+            if pooled is not None and not pooled.closed:
+                if time.monotonic() - pooled.last_used <= HEALTH_CHECK_INTERVAL or await pooled.ping():
+                    pooled.in_use += 1
+                    return pooled
+                del self._sessions[key]
+                await pooled.close()
+
+            pooled = PooledSession(key, transport, server_config)
+            await pooled.start()
+            pooled.in_use += 1
+            if await self._make_room():
+                self._sessions[key] = pooled
+            else:
+                logger.warning(f"MCP session pool is full ({self.max_sessions}); using a one-off session")
+            return pooled
+
+    async def _release(self, pooled: PooledSession):
+        pooled.in_use -= 1
+        pooled.last_used = time.monotonic()
+        if self._sessions.get(pooled.key) is not pooled and pooled.in_use == 0:
+            await pooled.close()
+
+    async def _discard(self, pooled: PooledSession):
+        if self._sessions.get(pooled.key) is pooled:
+            del self._sessions[pooled.key]
+        pooled.in_use -= 1
+        await pooled.close()
+
+    async def _run(self, transport: str, server_config: Dict[str, Any], operation: str, call, timeout: Optional[float], retry: bool):
+        for attempt in range(2 if retry else 1):
+            pooled = await self._acquire(transport, server_config)
+            try:
+                result = await asyncio.wait_for(call(pooled.session), timeout)
+            except (asyncio.TimeoutError, McpError):
+                # The server answered (or may still be working); the connection is fine
+                await self._release(pooled)
+                raise
+            except Exception as e:
+                await self._discard(pooled)
+                if attempt or not retry:
+                    raise
+                logger.warning(f"MCP {operation} failed on a pooled {transport} session, reconnecting: {e}")
+                continue
+            await self._release(pooled)
+            return result
+
+    async def call_tool(self, transport: str, server_config: Dict[str, Any], tool_name: str, arguments: Dict[str, Any], timeout: Optional[float] = 30) -> Any:
+        """Call a tool on an MCP server through a pooled session.
+
+        A broken session is discarded but the call is not retried: the request
+        may have reached the server, and tools can have side effects.
+        """
+        return await self._run(
+            transport, server_config, f"call_tool {tool_name}",
+            lambda session: session.call_tool(tool_name, arguments), timeout, retry=False
+        )
+
+    async def list_tools(self, transport: str, server_config: Dict[str, Any], timeout: Optional[float] = 30) -> List[Any]:
+        """List the tools of an MCP server through a pooled session."""
+        result = await self._run(transport, server_config, "list_tools", lambda session: session.list_tools(), timeout, retry=True)
+        return result.tools if hasattr(result, 'tools') else result
+
+    async def close_all(self):
+        """Close every pooled session."""
+        sessions, self._sessions = list(self._sessions.values()), {}
+        for pooled in sessions:
+            await pooled.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "in_use": sum(1 for pooled in self._sessions.values() if pooled.in_use),
+            "max_sessions": self.max_sessions,
+        }
+
+
+mcp_session_pool = MCPSessionPool()
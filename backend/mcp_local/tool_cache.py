@@ -0,0 +1,111 @@
+"""
+Redis cache of discovered MCP tool schemas.
+
+Tools are cached per server, keyed by the server name plus a hash of its
+transport and config, so runs of an agent start from cached schemas without
+connecting to any server. Entries older than MCP_TOOL_CACHE_REFRESH seconds are
+still served, and refreshed in the background; a server is only contacted
+before the run starts when nothing is cached for it yet.
+
+Stdio servers are never refreshed in the background: their sessions belong to
+a run, which may end before the refresh does and may never call the server.
+Their entries are served until they expire and are then discovered again.
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from mcp_local.session_pool import server_key
+from services import redis
+from utils.config import config
+from utils.logger import logger
+
+CACHE_KEY_PREFIX = "mcp_tools"
+
+
+@dataclass
+class CachedTool:
+    """Tool schema with the attributes of mcp.types.Tool that callers read."""
+    name: str
+    description: Optional[str] = None
+    inputSchema: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_tool(cls, tool: Any) -> "CachedTool":
+        return cls(name=tool.name, description=tool.description, inputSchema=tool.inputSchema)
+
+
+class MCPToolCache:
+    """Stores the tool list of each MCP server in Redis."""
+
+    def __init__(self, prefix: str = CACHE_KEY_PREFIX):
+        self.prefix = prefix
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def make_key(self, server_name: str, transport: str, server_config: Dict[str, Any]) -> str:
+        """Build the cache key of a server."""
+        return f"{self.prefix}:{server_name}:{server_key(transport, server_config)}"
+
+    async def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            cached = await redis.get(key)
+            if cached is None:
+                return None
+            entry = json.loads(cached)
+            # A corrupt or old-format entry is a miss, not a discovery failure
+            return {"fetched_at": entry.get("fetched_at", 0), "tools": [CachedTool(**tool) for tool in entry["tools"]]}
+        except Exception as e:
+            logger.warning(f"MCP tool cache lookup failed for {key}: {str(e)}")
+            return None
+
+    async def _discover(self, key: str, discover: Callable[[], Awaitable[List[Any]]]) -> List[CachedTool]:
+        async with asyncio.timeout(config.MCP_DISCOVERY_TIMEOUT):
+            tools = [CachedTool.from_tool(tool) for tool in await discover()]
+        try:
+            entry = {"fetched_at": time.time(), "tools": [asdict(tool) for tool in tools]}
+            await redis.set(key, json.dumps(entry, default=str), ex=config.MCP_TOOL_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Failed to cache MCP tools for {key}: {str(e)}")
+        return tools
+
+    async def _refresh(self, key: str, discover: Callable[[], Awaitable[List[Any]]]):
+        try:
+            # One refresh per key across workers; the lock expires on its own
+            if not await redis.set(f"{key}:refresh", "1", nx=True, ex=config.MCP_TOOL_CACHE_REFRESH):
+                return
+            await self._discover(key, discover)
+            logger.info(f"Refreshed cached MCP tools for {key}")
+        except Exception as e:
+            logger.warning(f"Background refresh of MCP tools failed for {key}: {str(e)}")
+        finally:
+            self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key: str, discover: Callable[[], Awaitable[List[Any]]]):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, discover))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def get_tools(self, server_name: str, transport: str, server_config: Dict[str, Any], discover: Callable[[], Awaitable[List[Any]]]) -> List[CachedTool]:
+        """Return the tools of a server, calling discover only on a cache miss.
+
+        discover returns the server's tools as mcp.types.Tool-like objects. Stale
+        entries are returned as is and refreshed in the background.
+        """
+        key = self.make_key(server_name, transport, server_config)
+        entry = await self._read(key)
+        if entry is None:
+            return await self._discover(key, discover)
+
+        if transport != "stdio" and time.time() - entry["fetched_at"] > config.MCP_TOOL_CACHE_REFRESH:
+            self._schedule_refresh(key, discover)
+        return entry["tools"]
+
+
+mcp_tool_cache = MCPToolCache()
@@ -14,11 +14,12 @@ import dramatiq
 import uuid
 from agentpress.thread_manager import ThreadManager
 from services.supabase import DBConnection
-from services import redis
+from services import redis, response_stream
 from dramatiq.brokers.rabbitmq import RabbitmqBroker
 import os
 from services.langfuse import langfuse
 from utils.retry import retry
+from utils.config import config
 from workflows.executor import WorkflowExecutor
 from workflows.deterministic_executor import DeterministicWorkflowExecutor
 from workflows.models import WorkflowDefinition
@@ -126,8 +127,8 @@ async def run_agent_background(
     stop_signal_received = False
 
     # Define Redis keys and channels
-    response_list_key = f"agent_run:{agent_run_id}:responses"
-    response_channel = f"agent_run:{agent_run_id}:new_response"
+    stream_key = response_stream.agent_run_stream_key(agent_run_id)
+    writer = _create_stream_writer(stream_key)
     instance_control_channel = f"agent_run:{agent_run_id}:control:{instance_id}"
     global_control_channel = f"agent_run:{agent_run_id}:control"
     instance_active_key = f"active_run:{instance_id}:{agent_run_id}"
@@ -188,8 +189,6 @@ async def run_agent_background(
         final_status = "running"
         error_message = None
 
-        pending_redis_operations = []
-
         async for response in agent_gen:
             if stop_signal_received:
                 logger.info(f"Agent run {agent_run_id} stopped by signal.")
@@ -197,10 +196,8 @@ async def run_agent_background(
                 trace.span(name="agent_run_stopped").end(status_message="agent_run_stopped", level="WARNING")
                 break
 
-            # Store response in Redis list and publish notification
-            response_json = json.dumps(response)
-            pending_redis_operations.append(asyncio.create_task(redis.rpush(response_list_key, response_json)))
-            pending_redis_operations.append(asyncio.create_task(redis.publish(response_channel, "new")))
+            # Queue response for the next pipelined batch written to the Redis stream
+            await writer.write(response)
             total_responses += 1
 
             # Check for agent-signaled completion or error
@@ -220,24 +217,22 @@ async def run_agent_background(
              logger.info(f"Agent run {agent_run_id} completed normally (duration: {duration:.2f}s, responses: {total_responses})")
              completion_message = {"type": "status", "status": "completed", "message": "Agent run completed successfully"}
              trace.span(name="agent_run_completed").end(status_message="agent_run_completed")
-             await redis.rpush(response_list_key, json.dumps(completion_message))
-             await redis.publish(response_channel, "new") # Notify about the completion message
+             await writer.write(completion_message)
 
         # Fetch final responses from Redis for DB update
-        all_responses_json = await redis.lrange(response_list_key, 0, -1)
-        all_responses = [json.loads(r) for r in all_responses_json]
+        await writer.flush()
+        all_responses = await response_stream.read_all(stream_key)
 
         # Update DB status
         await update_agent_run_status(client, agent_run_id, final_status, error=error_message, responses=all_responses)
 
-        # Publish final control signal (END_STREAM or ERROR)
+        # Append final control signal (END_STREAM, ERROR or STOP) to end the stream for readers
         control_signal = "END_STREAM" if final_status == "completed" else "ERROR" if final_status == "failed" else "STOP"
         try:
-            await redis.publish(global_control_channel, control_signal)
-            # No need to publish to instance channel as the run is ending on this instance
-            logger.debug(f"Published final control signal '{control_signal}' to {global_control_channel}")
+            await response_stream.append_control(stream_key, control_signal)
+            logger.debug(f"Appended final control signal '{control_signal}' to {stream_key}")
         except Exception as e:
-            logger.warning(f"Failed to publish final control signal {control_signal}: {str(e)}")
+            logger.warning(f"Failed to append final control signal {control_signal}: {str(e)}")
 
     except Exception as e:
         error_message = str(e)
@@ -247,19 +242,18 @@ async def run_agent_background(
         final_status = "failed"
         trace.span(name="agent_run_failed").end(status_message=error_message, level="ERROR")
 
-        # Push error message to Redis list
+        # Append error message to the Redis stream
         error_response = {"type": "status", "status": "error", "message": error_message}
         try:
-            await redis.rpush(response_list_key, json.dumps(error_response))
-            await redis.publish(response_channel, "new")
+            await writer.write(error_response)
+            await writer.flush()
         except Exception as redis_err:
              logger.error(f"Failed to push error response to Redis for {agent_run_id}: {redis_err}")
 
         # Fetch final responses (including the error)
         all_responses = []
         try:
-             all_responses_json = await redis.lrange(response_list_key, 0, -1)
-             all_responses = [json.loads(r) for r in all_responses_json]
+             all_responses = await response_stream.read_all(stream_key)
         except Exception as fetch_err:
              logger.error(f"Failed to fetch responses from Redis after error for {agent_run_id}: {fetch_err}")
              all_responses = [error_response] # Use the error message we tried to push
@@ -267,12 +261,12 @@ async def run_agent_background(
         # Update DB status
         await update_agent_run_status(client, agent_run_id, "failed", error=f"{error_message}\n{traceback_str}", responses=all_responses)
 
-        # Publish ERROR signal
+        # Append ERROR signal
         try:
-            await redis.publish(global_control_channel, "ERROR")
-            logger.debug(f"Published ERROR signal to {global_control_channel}")
+            await response_stream.append_control(stream_key, "ERROR")
+            logger.debug(f"Appended ERROR signal to {stream_key}")
         except Exception as e:
-            logger.warning(f"Failed to publish ERROR signal: {str(e)}")
+            logger.warning(f"Failed to append ERROR signal: {str(e)}")
 
     finally:
         # Cleanup stop checker task
@@ -291,8 +285,9 @@ async def run_agent_background(
             except Exception as e:
                 logger.warning(f"Error closing pubsub for {agent_run_id}: {str(e)}")
 
-        # Set TTL on the response list in Redis
-        await _cleanup_redis_response_list(agent_run_id)
+        # Write any responses still queued, then set TTL on the response stream in Redis
+        await writer.close()
+        await response_stream.expire(stream_key)
 
         # Remove the instance-specific active run key
         await _cleanup_redis_instance_key(agent_run_id)
@@ -300,14 +295,16 @@ async def run_agent_background(
         # Clean up the run lock
         await _cleanup_redis_run_lock(agent_run_id)
 
-        # Wait for all pending redis operations to complete, with timeout
-        try:
-            await asyncio.wait_for(asyncio.gather(*pending_redis_operations), timeout=30.0)
-        except asyncio.TimeoutError:
-            logger.warning(f"Timeout waiting for pending Redis operations for {agent_run_id}")
-
         logger.info(f"Agent run background task fully completed for: {agent_run_id} (Instance: {instance_id}) with final status: {final_status}")
 
+def _create_stream_writer(stream_key: str) -> response_stream.StreamWriter:
+    """Create the batched response writer of a run from config."""
+    return response_stream.StreamWriter(
+        stream_key,
+        flush_interval=config.RESPONSE_STREAM_FLUSH_MS / 1000,
+        max_batch=config.RESPONSE_STREAM_MAX_BATCH
+    )
+
 async def _cleanup_redis_instance_key(agent_run_id: str):
     """Clean up the instance-specific Redis key for an agent run."""
     if not instance_id:
@@ -331,17 +328,6 @@ async def _cleanup_redis_run_lock(agent_run_id: str):
     except Exception as e:
         logger.warning(f"Failed to clean up Redis run lock key {run_lock_key}: {str(e)}")
 
-# TTL for Redis response lists (24 hours)
-REDIS_RESPONSE_LIST_TTL = 3600 * 24
-
-async def _cleanup_redis_response_list(agent_run_id: str):
-    """Set TTL on the Redis response list."""
-    response_list_key = f"agent_run:{agent_run_id}:responses"
-    try:
-        await redis.expire(response_list_key, REDIS_RESPONSE_LIST_TTL)
-        logger.debug(f"Set TTL ({REDIS_RESPONSE_LIST_TTL}s) on response list: {response_list_key}")
-    except Exception as e:
-        logger.warning(f"Failed to set TTL on response list {response_list_key}: {str(e)}")
 
 async def update_agent_run_status(
     client,
@@ -450,18 +436,17 @@ async def run_workflow_background(
 
     # Define Redis keys and channels - use agent_run pattern if agent_run_id provided for frontend compatibility
     if agent_run_id:
-        response_list_key = f"agent_run:{agent_run_id}:responses"
-        response_channel = f"agent_run:{agent_run_id}:new_response"
+        stream_key = response_stream.agent_run_stream_key(agent_run_id)
         instance_control_channel = f"agent_run:{agent_run_id}:control:{instance_id}"
         global_control_channel = f"agent_run:{agent_run_id}:control"
         instance_active_key = f"active_run:{instance_id}:{agent_run_id}"
     else:
         # Fallback to workflow execution pattern
-        response_list_key = f"workflow_execution:{execution_id}:responses"
-        response_channel = f"workflow_execution:{execution_id}:new_response"
+        stream_key = response_stream.workflow_execution_stream_key(execution_id)
         instance_control_channel = f"workflow_execution:{execution_id}:control:{instance_id}"
         global_control_channel = f"workflow_execution:{execution_id}:control"
         instance_active_key = f"active_workflow:{instance_id}:{execution_id}"
+    writer = _create_stream_writer(stream_key)
 
     async def check_for_stop_signal():
         nonlocal stop_signal_received
@@ -510,7 +495,6 @@ async def run_workflow_background(
 
         final_status = "running"
         error_message = None
-        pending_redis_operations = []
 
         if deterministic:
             executor = deterministic_executor
@@ -530,9 +514,7 @@ async def run_workflow_background(
                 final_status = "stopped"
                 break
 
-            response_json = json.dumps(response)
-            pending_redis_operations.append(asyncio.create_task(redis.rpush(response_list_key, response_json)))
-            pending_redis_operations.append(asyncio.create_task(redis.publish(response_channel, "new")))
+            await writer.write(response)
             total_responses += 1
 
             if response.get('type') == 'workflow_status':
@@ -549,17 +531,17 @@ async def run_workflow_background(
             duration = (datetime.now(timezone.utc) - start_time).total_seconds()
             logger.info(f"Workflow execution {execution_id} completed normally (duration: {duration:.2f}s, responses: {total_responses})")
             completion_message = {"type": "workflow_status", "status": "completed", "message": "Workflow execution completed successfully"}
-            await redis.rpush(response_list_key, json.dumps(completion_message))
-            await redis.publish(response_channel, "new")
+            await writer.write(completion_message)
 
         await update_workflow_execution_status(client, execution_id, final_status, error=error_message, agent_run_id=agent_run_id)
 
         control_signal = "END_STREAM" if final_status == "completed" else "ERROR" if final_status == "failed" else "STOP"
         try:
-            await redis.publish(global_control_channel, control_signal)
-            logger.debug(f"Published final control signal '{control_signal}' to {global_control_channel}")
+            await writer.flush()
+            await response_stream.append_control(stream_key, control_signal)
+            logger.debug(f"Appended final control signal '{control_signal}' to {stream_key}")
         except Exception as e:
-            logger.warning(f"Failed to publish final control signal {control_signal}: {str(e)}")
+            logger.warning(f"Failed to append final control signal {control_signal}: {str(e)}")
 
     except Exception as e:
         error_message = str(e)
@@ -570,17 +552,17 @@ async def run_workflow_background(
 
         error_response = {"type": "workflow_status", "status": "error", "message": error_message}
         try:
-            await redis.rpush(response_list_key, json.dumps(error_response))
-            await redis.publish(response_channel, "new")
+            await writer.write(error_response)
+            await writer.flush()
         except Exception as redis_err:
             logger.error(f"Failed to push error response to Redis for {execution_id}: {redis_err}")
 
         await update_workflow_execution_status(client, execution_id, "failed", error=f"{error_message}\n{traceback_str}", agent_run_id=agent_run_id)
         try:
-            await redis.publish(global_control_channel, "ERROR")
-            logger.debug(f"Published ERROR signal to {global_control_channel}")
+            await response_stream.append_control(stream_key, "ERROR")
+            logger.debug(f"Appended ERROR signal to {stream_key}")
         except Exception as e:
-            logger.warning(f"Failed to publish ERROR signal: {str(e)}")
+            logger.warning(f"Failed to append ERROR signal: {str(e)}")
 
     finally:
         if stop_checker and not stop_checker.done():
@@ -597,15 +579,11 @@ async def run_workflow_background(
             except Exception as e:
                 logger.warning(f"Error closing pubsub for {execution_id}: {str(e)}")
 
-        await _cleanup_redis_response_list(agent_run_id)
+        await writer.close()
+        await response_stream.expire(stream_key)
         await _cleanup_redis_instance_key(agent_run_id)
         await _cleanup_redis_run_lock(agent_run_id)
 
-        try:
-            await asyncio.wait_for(asyncio.gather(*pending_redis_operations), timeout=30.0)
-        except asyncio.TimeoutError:
-            logger.warning(f"Timeout waiting for pending Redis operations for {execution_id}")
-
         logger.info(f"Workflow execution background task fully completed for: {execution_id} (Instance: {instance_id}) with final status: {final_status}")
 
 
@@ -1,12 +1,15 @@
 import os
+import re
 import urllib.parse
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, APIRouter, Form, Depends, Request
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 
-from sandbox.sandbox import get_or_start_sandbox, delete_sandbox
+from sandbox.sandbox import delete_sandbox
+from sandbox.registry import sandbox_registry
+from sandbox.workspace import READ_CHUNK_BYTES, read_file_range, upload_files
 from utils.logger import logger
 from utils.auth_utils import get_optional_user_id
 from services.supabase import DBConnection
@@ -114,7 +117,7 @@ async def get_sandbox_by_id_safely(client, sandbox_id: str):
         sandbox_id: The sandbox ID to retrieve
     
     Returns:
-        Sandbox: The sandbox object
+        AsyncSandbox: The sandbox object
         
     Raises:
         HTTPException: If the sandbox doesn't exist or can't be retrieved
@@ -131,7 +134,7 @@ async def get_sandbox_by_id_safely(client, sandbox_id: str):
     
     try:
         # Get the sandbox
-        sandbox = await get_or_start_sandbox(sandbox_id)
+        sandbox = await sandbox_registry.get_sandbox(sandbox_id)
         # Extract just the sandbox object from the tuple (sandbox, sandbox_id, sandbox_pass)
         # sandbox = sandbox_tuple[0]
             
@@ -166,7 +169,7 @@ async def create_file(
         content = await file.read()
         
         # Create file using raw binary content
-        sandbox.fs.upload_file(content, path)
+        await sandbox.fs.upload_file(content, path)
         logger.info(f"File created at {path} in sandbox {sandbox_id}")
         
         return {"status": "success", "created": True, "path": path}
@@ -174,6 +177,40 @@ async def create_file(
         logger.error(f"Error creating file in sandbox {sandbox_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/sandboxes/{sandbox_id}/files/batch")
+async def create_files(
+    sandbox_id: str,
+    paths: List[str] = Form(...),
+    files: List[UploadFile] = File(...),
+    request: Request = None,
+    user_id: Optional[str] = Depends(get_optional_user_id)
+):
+    """Create several files in the sandbox at once; paths[i] is the target path of files[i]"""
+    if len(paths) != len(files):
+        raise HTTPException(status_code=400, detail="Expected one path per uploaded file")
+    paths = [normalize_path(path) for path in paths]
+
+    logger.info(f"Received batch upload request for sandbox {sandbox_id}, {len(files)} files, user_id: {user_id}")
+    client = await db.client
+
+    # Verify the user has access to this sandbox
+    await verify_sandbox_access(client, sandbox_id, user_id)
+
+    try:
+        sandbox = await get_sandbox_by_id_safely(client, sandbox_id)
+
+        # Uploaded files are spooled by the server; they are packed into archives from disk
+        uploaded, failed = await upload_files(sandbox, [(path, file.file) for path, file in zip(paths, files)])
+        logger.info(f"Uploaded {len(uploaded)} of {len(paths)} files to sandbox {sandbox_id}")
+
+        return {"status": "success" if not failed else "partial", "created": uploaded, "failed": failed}
+    except Exception as e:
+        logger.error(f"Error creating files in sandbox {sandbox_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for file in files:
+            await file.close()
+
 @router.get("/sandboxes/{sandbox_id}/files")
 async def list_files(
     sandbox_id: str, 
@@ -196,7 +233,7 @@ async def list_files(
         sandbox = await get_sandbox_by_id_safely(client, sandbox_id)
         
         # List files
-        files = sandbox.fs.list_files(path)
+        files = await sandbox.fs.list_files(path)
         result = []
         
         for file in files:
@@ -246,7 +283,7 @@ async def read_file(
         
         # Read file directly - don't check existence first with a separate call
         try:
-            content = sandbox.fs.download_file(path)
+            content = await sandbox.fs.download_file(path)
         except Exception as download_err:
             logger.error(f"Error downloading file {path} from sandbox {sandbox_id}: {str(download_err)}")
             raise HTTPException(
@@ -275,6 +312,80 @@ async def read_file(
         logger.error(f"Error reading file in sandbox {sandbox_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def parse_range_header(range_header: str, size: int) -> tuple[int, int]:
+    """Parse a single-range 'bytes=start-end' header into inclusive offsets; raises 416 if unsatisfiable"""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or match.groups() == ("", ""):
+        raise HTTPException(status_code=416, detail="Invalid range", headers={"Content-Range": f"bytes */{size}"})
+    start, end = match.groups()
+    if start == "":
+        # Suffix range: the last N bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+@router.get("/sandboxes/{sandbox_id}/files/download")
+async def download_file(
+    sandbox_id: str,
+    path: str,
+    request: Request,
+    user_id: Optional[str] = Depends(get_optional_user_id)
+):
+    """Stream a file from the sandbox, honouring a single HTTP Range"""
+    path = normalize_path(path)
+
+    logger.info(f"Received file download request for sandbox {sandbox_id}, path: {path}, user_id: {user_id}")
+    client = await db.client
+
+    # Verify the user has access to this sandbox
+    await verify_sandbox_access(client, sandbox_id, user_id)
+
+    sandbox = await get_sandbox_by_id_safely(client, sandbox_id)
+    try:
+        file_info = await sandbox.fs.get_file_info(path)
+    except Exception as e:
+        logger.error(f"Error getting file info of {path} in sandbox {sandbox_id}: {str(e)}")
+        raise HTTPException(status_code=404, detail=f"File not found: {str(e)}")
+    if file_info.is_dir:
+        raise HTTPException(status_code=400, detail="Path is a directory")
+
+    size = file_info.size
+    range_header = request.headers.get("range")
+    if range_header:
+        start, end = parse_range_header(range_header, size)
+    else:
+        start, end = 0, size - 1
+
+    async def content():
+        if start == 0 and end == size - 1 and size <= READ_CHUNK_BYTES:
+            yield await sandbox.fs.download_file(path)
+            return
+        offset = start
+        while offset <= end:
+            length = min(READ_CHUNK_BYTES, end - offset + 1)
+            yield await read_file_range(sandbox, path, offset, length)
+            offset += length
+
+    filename = os.path.basename(path)
+    encoded_filename = urllib.parse.quote(filename)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(max(end - start + 1, 0)),
+        "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
+    }
+    if range_header:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    return StreamingResponse(
+        content() if size else iter([b""]),
+        status_code=206 if range_header else 200,
+        media_type="application/octet-stream",
+        headers=headers
+    )
+
 @router.delete("/sandboxes/{sandbox_id}/files")
 async def delete_file(
     sandbox_id: str, 
@@ -297,7 +408,7 @@ async def delete_file(
         sandbox = await get_sandbox_by_id_safely(client, sandbox_id)
         
         # Delete file
-        sandbox.fs.delete_file(path)
+        await sandbox.fs.delete_file(path)
         logger.info(f"File deleted at {path} in sandbox {sandbox_id}")
         
         return {"status": "success", "deleted": True, "path": path}
@@ -376,7 +487,7 @@ async def ensure_project_sandbox_active(
         
         # Get or start the sandbox
         logger.info(f"Ensuring sandbox is active for project {project_id}")
-        sandbox = await get_or_start_sandbox(sandbox_id)
+        sandbox = await sandbox_registry.get_sandbox(sandbox_id, refresh=True)
         
         logger.info(f"Successfully ensured sandbox {sandbox_id} is active for project {project_id}")
         
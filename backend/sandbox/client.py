@@ -0,0 +1,247 @@
+"""
+Async client layer over the synchronous Daytona SDK.
+
+Every Daytona call blocks on HTTP, so calling it from async code stalls the
+event loop of the API or worker process for every run it serves. This module
+runs those calls on a bounded thread pool instead, limits how many operations
+may be in flight per sandbox, applies a timeout per operation category and
+records a latency histogram per operation.
+
+Sandbox tools and endpoints use AsyncSandbox, which mirrors the parts of the
+SDK's Sandbox, FileSystem and Process APIs the backend needs as coroutines.
+"""
+
+import asyncio
+import bisect
+import functools
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from daytona_sdk import Sandbox
+from utils.config import config
+from utils.logger import logger
+
+# Default timeout in seconds per operation category. A call that passes its own
+# SDK timeout gets that plus TIMEOUT_MARGIN instead.
+OPERATION_TIMEOUTS = {
+    "fs": 120.0,
+    "process": 300.0,
+    "lifecycle": 300.0,
+    "preview": 30.0,
+}
+TIMEOUT_MARGIN = 30.0
+
+# Upper bounds (ms) of the latency histogram buckets; slower calls land in +Inf
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# Number of per-sandbox semaphores kept before the least recently used are dropped
+MAX_TRACKED_SANDBOXES = 4096
+
+sandbox_executor = ThreadPoolExecutor(
+    max_workers=config.SANDBOX_MAX_WORKERS,
+    thread_name_prefix="sandbox",
+)
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with error and timeout counters for one operation."""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.errors = 0
+        self.timeouts = 0
+
+    def observe(self, elapsed_ms: float, error: bool = False, timeout: bool = False):
+        self.counts[bisect.bisect_left(self.buckets_ms, elapsed_ms)] += 1
+        self.total += 1
+        self.sum_ms += elapsed_ms
+        if error:
+            self.errors += 1
+        if timeout:
+            self.timeouts += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound (ms) of the bucket holding the q-quantile; None when empty or in +Inf."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(self.buckets_ms, self.counts):
+            seen += count
+            if seen >= rank:
+                return float(bound)
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.total,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "avg_ms": round(self.sum_ms / self.total, 2) if self.total else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "buckets": {
+                **{str(bound): count for bound, count in zip(self.buckets_ms, self.counts)},
+                "+Inf": self.counts[-1],
+            },
+        }
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_semaphores: "OrderedDict[str, asyncio.Semaphore]" = OrderedDict()
+_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_latency_stats() -> Dict[str, Dict[str, Any]]:
+    """Latency histogram snapshots keyed by operation name."""
+    return {operation: histogram.snapshot() for operation, histogram in sorted(_histograms.items())}
+
+
+def _sandbox_semaphore(sandbox_id: str) -> asyncio.Semaphore:
+    global _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if loop is not _semaphore_loop:
+        # Semaphores bind to the loop they are first awaited on
+        _semaphores.clear()
+        _semaphore_loop = loop
+
+    semaphore = _semaphores.get(sandbox_id)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(config.SANDBOX_MAX_CONCURRENT_OPS)
+        _semaphores[sandbox_id] = semaphore
+        while len(_semaphores) > MAX_TRACKED_SANDBOXES:
+            _semaphores.popitem(last=False)
+    else:
+        _semaphores.move_to_end(sandbox_id)
+    return semaphore
+
+
+def _timeout_for(operation: str, kwargs: Dict[str, Any]) -> float:
+    sdk_timeout = kwargs.get("timeout")
+    if sdk_timeout:
+        return float(sdk_timeout) + TIMEOUT_MARGIN
+    return OPERATION_TIMEOUTS[operation.split(".", 1)[0]]
+
+
+async def run_sandbox_call(sandbox_id: Optional[str], operation: str, func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking Daytona call on the sandbox executor.
+
+    Calls for the same sandbox wait for one of SANDBOX_MAX_CONCURRENT_OPS slots;
+    sandbox_id may be None for calls not tied to an existing sandbox (create).
+    The operation name ("fs.upload_file", "lifecycle.start", ...) selects the
+    timeout category and the latency histogram. Raises TimeoutError when the call
+    does not finish in time; the worker thread itself cannot be interrupted and
+    finishes in the background.
+    """
+    timeout = _timeout_for(operation, kwargs)
+    histogram = _histograms.setdefault(operation, LatencyHistogram())
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+
+    async def _run():
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(loop.run_in_executor(sandbox_executor, call), timeout)
+        except asyncio.TimeoutError:
+            histogram.observe((time.monotonic() - start) * 1000, error=True, timeout=True)
+            logger.warning(f"Sandbox operation {operation} on {sandbox_id} timed out after {timeout}s")
+            raise TimeoutError(f"Sandbox operation {operation} timed out after {timeout}s")
+        except Exception:
+            histogram.observe((time.monotonic() - start) * 1000, error=True)
+            raise
+        histogram.observe((time.monotonic() - start) * 1000)
+        return result
+
+    if sandbox_id is None:
+        return await _run()
+    async with _sandbox_semaphore(sandbox_id):
+        return await _run()
+
+
+class AsyncFileSystem:
+    """Coroutine versions of the Daytona FileSystem methods used by the backend."""
+
+    def __init__(self, sandbox: Sandbox):
+        self._sandbox = sandbox
+
+    def _call(self, name: str, *args, **kwargs):
+        return run_sandbox_call(self._sandbox.id, f"fs.{name}", getattr(self._sandbox.fs, name), *args, **kwargs)
+
+    async def upload_file(self, src, dst: str, **kwargs) -> None:
+        return await self._call("upload_file", src, dst, **kwargs)
+
+    async def download_file(self, path: str) -> bytes:
+        return await self._call("download_file", path)
+
+    async def list_files(self, path: str) -> List[Any]:
+        return await self._call("list_files", path)
+
+    async def get_file_info(self, path: str) -> Any:
+        return await self._call("get_file_info", path)
+
+    async def create_folder(self, path: str, mode: str) -> None:
+        return await self._call("create_folder", path, mode)
+
+    async def delete_file(self, path: str) -> None:
+        return await self._call("delete_file", path)
+
+    async def set_file_permissions(self, path: str, mode: str = None, owner: str = None, group: str = None) -> None:
+        return await self._call("set_file_permissions", path, mode=mode, owner=owner, group=group)
+
+
+class AsyncProcess:
+    """Coroutine versions of the Daytona Process methods used by the backend."""
+
+    def __init__(self, sandbox: Sandbox):
+        self._sandbox = sandbox
+
+    def _call(self, name: str, *args, **kwargs):
+        return run_sandbox_call(self._sandbox.id, f"process.{name}", getattr(self._sandbox.process, name), *args, **kwargs)
+
+    async def exec(self, command: str, **kwargs) -> Any:
+        return await self._call("exec", command, **kwargs)
+
+    async def create_session(self, session_id: str) -> None:
+        return await self._call("create_session", session_id)
+
+    async def delete_session(self, session_id: str) -> None:
+        return await self._call("delete_session", session_id)
+
+    async def execute_session_command(self, session_id: str, req, **kwargs) -> Any:
+        return await self._call("execute_session_command", session_id, req, **kwargs)
+
+    async def get_session_command(self, session_id: str, command_id: str) -> Any:
+        return await self._call("get_session_command", session_id, command_id)
+
+    async def get_session_command_logs(self, session_id: str, command_id: str) -> str:
+        return await self._call("get_session_command_logs", session_id, command_id)
+
+
+class AsyncSandbox:
+    """Async wrapper around a Daytona Sandbox; fs and process calls run off the event loop."""
+
+    def __init__(self, sandbox: Sandbox):
+        self._sandbox = sandbox
+        self.fs = AsyncFileSystem(sandbox)
+        self.process = AsyncProcess(sandbox)
+
+    @property
+    def id(self) -> str:
+        return self._sandbox.id
+
+    @property
+    def state(self):
+        return self._sandbox.state
+
+    @property
+    def raw(self) -> Sandbox:
+        """The wrapped SDK sandbox, for code that needs its synchronous API."""
+        return self._sandbox
+
+    async def get_preview_link(self, port: int) -> Any:
+        return await run_sandbox_call(self._sandbox.id, "preview.get_preview_link", self._sandbox.get_preview_link, port)
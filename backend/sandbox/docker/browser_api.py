@@ -1,5 +1,5 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Body
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from fastapi import FastAPI, APIRouter, HTTPException, Body, Request
+from playwright.async_api import async_playwright, Browser, BrowserContext, CDPSession, Page
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import asyncio
@@ -15,6 +15,256 @@ import traceback
 import pytesseract
 from PIL import Image
 import io
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+
+# OCR runs in worker processes so it never blocks the event loop
+OCR_WORKERS = int(os.getenv("BROWSER_OCR_WORKERS", "2"))
+OCR_CACHE_SIZE = 64
+
+def ocr_image_bytes(image_bytes: bytes) -> str:
+    """Extract text from an encoded image. Runs in an OCR worker process."""
+    image = Image.open(io.BytesIO(image_bytes))
+    return pytesseract.image_to_string(image).strip()
+
+# Screenshots above SCREENSHOT_MAX_BYTES as JPEG are re-encoded as WebP when that is smaller
+SCREENSHOT_QUALITY = 60
+SCREENSHOT_MAX_BYTES = 150 * 1024
+SCREENSHOT_WEBP_QUALITY = 50
+
+# Binary transfer: screenshots are written here and returned by path instead of base64
+SCREENSHOT_TRANSFER_DIR = "/tmp/browser_screenshots"
+SCREENSHOT_TRANSFER_KEEP = 20
+
+# Set per request from the X-Screenshot-Transfer header: "base64" (default) or "file"
+screenshot_transfer: ContextVar[str] = ContextVar("screenshot_transfer", default="base64")
+
+def reencode_screenshot(jpeg_bytes: bytes) -> bytes:
+    """Return the smaller of the JPEG screenshot and its WebP encoding."""
+    with Image.open(io.BytesIO(jpeg_bytes)) as image:
+        buffer = io.BytesIO()
+        image.save(buffer, format="WEBP", quality=SCREENSHOT_WEBP_QUALITY, method=4)
+    webp_bytes = buffer.getvalue()
+    return webp_bytes if len(webp_bytes) < len(jpeg_bytes) else jpeg_bytes
+
+#######################################################
+# In-page interactive element index
+#######################################################
+
+# Installed in every document. A MutationObserver and an IntersectionObserver mark
+# interactive elements dirty when they are added, removed or changed, and
+# capture-phase input, change and focus listeners do the same for value, checked
+# and focus changes, which produce no mutation records. Each collect() only
+# re-describes dirty elements. Layout shifts (e.g. content inserted above) move
+# elements without marking them, so collect() also re-measures the rects of all
+# shown elements, which is cheap next to the style and text pass. Indices are assigned
+# once per element and never reused in a document, so unchanged elements keep their highlight_index.
+ELEMENT_INDEX_JS = """
+(() => {
+    if (window.__sunaIndex) return;
+    const SELECTOR = 'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])';
+    const index = {
+        id: Math.random().toString(36).slice(2),
+        nextIndex: 1,
+        byIndex: new Map(),
+        byElement: new WeakMap(),
+        dirty: new Set(),
+        shown: new Set(),
+        scanned: false,
+    };
+
+    const intersection = new IntersectionObserver(entries => {
+        for (const entry of entries) {
+            const i = index.byElement.get(entry.target);
+            if (i !== undefined) index.dirty.add(i);
+        }
+    }, { threshold: [0, 1] });
+
+    function register(el) {
+        let i = index.byElement.get(el);
+        if (i === undefined) {
+            i = index.nextIndex++;
+            index.byElement.set(el, i);
+            index.byIndex.set(i, el);
+            intersection.observe(el);
+        }
+        index.dirty.add(i);
+    }
+
+    function forget(el, i) {
+        index.byIndex.delete(i);
+        index.byElement.delete(el);
+        index.shown.delete(i);
+        intersection.unobserve(el);
+    }
+
+    function markSubtree(node) {
+        if (node.nodeType !== Node.ELEMENT_NODE) return;
+        if (node.matches(SELECTOR)) register(node);
+        for (const el of node.querySelectorAll(SELECTOR)) register(el);
+    }
+
+    function markIndexedSubtree(node) {
+        if (node.nodeType !== Node.ELEMENT_NODE) return;
+        const i = index.byElement.get(node);
+        if (i !== undefined) index.dirty.add(i);
+        for (const el of node.querySelectorAll(SELECTOR)) {
+            const j = index.byElement.get(el);
+            if (j !== undefined) index.dirty.add(j);
+        }
+    }
+
+    function markClosest(node) {
+        const el = node.nodeType === Node.ELEMENT_NODE ? node : node.parentElement;
+        const target = el && el.closest(SELECTOR);
+        if (target) register(target);
+    }
+
+    new MutationObserver(records => {
+        for (const record of records) {
+            if (record.type === 'childList') {
+                record.addedNodes.forEach(markSubtree);
+                record.removedNodes.forEach(markIndexedSubtree);
+                markClosest(record.target);
+            } else if (record.type === 'attributes') {
+                // Class, style or hidden changes can show or hide everything below the target
+                markSubtree(record.target);
+                markIndexedSubtree(record.target);
+            } else {
+                markClosest(record.target);
+            }
+        }
+    }).observe(document, { childList: true, subtree: true, attributes: true, characterData: true });
+
+    function markState(event) {
+        const el = event.target;
+        if (!(el instanceof Element)) return;
+        markClosest(el);
+        // Checking a radio button unchecks the others of its group without events on them
+        if (el.type === 'radio' && el.name) {
+            for (const radio of document.querySelectorAll(`input[type="radio"][name="${CSS.escape(el.name)}"]`)) {
+                const i = index.byElement.get(radio);
+                if (i !== undefined) index.dirty.add(i);
+            }
+        }
+    }
+    for (const type of ['input', 'change', 'focusin', 'focusout']) {
+        document.addEventListener(type, markState, true);
+    }
+
+    function getAttributes(el) {
+        const attributes = {};
+        for (const attr of el.attributes) {
+            attributes[attr.name] = attr.value;
+        }
+        // Current state rather than the initial one the attributes hold
+        if (el.matches('input[type="checkbox"], input[type="radio"]')) {
+            if (el.checked) attributes.checked = '';
+            else delete attributes.checked;
+        }
+        return attributes;
+    }
+
+    function measure(rect) {
+        return {
+            pageCoordinates: {
+                x: rect.left + window.scrollX,
+                y: rect.top + window.scrollY,
+                width: rect.width,
+                height: rect.height
+            },
+            isInViewport: rect.top >= 0 && rect.left >= 0 &&
+                          rect.bottom <= window.innerHeight && rect.right <= window.innerWidth
+        };
+    }
+
+    function describe(el, i) {
+        if (!el.isConnected || !el.matches(SELECTOR)) {
+            forget(el, i);
+            return null;
+        }
+        const style = window.getComputedStyle(el);
+        const rect = el.getBoundingClientRect();
+        if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0' ||
+            rect.width <= 0 || rect.height <= 0) {
+            index.shown.delete(i);
+            return null;
+        }
+        index.shown.add(i);
+        return {
+            index: i,
+            tagName: el.tagName.toLowerCase(),
+            text: el.innerText || el.value || '',
+            attributes: getAttributes(el),
+            isVisible: true,
+            isInteractive: true,
+            ...measure(rect)
+        };
+    }
+
+    index.collect = (full) => {
+        full = full || !index.scanned;
+        if (full) {
+            index.scanned = true;
+            for (const i of index.byIndex.keys()) index.dirty.add(i);
+            for (const el of document.querySelectorAll(SELECTOR)) register(el);
+        }
+        // Clean shown elements only need their rects; one that shrank to nothing is described again
+        const layout = [];
+        for (const i of index.shown) {
+            if (index.dirty.has(i)) continue;
+            const rect = index.byIndex.get(i).getBoundingClientRect();
+            if (rect.width > 0 && rect.height > 0) layout.push({ index: i, ...measure(rect) });
+            else index.dirty.add(i);
+        }
+        const changed = [];
+        const removed = [];
+        for (const i of index.dirty) {
+            const el = index.byIndex.get(i);
+            const description = el ? describe(el, i) : null;
+            if (description) changed.push(description);
+            else removed.push(i);
+        }
+        index.dirty.clear();
+        return { id: index.id, full, changed, removed, layout, scrollX: window.scrollX, scrollY: window.scrollY };
+    };
+
+    index.get = (i) => {
+        const el = index.byIndex.get(i);
+        return el && el.isConnected ? el : null;
+    };
+
+    window.__sunaIndex = index;
+})();
+"""
+
+# Installs the index if the document does not have it yet, then collects changes
+ELEMENT_INDEX_COLLECT_JS = "(full) => { " + ELEMENT_INDEX_JS + " return window.__sunaIndex.collect(full); }"
+
+#######################################################
+# Fast navigation mode
+#######################################################
+
+# Fast mode skips resources that research-style browsing (navigate, read, move on)
+# does not need. Blocking goes through CDP rather than page.route(), because
+# Playwright routing disables the HTTP cache that pages of the context share.
+FAST_MODE_DEFAULT = os.getenv("BROWSER_FAST_MODE", "false").lower() == "true"
+FAST_MODE_BLOCKED_RESOURCE_TYPES = [
+    t.strip() for t in os.getenv("BROWSER_FAST_MODE_RESOURCE_TYPES", "Image,Media,Font").split(",") if t.strip()
+]
+FAST_MODE_BLOCKED_DOMAINS = [
+    d.strip() for d in os.getenv("BROWSER_FAST_MODE_BLOCKED_DOMAINS", ",".join([
+        "doubleclick.net", "googlesyndication.com", "googleadservices.com", "googletagmanager.com",
+        "google-analytics.com", "adservice.google.com", "facebook.net", "amazon-adsystem.com",
+        "adnxs.com", "criteo.com", "taboola.com", "outbrain.com", "scorecardresearch.com",
+        "quantserve.com", "hotjar.com", "segment.com", "segment.io", "mixpanel.com", "nr-data.net",
+    ])).split(",") if d.strip()
+]
+
+# Collects between full rescans, which catch visibility changes no mutation reported (e.g. CSS animations)
+ELEMENT_INDEX_FULL_REFRESH = 20
 
 #######################################################
 # Action model definitions
@@ -33,6 +283,7 @@ class ClickCoordinatesAction(BaseModel):
 
 class GoToUrlAction(BaseModel):
     url: str
+    fast: Optional[bool] = None  # Defaults to BROWSER_FAST_MODE
 
 class InputTextAction(BaseModel):
     index: int
@@ -264,6 +515,8 @@ class BrowserActionResult(BaseModel):
     pixels_below: int = 0
     content: Optional[str] = None
     ocr_text: Optional[str] = None  # Added field for OCR text
+    screenshot_hash: Optional[str] = None  # SHA-256 of the screenshot, for skipping unchanged screenshots
+    screenshot_path: Optional[str] = None  # Set instead of screenshot_base64 for binary transfer
     
     # Additional metadata
     element_count: int = 0  # Number of interactive elements found
@@ -289,6 +542,13 @@ class BrowserAutomation:
         self.include_attributes = ["id", "href", "src", "alt", "aria-label", "placeholder", "name", "role", "title", "value"]
         self.screenshot_dir = os.path.join(os.getcwd(), "screenshots")
         os.makedirs(self.screenshot_dir, exist_ok=True)
+        self.ocr_executor: Optional[ProcessPoolExecutor] = None
+        # Interactive elements of each page as of the last collect, keyed by index
+        self.element_index_cache: Dict[Page, Dict[str, Any]] = {}
+        # CDP sessions of the pages that are in fast mode
+        self.fast_mode_sessions: Dict[Page, CDPSession] = {}
+        # OCR text keyed by screenshot hash, so an unchanged page is never OCR'd twice
+        self.ocr_cache: OrderedDict[str, str] = OrderedDict()
         
         # Register routes
         self.router.on_startup.append(self.startup)
@@ -314,6 +574,7 @@ class BrowserAutomation:
         # Content actions
         self.router.post("/automation/extract_content")(self.extract_content)
         self.router.post("/automation/save_pdf")(self.save_pdf)
+        self.router.post("/automation/get_page_text")(self.get_page_text)
         
         # Scroll actions
         self.router.post("/automation/scroll_down")(self.scroll_down)
@@ -343,6 +604,7 @@ class BrowserAutomation:
             try:
                 self.browser = await playwright.chromium.launch(**launch_options)
                 self.browser_context = await self.browser.new_context(viewport={'width': 1024, 'height': 768})
+                await self.browser_context.add_init_script(ELEMENT_INDEX_JS)
                 print("Browser launched successfully")
             except Exception as browser_error:
                 print(f"Failed to launch browser: {browser_error}")
@@ -351,6 +613,7 @@ class BrowserAutomation:
                 launch_options = {"timeout": 90000}
                 self.browser = await playwright.chromium.launch(**launch_options)
                 self.browser_context = await self.browser.new_context(viewport={'width': 1024, 'height': 768})
+                await self.browser_context.add_init_script(ELEMENT_INDEX_JS)
                 print("Browser launched with minimal options")
 
             try:
@@ -382,6 +645,9 @@ class BrowserAutomation:
             
     async def shutdown(self):
         """Clean up browser instance on shutdown"""
+        if self.ocr_executor:
+            self.ocr_executor.shutdown(wait=False, cancel_futures=True)
+            self.ocr_executor = None
         if self.browser_context:
             await self.browser_context.close()
         if self.browser:
@@ -394,12 +660,79 @@ class BrowserAutomation:
         self.current_page_index = len(self.pages) - 1
         print(f"Page created: {page.url}; current page index: {self.current_page_index}")
     
+    async def set_fast_mode(self, page: Page, enabled: bool):
+        """Turn fast mode on or off for a page; it stays in effect until the next navigate_to changes it"""
+        session = self.fast_mode_sessions.get(page)
+        if enabled and session is None:
+            session = await self.browser_context.new_cdp_session(page)
+            
+            def fail_request(event):
+                asyncio.create_task(session.send("Fetch.failRequest", {
+                    "requestId": event["requestId"],
+                    "errorReason": "BlockedByClient"
+                }))
+            
+            session.on("Fetch.requestPaused", fail_request)
+            await session.send("Network.enable")
+            await session.send("Network.setBlockedURLs", {
+                "urls": [pattern for domain in FAST_MODE_BLOCKED_DOMAINS for pattern in (f"*://{domain}/*", f"*://*.{domain}/*")]
+            })
+            # Only requests of the blocked types are paused, so other requests are not slowed down
+            await session.send("Fetch.enable", {
+                "patterns": [{"resourceType": t, "requestStage": "Request"} for t in FAST_MODE_BLOCKED_RESOURCE_TYPES]
+            })
+            self.fast_mode_sessions[page] = session
+        elif not enabled and session is not None:
+            del self.fast_mode_sessions[page]
+            try:
+                await session.send("Fetch.disable")
+                await session.send("Network.setBlockedURLs", {"urls": []})
+                await session.detach()
+            except Exception as e:
+                print(f"Error disabling fast mode: {e}")
+    
     async def get_current_page(self) -> Page:
         """Get the current active page"""
         if not self.pages:
             raise HTTPException(status_code=500, detail="No browser pages available")
         return self.pages[self.current_page_index]
     
+    async def collect_interactive_elements(self, page: Page) -> List[Dict[str, Any]]:
+        """Get the visible interactive elements of a page, updated incrementally from the in-page index"""
+        cache = self.element_index_cache.get(page)
+        full = cache is None or cache['collects'] >= ELEMENT_INDEX_FULL_REFRESH
+        delta = await page.evaluate(ELEMENT_INDEX_COLLECT_JS, full)
+        
+        # A new document has a new index, which always starts with a full scan
+        if cache is None or delta['full'] or delta['id'] != cache['id']:
+            cache = {'id': delta['id'], 'elements': {}, 'collects': 0}
+            self.element_index_cache[page] = cache
+        for index in delta['removed']:
+            cache['elements'].pop(index, None)
+        for element in delta['changed']:
+            cache['elements'][element['index']] = element
+        for update in delta['layout']:
+            element = cache['elements'].get(update['index'])
+            if element is not None:
+                element['pageCoordinates'] = update['pageCoordinates']
+                element['isInViewport'] = update['isInViewport']
+        cache['collects'] += 1
+        print(f"Element index: {len(delta['changed'])} changed, {len(delta['removed'])} removed (full={delta['full']})")
+        
+        # Viewport coordinates follow from page coordinates and the current scroll position
+        elements = []
+        for index in sorted(cache['elements']):
+            element = dict(cache['elements'][index])
+            coords = element['pageCoordinates']
+            element['viewportCoordinates'] = {
+                'x': coords['x'] - delta['scrollX'],
+                'y': coords['y'] - delta['scrollY'],
+                'width': coords['width'],
+                'height': coords['height']
+            }
+            elements.append(element)
+        return elements
+    
     async def get_selector_map(self) -> Dict[int, DOMElementNode]:
         """Get a map of selectable elements on the page"""
         page = await self.get_current_page()
@@ -408,68 +741,7 @@ class BrowserAutomation:
         selector_map = {}
         
         try:
-            # More comprehensive JavaScript to find interactive elements
-            elements_js = """
-            (() => {
-                // Helper function to get all attributes as an object
-                function getAttributes(el) {
-                    const attributes = {};
-                    for (const attr of el.attributes) {
-                        attributes[attr.name] = attr.value;
-                    }
-                    return attributes;
-                }
-                
-                // Find all potentially interactive elements
-                const interactiveElements = Array.from(document.querySelectorAll(
-                    'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])'
-                ));
-                
-                // Filter for visible elements
-                const visibleElements = interactiveElements.filter(el => {
-                    const style = window.getComputedStyle(el);
-                    const rect = el.getBoundingClientRect();
-                    return style.display !== 'none' && 
-                           style.visibility !== 'hidden' && 
-                           style.opacity !== '0' &&
-                           rect.width > 0 && 
-                           rect.height > 0;
-                });
-                
-                // Map to our expected structure
-                return visibleElements.map((el, index) => {
-                    const rect = el.getBoundingClientRect();
-                    const isInViewport = rect.top >= 0 && 
-                                      rect.left >= 0 && 
-                                      rect.bottom <= window.innerHeight &&
-                                      rect.right <= window.innerWidth;
-                    
-                    return {
-                        index: index + 1,
-                        tagName: el.tagName.toLowerCase(),
-                        text: el.innerText || el.value || '',
-                        attributes: getAttributes(el),
-                        isVisible: true,
-                        isInteractive: true,
-                        pageCoordinates: {
-                            x: rect.left + window.scrollX,
-                            y: rect.top + window.scrollY,
-                            width: rect.width,
-                            height: rect.height
-                        },
-                        viewportCoordinates: {
-                            x: rect.left,
-                            y: rect.top,
-                            width: rect.width,
-                            height: rect.height
-                        },
-                        isInViewport: isInViewport
-                    };
-                });
-            })();
-            """
-            
-            elements = await page.evaluate(elements_js)
+            elements = await self.collect_interactive_elements(page)
             print(f"Found {len(elements)} interactive elements in selector map")
             
             # Create a root element for the tree
@@ -650,12 +922,16 @@ class BrowserAutomation:
             # Take screenshot with increased timeout and better options
             screenshot_bytes = await page.screenshot(
                 type='jpeg',
-                quality=60,
+                quality=SCREENSHOT_QUALITY,
                 full_page=False,
                 timeout=60000,  # Increased timeout to 60s
                 scale='device'  # Use device scale factor
             )
             
+            # Busy pages compress much better as WebP
+            if len(screenshot_bytes) > SCREENSHOT_MAX_BYTES:
+                screenshot_bytes = await asyncio.to_thread(reencode_screenshot, screenshot_bytes)
+            
             return base64.b64encode(screenshot_bytes).decode('utf-8')
         except Exception as e:
             print(f"Error taking screenshot: {e}")
@@ -679,30 +955,51 @@ class BrowserAutomation:
             return ""
     
     async def extract_ocr_text_from_screenshot(self, screenshot_base64: str) -> str:
-        """Extract text from screenshot using OCR"""
+        """Extract text from screenshot using OCR in a worker process"""
         if not screenshot_base64:
             return ""
             
         try:
-            # Decode base64 to image
             image_bytes = base64.b64decode(screenshot_base64)
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Extract text using pytesseract
-            ocr_text = pytesseract.image_to_string(image)
-            
-            # Clean up the text
-            ocr_text = ocr_text.strip()
-            
+            screenshot_hash = hashlib.sha256(image_bytes).hexdigest()
+            if screenshot_hash in self.ocr_cache:
+                self.ocr_cache.move_to_end(screenshot_hash)
+                return self.ocr_cache[screenshot_hash]
+            
+            if self.ocr_executor is None:
+                self.ocr_executor = ProcessPoolExecutor(max_workers=OCR_WORKERS)
+            loop = asyncio.get_running_loop()
+            ocr_text = await loop.run_in_executor(self.ocr_executor, ocr_image_bytes, image_bytes)
+            
+            self.ocr_cache[screenshot_hash] = ocr_text
+            if len(self.ocr_cache) > OCR_CACHE_SIZE:
+                self.ocr_cache.popitem(last=False)
             return ocr_text
         except Exception as e:
             print(f"Error performing OCR: {e}")
             traceback.print_exc()
             return ""
     
-    async def get_updated_browser_state(self, action_name: str) -> tuple:
+    def write_screenshot_file(self, screenshot_bytes: bytes, screenshot_hash: str) -> str:
+        """Write a screenshot for binary transfer and prune old ones, returning its path"""
+        os.makedirs(SCREENSHOT_TRANSFER_DIR, exist_ok=True)
+        extension = "webp" if screenshot_bytes[:4] == b'RIFF' else "jpg"
+        filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{screenshot_hash[:16]}.{extension}"
+        filepath = os.path.join(SCREENSHOT_TRANSFER_DIR, filename)
+        with open(filepath, "wb") as f:
+            f.write(screenshot_bytes)
+        
+        for old_file in sorted(os.listdir(SCREENSHOT_TRANSFER_DIR))[:-SCREENSHOT_TRANSFER_KEEP]:
+            try:
+                os.remove(os.path.join(SCREENSHOT_TRANSFER_DIR, old_file))
+            except OSError:
+                pass
+        return filepath
+    
+    async def get_updated_browser_state(self, action_name: str, include_ocr: bool = False) -> tuple:
         """Helper method to get updated browser state after any action
         Returns a tuple of (dom_state, screenshot, elements, metadata)
+        OCR text is only extracted when include_ocr is set.
         """
         try:
             # Wait a moment for any potential async processes to settle
@@ -760,11 +1057,15 @@ class BrowserAutomation:
                 metadata['viewport_width'] = 0
                 metadata['viewport_height'] = 0
             
-            # Extract OCR text from screenshot if available
-            ocr_text = ""
             if screenshot:
-                ocr_text = await self.extract_ocr_text_from_screenshot(screenshot)
-                metadata['ocr_text'] = ocr_text
+                screenshot_bytes = base64.b64decode(screenshot)
+                metadata['screenshot_hash'] = hashlib.sha256(screenshot_bytes).hexdigest()
+                if screenshot_transfer.get() == "file":
+                    metadata['screenshot_path'] = self.write_screenshot_file(screenshot_bytes, metadata['screenshot_hash'])
+            
+            # Extract OCR text from screenshot if requested
+            if include_ocr and screenshot:
+                metadata['ocr_text'] = await self.extract_ocr_text_from_screenshot(screenshot)
             
             print(f"Got updated state after {action_name}: {len(dom_state.selector_map)} elements")
             return dom_state, screenshot, elements, metadata
@@ -789,11 +1090,14 @@ class BrowserAutomation:
             url=dom_state.url if dom_state else fallback_url or "",
             title=dom_state.title if dom_state else "",
             elements=elements,
-            screenshot_base64=screenshot,
+            # With binary transfer the client reads the screenshot from screenshot_path
+            screenshot_base64=None if metadata.get('screenshot_path') else screenshot,
             pixels_above=dom_state.pixels_above if dom_state else 0,
             pixels_below=dom_state.pixels_below if dom_state else 0,
             content=content,
             ocr_text=metadata.get('ocr_text', ""),
+            screenshot_hash=metadata.get('screenshot_hash'),
+            screenshot_path=metadata.get('screenshot_path'),
             element_count=metadata.get('element_count', 0),
             interactive_elements=metadata.get('interactive_elements', []),
             viewport_width=metadata.get('viewport_width', 0),
@@ -806,6 +1110,7 @@ class BrowserAutomation:
         """Navigate to a specified URL"""
         try:
             page = await self.get_current_page()
+            await self.set_fast_mode(page, FAST_MODE_DEFAULT if action.fast is None else action.fast)
             await page.goto(action.url, wait_until="domcontentloaded")
             await page.wait_for_load_state("networkidle", timeout=10000)
             
@@ -814,7 +1119,7 @@ class BrowserAutomation:
             
             result = self.build_action_result(
                 True,
-                f"Navigated to {action.url}",
+                f"Navigated to {action.url}" + (" (fast mode)" if page in self.fast_mode_sessions else ""),
                 dom_state,
                 screenshot,
                 elements,
@@ -1046,25 +1351,11 @@ class BrowserAutomation:
             element_to_click = selector_map[action.index]
             print(f"Attempting to click element: {element_to_click}")
 
-            # Construct a more reliable selector using JavaScript evaluation
-            # Find the element based on its properties captured in selector_map
+            # Look up the element by its stable index in the in-page element index
             js_selector_script = """
             (targetElementInfo) => {
-                const interactiveElements = Array.from(document.querySelectorAll(
-                    'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])'
-                ));
-                
-                const visibleElements = interactiveElements.filter(el => {
-                    const style = window.getComputedStyle(el);
-                    const rect = el.getBoundingClientRect();
-                    return style.display !== 'none' && style.visibility !== 'hidden' && style.opacity !== '0' && rect.width > 0 && rect.height > 0;
-                });
-
-                if (targetElementInfo.index > 0 && targetElementInfo.index <= visibleElements.length) {
-                    // Return the element at the specified index (1-based)
-                    return visibleElements[targetElementInfo.index - 1];
-                }
-                return null; // Element not found at the expected index
+                // Indices come from the in-page element index, which get_selector_map just refreshed
+                return window.__sunaIndex ? window.__sunaIndex.get(targetElementInfo.index) : null;
             }
             """
             
@@ -1340,6 +1631,8 @@ class BrowserAutomation:
                 url = page.url
                 await page.close()
                 self.pages.pop(action.page_id)
+                self.element_index_cache.pop(page, None)
+                self.fast_mode_sessions.pop(page, None)
                 
                 # Adjust current index if needed
                 if self.current_page_index >= len(self.pages):
@@ -1432,6 +1725,33 @@ class BrowserAutomation:
                 content=None
             )
     
+    async def get_page_text(self, _: NoParamsAction = Body(...)):
+        """Get the text visible on the current page via OCR of a screenshot"""
+        try:
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state("get_page_text", include_ocr=True)
+            
+            return self.build_action_result(
+                True,
+                "Extracted page text from screenshot",
+                dom_state,
+                screenshot,
+                elements,
+                metadata,
+                error="",
+                content=None
+            )
+        except Exception as e:
+            return self.build_action_result(
+                False,
+                str(e),
+                None,
+                "",
+                "",
+                {},
+                error=str(e),
+                content=None
+            )
+    
     async def save_pdf(self):
         """Save the current page as a PDF"""
         try:
@@ -1844,6 +2164,15 @@ automation_service = BrowserAutomation()
 # Create API app
 api_app = FastAPI()
 
+@api_app.middleware("http")
+async def screenshot_transfer_mode(request: Request, call_next):
+    """Let clients choose how screenshots are returned via the X-Screenshot-Transfer header"""
+    token = screenshot_transfer.set(request.headers.get("X-Screenshot-Transfer", "base64"))
+    try:
+        return await call_next(request)
+    finally:
+        screenshot_transfer.reset(token)
+
 @api_app.get("/api")
 async def health_check():
     return {"status": "ok", "message": "API server is running"}
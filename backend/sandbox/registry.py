@@ -0,0 +1,143 @@
+"""
+Process-wide registry of sandbox handles.
+
+Sandbox tools, the sandbox file endpoints and run_agent all need the sandbox
+of a project. Without a shared cache every tool instance looked up the project
+row and called daytona.get on its own, for every run. The registry keeps:
+
+- the sandbox info ({'id', 'pass', ...}) of each project, which does not change
+  after the project is created, for PROJECT_INFO_TTL seconds
+- an AsyncSandbox handle per sandbox, trusted for config.SANDBOX_STATE_TTL
+  seconds; after that the next lookup goes through get_or_start_sandbox again,
+  which re-reads the state and restarts the sandbox if Daytona stopped or
+  archived it in the meantime
+
+Concurrent lookups of the same sandbox share one Daytona round trip.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sandbox.client import AsyncSandbox
+from sandbox.sandbox import get_or_start_sandbox
+from utils.config import config
+from utils.logger import logger
+
+PROJECT_INFO_TTL = 600
+
+# Entries kept per cache before the least recently used are dropped
+MAX_ENTRIES = 1024
+
+
+class SandboxRegistry:
+    def __init__(self, state_ttl: Optional[float] = None, project_ttl: float = PROJECT_INFO_TTL, max_entries: int = MAX_ENTRIES):
+        self.state_ttl = config.SANDBOX_STATE_TTL if state_ttl is None else state_ttl
+        self.project_ttl = project_ttl
+        self.max_entries = max_entries
+        self._projects: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._handles: "OrderedDict[str, Tuple[AsyncSandbox, float]]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._prewarm_tasks: Set[asyncio.Task] = set()
+
+    def _put(self, cache: OrderedDict, key: str, value: Any):
+        cache[key] = (value, time.monotonic())
+        cache.move_to_end(key)
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    def _fresh(self, cache: OrderedDict, key: str, ttl: float) -> Optional[Any]:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if time.monotonic() - stored_at >= ttl:
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return value
+
+    def _lock(self, sandbox_id: str) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Locks bind to the loop they are first contended on
+            self._locks.clear()
+            self._loop = loop
+        lock = self._locks.get(sandbox_id)
+        if lock is None:
+            lock = self._locks[sandbox_id] = asyncio.Lock()
+        return lock
+
+    def remember_project(self, project_id: str, sandbox_info: Dict[str, Any]):
+        """Cache the sandbox info of a project row that was already loaded."""
+        if sandbox_info and sandbox_info.get('id'):
+            self._put(self._projects, project_id, sandbox_info)
+
+    async def get_sandbox_info(self, client, project_id: str) -> Dict[str, Any]:
+        """Sandbox info of a project; raises ValueError if the project or its sandbox is missing."""
+        sandbox_info = self._fresh(self._projects, project_id, self.project_ttl)
+        if sandbox_info is not None:
+            return sandbox_info
+
+        project = await client.table('projects').select('sandbox').eq('project_id', project_id).execute()
+        if not project.data:
+            raise ValueError(f"Project {project_id} not found")
+        sandbox_info = project.data[0].get('sandbox') or {}
+        if not sandbox_info.get('id'):
+            raise ValueError(f"No sandbox found for project {project_id}")
+
+        self.remember_project(project_id, sandbox_info)
+        return sandbox_info
+
+    async def get_sandbox(self, sandbox_id: str, refresh: bool = False) -> AsyncSandbox:
+        """Handle of a running sandbox, starting it if needed once the cached state has expired."""
+        if not refresh:
+            handle = self._fresh(self._handles, sandbox_id, self.state_ttl)
+            if handle is not None:
+                return handle
+
+        lock = self._lock(sandbox_id)
+        try:
+            async with lock:
+                # Another caller may have refreshed the handle while we waited
+                handle = self._fresh(self._handles, sandbox_id, self.state_ttl)
+                if handle is None or refresh:
+                    handle = await get_or_start_sandbox(sandbox_id)
+                    self._put(self._handles, sandbox_id, handle)
+                return handle
+        finally:
+            if not lock.locked() and self._locks.get(sandbox_id) is lock:
+                del self._locks[sandbox_id]
+
+    def prewarm(self, project_id: str, sandbox_info: Dict[str, Any]):
+        """Remember a project's sandbox and start resolving its handle in the background."""
+        self.remember_project(project_id, sandbox_info)
+        sandbox_id = sandbox_info.get('id') if sandbox_info else None
+        if not sandbox_id or self._fresh(self._handles, sandbox_id, self.state_ttl) is not None:
+            return
+
+        async def _warm():
+            try:
+                await self.get_sandbox(sandbox_id)
+            except Exception as e:
+                logger.warning(f"Failed to prewarm sandbox {sandbox_id} for project {project_id}: {e}")
+
+        task = asyncio.create_task(_warm())
+        self._prewarm_tasks.add(task)
+        task.add_done_callback(self._prewarm_tasks.discard)
+
+    def invalidate(self, sandbox_id: Optional[str] = None, project_id: Optional[str] = None):
+        """Drop cached entries, e.g. after a sandbox was stopped, archived or deleted."""
+        if project_id is not None:
+            entry = self._projects.pop(project_id, None)
+            if entry and sandbox_id is None:
+                sandbox_id = entry[0].get('id')
+        if sandbox_id is not None:
+            self._handles.pop(sandbox_id, None)
+            for key in [key for key, (info, _) in self._projects.items() if info.get('id') == sandbox_id]:
+                del self._projects[key]
+
+
+sandbox_registry = SandboxRegistry()
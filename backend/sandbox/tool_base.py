@@ -3,8 +3,8 @@ from typing import Optional
 
 from agentpress.thread_manager import ThreadManager
 from agentpress.tool import Tool
-from daytona_sdk import Sandbox
-from sandbox.sandbox import get_or_start_sandbox
+from sandbox.client import AsyncSandbox
+from sandbox.registry import sandbox_registry
 from utils.logger import logger
 from utils.files_utils import clean_path
 
@@ -23,53 +23,47 @@ class SandboxToolsBase(Tool):
         self._sandbox_id = None
         self._sandbox_pass = None
 
-    async def _ensure_sandbox(self) -> Sandbox:
-        """Ensure we have a valid sandbox instance, retrieving it from the project if needed."""
-        if self._sandbox is None:
-            try:
-                # Get database client
+    async def _ensure_sandbox(self) -> AsyncSandbox:
+        """Ensure we have a valid sandbox instance, retrieving it from the project if needed.
+
+        Lookups go through the process-wide sandbox registry, so tool instances and
+        consecutive runs on the same worker share one handle per sandbox, and a
+        handle is revalidated once its cached state expires.
+        """
+        try:
+            if self._sandbox_id is None:
                 client = await self.thread_manager.db.client
-                
-                # Get project data
-                project = await client.table('projects').select('*').eq('project_id', self.project_id).execute()
-                if not project.data or len(project.data) == 0:
-                    raise ValueError(f"Project {self.project_id} not found")
-                
-                project_data = project.data[0]
-                sandbox_info = project_data.get('sandbox', {})
-                
-                if not sandbox_info.get('id'):
-                    raise ValueError(f"No sandbox found for project {self.project_id}")
-                
+                sandbox_info = await sandbox_registry.get_sandbox_info(client, self.project_id)
+
                 # Store sandbox info
                 self._sandbox_id = sandbox_info['id']
                 self._sandbox_pass = sandbox_info.get('pass')
-                
-                # Get or start the sandbox
-                self._sandbox = await get_or_start_sandbox(self._sandbox_id)
-                
-                # # Log URLs if not already printed
-                # if not SandboxToolsBase._urls_printed:
-                #     vnc_link = self._sandbox.get_preview_link(6080)
-                #     website_link = self._sandbox.get_preview_link(8080)
-                    
-                #     vnc_url = vnc_link.url if hasattr(vnc_link, 'url') else str(vnc_link)
-                #     website_url = website_link.url if hasattr(website_link, 'url') else str(website_link)
-                    
-                #     print("\033[95m***")
-                #     print(f"VNC URL: {vnc_url}")
-                #     print(f"Website URL: {website_url}")
-                #     print("***\033[0m")
-                #     SandboxToolsBase._urls_printed = True
-                
-            except Exception as e:
-                logger.error(f"Error retrieving sandbox for project {self.project_id}: {str(e)}", exc_info=True)
-                raise e
+
+            # Get or start the sandbox
+            self._sandbox = await sandbox_registry.get_sandbox(self._sandbox_id)
+
+            # # Log URLs if not already printed
+            # if not SandboxToolsBase._urls_printed:
+            #     vnc_link = await self._sandbox.get_preview_link(6080)
+            #     website_link = await self._sandbox.get_preview_link(8080)
+
+            #     vnc_url = vnc_link.url if hasattr(vnc_link, 'url') else str(vnc_link)
+            #     website_url = website_link.url if hasattr(website_link, 'url') else str(website_link)
+
+            #     print("\033[95m***")
+            #     print(f"VNC URL: {vnc_url}")
+            #     print(f"Website URL: {website_url}")
+            #     print("***\033[0m")
+            #     SandboxToolsBase._urls_printed = True
+
+        except Exception as e:
+            logger.error(f"Error retrieving sandbox for project {self.project_id}: {str(e)}", exc_info=True)
+            raise e
         
         return self._sandbox
 
     @property
-    def sandbox(self) -> Sandbox:
+    def sandbox(self) -> AsyncSandbox:
         """Get the sandbox instance, ensuring it exists."""
         if self._sandbox is None:
             raise RuntimeError("Sandbox not initialized. Call _ensure_sandbox() first.")
@@ -0,0 +1,220 @@
+"""
+Workspace manifests and bulk file transfers for sandboxes.
+
+A manifest maps each file under a root directory to [size, mtime, sha1]. It is
+computed inside the sandbox by one python3 invocation, which keeps the previous
+manifest in the sandbox and only rehashes files whose size or mtime changed.
+Changed files are then fetched as a single tar archive instead of one download
+per file.
+
+Uploads go the other way: files are packed into tar archives of up to
+UPLOAD_BATCH_BYTES, a few archives are uploaded and extracted concurrently, and
+a single stat over all target paths verifies the result. Large downloads are
+read in ranges so they can be streamed without holding the file in memory.
+"""
+
+import asyncio
+import io
+import json
+import shlex
+import tarfile
+from typing import BinaryIO, Dict, Iterable, List, Tuple, Union
+from uuid import uuid4
+
+from sandbox.client import AsyncSandbox
+from utils.files_utils import EXCLUDED_DIRS
+from utils.logger import logger
+
+# Entry of a manifest: [size, mtime, sha1]
+ManifestEntry = List
+
+MANIFEST_CACHE_PATH = "/tmp/.workspace_manifest.json"
+
+# Content packed into one upload archive, and archives uploaded at once per call
+UPLOAD_BATCH_BYTES = 32 * 1024 * 1024
+UPLOAD_CONCURRENCY = 4
+
+# Bytes fetched per call by read_file_range
+READ_CHUNK_BYTES = 8 * 1024 * 1024
+
+MANIFEST_SCRIPT = r'''
+import hashlib, json, os, stat, sys
+root, cache_path, excluded = sys.argv[1], sys.argv[2], set(json.loads(sys.argv[3]))
+try:
+    with open(cache_path) as f:
+        cache = json.load(f)
+except Exception:
+    cache = {}
+manifest = {}
+for dirpath, dirnames, filenames in os.walk(root):
+    dirnames[:] = [d for d in dirnames if d not in excluded]
+    for name in filenames:
+        path = os.path.join(dirpath, name)
+        rel = os.path.relpath(path, root)
+        try:
+            st = os.stat(path)
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            prev = cache.get(rel)
+            if prev and prev[0] == st.st_size and prev[1] == st.st_mtime:
+                digest = prev[2]
+            else:
+                h = hashlib.sha1()
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        h.update(chunk)
+                digest = h.hexdigest()
+        except OSError:
+            continue
+        manifest[rel] = [st.st_size, st.st_mtime, digest]
+with open(cache_path + ".tmp", "w") as f:
+    json.dump(manifest, f)
+os.replace(cache_path + ".tmp", cache_path)
+json.dump(manifest, sys.stdout)
+'''
+
+
+async def build_manifest(sandbox: AsyncSandbox, root: str) -> Dict[str, ManifestEntry]:
+    """Manifest of the regular files under root, skipping EXCLUDED_DIRS."""
+    command = " ".join([
+        "python3", "-c", shlex.quote(MANIFEST_SCRIPT),
+        shlex.quote(root), shlex.quote(MANIFEST_CACHE_PATH), shlex.quote(json.dumps(sorted(EXCLUDED_DIRS))),
+    ])
+    response = await sandbox.process.exec(f"/bin/sh -c {shlex.quote(command)}", timeout=120)
+    if response.exit_code != 0:
+        raise RuntimeError(f"Failed to build workspace manifest: {response.result}")
+    return json.loads(response.result)
+
+
+def diff_manifests(previous: Dict[str, ManifestEntry], current: Dict[str, ManifestEntry]) -> Tuple[List[str], List[str]]:
+    """Return (changed, removed) paths; changed includes new files."""
+    changed = [path for path, entry in current.items() if path not in previous or previous[path][2] != entry[2]]
+    removed = [path for path in previous if path not in current]
+    return changed, removed
+
+
+async def fetch_files(sandbox: AsyncSandbox, root: str, paths: Iterable[str]) -> Dict[str, bytes]:
+    """Download files under root as one tar archive; returns contents keyed by relative path."""
+    paths = list(paths)
+    if not paths:
+        return {}
+
+    fetch_id = str(uuid4())[:8]
+    list_file = f"/tmp/.workspace_fetch_{fetch_id}.list"
+    archive_file = f"/tmp/.workspace_fetch_{fetch_id}.tar.gz"
+    try:
+        await sandbox.fs.upload_file("\0".join(paths).encode(), list_file)
+        # --ignore-failed-read: files removed since the manifest was built are skipped
+        command = f"tar -czf {archive_file} -C {shlex.quote(root)} --null --ignore-failed-read -T {list_file}"
+        response = await sandbox.process.exec(f"/bin/sh -c {shlex.quote(command)}", timeout=300)
+        if response.exit_code not in (0, 1):
+            raise RuntimeError(f"Failed to archive workspace files: {response.result}")
+        archive = await sandbox.fs.download_file(archive_file)
+    finally:
+        await sandbox.process.exec(f"rm -f {list_file} {archive_file}", timeout=30)
+
+    contents = {}
+    with tarfile.open(fileobj=io.BytesIO(archive), mode="r:gz") as tar:
+        for member in tar:
+            if member.isfile():
+                contents[member.name] = tar.extractfile(member).read()
+    return contents
+
+
+def _file_size(content: BinaryIO) -> int:
+    position = content.tell()
+    size = content.seek(0, io.SEEK_END)
+    content.seek(position)
+    return size - position
+
+
+def _pack_batches(files: List[Tuple[str, BinaryIO]]) -> List[List[Tuple[str, BinaryIO, int]]]:
+    batches, batch, batch_bytes = [], [], 0
+    for path, content in files:
+        size = _file_size(content)
+        if batch and batch_bytes + size > UPLOAD_BATCH_BYTES:
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+        batch.append((path, content, size))
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _pack_archive(batch: List[Tuple[str, BinaryIO, int]]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for path, content, size in batch:
+            info = tarfile.TarInfo(name=path.lstrip("/"))
+            info.size = size
+            info.mode = 0o644
+            tar.addfile(info, content)
+    return buffer.getvalue()
+
+
+async def _upload_batch(sandbox: AsyncSandbox, batch: List[Tuple[str, BinaryIO, int]]):
+    archive = await asyncio.to_thread(_pack_archive, batch)
+    archive_file = f"/tmp/.workspace_upload_{str(uuid4())[:8]}.tar"
+    await sandbox.fs.upload_file(archive, archive_file)
+    command = f"tar -xf {archive_file} -C / --no-same-owner; rc=$?; rm -f {archive_file}; exit $rc"
+    response = await sandbox.process.exec(f"/bin/sh -c {shlex.quote(command)}", timeout=300)
+    if response.exit_code != 0:
+        raise RuntimeError(f"Failed to extract upload archive: {response.result}")
+
+
+async def upload_files(sandbox: AsyncSandbox, files: List[Tuple[str, Union[bytes, BinaryIO]]]) -> Tuple[List[str], List[str]]:
+    """Upload files given as (absolute path, content) pairs.
+
+    Content may be bytes or a readable file object; file objects are read from
+    their current position. Returns (uploaded, failed) paths, where a file only
+    counts as uploaded if its size in the sandbox matches after all archives have
+    been extracted.
+    """
+    files = [(path, io.BytesIO(content) if isinstance(content, bytes) else content) for path, content in files]
+    if not files:
+        return [], []
+    expected = {path: _file_size(content) for path, content in files}
+
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+    async def _upload(batch):
+        async with semaphore:
+            try:
+                await _upload_batch(sandbox, batch)
+            except Exception as e:
+                logger.error(f"Error uploading a batch of {len(batch)} files to sandbox {sandbox.id}: {e}")
+
+    await asyncio.gather(*(_upload(batch) for batch in _pack_batches(files)))
+
+    # Verify every target path with one stat
+    list_file = f"/tmp/.workspace_upload_{str(uuid4())[:8]}.list"
+    await sandbox.fs.upload_file("\0".join(expected).encode(), list_file)
+    command = f"xargs -0 stat -c '%s %n' < {list_file} 2>/dev/null; rm -f {list_file}"
+    response = await sandbox.process.exec(f"/bin/sh -c {shlex.quote(command)}", timeout=60)
+
+    actual = {}
+    for line in (response.result or "").splitlines():
+        size, _, path = line.partition(" ")
+        if size.isdigit():
+            actual[path] = int(size)
+
+    uploaded = [path for path, size in expected.items() if actual.get(path) == size]
+    failed = [path for path in expected if actual.get(path) != expected[path]]
+    return uploaded, failed
+
+
+async def read_file_range(sandbox: AsyncSandbox, path: str, start: int, length: int) -> bytes:
+    """Read length bytes of a sandbox file from offset start."""
+    range_file = f"/tmp/.workspace_range_{str(uuid4())[:8]}"
+    command = (
+        f"dd if={shlex.quote(path)} of={range_file} bs=1M status=none "
+        f"iflag=skip_bytes,count_bytes skip={start} count={length}"
+    )
+    try:
+        response = await sandbox.process.exec(f"/bin/sh -c {shlex.quote(command)}", timeout=120)
+        if response.exit_code != 0:
+            raise RuntimeError(f"Failed to read {path}: {response.result}")
+        return await sandbox.fs.download_file(range_file)
+    finally:
+        await sandbox.process.exec(f"rm -f {range_file}", timeout=30)
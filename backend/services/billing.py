@@ -5,21 +5,32 @@ stripe listen --forward-to localhost:8000/api/billing/webhook
 """
 
 from fastapi import APIRouter, HTTPException, Depends, Request
-from typing import Optional, Dict, Tuple
+from typing import Any, Callable, List, Optional, Dict, Tuple
+import asyncio
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
 import stripe
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from utils.logger import logger
 from utils.config import config, EnvMode
 from services.supabase import DBConnection
 from utils.auth_utils import get_current_user_id_from_jwt
 from pydantic import BaseModel
 from utils.constants import MODEL_ACCESS_TIERS, MODEL_NAME_ALIASES
+from services import redis, usage_ledger
 from litellm import cost_per_token, model_cost
 import time
 
 # Initialize Stripe
 stripe.api_key = config.STRIPE_SECRET_KEY
 
+# The Stripe SDK is synchronous; its calls run on a bounded pool so they never block the event loop
+stripe_executor = ThreadPoolExecutor(max_workers=config.STRIPE_MAX_WORKERS, thread_name_prefix="stripe")
+
+# Redis key prefix of cached subscription snapshots
+SUBSCRIPTION_CACHE_PREFIX = "billing:subscription"
+
 # Token price multiplier
 TOKEN_PRICE_MULTIPLIER = 1.5
 
@@ -120,6 +131,11 @@ class SubscriptionStatus(BaseModel):
     scheduled_change_date: Optional[datetime] = None
 
 # Helper functions
+async def run_stripe(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a synchronous Stripe SDK call on the Stripe thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(stripe_executor, functools.partial(func, *args, **kwargs))
+
 async def get_stripe_customer_id(client, user_id: str) -> Optional[str]:
     """Get the Stripe customer ID for a user."""
     result = await client.schema('basejump').from_('billing_customers') \
@@ -134,7 +150,7 @@ async def get_stripe_customer_id(client, user_id: str) -> Optional[str]:
 async def create_stripe_customer(client, user_id: str, email: str) -> str:
     """Create a new Stripe customer for a user."""
     # Create customer in Stripe
-    customer = stripe.Customer.create(
+    customer = await run_stripe(stripe.Customer.create,
         email=email,
         metadata={"user_id": user_id}
     )
@@ -150,116 +166,225 @@ async def create_stripe_customer(client, user_id: str, email: str) -> str:
     return customer.id
 
 async def get_user_subscription(user_id: str) -> Optional[Dict]:
-    """Get the current subscription for a user from Stripe."""
+    """Get the current subscription for a user, from the snapshot cache if fresh.
+
+    Snapshots live in Redis for STRIPE_SUBSCRIPTION_CACHE_TTL seconds and are
+    refreshed by the Stripe webhook whenever a subscription of the account changes.
+    """
+    cache_key = f"{SUBSCRIPTION_CACHE_PREFIX}:{user_id}"
     try:
-        # Get customer ID
-        db = DBConnection()
-        client = await db.client
-        customer_id = await get_stripe_customer_id(client, user_id)
-        
-        if not customer_id:
-            return None
-            
-        # Get all active subscriptions for the customer
-        subscriptions = stripe.Subscription.list(
-            customer=customer_id,
-            status='active'
-        )
-        # print("Found subscriptions:", subscriptions)
-        
-        # Check if we have any subscriptions
-        if not subscriptions or not subscriptions.get('data'):
-            return None
-            
-        # Filter subscriptions to only include our product's subscriptions
-        our_subscriptions = []
-        for sub in subscriptions['data']:
-            # Get the first subscription item
-            if sub.get('items') and sub['items'].get('data') and len(sub['items']['data']) > 0:
-                item = sub['items']['data'][0]
-                if item.get('price') and item['price'].get('id') in [
-                    config.STRIPE_FREE_TIER_ID,
-                    config.STRIPE_TIER_2_20_ID,
-                    config.STRIPE_TIER_6_50_ID,
-                    config.STRIPE_TIER_12_100_ID,
-                    config.STRIPE_TIER_25_200_ID,
-                    config.STRIPE_TIER_50_400_ID,
-                    config.STRIPE_TIER_125_800_ID,
-                    config.STRIPE_TIER_200_1000_ID,
-                    # Yearly tiers
-                    config.STRIPE_TIER_2_20_YEARLY_ID,
-                    config.STRIPE_TIER_6_50_YEARLY_ID,
-                    config.STRIPE_TIER_12_100_YEARLY_ID,
-                    config.STRIPE_TIER_25_200_YEARLY_ID,
-                    config.STRIPE_TIER_50_400_YEARLY_ID,
-                    config.STRIPE_TIER_125_800_YEARLY_ID,
-                    config.STRIPE_TIER_200_1000_YEARLY_ID
-                ]:
-                    our_subscriptions.append(sub)
-        
-        if not our_subscriptions:
-            return None
-            
-        # If there are multiple active subscriptions, we need to handle this
-        if len(our_subscriptions) > 1:
-            logger.warning(f"User {user_id} has multiple active subscriptions: {[sub['id'] for sub in our_subscriptions]}")
-            
-            # Get the most recent subscription
-            most_recent = max(our_subscriptions, key=lambda x: x['created'])
-            
-            # Cancel all other subscriptions
-            for sub in our_subscriptions:
-                if sub['id'] != most_recent['id']:
-                    try:
-                        stripe.Subscription.modify(
-                            sub['id'],
-                            cancel_at_period_end=True
-                        )
-                        logger.info(f"Cancelled subscription {sub['id']} for user {user_id}")
-                    except Exception as e:
-                        logger.error(f"Error cancelling subscription {sub['id']}: {str(e)}")
-            
-            return most_recent
-            
-        return our_subscriptions[0]
-        
+        cached = await redis.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)['subscription']
     except Exception as e:
+        logger.warning(f"Failed to read cached subscription for {user_id}: {str(e)}")
+
+    try:
+        subscription = await fetch_user_subscription(user_id)
+    except Exception as e:
+        # Not cached, so a Stripe outage does not pin paying users to the free tier
         logger.error(f"Error getting subscription from Stripe: {str(e)}")
         return None
 
-async def calculate_monthly_usage(client, user_id: str) -> float:
-    """Calculate total agent run minutes for the current month for a user."""
-    start_time = time.time()
+    try:
+        # "No subscription" is cached too, so free users do not hit Stripe on every check
+        await redis.set(cache_key, json.dumps({'subscription': subscription}, default=str), ex=config.STRIPE_SUBSCRIPTION_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to cache subscription for {user_id}: {str(e)}")
+    return subscription
+
+async def invalidate_subscription_cache(user_id: str):
+    """Drop the cached subscription snapshot of a user."""
+    try:
+        await redis.delete(f"{SUBSCRIPTION_CACHE_PREFIX}:{user_id}")
+    except Exception as e:
+        logger.warning(f"Failed to invalidate cached subscription for {user_id}: {str(e)}")
+
+async def fetch_user_subscription(user_id: str) -> Optional[Dict]:
+    """Get the current subscription for a user from Stripe. Raises on Stripe errors."""
+    # Get customer ID
+    db = DBConnection()
+    client = await db.client
+    customer_id = await get_stripe_customer_id(client, user_id)
     
-    # Use get_usage_logs to fetch all usage data (it already handles the date filtering and batching)
-    total_cost = 0.0
-    page = 0
-    items_per_page = 1000
+    if not customer_id:
+        return None
+        
+    # Get all active subscriptions for the customer
+    subscriptions = await run_stripe(stripe.Subscription.list,
+        customer=customer_id,
+        status='active'
+    )
+    # print("Found subscriptions:", subscriptions)
     
-    while True:
-        # Get usage logs for this page
-        usage_result = await get_usage_logs(client, user_id, page, items_per_page)
+    # Check if we have any subscriptions
+    if not subscriptions or not subscriptions.get('data'):
+        return None
         
-        if not usage_result['logs']:
-            break
+    # Filter subscriptions to only include our product's subscriptions
+    our_subscriptions = []
+    for sub in subscriptions['data']:
+        # Get the first subscription item
+        if sub.get('items') and sub['items'].get('data') and len(sub['items']['data']) > 0:
+            item = sub['items']['data'][0]
+            if item.get('price') and item['price'].get('id') in [
+                config.STRIPE_FREE_TIER_ID,
+                config.STRIPE_TIER_2_20_ID,
+                config.STRIPE_TIER_6_50_ID,
+                config.STRIPE_TIER_12_100_ID,
+                config.STRIPE_TIER_25_200_ID,
+                config.STRIPE_TIER_50_400_ID,
+                config.STRIPE_TIER_125_800_ID,
+                config.STRIPE_TIER_200_1000_ID,
+                # Yearly tiers
+                config.STRIPE_TIER_2_20_YEARLY_ID,
+                config.STRIPE_TIER_6_50_YEARLY_ID,
+                config.STRIPE_TIER_12_100_YEARLY_ID,
+                config.STRIPE_TIER_25_200_YEARLY_ID,
+                config.STRIPE_TIER_50_400_YEARLY_ID,
+                config.STRIPE_TIER_125_800_YEARLY_ID,
+                config.STRIPE_TIER_200_1000_YEARLY_ID
+            ]:
+                our_subscriptions.append(sub)
+    
+    if not our_subscriptions:
+        return None
+        
+    # If there are multiple active subscriptions, we need to handle this
+    if len(our_subscriptions) > 1:
+        logger.warning(f"User {user_id} has multiple active subscriptions: {[sub['id'] for sub in our_subscriptions]}")
         
-        # Sum up the estimated costs from this page
-        for log_entry in usage_result['logs']:
-            total_cost += log_entry['estimated_cost']
+        # Get the most recent subscription
+        most_recent = max(our_subscriptions, key=lambda x: x['created'])
         
-        # If there are no more pages, break
-        if not usage_result['has_more']:
+        # Cancel all other subscriptions
+        for sub in our_subscriptions:
+            if sub['id'] != most_recent['id']:
+                try:
+                    await run_stripe(stripe.Subscription.modify,
+                        sub['id'],
+                        cancel_at_period_end=True
+                    )
+                    logger.info(f"Cancelled subscription {sub['id']} for user {user_id}")
+                except Exception as e:
+                    logger.error(f"Error cancelling subscription {sub['id']}: {str(e)}")
+        
+        return most_recent
+        
+    return our_subscriptions[0]
+
+async def sum_monthly_usage(client, user_id: str, period: Optional[date] = None) -> Dict:
+    """Total a month's usage of a user from the daily usage rollup.
+
+    A month's usage is every assistant_response_end in any of the account's
+    threads whose created_at falls in that month, each priced on its own. The
+    usage ledger counts the same responses as their rows are written.
+    """
+    period = period or usage_ledger.current_period()
+    end_date = (period + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    totals = {"cost": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "messages": 0}
+    page = 0
+    while True:
+        result = await get_usage_rollup(client, user_id, period, end_date, page, 1000)
+        for row in result['rows']:
+            totals['cost'] += row['estimated_cost']
+            totals['prompt_tokens'] += row['prompt_tokens']
+            totals['completion_tokens'] += row['completion_tokens']
+            totals['messages'] += row['message_count']
+        if not result['has_more']:
             break
-            
         page += 1
-    
-    end_time = time.time()
-    execution_time = end_time - start_time
-    logger.info(f"Calculate monthly usage took {execution_time:.3f} seconds, total cost: {total_cost}")
-    
+    return totals
+
+
+async def calculate_monthly_usage(client, user_id: str) -> float:
+    """Calculate the current month's usage cost of a user without the ledger."""
+    start_time = time.time()
+    total_cost = (await sum_monthly_usage(client, user_id))['cost']
+    logger.info(f"Calculate monthly usage took {time.time() - start_time:.3f} seconds, total cost: {total_cost}")
     return total_cost
 
 
+async def get_monthly_usage(client, user_id: str) -> float:
+    """Get the current month's usage cost from the usage ledger.
+
+    Reads the Redis counters; on a miss the ledger is seeded from the last
+    rollup in Postgres, or recomputed from the daily usage rollup if there is none.
+    """
+    try:
+        totals = await usage_ledger.get(user_id)
+        if totals is not None:
+            return totals['cost']
+        base = await usage_ledger.snapshot(user_id)
+    except Exception as e:
+        logger.warning(f"Failed to read usage ledger for {user_id}, calculating from the usage rollup: {str(e)}")
+        return await calculate_monthly_usage(client, user_id)
+
+    totals = await usage_ledger.load_rollup(client, user_id)
+    if totals is None:
+        return (await reconcile_monthly_usage(client, user_id))['cost']
+
+    try:
+        totals = await usage_ledger.rebase(user_id, totals, base) or totals
+    except Exception as e:
+        logger.warning(f"Failed to seed usage ledger for {user_id}: {str(e)}")
+    return totals['cost']
+
+
+async def reconcile_monthly_usage(client, user_id: str) -> Dict:
+    """Recompute the current month's usage from the daily usage rollup and rebase the ledger on it.
+
+    Responses recorded while the rollup is read are kept on top of the
+    recomputed totals instead of being overwritten.
+    """
+    period = usage_ledger.current_period()
+    try:
+        base = await usage_ledger.snapshot(user_id, period)
+    except Exception as e:
+        logger.warning(f"Failed to read usage ledger for {user_id}: {str(e)}")
+        base = None
+
+    totals = await sum_monthly_usage(client, user_id, period)
+
+    try:
+        if base is not None:
+            totals = await usage_ledger.rebase(user_id, totals, base, period) or totals
+        await usage_ledger.write_rollup(client, user_id, totals, period, reconciled=True)
+    except Exception as e:
+        logger.warning(f"Failed to store reconciled usage ledger for {user_id}: {str(e)}")
+    logger.info(f"Reconciled usage ledger for {user_id}: {totals['messages']} responses, ${totals['cost']:.4f}")
+    return totals
+
+
+def calculate_message_cost(content: Dict) -> float:
+    """Price one assistant_response_end from its own usage and model."""
+    usage = content.get('usage') or {}
+    return calculate_token_cost(usage.get('prompt_tokens') or 0, usage.get('completion_tokens') or 0, content.get('model', 'unknown'))
+
+
+async def record_assistant_usage(client, account_id: str, message: Dict):
+    """Add the cost of a written assistant_response_end row to the account's usage ledger.
+
+    Call this only once the row is in the messages table, so a reconciliation
+    never counts the response both from the database and from the increment.
+    """
+    content = message.get('content') or {}
+    usage = content.get('usage') or {}
+    prompt_tokens = usage.get('prompt_tokens') or 0
+    completion_tokens = usage.get('completion_tokens') or 0
+    cost = (message.get('metadata') or {}).get('cost')
+    if cost is None:
+        cost = calculate_message_cost(content)
+    # The month of the message, not of the write, like the rollup it is reconciled with
+    period = usage_ledger.current_period(datetime.fromisoformat(message['created_at'].replace('Z', '+00:00'))) if message.get('created_at') else None
+    try:
+        await usage_ledger.record(account_id, cost, prompt_tokens, completion_tokens, period)
+    except Exception as e:
+        logger.warning(f"Failed to record usage for {account_id}: {str(e)}")
+        return
+    await usage_ledger.maybe_rollup(client, account_id, period)
+
+
 async def get_usage_logs(client, user_id: str, page: int = 0, items_per_page: int = 1000) -> Dict:
     """Get detailed usage logs for a user with pagination."""
     # Get start of current month in UTC
@@ -378,6 +503,99 @@ async def get_usage_logs(client, user_id: str, page: int = 0, items_per_page: in
     }
 
 
+async def get_usage_rollup(client, user_id: str, start_date: date, end_date: date, page: int = 0, items_per_page: int = 1000) -> Dict:
+    """Get daily usage rollup rows of a user, newest day first.
+
+    Rows come from usage_daily_rollup, one per day and model. Their cost is the
+    sum of the costs of the messages, each priced when it was saved, since
+    tiered prices make pricing the summed tokens overstate it.
+    """
+    result = await client.table('usage_daily_rollup') \
+        .select('day, model, prompt_tokens, completion_tokens, message_count, cost') \
+        .eq('account_id', user_id) \
+        .gte('day', start_date.isoformat()) \
+        .lte('day', end_date.isoformat()) \
+        .order('day', desc=True) \
+        .order('model') \
+        .range(page * items_per_page, (page + 1) * items_per_page - 1) \
+        .execute()
+
+    rows = []
+    for row in result.data or []:
+        prompt_tokens = row.get('prompt_tokens') or 0
+        completion_tokens = row.get('completion_tokens') or 0
+        rows.append({
+            'day': row['day'],
+            'model': row['model'],
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'message_count': row.get('message_count') or 0,
+            'estimated_cost': float(row.get('cost') or 0),
+        })
+
+    return {
+        "rows": rows,
+        "has_more": len(rows) == items_per_page
+    }
+
+
+def aggregate_usage_rollup(messages: List[Dict]) -> List[Dict]:
+    """Price assistant_response_end messages one by one and sum them into rollup rows.
+
+    Messages need account_id, created_at and content; those without an account
+    are skipped, as the rollup trigger does.
+    """
+    rows: Dict[Tuple[str, str, str], Dict] = {}
+    for message in messages:
+        if not message.get('account_id'):
+            continue
+        content = message.get('content') or {}
+        usage = content.get('usage') or {}
+        day = datetime.fromisoformat(message['created_at'].replace('Z', '+00:00')).astimezone(timezone.utc).date().isoformat()
+        model = content.get('model') or 'unknown'
+        row = rows.setdefault((message['account_id'], day, model), {
+            'account_id': message['account_id'], 'day': day, 'model': model,
+            'prompt_tokens': 0, 'completion_tokens': 0, 'message_count': 0, 'cost': 0.0
+        })
+        row['prompt_tokens'] += int(usage.get('prompt_tokens') or 0)
+        row['completion_tokens'] += int(usage.get('completion_tokens') or 0)
+        row['message_count'] += 1
+        row['cost'] += calculate_message_cost(content)
+    return list(rows.values())
+
+
+async def summarize_usage_rollup(client, user_id: str, start_date: date, end_date: date) -> Dict:
+    """Aggregate the rollup rows of a period into per-model and per-day totals."""
+    by_model: Dict[str, Dict] = {}
+    by_day: Dict[str, Dict] = {}
+    page = 0
+    while True:
+        result = await get_usage_rollup(client, user_id, start_date, end_date, page, 1000)
+        for row in result['rows']:
+            model_totals = by_model.setdefault(row['model'], {'model': row['model'], 'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'message_count': 0, 'estimated_cost': 0.0})
+            day_totals = by_day.setdefault(row['day'], {'day': row['day'], 'total_tokens': 0, 'message_count': 0, 'estimated_cost': 0.0})
+            for key in ('prompt_tokens', 'completion_tokens', 'total_tokens', 'message_count', 'estimated_cost'):
+                model_totals[key] += row[key]
+                if key in day_totals:
+                    day_totals[key] += row[key]
+        if not result['has_more']:
+            break
+        page += 1
+
+    models = sorted(by_model.values(), key=lambda m: m['estimated_cost'], reverse=True)
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "total_cost": sum(m['estimated_cost'] for m in models),
+        "prompt_tokens": sum(m['prompt_tokens'] for m in models),
+        "completion_tokens": sum(m['completion_tokens'] for m in models),
+        "message_count": sum(m['message_count'] for m in models),
+        "models": models,
+        "days": sorted(by_day.values(), key=lambda d: d['day'])
+    }
+
+
 def calculate_token_cost(prompt_tokens: int, completion_tokens: int, model: str) -> float:
     """Calculate the cost for tokens using the same logic as the monthly usage calculation."""
     try:
@@ -526,8 +744,8 @@ async def check_billing_status(client, user_id: str) -> Tuple[bool, str, Optiona
         logger.warning(f"Unknown subscription tier: {price_id}, defaulting to free tier")
         tier_info = SUBSCRIPTION_TIERS[config.STRIPE_FREE_TIER_ID]
     
-    # Calculate current month's usage
-    current_usage = await calculate_monthly_usage(client, user_id)
+    # Current month's usage from the incrementally updated ledger
+    current_usage = await get_monthly_usage(client, user_id)
     
     # Check if within limits
     if current_usage >= tier_info['cost']:
@@ -558,7 +776,7 @@ async def create_checkout_session(
          
         # Get the target price and product ID
         try:
-            price = stripe.Price.retrieve(request.price_id, expand=['product'])
+            price = await run_stripe(stripe.Price.retrieve, request.price_id, expand=['product'])
             product_id = price['product']['id']
         except stripe.error.InvalidRequestError:
             raise HTTPException(status_code=400, detail=f"Invalid price ID: {request.price_id}")
@@ -567,8 +785,9 @@ async def create_checkout_session(
         if product_id != config.STRIPE_PRODUCT_ID:
             raise HTTPException(status_code=400, detail="Price ID does not belong to the correct product.")
             
-        # Check for existing subscription for our product
-        existing_subscription = await get_user_subscription(current_user_id)
+        # Check for existing subscription for our product, straight from Stripe:
+        # a stale snapshot could start a second subscription or modify a cancelled one
+        existing_subscription = await fetch_user_subscription(current_user_id)
         # print("Existing subscription for product:", existing_subscription)
         
         if existing_subscription:
@@ -593,13 +812,13 @@ async def create_checkout_session(
                     }
                 
                 # Get current and new price details
-                current_price = stripe.Price.retrieve(current_price_id)
+                current_price = await run_stripe(stripe.Price.retrieve, current_price_id)
                 new_price = price # Already retrieved
                 is_upgrade = new_price['unit_amount'] > current_price['unit_amount']
 
                 if is_upgrade:
                     # --- Handle Upgrade --- Immediate modification
-                    updated_subscription = stripe.Subscription.modify(
+                    updated_subscription = await run_stripe(stripe.Subscription.modify,
                         subscription_id,
                         items=[{
                             'id': subscription_item['id'],
@@ -614,10 +833,11 @@ async def create_checkout_session(
                         {'active': True}
                     ).eq('id', customer_id).execute()
                     logger.info(f"Updated customer {customer_id} active status to TRUE after subscription upgrade")
+                    await invalidate_subscription_cache(current_user_id)
                     
                     latest_invoice = None
                     if updated_subscription.get('latest_invoice'):
-                       latest_invoice = stripe.Invoice.retrieve(updated_subscription['latest_invoice']) 
+                       latest_invoice = await run_stripe(stripe.Invoice.retrieve, updated_subscription['latest_invoice']) 
                     
                     return {
                         "subscription_id": updated_subscription['id'],
@@ -643,12 +863,12 @@ async def create_checkout_session(
                         
                         # Retrieve the subscription again to get the schedule ID if it exists
                         # This ensures we have the latest state before creating/modifying schedule
-                        sub_with_schedule = stripe.Subscription.retrieve(subscription_id)
+                        sub_with_schedule = await run_stripe(stripe.Subscription.retrieve, subscription_id)
                         schedule_id = sub_with_schedule.get('schedule')
 
                         # Get the current phase configuration from the schedule or subscription
                         if schedule_id:
-                            schedule = stripe.SubscriptionSchedule.retrieve(schedule_id)
+                            schedule = await run_stripe(stripe.SubscriptionSchedule.retrieve, schedule_id)
                             # Find the current phase in the schedule
                             # This logic assumes simple schedules; might need refinement for complex ones
                             current_phase = None
@@ -713,7 +933,7 @@ async def create_checkout_session(
                             logger.info(f"Updating existing schedule {schedule_id} for subscription {subscription_id}")
                             logger.debug(f"Current phase data: {current_phase_update_data}")
                             logger.debug(f"New phase data: {new_downgrade_phase_data}")
-                            updated_schedule = stripe.SubscriptionSchedule.modify(
+                            updated_schedule = await run_stripe(stripe.SubscriptionSchedule.modify,
                                 schedule_id,
                                 phases=[current_phase_update_data, new_downgrade_phase_data],
                                 end_behavior='release' 
@@ -728,7 +948,7 @@ async def create_checkout_session(
                             logger.debug(f"Current price: {current_price_id}, New price: {request.price_id}")
                             
                             try:
-                                updated_schedule = stripe.SubscriptionSchedule.create(
+                                updated_schedule = await run_stripe(stripe.SubscriptionSchedule.create,
                                     from_subscription=subscription_id,
                                     phases=[
                                         {
@@ -760,7 +980,7 @@ async def create_checkout_session(
                                 # print(f"Created new schedule {updated_schedule['id']} from subscription {subscription_id}")
                                 
                                 # Verify the schedule was created correctly
-                                fetched_schedule = stripe.SubscriptionSchedule.retrieve(updated_schedule['id'])
+                                fetched_schedule = await run_stripe(stripe.SubscriptionSchedule.retrieve, updated_schedule['id'])
                                 logger.info(f"Schedule verification - Status: {fetched_schedule.get('status')}, Phase Count: {len(fetched_schedule.get('phases', []))}")
                                 logger.debug(f"Schedule details: {fetched_schedule}")
                             except Exception as schedule_error:
@@ -788,7 +1008,7 @@ async def create_checkout_session(
                 raise HTTPException(status_code=500, detail=f"Error updating subscription: {str(e)}")
         else:
             
-            session = stripe.checkout.Session.create(
+            session = await run_stripe(stripe.checkout.Session.create,
                 customer=customer_id,
                 payment_method_types=['card'],
                     line_items=[{'price': request.price_id, 'quantity': 1}],
@@ -840,7 +1060,7 @@ async def create_portal_session(
         # Ensure the portal configuration has subscription_update enabled
         try:
             # First, check if we have a configuration that already enables subscription update
-            configurations = stripe.billing_portal.Configuration.list(limit=100)
+            configurations = await run_stripe(stripe.billing_portal.Configuration.list, limit=100)
             active_config = None
             
             # Look for a configuration with subscription_update enabled
@@ -859,7 +1079,7 @@ async def create_portal_session(
                     default_config = configurations['data'][0]
                     logger.info(f"Updating default portal configuration: {default_config['id']} to enable subscription_update")
                     
-                    active_config = stripe.billing_portal.Configuration.update(
+                    active_config = await run_stripe(stripe.billing_portal.Configuration.update,
                         default_config['id'],
                         features={
                             'subscription_update': {
@@ -876,7 +1096,7 @@ async def create_portal_session(
                 else:
                     # Create a new configuration with subscription_update enabled
                     logger.info("Creating new portal configuration with subscription_update enabled")
-                    active_config = stripe.billing_portal.Configuration.create(
+                    active_config = await run_stripe(stripe.billing_portal.Configuration.create,
                         business_profile={
                             'headline': 'Subscription Management',
                             'privacy_policy_url': config.FRONTEND_URL + '/privacy',
@@ -914,7 +1134,7 @@ async def create_portal_session(
             portal_params["configuration"] = active_config['id']
         
         # Create the session
-        session = stripe.billing_portal.Session.create(**portal_params)
+        session = await run_stripe(stripe.billing_portal.Session.create, **portal_params)
         
         return {"url": session.url}
         
@@ -935,7 +1155,7 @@ async def get_subscription(
         # Calculate current usage
         db = DBConnection()
         client = await db.client
-        current_usage = await calculate_monthly_usage(client, current_user_id)
+        current_usage = await get_monthly_usage(client, current_user_id)
 
         if not subscription:
             # Default to free tier status if no active subscription for our product
@@ -976,7 +1196,7 @@ async def get_subscription(
         schedule_id = subscription.get('schedule')
         if schedule_id:
             try:
-                schedule = stripe.SubscriptionSchedule.retrieve(schedule_id)
+                schedule = await run_stripe(stripe.SubscriptionSchedule.retrieve, schedule_id)
                 # Find the *next* phase after the current one
                 next_phase = None
                 current_phase_end = current_item['current_period_end']
@@ -1076,11 +1296,11 @@ async def stripe_webhook(request: Request):
                 else:
                     # Subscription is not active (e.g., past_due, canceled, etc.)
                     # Check if customer has any other active subscriptions before updating status
-                    has_active = len(stripe.Subscription.list(
+                    has_active = len((await run_stripe(stripe.Subscription.list,
                         customer=customer_id,
                         status='active',
                         limit=1
-                    ).get('data', [])) > 0
+                    )).get('data', [])) > 0
                     
                     if not has_active:
                         await client.schema('basejump').from_('billing_customers').update(
@@ -1090,11 +1310,11 @@ async def stripe_webhook(request: Request):
             
             elif event.type == 'customer.subscription.deleted':
                 # Check if customer has any other active subscriptions
-                has_active = len(stripe.Subscription.list(
+                has_active = len((await run_stripe(stripe.Subscription.list,
                     customer=customer_id,
                     status='active',
                     limit=1
-                ).get('data', [])) > 0
+                )).get('data', [])) > 0
                 
                 if not has_active:
                     # If no active subscriptions left, set active to false
@@ -1103,6 +1323,15 @@ async def stripe_webhook(request: Request):
                     ).eq('id', customer_id).execute()
                     logger.info(f"Webhook: Updated customer {customer_id} active status to FALSE after subscription deletion")
             
+            # Refresh the cached subscription snapshot of the customer's accounts
+            customer_result = await client.schema('basejump').from_('billing_customers') \
+                .select('account_id') \
+                .eq('id', customer_id) \
+                .execute()
+            for row in customer_result.data or []:
+                await invalidate_subscription_cache(row['account_id'])
+                await get_user_subscription(row['account_id'])
+
             logger.info(f"Processed {event.type} event for customer {customer_id}")
         
         return {"status": "success"}
@@ -1324,4 +1553,65 @@ async def get_usage_logs_endpoint(
         raise
     except Exception as e:
         logger.error(f"Error getting usage logs: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error getting usage logs: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error getting usage logs: {str(e)}")
+
+
+def _usage_date_range(start_date: Optional[date], end_date: Optional[date]) -> Tuple[date, date]:
+    """Default to the current month and validate the range of usage queries."""
+    today = datetime.now(timezone.utc).date()
+    start_date = start_date or today.replace(day=1)
+    end_date = end_date or today
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    if end_date - start_date > timedelta(days=366):
+        raise HTTPException(status_code=400, detail="Date range must not exceed one year")
+    return start_date, end_date
+
+
+@router.get("/usage/daily")
+async def get_daily_usage_endpoint(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    page: int = 0,
+    items_per_page: int = 100,
+    current_user_id: str = Depends(get_current_user_id_from_jwt)
+):
+    """Get daily usage per model for a user with pagination (defaults to the current month)."""
+    try:
+        if page < 0:
+            raise HTTPException(status_code=400, detail="Page must be non-negative")
+        if items_per_page < 1 or items_per_page > 1000:
+            raise HTTPException(status_code=400, detail="Items per page must be between 1 and 1000")
+        start_date, end_date = _usage_date_range(start_date, end_date)
+
+        db = DBConnection()
+        client = await db.client
+        result = await get_usage_rollup(client, current_user_id, start_date, end_date, page, items_per_page)
+        return {**result, "page": page, "start_date": start_date.isoformat(), "end_date": end_date.isoformat()}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting daily usage: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error getting daily usage: {str(e)}")
+
+
+@router.get("/usage/summary")
+async def get_usage_summary_endpoint(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user_id: str = Depends(get_current_user_id_from_jwt)
+):
+    """Get usage totals per model and per day for a user (defaults to the current month)."""
+    try:
+        start_date, end_date = _usage_date_range(start_date, end_date)
+
+        db = DBConnection()
+        client = await db.client
+        return await summarize_usage_rollup(client, current_user_id, start_date, end_date)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting usage summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error getting usage summary: {str(e)}")
@@ -18,6 +18,7 @@ from openai import OpenAIError
 import litellm
 from utils.logger import logger
 from utils.config import config
+from agentpress.prompt_cache import apply_cache_breakpoints
 
 # litellm.set_verbose=True
 litellm.modify_params=True
@@ -85,9 +86,14 @@ def prepare_params(
     top_p: Optional[float] = None,
     model_id: Optional[str] = None,
     enable_thinking: Optional[bool] = False,
-    reasoning_effort: Optional[str] = 'low'
+    reasoning_effort: Optional[str] = 'low',
+    cache_breakpoints: Optional[List[int]] = None
 ) -> Dict[str, Any]:
-    """Prepare parameters for the API call."""
+    """Prepare parameters for the API call.
+
+    For Anthropic models, cache_breakpoints lists the indices of the messages to
+    mark with cache_control. Without it, the first 4 text blocks are marked.
+    """
     params = {
         "model": model_name,
         "messages": messages,
@@ -170,28 +176,33 @@ def prepare_params(
         if not isinstance(messages, list):
             return params # Return early if messages format is unexpected
 
-        # Apply cache control to the first 4 text blocks across all messages
-        cache_control_count = 0
-        max_cache_control_blocks = 4
-
-        for message in messages:
-            if cache_control_count >= max_cache_control_blocks:
-                break
-                
-            content = message.get("content")
-            
-            if isinstance(content, str):
-                message["content"] = [
-                    {"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}
-                ]
-                cache_control_count += 1
-            elif isinstance(content, list):
-                for item in content:
-                    if cache_control_count >= max_cache_control_blocks:
-                        break
-                    if isinstance(item, dict) and item.get("type") == "text" and "cache_control" not in item:
-                        item["cache_control"] = {"type": "ephemeral"}
-                        cache_control_count += 1
+        if cache_breakpoints is not None:
+            # Mark copies, the caller reuses the prefix messages on later turns
+            params["messages"], applied = apply_cache_breakpoints(messages, cache_breakpoints)
+            logger.debug(f"Applied {applied} cache breakpoints at message indices {cache_breakpoints}")
+        else:
+            # Apply cache control to the first 4 text blocks across all messages
+            cache_control_count = 0
+            max_cache_control_blocks = 4
+
+            for message in messages:
+                if cache_control_count >= max_cache_control_blocks:
+                    break
+
+                content = message.get("content")
+
+                if isinstance(content, str):
+                    message["content"] = [
+                        {"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}
+                    ]
+                    cache_control_count += 1
+                elif isinstance(content, list):
+                    for item in content:
+                        if cache_control_count >= max_cache_control_blocks:
+                            break
+                        if isinstance(item, dict) and item.get("type") == "text" and "cache_control" not in item:
+                            item["cache_control"] = {"type": "ephemeral"}
+                            cache_control_count += 1
 
     # Add reasoning_effort for Anthropic models if enabled
     use_thinking = enable_thinking if enable_thinking is not None else False
@@ -219,7 +230,8 @@ async def make_llm_api_call(
     top_p: Optional[float] = None,
     model_id: Optional[str] = None,
     enable_thinking: Optional[bool] = False,
-    reasoning_effort: Optional[str] = 'low'
+    reasoning_effort: Optional[str] = 'low',
+    cache_breakpoints: Optional[List[int]] = None
 ) -> Union[Dict[str, Any], AsyncGenerator]:
     """
     Make an API call to a language model using LiteLLM.
@@ -239,6 +251,7 @@ async def make_llm_api_call(
         model_id: Optional ARN for Bedrock inference profiles
         enable_thinking: Whether to enable thinking
         reasoning_effort: Level of reasoning effort
+        cache_breakpoints: Indices of the messages to mark as Anthropic cache breakpoints
 
     Returns:
         Union[Dict[str, Any], AsyncGenerator]: API response or stream
@@ -264,7 +277,8 @@ async def make_llm_api_call(
         top_p=top_p,
         model_id=model_id,
         enable_thinking=enable_thinking,
-        reasoning_effort=reasoning_effort
+        reasoning_effort=reasoning_effort,
+        cache_breakpoints=cache_breakpoints
     )
     last_error = None
     for attempt in range(MAX_RETRIES):
@@ -151,3 +151,25 @@ async def keys(pattern: str) -> List[str]:
     """Get keys matching a pattern."""
     redis_client = await get_client()
     return await redis_client.keys(pattern)
+
+
+# Stream operations
+async def xadd(key: str, fields: dict, maxlen: int = None, approximate: bool = True) -> str:
+    """Append an entry to a stream, optionally capping its length."""
+    redis_client = await get_client()
+    return await redis_client.xadd(key, fields, maxlen=maxlen, approximate=approximate)
+
+
+async def xread(streams: dict, count: int = None, block: int = None) -> list:
+    """Read entries newer than the given IDs from one or more streams."""
+    redis_client = await get_client()
+    return await redis_client.xread(streams, count=count, block=block)
+
+
+async def xadd_many(key: str, entries: List[dict], maxlen: int = None, approximate: bool = True) -> List[str]:
+    """Append several entries to a stream in one pipelined round trip."""
+    redis_client = await get_client()
+    pipe = redis_client.pipeline(transaction=False)
+    for fields in entries:
+        pipe.xadd(key, fields, maxlen=maxlen, approximate=approximate)
+    return await pipe.execute()
@@ -0,0 +1,267 @@
+"""
+Redis Streams transport for the responses of agent runs and workflow executions.
+
+Workers append every response to a capped stream with XADD, and the SSE
+endpoints read it with XREAD BLOCK from the last entry they delivered. Stream
+entry IDs are sent as SSE event IDs, so a reconnecting client resumes from its
+Last-Event-ID instead of replaying the whole run. The end of a run is written
+into the stream as a control entry, so readers need no pub/sub subscription.
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services import redis
+from utils.logger import logger
+
+# Approximate cap on entries kept per stream (XADD MAXLEN ~)
+STREAM_MAXLEN = 20000
+
+# TTL of a stream once its run has finished
+STREAM_TTL = 3600 * 24
+
+# XREAD BLOCK timeout; must stay below the Redis client's socket timeout
+READ_BLOCK_MS = 3000
+
+# Entries fetched per XREAD
+READ_COUNT = 500
+
+# StreamWriter defaults: how long a batch collects responses, its maximum
+# size, and how many unwritten responses a run may queue before it waits
+WRITE_FLUSH_INTERVAL = 0.02
+WRITE_MAX_BATCH = 64
+WRITE_MAX_PENDING = 1024
+
+# Attempts per batch before the writer gives up on it, and the delay before
+# the first retry, doubled for each further one
+WRITE_ATTEMPTS = 3
+WRITE_RETRY_BACKOFF = 0.1
+
+CONTROL_SIGNALS = ("STOP", "END_STREAM", "ERROR")
+
+# A stream entry as returned by read(): (entry_id, kind, payload), where kind is
+# "data" with the response dict as payload or "control" with the signal string
+StreamEntry = Tuple[str, str, Any]
+
+
+def agent_run_stream_key(agent_run_id: str) -> str:
+    return f"agent_run:{agent_run_id}:stream"
+
+
+def workflow_execution_stream_key(execution_id: str) -> str:
+    return f"workflow_execution:{execution_id}:stream"
+
+
+async def append(key: str, response: Dict[str, Any]) -> str:
+    """Append a response to the stream and return its entry ID."""
+    return await redis.xadd(key, {"data": json.dumps(response)}, maxlen=STREAM_MAXLEN)
+
+
+async def append_control(key: str, signal: str) -> str:
+    """Append a control signal (STOP, END_STREAM or ERROR) that ends the stream for readers."""
+    return await redis.xadd(key, {"control": signal}, maxlen=STREAM_MAXLEN)
+
+
+async def read(key: str, last_id: str = "0-0", block_ms: Optional[int] = None, count: int = READ_COUNT) -> List[StreamEntry]:
+    """Read entries after last_id, waiting up to block_ms for new ones if given."""
+    result = await redis.xread({key: last_id}, count=count, block=block_ms)
+    entries: List[StreamEntry] = []
+    for _, stream_entries in result or []:
+        for entry_id, fields in stream_entries:
+            if "control" in fields:
+                entries.append((entry_id, "control", fields["control"]))
+            elif "data" in fields:
+                entries.append((entry_id, "data", json.loads(fields["data"])))
+    return entries
+
+
+async def read_all(key: str) -> List[Dict[str, Any]]:
+    """Read all responses of a stream, without control entries."""
+    responses = []
+    last_id = "0-0"
+    while True:
+        entries = await read(key, last_id)
+        if not entries:
+            return responses
+        for entry_id, kind, payload in entries:
+            last_id = entry_id
+            if kind == "data":
+                responses.append(payload)
+
+
+async def expire(key: str, ttl: int = STREAM_TTL):
+    """Set the TTL of a finished run's stream."""
+    try:
+        await redis.expire(key, ttl)
+        logger.debug(f"Set TTL ({ttl}s) on response stream: {key}")
+    except Exception as e:
+        logger.warning(f"Failed to set TTL on response stream {key}: {str(e)}")
+
+
+class StreamWriter:
+    """Per-run writer that coalesces responses into pipelined XADD batches.
+
+    Responses queued within flush_interval (or until max_batch is reached) are
+    written in one round trip, in order. write() waits once max_pending
+    responses are queued, so a slow Redis holds back the run instead of
+    buffering without bound. flush() returns once everything queued so far
+    has been written. A failed batch is retried with backoff. A batch that still
+    cannot be written is dropped, and a "stream_gap" response takes its place so
+    readers can tell that responses are missing.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        flush_interval: float = WRITE_FLUSH_INTERVAL,
+        max_batch: int = WRITE_MAX_BATCH,
+        max_pending: int = WRITE_MAX_PENDING
+    ):
+        self.key = key
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._task: Optional[asyncio.Task] = None
+        self.batches_written = 0
+        self.batches_dropped = 0
+
+    async def write(self, response: Dict[str, Any]):
+        """Queue a response for the next batch."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        await self._queue.put({"data": json.dumps(response)})
+
+    async def flush(self):
+        """Wait until all queued responses have been written."""
+        if self._task is not None:
+            await self._queue.join()
+
+    async def close(self, timeout: float = 30.0):
+        """Flush queued responses and stop the writer task."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout flushing {self._queue.qsize()} pending responses to {self.key}")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _next_batch(self) -> List[Dict[str, str]]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write_batch(self, batch: List[Dict[str, str]]):
+        delay = WRITE_RETRY_BACKOFF
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                await redis.xadd_many(self.key, batch, maxlen=STREAM_MAXLEN)
+                self.batches_written += 1
+                return
+            except Exception as e:
+                if attempt == WRITE_ATTEMPTS:
+                    logger.error(f"Dropping {len(batch)} responses for {self.key} after {attempt} failed writes: {str(e)}")
+                    break
+                logger.warning(f"Failed to write {len(batch)} responses to {self.key} (attempt {attempt}), retrying: {str(e)}")
+                await asyncio.sleep(delay)
+                delay *= 2
+
+        self.batches_dropped += 1
+        gap = {"type": "stream_gap", "dropped": len(batch), "message": f"{len(batch)} responses could not be written to the stream"}
+        try:
+            await append(self.key, gap)
+        except Exception as e:
+            logger.error(f"Failed to mark dropped responses in {self.key}: {str(e)}")
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+def format_sse(payload: Dict[str, Any], entry_id: Optional[str] = None) -> str:
+    """Format a payload as an SSE event, with the stream entry ID as event ID."""
+    if entry_id:
+        return f"id: {entry_id}\ndata: {json.dumps(payload)}\n\n"
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def sse_events(
+    key: str,
+    last_event_id: Optional[str],
+    is_running: Callable[[], Awaitable[bool]],
+    is_final_response: Callable[[Dict[str, Any]], bool],
+    status_type: str = "status"
+) -> AsyncGenerator[str, None]:
+    """Yield SSE events for a stream, resuming after last_event_id.
+
+    Delivers the backlog first, ends right away if the run is no longer
+    running, then blocks on new entries until a final response or a control
+    signal arrives. Sends a keep-alive comment whenever a block times out.
+
+    Args:
+        key: Stream key
+        last_event_id: ID of the last event the client received, if resuming
+        is_running: Returns whether the run is still producing responses
+        is_final_response: Returns whether a response ends the run
+        status_type: Type of the status events emitted for control signals
+    """
+    last_id = last_event_id or "0-0"
+
+    async def next_events(block_ms: Optional[int] = None) -> List[Tuple[str, bool]]:
+        """Read the next entries as (event, ends_stream) pairs."""
+        nonlocal last_id
+        events = []
+        for entry_id, kind, payload in await read(key, last_id, block_ms=block_ms):
+            last_id = entry_id
+            if kind == "control":
+                logger.info(f"Received control signal '{payload}' on {key}")
+                events.append((format_sse({"type": status_type, "status": payload}, entry_id), True))
+                break
+            events.append((format_sse(payload, entry_id), is_final_response(payload)))
+        return events
+
+    # 1. Backlog since the client's last event
+    while events := await next_events():
+        for event, ends_stream in events:
+            yield event
+            if ends_stream:
+                return
+
+    # 2. Nothing more will arrive if the run is over
+    if not await is_running():
+        logger.info(f"Run of stream {key} is not running. Ending stream.")
+        yield format_sse({"type": status_type, "status": "completed"})
+        return
+
+    # 3. Wait for new entries
+    while True:
+        events = await next_events(block_ms=READ_BLOCK_MS)
+        if not events:
+            yield ": keep-alive\n\n"
+            continue
+        for event, ends_stream in events:
+            yield event
+            if ends_stream:
+                return
@@ -0,0 +1,161 @@
+"""
+Incremental per-account monthly usage ledger.
+
+Every saved assistant_response_end adds its cost and tokens to a Redis hash per
+account and month with atomic increments, so reading the month's usage is a
+single HGETALL instead of re-pricing every message of the month. Responses are
+counted once their message row is written, in the month of its created_at. The
+counters are rolled up to the usage_ledger table at most once per
+ROLLUP_INTERVAL per account, and reconciliation rebases them on totals
+recomputed from the database to correct any drift.
+"""
+
+from datetime import date, datetime, timezone
+from typing import Dict, Optional
+
+from services import redis
+from utils.logger import logger
+
+REDIS_KEY_PREFIX = "usage_ledger"
+
+# Counters outlive their month so late reads and rollups still find them
+REDIS_LEDGER_TTL = 3600 * 24 * 40
+
+# Minimum seconds between rollups of one account to Postgres
+ROLLUP_INTERVAL = 60
+
+LEDGER_FIELDS = ("cost", "prompt_tokens", "completion_tokens", "messages")
+
+
+def current_period(now: Optional[datetime] = None) -> date:
+    """First day of the current UTC month."""
+    now = (now or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return date(now.year, now.month, 1)
+
+
+def _ledger_key(account_id: str, period: date) -> str:
+    return f"{REDIS_KEY_PREFIX}:{account_id}:{period:%Y-%m}"
+
+
+def _parse_totals(raw: Dict[str, str]) -> Dict[str, float]:
+    return {
+        "cost": float(raw.get("cost", 0) or 0),
+        "prompt_tokens": int(float(raw.get("prompt_tokens", 0) or 0)),
+        "completion_tokens": int(float(raw.get("completion_tokens", 0) or 0)),
+        "messages": int(float(raw.get("messages", 0) or 0)),
+    }
+
+
+async def record(account_id: str, cost: float, prompt_tokens: int, completion_tokens: int, period: Optional[date] = None):
+    """Add one priced assistant response to the account's counters."""
+    key = _ledger_key(account_id, period or current_period())
+    redis_client = await redis.get_client()
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hincrbyfloat(key, "cost", cost)
+    pipe.hincrby(key, "prompt_tokens", int(prompt_tokens or 0))
+    pipe.hincrby(key, "completion_tokens", int(completion_tokens or 0))
+    pipe.hincrby(key, "messages", 1)
+    pipe.expire(key, REDIS_LEDGER_TTL)
+    await pipe.execute()
+
+
+async def get(account_id: str, period: Optional[date] = None) -> Optional[Dict[str, float]]:
+    """Get the account's counters, or None if they have not been seeded yet."""
+    key = _ledger_key(account_id, period or current_period())
+    redis_client = await redis.get_client()
+    raw = await redis_client.hgetall(key)
+    # Increments alone do not make a ledger; it needs a base from a seed
+    if not raw or "seeded" not in raw:
+        return None
+    return _parse_totals(raw)
+
+
+async def snapshot(account_id: str, period: Optional[date] = None) -> Dict[str, float]:
+    """Read the account's counters as they are, seeded or not, before a rebase."""
+    key = _ledger_key(account_id, period or current_period())
+    redis_client = await redis.get_client()
+    return _parse_totals(await redis_client.hgetall(key))
+
+
+async def rebase(account_id: str, totals: Dict[str, float], base: Dict[str, float], period: Optional[date] = None) -> Dict[str, float]:
+    """Set the account's counters to known totals, keeping increments made since base.
+
+    totals must be computed after base was taken with snapshot(). Instead of
+    overwriting the counters, which would drop responses recorded while the
+    totals were computed, each counter moves by the difference between the
+    totals and the snapshot.
+    """
+    period = period or current_period()
+    key = _ledger_key(account_id, period)
+    redis_client = await redis.get_client()
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hincrbyfloat(key, "cost", totals.get("cost", 0) - base["cost"])
+    for field in ("prompt_tokens", "completion_tokens", "messages"):
+        pipe.hincrby(key, field, int(totals.get(field, 0)) - base[field])
+    pipe.hset(key, mapping={"seeded": 1})
+    pipe.expire(key, REDIS_LEDGER_TTL)
+    await pipe.execute()
+    return await get(account_id, period)
+
+
+async def seed(account_id: str, totals: Dict[str, float], period: Optional[date] = None):
+    """Overwrite the account's counters with known totals."""
+    key = _ledger_key(account_id, period or current_period())
+    redis_client = await redis.get_client()
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(key, mapping={**{field: totals.get(field, 0) for field in LEDGER_FIELDS}, "seeded": 1})
+    pipe.expire(key, REDIS_LEDGER_TTL)
+    await pipe.execute()
+
+
+async def load_rollup(client, account_id: str, period: Optional[date] = None) -> Optional[Dict[str, float]]:
+    """Read the account's last rolled-up totals from the usage_ledger table."""
+    period = period or current_period()
+    result = await client.table('usage_ledger').select('*') \
+        .eq('account_id', account_id) \
+        .eq('period_start', period.isoformat()) \
+        .maybe_single() \
+        .execute()
+    if not result or not result.data:
+        return None
+    row = result.data
+    return {
+        "cost": float(row.get('total_cost') or 0),
+        "prompt_tokens": int(row.get('prompt_tokens') or 0),
+        "completion_tokens": int(row.get('completion_tokens') or 0),
+        "messages": int(row.get('message_count') or 0),
+    }
+
+
+async def write_rollup(client, account_id: str, totals: Dict[str, float], period: Optional[date] = None, reconciled: bool = False):
+    """Upsert the account's totals into the usage_ledger table."""
+    period = period or current_period()
+    now = datetime.now(timezone.utc).isoformat()
+    row = {
+        'account_id': account_id,
+        'period_start': period.isoformat(),
+        'total_cost': totals.get('cost', 0),
+        'prompt_tokens': totals.get('prompt_tokens', 0),
+        'completion_tokens': totals.get('completion_tokens', 0),
+        'message_count': totals.get('messages', 0),
+        'updated_at': now,
+    }
+    if reconciled:
+        row['reconciled_at'] = now
+    await client.table('usage_ledger').upsert(row, on_conflict='account_id,period_start').execute()
+
+
+async def maybe_rollup(client, account_id: str, period: Optional[date] = None):
+    """Roll the account's counters up to Postgres unless it was done within ROLLUP_INTERVAL."""
+    period = period or current_period()
+    throttle_key = f"{_ledger_key(account_id, period)}:rollup"
+    try:
+        if not await redis.set(throttle_key, "1", nx=True, ex=ROLLUP_INTERVAL):
+            return
+        totals = await get(account_id, period)
+        if totals is None:
+            return
+        await write_rollup(client, account_id, totals, period)
+        logger.debug(f"Rolled up usage ledger of account {account_id} for {period:%Y-%m}: ${totals['cost']:.4f}")
+    except Exception as e:
+        logger.warning(f"Failed to roll up usage ledger of account {account_id}: {str(e)}")
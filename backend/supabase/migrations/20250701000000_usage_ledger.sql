@@ -0,0 +1,35 @@
+-- Migration: Per-account monthly usage ledger
+-- Token usage is counted in Redis as assistant responses are saved and rolled up here,
+-- so the billing gate no longer has to re-price every message of the month
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS usage_ledger (
+    account_id UUID NOT NULL REFERENCES basejump.accounts(id) ON DELETE CASCADE,
+    period_start DATE NOT NULL,
+
+    total_cost NUMERIC(18, 8) NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    message_count INTEGER NOT NULL DEFAULT 0,
+
+    reconciled_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (account_id, period_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_usage_ledger_period_start ON usage_ledger(period_start);
+
+ALTER TABLE usage_ledger ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY usage_ledger_select_own ON usage_ledger
+    FOR SELECT
+    USING (basejump.has_role_on_account(account_id) = true);
+
+GRANT SELECT ON TABLE usage_ledger TO authenticated;
+GRANT ALL PRIVILEGES ON TABLE usage_ledger TO service_role;
+
+COMMENT ON TABLE usage_ledger IS 'Monthly token usage and cost per account, rolled up from Redis counters and periodically reconciled against assistant_response_end messages.';
+
+COMMIT;
@@ -0,0 +1,161 @@
+-- Migration: Daily token usage rollup per account and model
+-- Maintained by a trigger on assistant_response_end messages, so usage reporting reads
+-- a few rows per day instead of scanning and parsing the messages table.
+-- Cost is summed from the per-message cost the backend stores in messages.metadata:
+-- model prices are tiered, so summed tokens cannot be priced after the fact.
+-- Messages created before this migration are rolled up by
+-- backend/utils/scripts/backfill_usage_rollup.py, in batches outside of this transaction.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS usage_daily_rollup (
+    account_id UUID NOT NULL REFERENCES basejump.accounts(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    model TEXT NOT NULL,
+
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    cost NUMERIC(18, 8) NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (account_id, day, model)
+);
+
+CREATE INDEX IF NOT EXISTS idx_usage_daily_rollup_day ON usage_daily_rollup(day);
+
+ALTER TABLE usage_daily_rollup ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY usage_daily_rollup_select_own ON usage_daily_rollup
+    FOR SELECT
+    USING (basejump.has_role_on_account(account_id) = true);
+
+GRANT SELECT ON TABLE usage_daily_rollup TO authenticated;
+GRANT ALL PRIVILEGES ON TABLE usage_daily_rollup TO service_role;
+
+-- Progress of the backfill. Messages created before cutoff are rolled up by the
+-- backfill job, later ones by the trigger, so no message is counted twice.
+CREATE TABLE IF NOT EXISTS usage_daily_rollup_backfill (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    cutoff TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    cursor_created_at TIMESTAMPTZ,
+    cursor_message_id UUID,
+    completed_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO usage_daily_rollup_backfill (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+ALTER TABLE usage_daily_rollup_backfill ENABLE ROW LEVEL SECURITY;
+GRANT ALL PRIVILEGES ON TABLE usage_daily_rollup_backfill TO service_role;
+
+CREATE OR REPLACE FUNCTION record_usage_daily_rollup()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    INSERT INTO usage_daily_rollup (account_id, day, model, prompt_tokens, completion_tokens, message_count, cost)
+    SELECT
+        t.account_id,
+        (NEW.created_at AT TIME ZONE 'UTC')::date,
+        COALESCE(NEW.content->>'model', 'unknown'),
+        COALESCE((NEW.content->'usage'->>'prompt_tokens')::numeric, 0)::bigint,
+        COALESCE((NEW.content->'usage'->>'completion_tokens')::numeric, 0)::bigint,
+        1,
+        COALESCE((NEW.metadata->>'cost')::numeric, 0)
+    FROM threads t, usage_daily_rollup_backfill b
+    WHERE t.thread_id = NEW.thread_id
+      AND t.account_id IS NOT NULL
+      AND NEW.created_at >= b.cutoff
+    ON CONFLICT (account_id, day, model) DO UPDATE SET
+        prompt_tokens = usage_daily_rollup.prompt_tokens + EXCLUDED.prompt_tokens,
+        completion_tokens = usage_daily_rollup.completion_tokens + EXCLUDED.completion_tokens,
+        message_count = usage_daily_rollup.message_count + EXCLUDED.message_count,
+        cost = usage_daily_rollup.cost + EXCLUDED.cost,
+        updated_at = NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_usage_daily_rollup ON messages;
+CREATE TRIGGER trigger_usage_daily_rollup
+    AFTER INSERT ON messages
+    FOR EACH ROW
+    WHEN (NEW.type = 'assistant_response_end')
+    EXECUTE FUNCTION record_usage_daily_rollup();
+
+-- Next batch of messages for the backfill job, after its cursor and before the cutoff
+CREATE OR REPLACE FUNCTION get_usage_daily_rollup_backfill_batch(p_limit INTEGER DEFAULT 1000)
+RETURNS TABLE (message_id UUID, account_id UUID, created_at TIMESTAMPTZ, content JSONB)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT m.message_id, t.account_id, m.created_at, m.content
+    FROM usage_daily_rollup_backfill b
+    JOIN messages m
+      ON m.type = 'assistant_response_end'
+     AND m.created_at < b.cutoff
+     AND (b.cursor_created_at IS NULL OR (m.created_at, m.message_id) > (b.cursor_created_at, b.cursor_message_id))
+    JOIN threads t ON t.thread_id = m.thread_id
+    ORDER BY m.created_at, m.message_id
+    LIMIT p_limit;
+$$;
+
+-- Add a priced batch to the rollup and advance the cursor in one transaction.
+-- A batch at or behind the cursor was already applied and is skipped.
+CREATE OR REPLACE FUNCTION apply_usage_daily_rollup_backfill(
+    p_rows JSONB,
+    p_cursor_created_at TIMESTAMPTZ,
+    p_cursor_message_id UUID
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_state usage_daily_rollup_backfill%ROWTYPE;
+BEGIN
+    SELECT * INTO v_state FROM usage_daily_rollup_backfill WHERE id FOR UPDATE;
+
+    IF v_state.cursor_created_at IS NOT NULL
+       AND (p_cursor_created_at, p_cursor_message_id) <= (v_state.cursor_created_at, v_state.cursor_message_id) THEN
+        RETURN FALSE;
+    END IF;
+
+    INSERT INTO usage_daily_rollup (account_id, day, model, prompt_tokens, completion_tokens, message_count, cost)
+    SELECT r.account_id, r.day, r.model, r.prompt_tokens, r.completion_tokens, r.message_count, r.cost
+    FROM jsonb_to_recordset(p_rows) AS r(
+        account_id UUID, day DATE, model TEXT, prompt_tokens BIGINT, completion_tokens BIGINT, message_count INTEGER, cost NUMERIC
+    )
+    ON CONFLICT (account_id, day, model) DO UPDATE SET
+        prompt_tokens = usage_daily_rollup.prompt_tokens + EXCLUDED.prompt_tokens,
+        completion_tokens = usage_daily_rollup.completion_tokens + EXCLUDED.completion_tokens,
+        message_count = usage_daily_rollup.message_count + EXCLUDED.message_count,
+        cost = usage_daily_rollup.cost + EXCLUDED.cost,
+        updated_at = NOW();
+
+    UPDATE usage_daily_rollup_backfill
+    SET cursor_created_at = p_cursor_created_at,
+        cursor_message_id = p_cursor_message_id,
+        updated_at = NOW()
+    WHERE id;
+
+    RETURN TRUE;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION get_usage_daily_rollup_backfill_batch(INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION apply_usage_daily_rollup_backfill(JSONB, TIMESTAMPTZ, UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_usage_daily_rollup_backfill_batch(INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION apply_usage_daily_rollup_backfill(JSONB, TIMESTAMPTZ, UUID) TO service_role;
+
+COMMENT ON TABLE usage_daily_rollup IS 'Token usage and cost per account, UTC day and model, maintained from assistant_response_end messages by trigger_usage_daily_rollup.';
+COMMENT ON TABLE usage_daily_rollup_backfill IS 'Cursor of backfill_usage_rollup.py over messages created before the rollup trigger existed.';
+
+COMMIT;
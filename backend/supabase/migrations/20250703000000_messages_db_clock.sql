@@ -0,0 +1,12 @@
+-- Migration: Stamp messages with the database clock at insert time
+-- Every insert path leaves created_at to the column default, so the rows of a thread
+-- are ordered by one clock. clock_timestamp() advances within a transaction, which
+-- keeps the rows of one bulk insert (the status message write-behind) in order;
+-- NOW() would give them all the same transaction start time.
+
+BEGIN;
+
+ALTER TABLE messages ALTER COLUMN created_at SET DEFAULT clock_timestamp();
+ALTER TABLE messages ALTER COLUMN updated_at SET DEFAULT clock_timestamp();
+
+COMMIT;
@@ -0,0 +1,11 @@
+-- Migration: Private bucket for images the vision tool reads from user workspaces
+-- Objects are stored under the project ID and only handed to models as signed URLs
+-- that expire, unlike the public browser-screenshots bucket.
+
+BEGIN;
+
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('vision-images', 'vision-images', false)
+ON CONFLICT (id) DO NOTHING; -- Avoid error if bucket already exists
+
+COMMIT;
@@ -0,0 +1,17 @@
+import pytest
+
+from agentpress.utils import token_cache
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """Count one token per character and record every counted message."""
+    calls = []
+
+    def fake_token_counter(model="", messages=None):
+        calls.extend(messages)
+        return sum(len(str(m.get('content', ''))) for m in messages)
+
+    monkeypatch.setattr(token_cache, "token_counter", fake_token_counter)
+    token_cache.token_count_cache.clear()
+    return calls
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from sandbox.docker import browser_api
+from sandbox.docker.browser_api import BrowserAutomation
+
+
+def _element(index, y, text=""):
+    return {
+        "index": index,
+        "tagName": "button",
+        "text": text,
+        "attributes": {},
+        "isVisible": True,
+        "isInteractive": True,
+        "pageCoordinates": {"x": 10, "y": y, "width": 80, "height": 20},
+        "isInViewport": True,
+    }
+
+
+def _layout(index, y, in_viewport=True):
+    return {"index": index, "pageCoordinates": {"x": 10, "y": y, "width": 80, "height": 20}, "isInViewport": in_viewport}
+
+
+def _delta(document_id, full, changed=(), removed=(), layout=(), scroll_y=0):
+    return {
+        "id": document_id, "full": full, "changed": list(changed), "removed": list(removed),
+        "layout": list(layout), "scrollX": 0, "scrollY": scroll_y,
+    }
+
+
+class FakePage:
+    """Returns scripted index deltas and records which collects asked for a full scan."""
+
+    def __init__(self, deltas):
+        self.deltas = list(deltas)
+        self.requested_full = []
+
+    async def evaluate(self, script, full):
+        self.requested_full.append(full)
+        return self.deltas.pop(0)
+
+
+def _collect(automation, page, times):
+    async def scenario():
+        return [await automation.collect_interactive_elements(page) for _ in range(times)]
+
+    return asyncio.run(scenario())
+
+
+def test_deltas_are_merged_into_the_cached_elements(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    automation = BrowserAutomation()
+    page = FakePage([
+        _delta("doc", True, changed=[_element(1, 100), _element(2, 200), _element(3, 300)]),
+        _delta("doc", False, changed=[_element(3, 300, text="typed")], removed=[2], scroll_y=150),
+    ])
+
+    first, second = _collect(automation, page, 2)
+
+    assert page.requested_full == [True, False]
+    assert [element["index"] for element in first] == [1, 2, 3]
+    # Unchanged elements keep their index; removed ones are dropped
+    assert [element["index"] for element in second] == [1, 3]
+    assert second[1]["text"] == "typed"
+    # Viewport coordinates follow the scroll position of the latest collect
+    assert [element["viewportCoordinates"]["y"] for element in second] == [-50, 150]
+    assert second[0]["pageCoordinates"]["y"] == 100
+
+
+def test_insertion_above_moves_the_unchanged_elements(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    automation = BrowserAutomation()
+    page = FakePage([
+        _delta("doc", True, changed=[_element(1, 100, text="first"), _element(2, 700, text="second")]),
+        # A 400px banner is inserted above both: only the new element is described,
+        # the others come back as re-measured rects
+        _delta("doc", False, changed=[_element(3, 50, text="banner")], layout=[_layout(1, 500), _layout(2, 1100, in_viewport=False)]),
+    ])
+
+    _, after_insert = _collect(automation, page, 2)
+
+    by_index = {element["index"]: element for element in after_insert}
+    assert by_index[1]["text"] == "first"
+    assert by_index[1]["pageCoordinates"]["y"] == 500
+    assert by_index[1]["viewportCoordinates"]["y"] == 500
+    assert by_index[2]["pageCoordinates"]["y"] == 1100
+    assert by_index[2]["isInViewport"] is False
+    assert by_index[3]["text"] == "banner"
+
+
+def test_new_document_resets_the_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    automation = BrowserAutomation()
+    page = FakePage([
+        _delta("old", True, changed=[_element(1, 100), _element(2, 200)]),
+        # After a navigation the new document's index starts over with a full scan
+        _delta("new", True, changed=[_element(1, 50, text="fresh")]),
+    ])
+
+    _, after_navigation = _collect(automation, page, 2)
+
+    assert [(element["index"], element["text"]) for element in after_navigation] == [(1, "fresh")]
+
+
+def test_full_rescan_is_requested_periodically(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(browser_api, "ELEMENT_INDEX_FULL_REFRESH", 2)
+    automation = BrowserAutomation()
+    page = FakePage([
+        _delta("doc", True, changed=[_element(1, 100)]),
+        _delta("doc", False),
+        _delta("doc", True, changed=[_element(1, 100)]),
+    ])
+
+    elements = _collect(automation, page, 3)
+
+    assert page.requested_full == [True, False, True]
+    assert [element["index"] for element in elements[-1]] == [1]
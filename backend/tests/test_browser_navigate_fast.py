@@ -0,0 +1,26 @@
+import asyncio
+
+from agent.tools.sb_browser_tool import SandboxBrowserTool
+
+
+def _navigate(fast_navigation=None, **kwargs):
+    calls = []
+    tool = SandboxBrowserTool("project", "thread", thread_manager=None, fast_navigation=fast_navigation)
+
+    async def execute(endpoint, params=None, method="POST"):
+        calls.append((endpoint, params))
+
+    tool._execute_browser_action = execute
+    asyncio.run(tool.browser_navigate_to("https://example.com", **kwargs))
+    return calls[0][1]
+
+
+def test_fast_is_left_to_the_sandbox_default_when_unset():
+    assert _navigate() == {"url": "https://example.com"}
+
+
+def test_agent_setting_and_explicit_fast_are_sent():
+    assert _navigate(fast_navigation=True)["fast"] is True
+    assert _navigate(fast_navigation=False)["fast"] is False
+    # An explicit value from the tool call wins, including the string form of XML attributes
+    assert _navigate(fast_navigation=True, fast="false")["fast"] is False
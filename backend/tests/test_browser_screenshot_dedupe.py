@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import hashlib
+import io
+from types import SimpleNamespace
+
+from PIL import Image, ImageDraw
+
+from agent.tools import sb_browser_tool
+from agent.tools.sb_browser_tool import SandboxBrowserTool
+
+
+def _jpeg(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _tool(monkeypatch, files=None):
+    uploads = []
+
+    async def upload_image(image_data):
+        uploads.append(image_data)
+        return f"https://storage/{len(uploads)}.jpg"
+
+    async def download_file(path):
+        return files[path]
+
+    monkeypatch.setattr(sb_browser_tool, "upload_image", upload_image)
+    tool = SandboxBrowserTool("project", "thread", thread_manager=None)
+    tool._sandbox = SimpleNamespace(fs=SimpleNamespace(download_file=download_file))
+    return tool, uploads
+
+
+def _page(typed=""):
+    """A 1024x768 page with a search field, optionally with text typed into it."""
+    image = Image.new("RGB", (1024, 768), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((200, 100, 824, 140), outline="gray")
+    draw.text((210, 112), typed, fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=60)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def test_only_identical_screenshots_reuse_the_previous_upload(monkeypatch):
+    tool, uploads = _tool(monkeypatch)
+    results = [
+        {"screenshot_base64": _page()},
+        {"screenshot_base64": _page()},
+        # Typing into the field barely changes the page, but it must not be deduplicated
+        {"screenshot_base64": _page("hello world my search query")},
+    ]
+
+    async def scenario():
+        for result in results:
+            await tool._attach_screenshot(result)
+
+    asyncio.run(scenario())
+    assert [result["image_url"] for result in results] == ["https://storage/1.jpg", "https://storage/1.jpg", "https://storage/2.jpg"]
+    assert len(uploads) == 2
+    assert all("screenshot_base64" not in result and "screenshot_hash" not in result for result in results)
+
+
+def test_content_hash_from_the_browser_api_skips_the_download(monkeypatch):
+    image = _jpeg("black")
+    tool, uploads = _tool(monkeypatch, files={"/tmp/browser_screenshots/a.jpg": image})
+    digest = hashlib.sha256(image).hexdigest()
+    results = [
+        {"screenshot_path": "/tmp/browser_screenshots/a.jpg", "screenshot_hash": digest},
+        # Gone from the sandbox, so reusing the upload must not need it
+        {"screenshot_path": "/tmp/browser_screenshots/b.jpg", "screenshot_hash": digest},
+    ]
+
+    async def scenario():
+        for result in results:
+            await tool._attach_screenshot(result)
+
+    asyncio.run(scenario())
+    assert uploads == [image]
+    assert [result["image_url"] for result in results] == ["https://storage/1.jpg"] * 2
+
+
+def test_binary_transfer_reads_the_screenshot_from_the_sandbox(monkeypatch):
+    image = _jpeg("black")
+    tool, uploads = _tool(monkeypatch, files={"/tmp/browser_screenshots/a.jpg": image})
+    result = {"screenshot_path": "/tmp/browser_screenshots/a.jpg", "screenshot_hash": "00" * 32}
+
+    asyncio.run(tool._attach_screenshot(result))
+
+    assert uploads == [image]
+    assert result["image_url"] == "https://storage/1.jpg"
+    assert "screenshot_path" not in result
@@ -0,0 +1,26 @@
+import asyncio
+from types import SimpleNamespace
+
+from agent.tools.computer_use_tool import ComputerUseTool
+
+
+class FakeSandbox:
+    id = "sandbox"
+
+    def __init__(self):
+        self.preview_calls = []
+
+    async def get_preview_link(self, port):
+        self.preview_calls.append(port)
+        return SimpleNamespace(url="https://8000-sandbox.example")
+
+
+def test_api_url_is_resolved_once_from_the_preview_link():
+    sandbox = FakeSandbox()
+    tool = ComputerUseTool(sandbox)
+
+    async def scenario():
+        return [await tool._get_api_base_url() for _ in range(2)]
+
+    assert asyncio.run(scenario()) == ["https://8000-sandbox.example"] * 2
+    assert sandbox.preview_calls == [8000]
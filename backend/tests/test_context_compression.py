@@ -0,0 +1,53 @@
+import json
+
+from agentpress.thread_manager import ThreadManager
+
+
+def _tool_result(message_id, size):
+    return {"role": "user", "content": json.dumps({"tool_execution": {"result": "r" * size}}), "message_id": message_id}
+
+
+def _thread():
+    return [
+        {"role": "system", "content": "system prompt"},
+        {"role": "user", "content": "first task", "message_id": "u1"},
+        {"role": "assistant", "content": "a" * 500, "message_id": "a1"},
+        _tool_result("t1", 8000),
+        {"role": "assistant", "content": "b" * 500, "message_id": "a2"},
+        _tool_result("t2", 8000),
+        {"role": "user", "content": "latest question", "message_id": "u2"},
+    ]
+
+
+def test_compresses_old_tool_results_first(counted):
+    tm = ThreadManager()
+    result = tm._compress_messages(_thread(), "gpt-4o", max_tokens=12000, compressed_length=1000)
+
+    by_id = {msg.get("message_id"): msg for msg in result}
+    assert result[0]["content"] == "system prompt"
+    assert by_id["u2"]["content"] == "latest question"
+    assert 'message_id "t1"' in by_id["t1"]["content"]
+    assert "Use expand-message tool to see contents" in by_id["t1"]["content"]
+    # Latest tool result and the assistant messages are left alone once under budget
+    assert 'message_id "t2"' not in by_id["t2"]["content"]
+    assert by_id["a1"]["content"] == "a" * 500
+
+
+def test_measures_each_message_once(counted):
+    tm = ThreadManager()
+    messages = _thread()
+    tm._compress_messages(messages, "gpt-4o", max_tokens=10000, compressed_length=1000)
+
+    # One count per original message plus one per compressed replacement
+    assert len(counted) == len(messages) + 1
+
+
+def test_drops_oldest_messages_when_compression_is_not_enough(counted):
+    tm = ThreadManager()
+    result = tm._compress_messages(_thread(), "gpt-4o", max_tokens=3000, compressed_length=1000)
+
+    ids = [msg.get("message_id") for msg in result]
+    assert result[0]["role"] == "system"
+    assert "u1" not in ids
+    assert ids[-1] == "u2"
+    assert "t2" in ids
@@ -0,0 +1,167 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from agent.tools.mcp_tool_wrapper import MCPToolWrapper
+from mcp_local import session_pool
+from mcp_local.session_pool import MCPSessionPool
+
+
+class FakeMcpError(Exception):
+    pass
+
+
+class FakeServer:
+    """Counts connections and fails calls while broken."""
+
+    def __init__(self):
+        self.connections = 0
+        self.closed = 0
+        self.broken = False
+        self.calls = 0
+
+
+def _install(monkeypatch, server):
+    monkeypatch.setattr(session_pool, "McpError", FakeMcpError)
+
+    @asynccontextmanager
+    async def open_transport(transport, server_config):
+        server.connections += 1
+        try:
+            yield None, None
+        finally:
+            server.closed += 1
+
+    class ClientSession:
+        def __init__(self, read, write):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def initialize(self):
+            pass
+
+        async def send_ping(self):
+            if server.broken:
+                raise ConnectionError("gone")
+
+        async def list_tools(self):
+            if server.broken:
+                server.broken = False
+                raise ConnectionError("connection reset")
+            return ["echo"]
+
+        async def call_tool(self, name, arguments):
+            server.calls += 1
+            if server.broken:
+                server.broken = False
+                raise ConnectionError("connection reset")
+            if name == "invalid":
+                raise FakeMcpError("unknown tool")
+            return f"{name}:{arguments['x']}"
+
+    monkeypatch.setattr(session_pool, "open_transport", open_transport)
+    monkeypatch.setattr(session_pool, "ClientSession", ClientSession)
+
+
+def test_calls_reuse_one_session_per_server_config(monkeypatch):
+    server = FakeServer()
+    _install(monkeypatch, server)
+    pool = MCPSessionPool(max_sessions=4, idle_ttl=60)
+
+    async def scenario():
+        results = await asyncio.gather(*(pool.call_tool("sse", {"url": "a"}, "echo", {"x": i}) for i in range(5)))
+        await pool.call_tool("sse", {"url": "b"}, "echo", {"x": 0})
+        stats = pool.get_stats()
+        await pool.close_all()
+        return results, stats
+
+    results, stats = asyncio.run(scenario())
+    assert results == [f"echo:{i}" for i in range(5)]
+    assert server.connections == 2
+    assert stats["sessions"] == 2
+    assert server.closed == 2
+
+
+def test_broken_session_is_replaced_but_tool_calls_are_not_retried(monkeypatch):
+    server = FakeServer()
+    _install(monkeypatch, server)
+    pool = MCPSessionPool(max_sessions=4, idle_ttl=60)
+
+    async def scenario():
+        await pool.call_tool("http", {"url": "a"}, "echo", {"x": 1})
+        server.broken = True
+        with pytest.raises(ConnectionError):
+            await pool.call_tool("http", {"url": "a"}, "echo", {"x": 2})
+        result = await pool.call_tool("http", {"url": "a"}, "echo", {"x": 3})
+        with pytest.raises(FakeMcpError):
+            await pool.call_tool("http", {"url": "a"}, "invalid", {"x": 4})
+        await pool.close_all()
+        return result
+
+    assert asyncio.run(scenario()) == "echo:3"
+    # The failed call reached the server once; only the reset connection was replaced
+    assert server.calls == 4
+    assert server.connections == 2
+
+
+def test_list_tools_reconnects_and_retries_once(monkeypatch):
+    server = FakeServer()
+    _install(monkeypatch, server)
+    pool = MCPSessionPool(max_sessions=4, idle_ttl=60)
+
+    async def scenario():
+        await pool.list_tools("sse", {"url": "a"})
+        server.broken = True
+        tools = await pool.list_tools("sse", {"url": "a"})
+        await pool.close_all()
+        return tools
+
+    assert asyncio.run(scenario()) == ["echo"]
+    assert server.connections == 2
+
+
+def test_stdio_servers_are_not_shared_between_runs(monkeypatch):
+    server = FakeServer()
+    _install(monkeypatch, server)
+    stdio = {"command": "npx", "args": ["server"]}
+
+    async def scenario():
+        runs = [MCPToolWrapper(mcp_configs=[]) for _ in range(2)]
+        for run in runs:
+            await run._pool_for("stdio").call_tool("stdio", stdio, "echo", {"x": 0})
+        opened = server.connections
+        for run in runs:
+            await run.cleanup()
+        return runs, opened
+
+    runs, opened = asyncio.run(scenario())
+    assert runs[0]._pool_for("stdio") is not runs[1]._pool_for("stdio")
+    assert runs[0]._pool_for("sse") is runs[1]._pool_for("sse")
+    assert opened == 2
+    assert server.closed == 2
+
+
+def test_idle_sessions_are_evicted_and_pool_size_is_capped(monkeypatch):
+    server = FakeServer()
+    _install(monkeypatch, server)
+    pool = MCPSessionPool(max_sessions=2, idle_ttl=60)
+
+    async def scenario():
+        for url in ("a", "b", "c"):
+            await pool.call_tool("sse", {"url": url}, "echo", {"x": 0})
+        capped = pool.get_stats()["sessions"]
+        pool.idle_ttl = 0
+        await asyncio.sleep(0.01)
+        await pool.call_tool("sse", {"url": "d"}, "echo", {"x": 0})
+        return capped, pool.get_stats()["sessions"], server.closed
+
+    capped, after_idle, closed = asyncio.run(scenario())
+    assert capped == 2
+    assert after_idle == 1
+    assert closed == 3
@@ -0,0 +1,120 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from agent.tools.mcp_tool_wrapper import MCPToolWrapper
+from mcp_local import tool_cache
+from services import redis
+
+
+@pytest.fixture
+def store(monkeypatch):
+    data = {}
+
+    async def get(key, default=None):
+        return data.get(key, default)
+
+    async def set(key, value, ex=None, nx=False):
+        if nx and key in data:
+            return None
+        data[key] = value
+        return True
+
+    monkeypatch.setattr(redis, "get", get)
+    monkeypatch.setattr(redis, "set", set)
+    return data
+
+
+def _tool(name):
+    return SimpleNamespace(name=name, description=f"{name} tool", inputSchema={"type": "object", "properties": {}})
+
+
+def _wrapper(monkeypatch, delays):
+    calls = []
+    wrapper = MCPToolWrapper(mcp_configs=[
+        {"name": name, "qualifiedName": name, "isCustom": True, "customType": "sse", "config": {"url": f"https://{name}"}, "enabledTools": []}
+        for name in delays
+    ])
+
+    async def list_tools(transport, server_config, timeout=30):
+        name = server_config["url"].removeprefix("https://")
+        calls.append(name)
+        await asyncio.sleep(delays[name])
+        return [_tool(f"{name}_search")]
+
+    monkeypatch.setattr(wrapper.session_pool, "list_tools", list_tools)
+    return wrapper, calls
+
+
+def test_servers_are_discovered_concurrently_and_cached(store, monkeypatch):
+    delays = {"alpha": 0.3, "beta": 0.3, "gamma": 0.3}
+
+    async def scenario():
+        wrapper, calls = _wrapper(monkeypatch, delays)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await wrapper._ensure_initialized()
+        elapsed = loop.time() - started
+
+        second, second_calls = _wrapper(monkeypatch, delays)
+        await second._ensure_initialized()
+        return wrapper, calls, elapsed, second, second_calls
+
+    wrapper, calls, elapsed, second, second_calls = asyncio.run(scenario())
+    assert sorted(calls) == ["alpha", "beta", "gamma"]
+    assert elapsed < 0.6
+    assert set(wrapper._custom_tools) == {"custom_alpha_alpha_search", "custom_beta_beta_search", "custom_gamma_gamma_search"}
+    # The next run starts from cached schemas without connecting
+    assert second_calls == []
+    assert set(second._custom_tools) == set(wrapper._custom_tools)
+
+
+def test_stale_entries_are_served_and_refreshed_in_the_background(store, monkeypatch):
+    cache = tool_cache.MCPToolCache()
+    key = cache.make_key("alpha", "sse", {"url": "https://alpha"})
+    store[key] = json.dumps({"fetched_at": 0, "tools": [{"name": "old", "description": None, "inputSchema": {}}]})
+
+    async def discover():
+        return [_tool("new")]
+
+    async def scenario():
+        tools = await cache.get_tools("alpha", "sse", {"url": "https://alpha"}, discover)
+        await asyncio.gather(*cache._tasks)
+        refreshed = await cache.get_tools("alpha", "sse", {"url": "https://alpha"}, discover)
+        return tools, refreshed
+
+    tools, refreshed = asyncio.run(scenario())
+    assert [tool.name for tool in tools] == ["old"]
+    assert [tool.name for tool in refreshed] == ["new"]
+
+
+def test_stale_stdio_entries_are_not_refreshed_in_the_background(store, monkeypatch):
+    cache = tool_cache.MCPToolCache()
+    stdio = {"command": "npx", "args": ["server"]}
+    key = cache.make_key("local", "stdio", stdio)
+    store[key] = json.dumps({"fetched_at": 0, "tools": [{"name": "old", "description": None, "inputSchema": {}}]})
+    calls = []
+
+    async def discover():
+        calls.append("local")
+        return [_tool("new")]
+
+    tools = asyncio.run(cache.get_tools("local", "stdio", stdio, discover))
+    assert [tool.name for tool in tools] == ["old"]
+    assert cache._tasks == set()
+    assert calls == []
+
+
+def test_corrupt_entries_are_rediscovered(store, monkeypatch):
+    cache = tool_cache.MCPToolCache()
+    key = cache.make_key("alpha", "sse", {"url": "https://alpha"})
+    store[key] = "{not json"
+
+    async def discover():
+        return [_tool("new")]
+
+    tools = asyncio.run(cache.get_tools("alpha", "sse", {"url": "https://alpha"}, discover))
+    assert [tool.name for tool in tools] == ["new"]
+    assert json.loads(store[key])["tools"][0]["name"] == "new"
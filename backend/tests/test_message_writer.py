@@ -0,0 +1,122 @@
+import asyncio
+
+from agentpress.message_writer import MessageWriter
+from agentpress.thread_manager import ThreadManager
+from utils.supabase_fake import InMemoryQuery, InMemorySupabase
+
+
+class FakeDB:
+    def __init__(self, client):
+        self._client = client
+
+    @property
+    async def client(self):
+        return self._client
+
+
+class FailingRowsQuery(InMemoryQuery):
+    """Rejects an insert as a whole when any of its rows is marked as bad."""
+
+    async def execute(self):
+        if self._op == "insert":
+            rows = self._payload if isinstance(self._payload, list) else [self._payload]
+            if any(row.get("bad") for row in rows):
+                raise ValueError("bad row")
+        return await super().execute()
+
+
+class FailingRowsSupabase(InMemorySupabase):
+    def table(self, name):
+        return FailingRowsQuery(self, name)
+
+
+def _status(n):
+    return {"thread_id": "thread", "type": "status", "content": {"n": n}, "is_llm_message": False}
+
+
+def test_queued_rows_are_written_in_one_batch_in_order():
+    client = InMemorySupabase()
+    writer = MessageWriter(FakeDB(client), flush_interval=60)
+
+    async def scenario():
+        rows = [writer.enqueue(_status(n)) for n in range(5)]
+        assert client.tables.get("messages") is None
+        await writer.flush()
+        return rows
+
+    rows = asyncio.run(scenario())
+    stored = client.tables["messages"]
+    assert client.calls["messages.insert"] == 1
+    assert [row["message_id"] for row in stored] == [row["message_id"] for row in rows]
+    assert [row["content"]["n"] for row in stored] == list(range(5))
+    # The stored timestamp comes from the database, not from the worker
+    assert all(row["created_at"] for row in rows)
+
+
+def test_full_queue_is_flushed_without_waiting_for_the_interval():
+    client = InMemorySupabase()
+    writer = MessageWriter(FakeDB(client), flush_interval=60, max_batch_size=3)
+
+    async def scenario():
+        for n in range(3):
+            writer.enqueue(_status(n))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert len(client.tables["messages"]) == 3
+    assert writer.pending_count == 0
+
+
+def test_close_drains_the_queue_and_runs_callbacks():
+    client = InMemorySupabase()
+    writer = MessageWriter(FakeDB(client), flush_interval=60)
+    written = []
+
+    async def on_written(row):
+        written.append(row["message_id"])
+
+    async def scenario():
+        row = writer.enqueue(_status(0), on_written=on_written)
+        writer.enqueue(_status(1))
+        await writer.close()
+        return row
+
+    row = asyncio.run(scenario())
+    assert writer.pending_count == 0
+    assert len(client.tables["messages"]) == 2
+    assert written == [row["message_id"]]
+
+
+def test_failed_batch_is_retried_row_by_row():
+    client = FailingRowsSupabase()
+    writer = MessageWriter(FakeDB(client), flush_interval=60)
+    written = []
+
+    async def on_written(row):
+        written.append(row["content"]["n"])
+
+    async def scenario():
+        writer.enqueue(_status(0), on_written=on_written)
+        writer.enqueue({**_status(1), "bad": True}, on_written=on_written)
+        writer.enqueue(_status(2), on_written=on_written)
+        await writer.flush()
+
+    asyncio.run(scenario())
+    assert [row["content"]["n"] for row in client.tables["messages"]] == [0, 2]
+    assert written == [0, 2]
+
+
+def test_direct_insert_writes_queued_rows_first():
+    client = InMemorySupabase()
+    manager = ThreadManager()
+    manager.db = manager.message_writer.db = FakeDB(client)
+    manager.message_writer.flush_interval = 60
+
+    async def scenario():
+        await manager.add_message("thread", "status", {"status_type": "thread_run_start"})
+        await manager.add_message("thread", "tool", {"role": "tool", "content": "ok"}, is_llm_message=True)
+
+    asyncio.run(scenario())
+    assert [row["type"] for row in client.tables["messages"]] == ["status", "tool"]
+    assert all("created_at" in row for row in client.tables["messages"])
@@ -0,0 +1,80 @@
+import pytest
+
+from agentpress.prompt_cache import StablePrefixCache, apply_cache_breakpoints, match_frozen_prefix
+from agentpress.thread_manager import ThreadManager
+from agentpress.utils import token_cache
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(token_cache, "token_counter", lambda model="", messages=None: sum(len(str(m.get('content', ''))) for m in messages))
+    token_cache.token_count_cache.clear()
+    tm = ThreadManager()
+    tm.prefix_cache = StablePrefixCache()
+    return tm
+
+
+def test_breakpoints_mark_copies():
+    messages = [
+        {"role": "system", "content": "system"},
+        {"role": "user", "content": [{"type": "text", "text": "a"}, {"type": "text", "text": "b"}]},
+        {"role": "assistant", "content": "c"},
+    ]
+    marked, applied = apply_cache_breakpoints(messages, [0, 1, 7])
+
+    assert applied == 2
+    assert marked[0]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in marked[1]["content"][0]
+    assert marked[1]["content"][1]["cache_control"] == {"type": "ephemeral"}
+    assert marked[2] is messages[2]
+    # Inputs are left untouched so frozen prefixes can be reused
+    assert messages[0]["content"] == "system"
+    assert "cache_control" not in messages[1]["content"][1]
+
+
+def test_match_frozen_prefix():
+    frozen = [{"message_id": "a"}, {"message_id": "b"}, {"message_id": "c"}]
+    assert match_frozen_prefix(frozen, [{"message_id": "a"}, {"message_id": "b"}, {"message_id": "x"}]) == (2, 2)
+    assert match_frozen_prefix(frozen, [{"message_id": "a"}, {"content": "temp"}]) == (1, 1)
+    # Messages dropped from the rendered prefix are skipped in the history
+    history = [{"message_id": m} for m in ("old", "a", "gap", "b", "c", "new")]
+    assert match_frozen_prefix(frozen, history) == (3, 5)
+
+
+def test_prefix_is_reused_verbatim_across_turns(manager):
+    system = {"role": "system", "content": "system"}
+    history = [
+        {"role": "user", "content": "task", "message_id": "u1"},
+        {"role": "assistant", "content": "answer", "message_id": "a1"},
+    ]
+    first, first_breakpoints = manager._prepare_cache_stable_messages("t", system, history, None, "anthropic/claude-sonnet-4")
+    assert first_breakpoints == [0, 2]
+
+    history = history + [{"role": "user", "content": "follow up", "message_id": "u2"}]
+    temp = {"role": "user", "content": "browser state"}
+    second, second_breakpoints = manager._prepare_cache_stable_messages("t", system, history, temp, "anthropic/claude-sonnet-4")
+
+    assert second[:3] == first
+    assert second[3]["message_id"] == "u2"
+    assert second[4] is temp
+    assert second_breakpoints == [0, 2, 3]
+
+
+def test_long_thread_keeps_its_prefix_across_turns(manager):
+    system = {"role": "system", "content": "system"}
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}", "message_id": f"m{i}"}
+        for i in range(330)
+    ]
+    first, first_breakpoints = manager._prepare_cache_stable_messages("t", system, history, None, "anthropic/claude-sonnet-4")
+    frozen_count = first_breakpoints[-1]
+    # Cut from the middle below the limit, leaving room for the next turns
+    assert frozen_count < 320
+
+    for turn in range(2):
+        history = history + [{"role": "user", "content": f"turn {turn}", "message_id": f"t{turn}"}]
+        prepared, breakpoints = manager._prepare_cache_stable_messages("t", system, history, None, "anthropic/claude-sonnet-4")
+        # The prefix only grows by the turns frozen since, so earlier breakpoints still hit
+        assert breakpoints[:2] == [0, frozen_count + turn]
+        assert prepared[:frozen_count + 1] == first
+        assert prepared[-1]["message_id"] == f"t{turn}"
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from services import redis, response_stream
+
+
+class FakeStreams:
+    """In-memory XADD/XREAD with sequential entry IDs."""
+
+    def __init__(self):
+        self.entries = {}
+        self.seq = 0
+        self.batches = []
+
+    async def xadd(self, key, fields, maxlen=None, approximate=True):
+        self.seq += 1
+        entry_id = f"{self.seq}-0"
+        self.entries.setdefault(key, []).append((entry_id, dict(fields)))
+        return entry_id
+
+    async def xread(self, streams, count=None, block=None):
+        (key, last_id), = streams.items()
+        after = int(last_id.split("-")[0])
+        found = [(entry_id, fields) for entry_id, fields in self.entries.get(key, []) if int(entry_id.split("-")[0]) > after]
+        return [[key, found[:count]]] if found else []
+
+    async def xadd_many(self, key, entries, maxlen=None, approximate=True):
+        self.batches.append(len(entries))
+        return [await self.xadd(key, fields) for fields in entries]
+
+
+@pytest.fixture
+def streams(monkeypatch):
+    fake = FakeStreams()
+    monkeypatch.setattr(redis, "xadd", fake.xadd)
+    monkeypatch.setattr(redis, "xread", fake.xread)
+    monkeypatch.setattr(redis, "xadd_many", fake.xadd_many)
+    return fake
+
+
+async def _collect(last_event_id, running=True):
+    async def is_running():
+        return running
+
+    def is_final(response):
+        return response.get("type") == "status" and response.get("status") == "completed"
+
+    return [event async for event in response_stream.sse_events("s", last_event_id, is_running, is_final)]
+
+
+def test_resumes_after_last_event_id(streams):
+    async def scenario():
+        for i in range(3):
+            await response_stream.append("s", {"type": "assistant", "content": str(i)})
+        await response_stream.append("s", {"type": "status", "status": "completed"})
+        return await _collect("2-0")
+
+    events = asyncio.run(scenario())
+    assert events[0].startswith("id: 3-0\n")
+    assert '"content": "2"' in events[0]
+    assert events[1].startswith("id: 4-0\n")
+    assert len(events) == 2
+
+
+def test_control_entry_ends_stream_and_is_skipped_by_read_all(streams):
+    async def scenario():
+        await response_stream.append("s", {"type": "assistant", "content": "a"})
+        await response_stream.append_control("s", "STOP")
+        return await _collect(None), await response_stream.read_all("s")
+
+    events, responses = asyncio.run(scenario())
+    assert events[-1] == 'id: 2-0\ndata: {"type": "status", "status": "STOP"}\n\n'
+    assert responses == [{"type": "assistant", "content": "a"}]
+
+
+def test_writer_batches_in_order_and_flushes(streams):
+    async def scenario():
+        writer = response_stream.StreamWriter("s", flush_interval=0.01, max_batch=4, max_pending=8)
+        for i in range(10):
+            await writer.write({"content": i})
+        await writer.flush()
+        responses = await response_stream.read_all("s")
+        await writer.close()
+        return responses
+
+    responses = asyncio.run(scenario())
+    assert [r["content"] for r in responses] == list(range(10))
+    assert streams.batches == [4, 4, 2]
+
+
+def test_writer_retries_failed_batches(streams, monkeypatch):
+    monkeypatch.setattr(response_stream, "WRITE_RETRY_BACKOFF", 0)
+    write = streams.xadd_many
+    failures = [ConnectionError("down")]
+
+    async def flaky_xadd_many(key, entries, maxlen=None, approximate=True):
+        if failures:
+            raise failures.pop()
+        return await write(key, entries, maxlen=maxlen)
+
+    monkeypatch.setattr(redis, "xadd_many", flaky_xadd_many)
+
+    async def scenario():
+        writer = response_stream.StreamWriter("s", flush_interval=0.01)
+        for i in range(3):
+            await writer.write({"content": i})
+        await writer.close()
+        return writer, await response_stream.read_all("s")
+
+    writer, responses = asyncio.run(scenario())
+    assert [r["content"] for r in responses] == [0, 1, 2]
+    assert (writer.batches_written, writer.batches_dropped) == (1, 0)
+
+
+def test_writer_marks_dropped_batch_in_stream(streams, monkeypatch):
+    monkeypatch.setattr(response_stream, "WRITE_RETRY_BACKOFF", 0)
+    attempts = []
+
+    async def failing_xadd_many(key, entries, maxlen=None, approximate=True):
+        attempts.append(len(entries))
+        raise ConnectionError("down")
+
+    monkeypatch.setattr(redis, "xadd_many", failing_xadd_many)
+
+    async def scenario():
+        writer = response_stream.StreamWriter("s", flush_interval=0.01)
+        for i in range(3):
+            await writer.write({"content": i})
+        await writer.close()
+        return writer, await response_stream.read_all("s")
+
+    writer, responses = asyncio.run(scenario())
+    assert attempts == [3] * response_stream.WRITE_ATTEMPTS
+    assert writer.batches_dropped == 1
+    assert responses == [{"type": "stream_gap", "dropped": 3, "message": "3 responses could not be written to the stream"}]
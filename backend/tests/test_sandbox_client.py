@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from sandbox import client
+
+
+def test_calls_per_sandbox_are_limited(monkeypatch):
+    monkeypatch.setattr(client.config, "SANDBOX_MAX_CONCURRENT_OPS", 2)
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def blocking_call():
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+
+    async def scenario():
+        await asyncio.gather(*(client.run_sandbox_call("sb-limited", "fs.list_files", blocking_call) for _ in range(6)))
+
+    asyncio.run(scenario())
+    assert running["peak"] == 2
+    assert client.get_latency_stats()["fs.list_files"]["count"] >= 6
+
+
+def test_slow_calls_time_out_and_are_counted(monkeypatch):
+    monkeypatch.setitem(client.OPERATION_TIMEOUTS, "preview", 0.05)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(client.run_sandbox_call("sb-slow", "preview.get_preview_link", time.sleep, 0.5))
+
+    stats = client.get_latency_stats()["preview.get_preview_link"]
+    assert stats["timeouts"] == 1
+    assert stats["errors"] == 1
+
+
+def test_histogram_quantiles_use_bucket_bounds():
+    histogram = client.LatencyHistogram(buckets_ms=(10, 100, 1000))
+    for elapsed in (5, 7, 50, 60, 70, 500, 5000):
+        histogram.observe(elapsed)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["p50_ms"] == 100.0
+    assert snapshot["p95_ms"] is None
+    assert snapshot["buckets"] == {"10": 2, "100": 3, "1000": 1, "+Inf": 1}
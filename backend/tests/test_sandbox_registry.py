@@ -0,0 +1,60 @@
+import asyncio
+
+from utils.supabase_fake import InMemorySupabase
+from sandbox import registry
+
+
+def _counting_lookup(monkeypatch):
+    calls = []
+
+    async def get_or_start_sandbox(sandbox_id):
+        calls.append(sandbox_id)
+        await asyncio.sleep(0.01)
+        return f"handle-{sandbox_id}-{len(calls)}"
+
+    monkeypatch.setattr(registry, "get_or_start_sandbox", get_or_start_sandbox)
+    return calls
+
+
+def test_concurrent_lookups_share_one_daytona_call(monkeypatch):
+    calls = _counting_lookup(monkeypatch)
+    sandboxes = registry.SandboxRegistry(state_ttl=60)
+
+    async def scenario():
+        return await asyncio.gather(*(sandboxes.get_sandbox("sb") for _ in range(8)))
+
+    handles = asyncio.run(scenario())
+    assert set(handles) == {"handle-sb-1"}
+    assert calls == ["sb"]
+
+
+def test_expired_and_invalidated_handles_are_looked_up_again(monkeypatch):
+    calls = _counting_lookup(monkeypatch)
+    sandboxes = registry.SandboxRegistry(state_ttl=0)
+
+    async def scenario():
+        await sandboxes.get_sandbox("sb")
+        await sandboxes.get_sandbox("sb")
+        sandboxes.state_ttl = 60
+        await sandboxes.get_sandbox("sb")
+        sandboxes.invalidate(sandbox_id="sb")
+        return await sandboxes.get_sandbox("sb")
+
+    assert asyncio.run(scenario()) == "handle-sb-3"
+    assert len(calls) == 3
+
+
+def test_sandbox_info_comes_from_the_prewarmed_project(monkeypatch):
+    calls = _counting_lookup(monkeypatch)
+    sandboxes = registry.SandboxRegistry(state_ttl=60)
+    client = InMemorySupabase()
+
+    async def scenario():
+        sandboxes.prewarm("project", {"id": "sb", "pass": "secret"})
+        info = await sandboxes.get_sandbox_info(client, "project")
+        return info, await sandboxes.get_sandbox(info["id"])
+
+    info, handle = asyncio.run(scenario())
+    assert info == {"id": "sb", "pass": "secret"}
+    assert handle == "handle-sb-1"
+    assert calls == ["sb"]
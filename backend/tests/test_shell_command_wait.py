@@ -0,0 +1,77 @@
+import asyncio
+import subprocess
+from types import SimpleNamespace
+
+from agent.tools import sb_shell_tool
+from agent.tools.sb_shell_tool import SandboxShellTool, wrap_blocking_command
+
+
+class LocalProcess:
+    """Runs sandbox exec calls with the local shell and counts them."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def exec(self, command, timeout=None):
+        self.calls += 1
+        result = subprocess.run(["/bin/sh", "-c", command], capture_output=True, text=True, timeout=timeout)
+        return SimpleNamespace(exit_code=result.returncode, result=result.stdout)
+
+
+def _tool():
+    tool = SandboxShellTool("project", thread_manager=None)
+    tool._sandbox = SimpleNamespace(process=LocalProcess())
+    return tool
+
+
+def _start(tmp_path, command):
+    log_file, exit_file = str(tmp_path / "logs" / "cmd.log"), str(tmp_path / "logs" / "cmd.exit")
+    wrapped = wrap_blocking_command(command, str(tmp_path), log_file, exit_file)
+    process = subprocess.Popen(["/bin/bash", "-c", wrapped], stdout=subprocess.DEVNULL)
+    return process, log_file, exit_file
+
+
+def test_returns_real_exit_code_and_output(tmp_path):
+    process, log_file, exit_file = _start(tmp_path, "echo one; sleep 0.3; echo two >&2; exit 3")
+    tool = _tool()
+
+    exit_code, output = asyncio.run(tool._wait_for_command(log_file, exit_file, timeout=10))
+    process.wait()
+
+    assert exit_code == 3
+    assert output == "one\ntwo\n"
+
+
+def test_large_logs_are_read_in_increments(tmp_path, monkeypatch):
+    monkeypatch.setattr(sb_shell_tool, "POLL_READ_LIMIT", 1000)
+    process, log_file, exit_file = _start(tmp_path, "seq 1 2000")
+    process.wait()
+    tool = _tool()
+
+    exit_code, output = asyncio.run(tool._wait_for_command(log_file, exit_file, timeout=10))
+
+    assert exit_code == 0
+    assert output.split() == [str(i) for i in range(1, 2001)]
+    assert tool._sandbox.process.calls > 5
+
+
+def test_unfinished_command_times_out_with_partial_output(tmp_path):
+    process, log_file, exit_file = _start(tmp_path, "echo started; sleep 2")
+    tool = _tool()
+
+    exit_code, output = asyncio.run(tool._wait_for_command(log_file, exit_file, timeout=0.5))
+    process.kill()
+
+    assert exit_code is None
+    assert output == "started\n"
+
+
+def test_trailing_comment_does_not_swallow_the_exit_marker(tmp_path):
+    process, log_file, exit_file = _start(tmp_path, "echo built; pwd # build")
+    tool = _tool()
+
+    exit_code, output = asyncio.run(tool._wait_for_command(log_file, exit_file, timeout=10))
+    process.wait()
+
+    assert exit_code == 0
+    assert output == f"built\n{tmp_path}\n"
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from services import billing, redis
+
+
+@pytest.fixture
+def store(monkeypatch):
+    data = {}
+
+    async def get(key, default=None):
+        return data.get(key, default)
+
+    async def set(key, value, ex=None, nx=False):
+        data[key] = value
+
+    async def delete(key):
+        data.pop(key, None)
+
+    monkeypatch.setattr(redis, "get", get)
+    monkeypatch.setattr(redis, "set", set)
+    monkeypatch.setattr(redis, "delete", delete)
+    return data
+
+
+def test_snapshot_is_served_from_cache_until_invalidated(store, monkeypatch):
+    calls = []
+
+    async def fetch(user_id):
+        calls.append(user_id)
+        return {"id": f"sub_{len(calls)}", "items": {"data": [{"price": {"id": "price"}}]}}
+
+    monkeypatch.setattr(billing, "fetch_user_subscription", fetch)
+
+    async def scenario():
+        first = await billing.get_user_subscription("acct")
+        second = await billing.get_user_subscription("acct")
+        await billing.invalidate_subscription_cache("acct")
+        third = await billing.get_user_subscription("acct")
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert first == second
+    assert third["id"] == "sub_2"
+    assert calls == ["acct", "acct"]
+
+
+def test_stripe_errors_are_not_cached(store, monkeypatch):
+    async def failing_fetch(user_id):
+        raise RuntimeError("stripe down")
+
+    monkeypatch.setattr(billing, "fetch_user_subscription", failing_fetch)
+
+    assert asyncio.run(billing.get_user_subscription("acct")) is None
+    assert store == {}
@@ -0,0 +1,129 @@
+import asyncio
+
+from agentpress.thread_history_cache import ThreadHistoryCache
+from utils.supabase_fake import InMemorySupabase
+
+
+class FakeDB:
+    def __init__(self, client):
+        self._client = client
+
+    @property
+    async def client(self):
+        return self._client
+
+
+def _insert(client, text, created_at, message_id=None):
+    row = {
+        "thread_id": "thread",
+        "type": "user",
+        "is_llm_message": True,
+        "content": {"role": "user", "content": text},
+        "created_at": created_at,
+    }
+    if message_id:
+        row["message_id"] = message_id
+    return client.store("messages", row)
+
+
+def _texts(messages):
+    return [message["content"] for message in messages]
+
+
+def _cache():
+    client = InMemorySupabase()
+    _insert(client, "one", "2025-07-01T10:00:00+00:00")
+    _insert(client, "two", "2025-07-01T10:00:01+00:00")
+    return client, ThreadHistoryCache(FakeDB(client))
+
+
+def test_unchanged_thread_is_served_from_the_cache():
+    client, cache = _cache()
+
+    async def scenario():
+        first = await cache.get_messages("thread")
+        client.reset_calls()
+        second = await cache.get_messages("thread")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert _texts(first) == _texts(second) == ["one", "two"]
+    # Only the ID listing, no content fetch
+    assert client.calls["messages.select"] == 1
+
+
+def test_rows_are_fetched_by_id_whatever_their_timestamp():
+    client, cache = _cache()
+
+    async def scenario():
+        await cache.get_messages("thread")
+        # Written by another worker with a clock far behind the cached rows
+        _insert(client, "late", "2025-07-01T09:00:00+00:00")
+        _insert(client, "three", "2025-07-01T10:00:02+00:00")
+        client.reset_calls()
+        messages = await cache.get_messages("thread")
+        return messages, client.calls["messages.select"]
+
+    messages, selects = asyncio.run(scenario())
+    assert _texts(messages) == ["late", "one", "two", "three"]
+    assert selects == 2
+
+
+def test_deleted_messages_are_dropped():
+    client, cache = _cache()
+
+    async def scenario():
+        first = await cache.get_messages("thread")
+        client.tables["messages"] = [row for row in client.tables["messages"] if row["message_id"] != first[0]["message_id"]]
+        return await cache.get_messages("thread")
+
+    assert _texts(asyncio.run(scenario())) == ["two"]
+
+
+def test_appended_rows_are_not_fetched_again():
+    client, cache = _cache()
+
+    async def scenario():
+        await cache.get_messages("thread")
+        row = _insert(client, "three", "2025-07-01T10:00:02+00:00")
+        await cache.append(row)
+        client.reset_calls()
+        return await cache.get_messages("thread")
+
+    assert _texts(asyncio.run(scenario())) == ["one", "two", "three"]
+    assert client.calls["messages.select"] == 1
+
+
+def test_invalidate_reloads_the_thread():
+    client, cache = _cache()
+
+    async def scenario():
+        await cache.get_messages("thread")
+        client.tables["messages"][0]["content"] = {"role": "user", "content": "edited"}
+        cached = await cache.get_messages("thread")
+        cache.invalidate("thread")
+        return cached, await cache.get_messages("thread")
+
+    cached, reloaded = asyncio.run(scenario())
+    assert _texts(cached) == ["one", "two"]
+    assert _texts(reloaded) == ["edited", "two"]
+
+
+def test_returned_messages_do_not_share_state_with_the_cache():
+    client = InMemorySupabase()
+    client.store("messages", {
+        "thread_id": "thread",
+        "is_llm_message": True,
+        "content": {"role": "assistant", "content": "hi", "tool_calls": [{"id": "call", "function": {"name": "ls"}}]},
+    })
+    cache = ThreadHistoryCache(FakeDB(client))
+
+    async def scenario():
+        messages = await cache.get_messages("thread")
+        messages[0]["tool_calls"][0]["function"]["name"] = "rm"
+        messages[0]["content"] = "changed"
+        return await cache.get_messages("thread")
+
+    message = asyncio.run(scenario())[0]
+    assert message["content"] == "hi"
+    assert message["tool_calls"][0]["function"]["name"] == "ls"
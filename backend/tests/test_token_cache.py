@@ -0,0 +1,33 @@
+from agentpress.utils.token_cache import TokenCountCache
+
+
+def test_counts_each_message_once(counted):
+    cache = TokenCountCache()
+    messages = [
+        {"role": "user", "content": "hello", "message_id": "a"},
+        {"role": "assistant", "content": "hi there", "message_id": "b"},
+    ]
+
+    assert cache.count_messages(messages, "gpt-4o") == 13
+    assert cache.count_messages(messages, "gpt-4o") == 13
+    assert len(counted) == 2
+    assert cache.hits == 2
+    assert cache.misses == 2
+
+
+def test_changed_content_is_recounted(counted):
+    cache = TokenCountCache()
+    msg = {"role": "user", "content": "x" * 100, "message_id": "a"}
+    assert cache.count_message(msg, "gpt-4o") == 100
+
+    msg["content"] = "x" * 10
+    assert cache.count_message(msg, "gpt-4o") == 10
+    assert len(counted) == 2
+
+
+def test_lru_eviction(counted):
+    cache = TokenCountCache(max_entries=2)
+    for i in range(3):
+        cache.count_message({"role": "user", "content": str(i), "message_id": str(i)})
+    cache.count_message({"role": "user", "content": "0", "message_id": "0"})
+    assert len(counted) == 4
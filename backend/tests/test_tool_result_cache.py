@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from agentpress.response_processor import ResponseProcessor
+from agentpress.tool import Tool, ToolResult, cacheable, openapi_schema
+from agentpress.tool_registry import ToolRegistry
+from agentpress.tool_result_cache import ToolResultCache
+from services import redis
+from utils import auth_utils
+from utils.config import config
+
+
+class FakeRedisClient:
+    def __init__(self):
+        self.hashes = {}
+
+    async def hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = fields.get(field, 0) + amount
+
+    async def hgetall(self, key):
+        return {field: str(count) for field, count in self.hashes.get(key, {}).items()}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    data, ttls = {}, {}
+    client = FakeRedisClient()
+
+    async def get(key, default=None):
+        return data.get(key, default)
+
+    async def set(key, value, ex=None, nx=False):
+        data[key] = value
+        ttls[key] = ex
+        return True
+
+    async def delete(key):
+        data.pop(key, None)
+
+    async def get_client():
+        return client
+
+    monkeypatch.setattr(redis, "get", get)
+    monkeypatch.setattr(redis, "set", set)
+    monkeypatch.setattr(redis, "delete", delete)
+    monkeypatch.setattr(redis, "get_client", get_client)
+    return data, ttls
+
+
+_SCHEMA = {"type": "function", "function": {"name": "lookup", "description": "", "parameters": {"type": "object", "properties": {}}}}
+
+
+class LookupTool(Tool):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    @openapi_schema(_SCHEMA)
+    @cacheable(ttl=600)
+    async def lookup(self, query: str, limit: int = 5) -> ToolResult:
+        self.calls.append(("lookup", query))
+        return self.success_response({"query": query, "results": len(self.calls)})
+
+    @openapi_schema({**_SCHEMA, "function": {**_SCHEMA["function"], "name": "now"}})
+    async def now(self) -> ToolResult:
+        self.calls.append(("now",))
+        return self.success_response(len(self.calls))
+
+
+def test_equivalent_arguments_share_a_key_within_a_scope():
+    cache = ToolResultCache()
+
+    xml_call = cache.make_key("search", {"query": " weather ", "num_results": "5", "filters": '{"site": "bbc.com"}'}, scope="acct")
+    native_call = cache.make_key("search", {"filters": {"site": "bbc.com"}, "num_results": 5, "query": "weather", "page": None}, scope="acct")
+
+    assert xml_call == native_call
+    assert cache.make_key("search", {"query": "weather", "num_results": 6}, scope="acct") != cache.make_key("search", {"query": "weather", "num_results": 5}, scope="acct")
+    assert cache.make_key("search", {"query": "weather"}, scope="other") != cache.make_key("search", {"query": "weather"}, scope="acct")
+    assert cache.make_key("scrape", {"query": "weather"}, scope="acct") != cache.make_key("search", {"query": "weather"}, scope="acct")
+
+
+def test_successful_results_are_stored_with_their_ttl(store):
+    data, ttls = store
+    cache = ToolResultCache()
+
+    async def scenario():
+        await cache.set("search", {"query": "a"}, ToolResult(success=True, output="found"), ttl=300, scope="acct")
+        await cache.set("search", {"query": "b"}, ToolResult(success=False, output="rate limited"), ttl=300, scope="acct")
+        return await cache.get("search", {"query": "a"}, scope="acct"), await cache.get("search", {"query": "b"}, scope="acct"), await cache.get_stats()
+
+    hit, miss, stats = asyncio.run(scenario())
+    assert hit == ToolResult(success=True, output="found")
+    assert miss is None
+    assert list(ttls.values()) == [300]
+    assert stats == {"search": {"hits": 1, "misses": 1}}
+
+
+def test_only_cacheable_tools_are_served_from_the_cache(store):
+    data, ttls = store
+    registry = ToolRegistry()
+    registry.register_tool(LookupTool)
+    tool = registry.tools["lookup"]["instance"]
+
+    async def add_message(**kwargs):
+        return None
+
+    processor = ResponseProcessor(registry, add_message, account_id="acct")
+
+    async def scenario():
+        results = []
+        for _ in range(2):
+            results.append(await processor._execute_tool({"function_name": "lookup", "arguments": {"query": "x"}}))
+            results.append(await processor._execute_tool({"function_name": "now", "arguments": {}}))
+        return results
+
+    results = asyncio.run(scenario())
+    assert tool.calls == [("lookup", "x"), ("now",), ("now",)]
+    assert results[0] == results[2]
+    assert results[1] != results[3]
+    assert list(ttls.values()) == [600]
+    assert all(":acct:lookup:" in key for key in data)
+
+
+def test_unreadable_entries_are_misses_and_dropped(store):
+    data, ttls = store
+    cache = ToolResultCache()
+    old_format = cache.make_key("search", {"query": "a"}, scope="acct")
+    corrupt = cache.make_key("search", {"query": "b"}, scope="acct")
+    data[old_format] = '{"result": "found"}'
+    data[corrupt] = "{not json"
+
+    async def scenario():
+        return [await cache.get("search", {"query": query}, scope="acct") for query in ("a", "b")]
+
+    assert asyncio.run(scenario()) == [None, None]
+    assert data == {}
+
+
+def _request(headers):
+    return Request({"type": "http", "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()]})
+
+
+def test_stats_require_the_admin_api_key(monkeypatch):
+    def status(headers):
+        try:
+            asyncio.run(auth_utils.verify_admin_api_key(_request(headers)))
+        except HTTPException as e:
+            return e.status_code
+        return 200
+
+    monkeypatch.setattr(config, "ADMIN_API_KEY", None, raising=False)
+    assert status({"X-Admin-Api-Key": ""}) == 404
+
+    monkeypatch.setattr(config, "ADMIN_API_KEY", "secret", raising=False)
+    assert status({}) == 403
+    assert status({"Authorization": "Bearer user-token", "X-Admin-Api-Key": "guess"}) == 403
+    assert status({"X-Admin-Api-Key": "secret"}) == 200
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from agentpress import thread_manager
+from agentpress.thread_manager import ThreadManager
+from services import billing, redis, usage_ledger
+from utils.supabase_fake import InMemorySupabase
+
+
+class FakeRedis:
+    """Hash commands of redis.asyncio, with pipelines that run on execute()."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def hgetall(self, key):
+        return {field: str(value) for field, value in self.hashes.get(key, {}).items()}
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def hincrbyfloat(self, key, field, amount):
+        self.commands.append(lambda h: h.setdefault(key, {}).__setitem__(field, float(h.get(key, {}).get(field, 0)) + amount))
+
+    def hincrby(self, key, field, amount):
+        self.commands.append(lambda h: h.setdefault(key, {}).__setitem__(field, int(h.get(key, {}).get(field, 0)) + amount))
+
+    def hset(self, key, mapping):
+        self.commands.append(lambda h: h.setdefault(key, {}).update(mapping))
+
+    def expire(self, key, ttl):
+        pass
+
+    async def execute(self):
+        for command in self.commands:
+            command(self.client.hashes)
+
+
+class FakeDB:
+    def __init__(self, client):
+        self._client = client
+
+    @property
+    async def client(self):
+        return self._client
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = FakeRedis()
+
+    async def get_client():
+        return fake
+
+    monkeypatch.setattr(redis, "get_client", get_client)
+    return fake
+
+
+def test_ledger_needs_a_seed_before_it_is_read(fake_redis):
+    async def scenario():
+        await usage_ledger.record("acct", 0.5, 100, 20)
+        unseeded = await usage_ledger.get("acct")
+        await usage_ledger.seed("acct", {"cost": 2.0, "prompt_tokens": 1000, "completion_tokens": 200, "messages": 4})
+        await usage_ledger.record("acct", 0.25, 50, 10)
+        return unseeded, await usage_ledger.get("acct")
+
+    unseeded, totals = asyncio.run(scenario())
+    assert unseeded is None
+    assert totals == {"cost": 2.25, "prompt_tokens": 1050, "completion_tokens": 210, "messages": 5}
+
+
+def test_reconcile_keeps_responses_recorded_while_it_runs(fake_redis, monkeypatch):
+    async def sum_monthly_usage(client, user_id, period=None):
+        # A response is written and recorded while the rollup is being read
+        await usage_ledger.record("acct", 0.25, 50, 10)
+        return {"cost": 2.0, "prompt_tokens": 1000, "completion_tokens": 200, "messages": 4}
+
+    async def write_rollup(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(billing, "sum_monthly_usage", sum_monthly_usage)
+    monkeypatch.setattr(usage_ledger, "write_rollup", write_rollup)
+
+    async def scenario():
+        # Drifted counters from before the reconcile
+        await usage_ledger.seed("acct", {"cost": 9.0, "prompt_tokens": 1, "completion_tokens": 1, "messages": 1})
+        await billing.reconcile_monthly_usage(None, "acct")
+        return await usage_ledger.get("acct")
+
+    assert asyncio.run(scenario()) == {"cost": 2.25, "prompt_tokens": 1050, "completion_tokens": 210, "messages": 5}
+
+
+def test_usage_is_recorded_in_the_month_of_the_message(fake_redis, monkeypatch):
+    async def maybe_rollup(client, account_id, period=None):
+        pass
+
+    monkeypatch.setattr(usage_ledger, "maybe_rollup", maybe_rollup)
+    message = {
+        "created_at": "2025-06-30T23:59:59.900000+00:00",
+        "content": {"model": "gpt-4o", "usage": {"prompt_tokens": 100, "completion_tokens": 20}},
+        "metadata": {"cost": 0.5},
+    }
+
+    asyncio.run(billing.record_assistant_usage(None, "acct", message))
+
+    assert fake_redis.hashes["usage_ledger:acct:2025-06"]["cost"] == 0.5
+
+
+def test_usage_is_recorded_after_the_row_is_written(monkeypatch):
+    client = InMemorySupabase()
+    recorded = []
+
+    async def record_assistant_usage(db_client, account_id, message):
+        recorded.append((account_id, len(client.tables.get("messages", []))))
+
+    monkeypatch.setattr(thread_manager, "record_assistant_usage", record_assistant_usage)
+    manager = ThreadManager(account_id="acct")
+    manager.db = manager.message_writer.db = FakeDB(client)
+    content = {"model": "gpt-4o", "usage": {"prompt_tokens": 100, "completion_tokens": 20}}
+
+    async def scenario():
+        await manager.add_message("thread", "assistant_response_end", content)
+        before_flush = list(recorded)
+        await manager.flush_messages()
+        return before_flush
+
+    assert asyncio.run(scenario()) == []
+    assert recorded == [("acct", 1)]
+    assert "cost" in client.tables["messages"][0]["metadata"]
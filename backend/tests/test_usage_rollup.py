@@ -0,0 +1,62 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from utils.supabase_fake import InMemorySupabase
+from services import billing
+
+
+def _rollup_client():
+    client = InMemorySupabase()
+    client.tables['usage_daily_rollup'] = [
+        {'account_id': 'acct', 'day': '2025-07-01', 'model': 'gpt-4o', 'prompt_tokens': 1000, 'completion_tokens': 100, 'message_count': 2, 'cost': 1.1},
+        {'account_id': 'acct', 'day': '2025-07-02', 'model': 'gpt-4o', 'prompt_tokens': 3000, 'completion_tokens': 300, 'message_count': 3, 'cost': 3.3},
+        {'account_id': 'acct', 'day': '2025-07-02', 'model': 'claude', 'prompt_tokens': 500, 'completion_tokens': 50, 'message_count': 1, 'cost': 0.55},
+        {'account_id': 'other', 'day': '2025-07-02', 'model': 'gpt-4o', 'prompt_tokens': 9999, 'completion_tokens': 999, 'message_count': 9, 'cost': 10.998},
+        {'account_id': 'acct', 'day': '2025-06-30', 'model': 'gpt-4o', 'prompt_tokens': 7777, 'completion_tokens': 777, 'message_count': 7, 'cost': 8.554},
+    ]
+    return client
+
+
+def test_summary_sums_the_stored_costs():
+    summary = asyncio.run(billing.summarize_usage_rollup(_rollup_client(), 'acct', date(2025, 7, 1), date(2025, 7, 31)))
+
+    assert summary['message_count'] == 6
+    assert summary['prompt_tokens'] == 4500
+    assert [m['model'] for m in summary['models']] == ['gpt-4o', 'claude']
+    assert summary['models'][0]['estimated_cost'] == pytest.approx(4.4)
+    assert summary['total_cost'] == pytest.approx(4.95)
+    assert [d['day'] for d in summary['days']] == ['2025-07-01', '2025-07-02']
+    assert summary['days'][1]['total_tokens'] == 3850
+
+
+def test_daily_rows_are_paginated_newest_first():
+    first = asyncio.run(billing.get_usage_rollup(_rollup_client(), 'acct', date(2025, 7, 1), date(2025, 7, 31), page=0, items_per_page=2))
+    second = asyncio.run(billing.get_usage_rollup(_rollup_client(), 'acct', date(2025, 7, 1), date(2025, 7, 31), page=1, items_per_page=2))
+
+    assert [(r['day'], r['model']) for r in first['rows']] == [('2025-07-02', 'claude'), ('2025-07-02', 'gpt-4o')]
+    assert first['has_more'] is True
+    assert [r['day'] for r in second['rows']] == ['2025-07-01']
+    assert second['has_more'] is False
+
+
+def test_backfill_rows_price_each_message_on_its_own(monkeypatch):
+    # Tiered price: prompt tokens above 200k cost twice as much
+    def tiered_cost(prompt, completion, model):
+        return (prompt + max(prompt - 200_000, 0)) / 1_000_000
+
+    monkeypatch.setattr(billing, "calculate_token_cost", tiered_cost)
+    messages = [
+        {'message_id': str(i), 'account_id': 'acct', 'created_at': '2025-07-01T23:30:00+00:00', 'content': {'model': 'gemini', 'usage': {'prompt_tokens': 100_000, 'completion_tokens': 0}}}
+        for i in range(3)
+    ] + [
+        {'message_id': '3', 'account_id': 'acct', 'created_at': '2025-07-02T01:00:00+02:00', 'content': {'model': 'gemini', 'usage': {'prompt_tokens': 300_000}}},
+        {'message_id': '4', 'account_id': None, 'created_at': '2025-07-01T10:00:00+00:00', 'content': {'model': 'gemini', 'usage': {'prompt_tokens': 1}}},
+    ]
+
+    rows = billing.aggregate_usage_rollup(messages)
+
+    assert [(row['day'], row['message_count'], row['prompt_tokens']) for row in rows] == [('2025-07-01', 4, 600_000)]
+    # Three small responses stay in the lower tier; pricing the 600k sum would give 1.0
+    assert rows[0]['cost'] == pytest.approx(0.3 + 0.4)
@@ -0,0 +1,117 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+from PIL import Image
+
+from agent.tools import sb_vision_tool
+from agent.tools.sb_vision_tool import SandboxVisionTool
+from services import redis
+
+
+def _png(size):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _tool(monkeypatch, files, fail_upload=False, project_id="project", store=None, uploads=None):
+    store = {} if store is None else store
+    uploads = [] if uploads is None else uploads
+    messages, signed = [], []
+
+    async def get(key, default=None):
+        return store.get(key, default)
+
+    async def set(key, value, ex=None, nx=False):
+        store[key] = value
+        return True
+
+    async def upload_private_image(image_data, folder, name):
+        if fail_upload:
+            raise RuntimeError("storage unavailable")
+        uploads.append(image_data)
+        return f"{folder}/{name}.png"
+
+    async def create_signed_image_url(path, expires_in):
+        signed.append(path)
+        return f"https://storage/sign/{path}?token={len(signed)}"
+
+    async def get_file_info(path):
+        return SimpleNamespace(is_dir=False, size=len(files[path]))
+
+    async def download_file(path):
+        return files[path]
+
+    async def add_message(**kwargs):
+        messages.append(kwargs["content"])
+
+    monkeypatch.setattr(redis, "get", get)
+    monkeypatch.setattr(redis, "set", set)
+    monkeypatch.setattr(sb_vision_tool, "upload_private_image", upload_private_image)
+    monkeypatch.setattr(sb_vision_tool, "create_signed_image_url", create_signed_image_url)
+    tool = SandboxVisionTool(project_id, "thread", SimpleNamespace(add_message=add_message))
+    tool._sandbox = SimpleNamespace(fs=SimpleNamespace(get_file_info=get_file_info, download_file=download_file))
+
+    async def ensure_sandbox():
+        return tool._sandbox
+
+    tool._ensure_sandbox = ensure_sandbox
+    return tool, uploads, messages
+
+
+def test_repeated_views_reuse_the_uploaded_image(monkeypatch):
+    image = _png((2400, 1200))
+    files = {"/workspace/a.png": image, "/workspace/copy.png": image}
+    tool, uploads, messages = _tool(monkeypatch, files)
+    compressions = []
+    compress_image = sb_vision_tool.compress_image
+
+    def counting_compress(*args):
+        compressions.append(args[2])
+        return compress_image(*args)
+
+    monkeypatch.setattr(sb_vision_tool, "compress_image", counting_compress)
+
+    async def scenario():
+        return [await tool.see_image(path) for path in ("a.png", "a.png", "copy.png")]
+
+    results = asyncio.run(scenario())
+    assert all(result.success for result in results)
+    assert compressions == ["a.png"]
+    assert len(uploads) == 1
+    assert Image.open(io.BytesIO(uploads[0])).size == (1920, 960)
+    # One private object, with a fresh signed URL for every view
+    urls = [message["image_url"] for message in messages]
+    assert len(set(urls)) == 3
+    assert len({url.split("?")[0] for url in urls}) == 1
+    assert urls[0].startswith("https://storage/sign/project/")
+    assert [message["file_path"] for message in messages] == ["a.png", "a.png", "copy.png"]
+    assert all("base64" not in message for message in messages)
+
+
+def test_failed_upload_falls_back_to_inline_base64(monkeypatch):
+    tool, uploads, messages = _tool(monkeypatch, {"/workspace/a.png": _png((32, 32))}, fail_upload=True)
+
+    result = asyncio.run(tool.see_image("a.png"))
+
+    assert result.success
+    assert "image_url" not in messages[0]
+    assert messages[0]["mime_type"] == "image/png"
+    assert messages[0]["base64"]
+
+
+def test_cached_images_are_not_shared_between_projects(monkeypatch):
+    image = _png((64, 64))
+    store, uploads = {}, []
+    first, _, first_messages = _tool(monkeypatch, {"/workspace/a.png": image}, project_id="alpha", store=store, uploads=uploads)
+    second, _, second_messages = _tool(monkeypatch, {"/workspace/a.png": image}, project_id="beta", store=store, uploads=uploads)
+
+    async def scenario():
+        await first.see_image("a.png")
+        await second.see_image("a.png")
+
+    asyncio.run(scenario())
+    assert len(uploads) == 2
+    assert first_messages[0]["image_url"].startswith("https://storage/sign/alpha/")
+    assert second_messages[0]["image_url"].startswith("https://storage/sign/beta/")
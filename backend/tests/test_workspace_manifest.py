@@ -0,0 +1,104 @@
+import asyncio
+import os
+import subprocess
+from types import SimpleNamespace
+
+from agent.tools.sb_files_tool import SandboxFilesTool
+from sandbox import workspace
+
+
+class LocalSandbox:
+    """Sandbox fs/process calls served by the local filesystem and shell, with a call log."""
+
+    def __init__(self):
+        self.calls = []
+        self.fs = SimpleNamespace(upload_file=self.upload_file, download_file=self.download_file)
+        self.process = SimpleNamespace(exec=self.exec)
+
+    async def upload_file(self, content, path):
+        self.calls.append("upload_file")
+        with open(path, "wb") as f:
+            f.write(content)
+
+    async def download_file(self, path):
+        self.calls.append("download_file")
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def exec(self, command, timeout=None):
+        self.calls.append("exec")
+        result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=timeout)
+        return SimpleNamespace(exit_code=result.returncode, result=result.stdout)
+
+
+def _write(root, rel_path, content):
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+
+
+def test_only_changed_files_are_fetched_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace, "MANIFEST_CACHE_PATH", str(tmp_path / "manifest.json"))
+    root = tmp_path / "workspace"
+    _write(root, "index.html", b"<h1>hi</h1>")
+    _write(root, "src/app.py", b"print('a')")
+    _write(root, "node_modules/pkg/index.js", b"module.exports = 1")
+    _write(root, "logo.png", b"\x89PNG")
+    _write(root, "data.bin", b"\xff\xfe\x00")
+
+    tool = SandboxFilesTool("project", thread_manager=None)
+    tool.workspace_path = str(root)
+    tool._sandbox = LocalSandbox()
+
+    async def _ensure_sandbox():
+        return tool._sandbox
+
+    monkeypatch.setattr(tool, "_ensure_sandbox", _ensure_sandbox)
+
+    first = asyncio.run(tool.get_workspace_state())
+    assert sorted(first) == ["index.html", "src/app.py"]
+    assert first["src/app.py"]["content"] == "print('a')"
+
+    _write(root, "src/app.py", b"print('b')")
+    os.remove(root / "index.html")
+    _write(root, "README.md", b"# readme")
+    tool._sandbox.calls.clear()
+
+    fetched = []
+    original_fetch = workspace.fetch_files
+
+    async def recording_fetch(sandbox, root_path, paths):
+        fetched.append(sorted(paths))
+        return await original_fetch(sandbox, root_path, paths)
+
+    monkeypatch.setattr("agent.tools.sb_files_tool.fetch_files", recording_fetch)
+
+    second = asyncio.run(tool.get_workspace_state())
+    assert sorted(second) == ["README.md", "src/app.py"]
+    assert second["src/app.py"]["content"] == "print('b')"
+    assert fetched == [["README.md", "src/app.py"]]
+    assert tool._sandbox.calls.count("download_file") == 1
+
+
+def test_batch_upload_extracts_archives_and_verifies_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace, "UPLOAD_BATCH_BYTES", 10)
+    sandbox = LocalSandbox()
+    sandbox.id = "sb"
+    files = [(str(tmp_path / "a.txt"), b"hello world"), (str(tmp_path / "dir/b.txt"), b"bye")]
+
+    uploaded, failed = asyncio.run(workspace.upload_files(sandbox, files))
+
+    assert sorted(uploaded) == sorted(path for path, _ in files)
+    assert failed == []
+    assert (tmp_path / "dir/b.txt").read_bytes() == b"bye"
+    # Two archives, then one list upload for the verification
+    assert sandbox.calls.count("upload_file") == 3
+
+
+def test_range_reads_return_the_requested_bytes(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)) * 4)
+
+    chunk = asyncio.run(workspace.read_file_range(LocalSandbox(), str(path), 250, 10))
+
+    assert chunk == (bytes(range(256)) * 4)[250:260]
@@ -0,0 +1,66 @@
+import random
+
+from agentpress.xml_stream_scanner import StreamingXMLScanner
+
+
+FUNCTION_CALLS_BLOCK = (
+    '<function_calls>\n'
+    '<invoke name="create_file">\n'
+    '<parameter name="file_path">index.html</parameter>\n'
+    '<parameter name="file_contents"><html><body>hi</body></html></parameter>\n'
+    '</invoke>\n'
+    '</function_calls>'
+)
+
+LEGACY_BLOCK = '<ask attachments="a.txt">Is <ask>nested</ask> fine?</ask>'
+
+
+def _feed_in_pieces(scanner, text, seed):
+    rng = random.Random(seed)
+    chunks = []
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, 7)
+        chunks.extend(scanner.feed(text[pos:pos + size]))
+        pos += size
+    return chunks
+
+
+def test_function_calls_block_split_across_deltas():
+    text = "Let me create the file.\n" + FUNCTION_CALLS_BLOCK + "\nDone."
+    for seed in range(20):
+        scanner = StreamingXMLScanner(["ask", "complete"])
+        assert _feed_in_pieces(scanner, text, seed) == [FUNCTION_CALLS_BLOCK]
+        assert not scanner.in_block
+
+
+def test_legacy_tag_with_nesting():
+    text = "Question: " + LEGACY_BLOCK + " trailing <complete></complete>"
+    for seed in range(20):
+        scanner = StreamingXMLScanner(["ask", "complete"])
+        assert _feed_in_pieces(scanner, text, seed) == [LEGACY_BLOCK, "<complete></complete>"]
+
+
+def test_block_emitted_when_closing_tag_arrives():
+    scanner = StreamingXMLScanner()
+    assert scanner.feed(FUNCTION_CALLS_BLOCK[:-1]) == []
+    assert scanner.in_block
+    assert scanner.pending == FUNCTION_CALLS_BLOCK[:-1]
+    assert scanner.feed(">") == [FUNCTION_CALLS_BLOCK]
+    assert scanner.pending == ""
+
+
+def test_tags_inside_function_calls_are_not_legacy_calls():
+    block = (
+        '<function_calls><invoke name="create_file">'
+        '<parameter name="file_contents"><ask>not a call</ask></parameter>'
+        '</invoke></function_calls>'
+    )
+    scanner = StreamingXMLScanner(["ask"])
+    assert _feed_in_pieces(scanner, block, 1) == [block]
+
+
+def test_tag_prefix_is_not_a_match():
+    scanner = StreamingXMLScanner(["ask"])
+    assert scanner.feed("<asking>hello</asking>") == []
+    assert not scanner.in_block
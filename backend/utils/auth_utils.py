@@ -1,9 +1,11 @@
+import hmac
 import sentry
 from fastapi import HTTPException, Request
 from typing import Optional
 import jwt
 from jwt.exceptions import PyJWTError
 from utils.logger import structlog
+from utils.config import config
 
 # This function extracts the user ID from Supabase JWT
 async def get_current_user_id_from_jwt(request: Request) -> str:
@@ -229,3 +231,20 @@ async def get_optional_user_id(request: Request) -> Optional[str]:
         return user_id
     except PyJWTError:
         return None
+
+async def verify_admin_api_key(request: Request) -> None:
+    """
+    Verify the admin API key in the X-Admin-Api-Key header.
+    
+    Used as a dependency of operational endpoints that expose data across all
+    accounts. They answer 404 when ADMIN_API_KEY is not configured.
+    
+    Raises:
+        HTTPException: If admin access is disabled or the key is missing or wrong
+    """
+    if not config.ADMIN_API_KEY:
+        raise HTTPException(status_code=404, detail="Not found")
+    
+    api_key = request.headers.get('X-Admin-Api-Key') or ''
+    if not hmac.compare_digest(api_key.encode(), config.ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin API key")
@@ -185,6 +185,10 @@ class Configuration:
     
     # Model configuration
     MODEL_TO_USE: Optional[str] = "anthropic/claude-sonnet-4-20250514"
+    PROMPT_CACHE_STABLE_LAYOUT: bool = True
+    
+    # Key for operational endpoints (cache and latency stats); they are disabled when unset
+    ADMIN_API_KEY: Optional[str] = None
     
     # Supabase configuration
     SUPABASE_URL: str
@@ -196,11 +200,30 @@ class Configuration:
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: Optional[str] = None
     REDIS_SSL: bool = True
+    THREAD_HISTORY_REDIS_CACHE: bool = False
+    RESPONSE_STREAM_FLUSH_MS: int = 20
+    RESPONSE_STREAM_MAX_BATCH: int = 64
     
     # Daytona sandbox configuration
     DAYTONA_API_KEY: str
     DAYTONA_SERVER_URL: str
     DAYTONA_TARGET: str
+    SANDBOX_MAX_WORKERS: int = 32
+    SANDBOX_MAX_CONCURRENT_OPS: int = 4
+    SANDBOX_STATE_TTL: int = 30
+    
+    # MCP client session pool
+    MCP_MAX_SESSIONS: int = 64
+    MCP_SESSION_IDLE_TTL: int = 120
+    MCP_SESSION_POOL_SHARED: bool = True
+    MCP_DISCOVERY_TIMEOUT: int = 15
+    MCP_TOOL_CACHE_TTL: int = 86400
+    MCP_TOOL_CACHE_REFRESH: int = 600
+    
+    # Vision tool image processing
+    VISION_MAX_WORKERS: int = 4
+    VISION_IMAGE_CACHE_TTL: int = 86400
+    VISION_IMAGE_URL_TTL: int = 3600
     
     # Search and other API keys
     TAVILY_API_KEY: str
@@ -214,6 +237,8 @@ class Configuration:
     STRIPE_WEBHOOK_SECRET: Optional[str] = None
     STRIPE_DEFAULT_PLAN_ID: Optional[str] = None
     STRIPE_DEFAULT_TRIAL_DAYS: int = 14
+    STRIPE_SUBSCRIPTION_CACHE_TTL: int = 300
+    STRIPE_MAX_WORKERS: int = 8
     
     # Stripe Product IDs
     STRIPE_PRODUCT_ID_PROD: str = 'prod_SCl7AQ2C8kK1CD'
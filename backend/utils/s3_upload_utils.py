@@ -8,28 +8,36 @@ from datetime import datetime
 from utils.logger import logger
 from services.supabase import DBConnection
 
-async def upload_base64_image(base64_data: str, bucket_name: str = "browser-screenshots") -> str:
-    """Upload a base64 encoded image to Supabase storage and return the URL.
+# Private bucket for images read from user workspaces; they are only handed out as signed URLs
+PRIVATE_IMAGE_BUCKET = "vision-images"
+
+def _image_type(image_data: bytes) -> tuple[str, str]:
+    """Return (extension, content type) of an encoded image from its magic bytes."""
+    if image_data[:3] == b'\xff\xd8\xff':
+        return "jpg", "image/jpeg"
+    if image_data[:4] == b'RIFF' and image_data[8:12] == b'WEBP':
+        return "webp", "image/webp"
+    if image_data[:4] == b'GIF8':
+        return "gif", "image/gif"
+    return "png", "image/png"
+
+async def upload_image(image_data: bytes, bucket_name: str = "browser-screenshots") -> str:
+    """Upload an encoded image to Supabase storage and return the URL.
     
     Args:
-        base64_data (str): Base64 encoded image data (with or without data URL prefix)
+        image_data (bytes): Encoded image (JPEG, WebP, GIF or PNG)
         bucket_name (str): Name of the storage bucket to upload to
         
     Returns:
         str: Public URL of the uploaded image
     """
     try:
-        # Remove data URL prefix if present
-        if base64_data.startswith('data:'):
-            base64_data = base64_data.split(',')[1]
-        
-        # Decode base64 data
-        image_data = base64.b64decode(base64_data)
+        extension, content_type = _image_type(image_data)
         
         # Generate unique filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         unique_id = str(uuid.uuid4())[:8]
-        filename = f"image_{timestamp}_{unique_id}.png"
+        filename = f"image_{timestamp}_{unique_id}.{extension}"
         
         # Upload to Supabase storage
         db = DBConnection()
@@ -37,7 +45,7 @@ async def upload_base64_image(base64_data: str, bucket_name: str = "browser-scre
         storage_response = await client.storage.from_(bucket_name).upload(
             filename,
             image_data,
-            {"content-type": "image/png"}
+            {"content-type": content_type}
         )
         
         # Get public URL
@@ -46,6 +54,73 @@ async def upload_base64_image(base64_data: str, bucket_name: str = "browser-scre
         logger.debug(f"Successfully uploaded image to {public_url}")
         return public_url
         
+    except Exception as e:
+        logger.error(f"Error uploading image: {e}")
+        raise RuntimeError(f"Failed to upload image: {str(e)}")
+
+async def upload_base64_image(base64_data: str, bucket_name: str = "browser-screenshots") -> str:
+    """Upload a base64 encoded image to Supabase storage and return the URL.
+    
+    Args:
+        base64_data (str): Base64 encoded image data (with or without data URL prefix)
+        bucket_name (str): Name of the storage bucket to upload to
+        
+    Returns:
+        str: Public URL of the uploaded image
+    """
+    try:
+        # Remove data URL prefix if present
+        if base64_data.startswith('data:'):
+            base64_data = base64_data.split(',')[1]
+        
+        # Decode base64 data
+        image_data = base64.b64decode(base64_data)
     except Exception as e:
         logger.error(f"Error uploading base64 image: {e}")
-        raise RuntimeError(f"Failed to upload image: {str(e)}") 
\ No newline at end of file
+        raise RuntimeError(f"Failed to upload image: {str(e)}")
+    
+    return await upload_image(image_data, bucket_name)
+
+async def upload_private_image(image_data: bytes, folder: str, name: str, bucket_name: str = PRIVATE_IMAGE_BUCKET) -> str:
+    """Upload an encoded image to a private storage bucket and return its path.
+
+    Args:
+        image_data (bytes): Encoded image (JPEG, WebP, GIF or PNG)
+        folder (str): Folder of the owner of the image, e.g. a project ID
+        name (str): File name without extension; an existing image of that name is replaced
+        bucket_name (str): Name of the private storage bucket to upload to
+
+    Returns:
+        str: Path of the image in the bucket, for create_signed_image_url
+    """
+    try:
+        extension, content_type = _image_type(image_data)
+        path = f"{folder}/{name}.{extension}"
+
+        db = DBConnection()
+        client = await db.client
+        await client.storage.from_(bucket_name).upload(
+            path,
+            image_data,
+            {"content-type": content_type, "upsert": "true"}
+        )
+        logger.debug(f"Successfully uploaded private image to {bucket_name}/{path}")
+        return path
+
+    except Exception as e:
+        logger.error(f"Error uploading private image: {e}")
+        raise RuntimeError(f"Failed to upload image: {str(e)}")
+
+async def create_signed_image_url(path: str, expires_in: int, bucket_name: str = PRIVATE_IMAGE_BUCKET) -> str:
+    """Create a URL to an image in a private bucket that expires after expires_in seconds.
+
+    Raises RuntimeError if the image does not exist (any more).
+    """
+    try:
+        db = DBConnection()
+        client = await db.client
+        response = await client.storage.from_(bucket_name).create_signed_url(path, expires_in)
+        return response.get("signedURL") or response["signedUrl"]
+    except Exception as e:
+        logger.warning(f"Error signing image URL for {bucket_name}/{path}: {e}")
+        raise RuntimeError(f"Failed to sign image URL: {str(e)}")
@@ -0,0 +1,88 @@
+"""
+Usage Rollup Backfill Script
+
+This script rolls up the assistant_response_end messages created before the
+usage_daily_rollup trigger was installed. Messages are read in batches after the
+cursor stored in usage_daily_rollup_backfill, priced one by one like the
+backend prices new responses, and added to the rollup together with the new
+cursor in a single transaction per batch. Interrupted runs resume from the
+cursor; run one instance at a time.
+
+Usage:
+    python backend/utils/scripts/backfill_usage_rollup.py [--batch-size <N>] [--verbose]
+
+Arguments:
+    --batch-size  Messages per batch (optional; default: 1000)
+    --verbose     Print every applied batch (optional)
+
+Notes:
+    - The script requires access to the Supabase database
+    - Make sure the .env file is properly configured
+"""
+
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv(".env")
+
+from services.supabase import DBConnection
+from services.billing import aggregate_usage_rollup
+from utils.logger import logger
+
+BATCH_SIZE = 1000
+
+
+async def backfill(client, batch_size: int = BATCH_SIZE, verbose: bool = False) -> int:
+    """Roll up all remaining messages before the cutoff and return how many were processed."""
+    processed = 0
+    while True:
+        batch = await client.rpc('get_usage_daily_rollup_backfill_batch', {'p_limit': batch_size}).execute()
+        messages = batch.data or []
+        if not messages:
+            break
+
+        rows = aggregate_usage_rollup(messages)
+        last = messages[-1]
+        applied = await client.rpc('apply_usage_daily_rollup_backfill', {
+            'p_rows': rows,
+            'p_cursor_created_at': last['created_at'],
+            'p_cursor_message_id': last['message_id'],
+        }).execute()
+        if not applied.data:
+            logger.warning(f"Batch ending at {last['created_at']} was already applied; is another backfill running?")
+
+        processed += len(messages)
+        if verbose:
+            print(f"Rolled up {len(messages)} messages into {len(rows)} rows (up to {last['created_at']})")
+
+    await client.table('usage_daily_rollup_backfill').update({
+        'completed_at': datetime.now(timezone.utc).isoformat()
+    }).eq('id', True).execute()
+    return processed
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Backfill the daily usage rollup from existing messages"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=BATCH_SIZE, help="Messages per batch"
+    )
+    parser.add_argument(
+        "--verbose", "-v", action="store_true", help="Print every applied batch"
+    )
+    args = parser.parse_args()
+
+    db_connection = DBConnection()
+    try:
+        client = await db_connection.client
+        processed = await backfill(client, args.batch_size, args.verbose)
+        print(f"Backfilled the usage rollup from {processed} messages")
+    finally:
+        await DBConnection.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
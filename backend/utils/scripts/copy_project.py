@@ -216,7 +216,7 @@ async def copy_sandbox(sandbox_id: str, password: str, project_id: str) -> Sandb
         raise Exception(f"Sandbox {sandbox_id} not found")
 
     # TODO: Currently there's no way to create a copy of a sandbox, so we will create a new one
-    new_sandbox = create_sandbox(password, project_id)
+    new_sandbox = await create_sandbox(password, project_id)
     return new_sandbox
 
 
@@ -259,8 +259,8 @@ async def main():
             project["sandbox"]["id"], project["sandbox"]["pass"], args.project_id
         )
         if new_sandbox:
-            vnc_link = new_sandbox.get_preview_link(6080)
-            website_link = new_sandbox.get_preview_link(8080)
+            vnc_link = await new_sandbox.get_preview_link(6080)
+            website_link = await new_sandbox.get_preview_link(8080)
             vnc_url = (
                 vnc_link.url
                 if hasattr(vnc_link, "url")
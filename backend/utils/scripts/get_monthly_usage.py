@@ -11,6 +11,7 @@ Arguments:
     --year       The year (e.g., 2024) (required)
     --month      The month (1-12) (required)
     --verbose    Enable verbose logging (optional)
+    --costs      Also print token usage and cost per model from the daily usage rollup (optional)
 
 Examples:
     # Get usage for December 2024
@@ -49,7 +50,7 @@ Notes:
 
 import asyncio
 import argparse
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 load_dotenv(".env")
@@ -174,6 +175,22 @@ async def calculate_monthly_usage(client, user_id: str, year: int, month: int):
     return total_seconds / 60, run_details  # Convert to minutes
 
 
+async def print_model_costs(client, user_id: str, year: int, month: int):
+    """Print token usage and cost per model for a month from the daily usage rollup."""
+    from services.billing import summarize_usage_rollup
+
+    start_date = date(year, month, 1)
+    end_date = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    summary = await summarize_usage_rollup(client, user_id, start_date, end_date)
+
+    print(f"\n=== Token Usage by Model ===")
+    for model in summary["models"]:
+        print(
+            f"{model['model'][:50]:50} | {model['message_count']:6d} responses | {model['total_tokens']:12,d} tokens | ${model['estimated_cost']:.4f}"
+        )
+    print(f"Total cost: ${summary['total_cost']:.4f}")
+
+
 async def main():
     """Main function to run the script."""
     # Parse command line arguments
@@ -188,6 +205,9 @@ async def main():
     parser.add_argument(
         "--verbose", "-v", action="store_true", help="Enable verbose logging"
     )
+    parser.add_argument(
+        "--costs", action="store_true", help="Print token usage and cost per model"
+    )
 
     args = parser.parse_args()
 
@@ -236,6 +256,9 @@ async def main():
         else:
             print("\nNo runs found for this period.")
 
+        if args.costs:
+            await print_model_costs(db, args.user_id, args.year, args.month)
+
     except Exception as e:
         logger.error(f"Error: {e}")
         raise e
@@ -0,0 +1,96 @@
+"""
+Usage Ledger Reconciliation Script
+
+This script recomputes the current month's usage of accounts from the daily
+usage rollup and rebases the usage ledger (Redis counters and the usage_ledger
+table) on the result. Run it periodically (e.g. hourly
+from cron) to correct drift in the incrementally updated counters.
+
+Usage:
+    python backend/utils/scripts/reconcile_usage_ledger.py [--account-id <ACCOUNT_ID>] [--verbose]
+
+Arguments:
+    --account-id  Only reconcile this account (optional; default: every account
+                  with a ledger row for the current month)
+    --verbose     Enable verbose logging (optional)
+
+Notes:
+    - The script requires access to the Supabase database and Redis
+    - Make sure the .env file is properly configured
+"""
+
+import asyncio
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv(".env")
+
+from services.supabase import DBConnection
+from services import redis, usage_ledger
+from services.billing import reconcile_monthly_usage
+from utils.logger import logger
+
+BATCH_SIZE = 1000
+
+
+async def get_ledger_accounts(client) -> list[str]:
+    """Get all accounts with a ledger row for the current month."""
+    period = usage_ledger.current_period().isoformat()
+    account_ids = []
+    offset = 0
+    while True:
+        result = await client.table('usage_ledger') \
+            .select('account_id') \
+            .eq('period_start', period) \
+            .range(offset, offset + BATCH_SIZE - 1) \
+            .execute()
+        if not result.data:
+            break
+        account_ids.extend(row['account_id'] for row in result.data)
+        if len(result.data) < BATCH_SIZE:
+            break
+        offset += BATCH_SIZE
+    return account_ids
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Reconcile the usage ledger against the message log"
+    )
+    parser.add_argument(
+        "--account-id", type=str, help="Account ID to reconcile", required=False
+    )
+    parser.add_argument(
+        "--verbose", "-v", action="store_true", help="Enable verbose logging"
+    )
+    args = parser.parse_args()
+
+    db_connection = DBConnection()
+    try:
+        client = await db_connection.client
+        await redis.initialize_async()
+
+        account_ids = [args.account_id] if args.account_id else await get_ledger_accounts(client)
+        logger.info(f"Reconciling usage ledger of {len(account_ids)} accounts")
+
+        failed = 0
+        for account_id in account_ids:
+            try:
+                before = await usage_ledger.get(account_id)
+                totals = await reconcile_monthly_usage(client, account_id)
+                if args.verbose:
+                    previous = f"${before['cost']:.4f}" if before else "unseeded"
+                    print(f"{account_id}: {previous} -> ${totals['cost']:.4f} ({totals['messages']} responses)")
+            except Exception as e:
+                failed += 1
+                logger.error(f"Failed to reconcile usage ledger of {account_id}: {e}")
+
+        print(f"Reconciled {len(account_ids) - failed} of {len(account_ids)} accounts")
+
+    finally:
+        await redis.close()
+        await DBConnection.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
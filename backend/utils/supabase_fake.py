@@ -0,0 +1,184 @@
+"""
+In-memory stand-in for the async Supabase client.
+
+InMemorySupabase mimics the subset of the async Supabase query builder used by
+the backend (table/select/insert/update/filters/order/range/execute) and counts
+every executed query, so tests and benchmarks can check database round trips.
+"""
+
+import json
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class QueryResult:
+    """Result object with the attributes callers read from Supabase responses."""
+    data: List[Dict[str, Any]]
+    count: Optional[int] = None
+
+
+class InMemoryQuery:
+    """A single chained query against an in-memory table."""
+
+    def __init__(self, client: 'InMemorySupabase', table: str):
+        self._client = client
+        self._table = table
+        self._op = 'select'
+        self._payload: Any = None
+        self._returning = 'representation'
+        self._filters: List[Any] = []
+        self._order: List[Any] = []
+        self._range: Optional[tuple] = None
+        self._single = False
+
+    # Operations
+
+    def select(self, columns: str = '*', count: Optional[str] = None) -> 'InMemoryQuery':
+        self._op = 'select'
+        return self
+
+    def insert(self, data: Any, returning: str = 'representation', **kwargs) -> 'InMemoryQuery':
+        self._op = 'insert'
+        self._payload = data
+        self._returning = returning
+        return self
+
+    def upsert(self, data: Any, returning: str = 'representation', **kwargs) -> 'InMemoryQuery':
+        return self.insert(data, returning=returning)
+
+    def update(self, data: Dict[str, Any], **kwargs) -> 'InMemoryQuery':
+        self._op = 'update'
+        self._payload = data
+        return self
+
+    def delete(self, **kwargs) -> 'InMemoryQuery':
+        self._op = 'delete'
+        return self
+
+    # Filters and modifiers
+
+    def eq(self, column: str, value: Any) -> 'InMemoryQuery':
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column: str, value: Any) -> 'InMemoryQuery':
+        self._filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def gt(self, column: str, value: Any) -> 'InMemoryQuery':
+        self._filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def gte(self, column: str, value: Any) -> 'InMemoryQuery':
+        self._filters.append(lambda row: row.get(column) is not None and row.get(column) >= value)
+        return self
+
+    def lt(self, column: str, value: Any) -> 'InMemoryQuery':
+        self._filters.append(lambda row: row.get(column) is not None and row.get(column) < value)
+        return self
+
+    def lte(self, column: str, value: Any) -> 'InMemoryQuery':
+        self._filters.append(lambda row: row.get(column) is not None and row.get(column) <= value)
+        return self
+
+    def in_(self, column: str, values: List[Any]) -> 'InMemoryQuery':
+        allowed = set(values)
+        self._filters.append(lambda row: row.get(column) in allowed)
+        return self
+
+    def order(self, column: str, desc: bool = False) -> 'InMemoryQuery':
+        self._order.append((column, desc))
+        return self
+
+    def range(self, start: int, end: int) -> 'InMemoryQuery':
+        self._range = (start, end + 1)
+        return self
+
+    def limit(self, count: int) -> 'InMemoryQuery':
+        self._range = (0, count)
+        return self
+
+    def single(self) -> 'InMemoryQuery':
+        self._single = True
+        return self
+
+    def maybe_single(self) -> 'InMemoryQuery':
+        return self.single()
+
+    # Execution
+
+    def _matches(self, row: Dict[str, Any]) -> bool:
+        return all(f(row) for f in self._filters)
+
+    async def execute(self) -> QueryResult:
+        self._client.calls[f"{self._table}.{self._op}"] += 1
+        rows = self._client.tables.setdefault(self._table, [])
+
+        if self._op == 'insert':
+            payload = self._payload if isinstance(self._payload, list) else [self._payload]
+            inserted = [self._client.store(self._table, row) for row in payload]
+            data = [] if self._returning == 'minimal' else [self._client.load(row) for row in inserted]
+            return QueryResult(data=data)
+
+        matched = [row for row in rows if self._matches(row)]
+
+        if self._op == 'update':
+            for row in matched:
+                row.update(self._client.roundtrip(self._payload))
+            return QueryResult(data=[self._client.load(row) for row in matched])
+
+        if self._op == 'delete':
+            self._client.tables[self._table] = [row for row in rows if not self._matches(row)]
+            return QueryResult(data=[self._client.load(row) for row in matched])
+
+        for column, desc in reversed(self._order):
+            matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        if self._range:
+            matched = matched[self._range[0]:self._range[1]]
+        data = [self._client.load(row) for row in matched]
+        if self._single:
+            return QueryResult(data=data[0] if data else None)
+        return QueryResult(data=data, count=len(data))
+
+
+class InMemorySupabase:
+    """Async Supabase client stand-in holding tables as lists of rows.
+
+    Rows are JSON round-tripped on the way in and out, which keeps callers
+    from sharing state with the store and approximates serialization cost.
+    """
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.calls: Counter = Counter()
+
+    def table(self, name: str) -> InMemoryQuery:
+        return InMemoryQuery(self, name)
+
+    @staticmethod
+    def roundtrip(value: Any) -> Any:
+        return json.loads(json.dumps(value, default=str))
+
+    def load(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        return self.roundtrip(row)
+
+    def store(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        stored = self.roundtrip(row)
+        if table == 'messages':
+            stored.setdefault('message_id', str(uuid.uuid4()))
+            now = datetime.now(timezone.utc).isoformat()
+            stored.setdefault('created_at', now)
+            stored.setdefault('updated_at', now)
+        self.tables.setdefault(table, []).append(stored)
+        return stored
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_calls(self):
+        self.calls.clear()
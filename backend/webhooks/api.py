@@ -222,8 +222,7 @@ async def trigger_workflow_webhook(
                 "thread_id": thread_id,
                 "type": "user",
                 "is_llm_message": True,
-                "content": json.dumps({"role": "user", "content": initial_message_content}),
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "content": json.dumps({"role": "user", "content": initial_message_content})
             }
             
             await client.table('messages').insert(message_data).execute()
@@ -96,8 +96,7 @@ async def _create_workflow_thread_for_api(
             "thread_id": thread_id,
             "type": "user",
             "is_llm_message": True,
-            "content": json.dumps({"role": "user", "content": initial_message}),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "content": json.dumps({"role": "user", "content": initial_message})
         }
         
         await client.table('messages').insert(message_data).execute()
@@ -479,6 +478,7 @@ async def execute_workflow(
 async def stream_workflow_execution(
     execution_id: str,
     token: Optional[str] = None,
+    last_event_id: Optional[str] = None,
     request: Request = None
 ):
     if not await is_enabled("workflows"):
@@ -487,11 +487,11 @@ async def stream_workflow_execution(
             detail="This feature is not available at the moment."
         )
     
-    """Stream the responses of a workflow execution using Redis Lists and Pub/Sub."""
+    """Stream the responses of a workflow execution from its Redis stream, resuming after Last-Event-ID."""
     logger.info(f"Starting stream for workflow execution: {execution_id}")
     
     from utils.auth_utils import get_user_id_from_stream_auth
-    import services.redis as redis
+    from services import response_stream
     
     user_id = await get_user_id_from_stream_auth(request, token)
     
@@ -506,152 +506,39 @@ async def stream_workflow_execution(
     if execution_data['account_id'] != user_id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    response_list_key = f"workflow_execution:{execution_id}:responses"
-    response_channel = f"workflow_execution:{execution_id}:new_response"
-    control_channel = f"workflow_execution:{execution_id}:control"
+    stream_key = response_stream.workflow_execution_stream_key(execution_id)
+    resume_from = (request.headers.get("last-event-id") if request else None) or last_event_id
+
+    async def is_running() -> bool:
+        run_status = await client.table('workflow_executions').select('status').eq("id", execution_id).maybe_single().execute()
+        current_status = run_status.data.get('status') if run_status.data else None
+        if current_status not in ['running', 'pending']:
+            logger.info(f"Workflow execution {execution_id} is not running (status: {current_status}).")
+            return False
+        return True
+
+    def is_final_response(response: Dict[str, Any]) -> bool:
+        if response.get('type') == 'workflow_status' and response.get('status') in ['completed', 'failed', 'stopped']:
+            logger.info(f"Detected workflow completion via status message in stream: {response.get('status')}")
+            return True
+        return False
 
     async def stream_generator():
-        logger.debug(f"Streaming responses for workflow execution {execution_id} using Redis list {response_list_key}")
-        last_processed_index = -1
-        pubsub_response = None
-        pubsub_control = None
-        listener_task = None
-        terminate_stream = False
+        logger.debug(f"Streaming responses for workflow execution {execution_id} from Redis stream {stream_key}")
         initial_yield_complete = False
-
         try:
-            initial_responses_json = await redis.lrange(response_list_key, 0, -1)
-            initial_responses = []
-            if initial_responses_json:
-                initial_responses = [json.loads(r) for r in initial_responses_json]
-                logger.debug(f"Sending {len(initial_responses)} initial responses for workflow execution {execution_id}")
-                for response in initial_responses:
-                    yield f"data: {json.dumps(response)}\n\n"
-                last_processed_index = len(initial_responses) - 1
-            initial_yield_complete = True
-
-            run_status = await client.table('workflow_executions').select('status').eq("id", execution_id).maybe_single().execute()
-            current_status = run_status.data.get('status') if run_status.data else None
-
-            if current_status not in ['running', 'pending']:
-                logger.info(f"Workflow execution {execution_id} is not running (status: {current_status}). Ending stream.")
-                yield f"data: {json.dumps({'type': 'workflow_status', 'status': 'completed'})}\n\n"
-                return
-
-            pubsub_response = await redis.create_pubsub()
-            await pubsub_response.subscribe(response_channel)
-            logger.debug(f"Subscribed to response channel: {response_channel}")
-
-            pubsub_control = await redis.create_pubsub()
-            await pubsub_control.subscribe(control_channel)
-            logger.debug(f"Subscribed to control channel: {control_channel}")
-
-            message_queue = asyncio.Queue()
-
-            async def listen_messages():
-                response_reader = pubsub_response.listen()
-                control_reader = pubsub_control.listen()
-                tasks = [asyncio.create_task(response_reader.__anext__()), asyncio.create_task(control_reader.__anext__())]
-
-                while not terminate_stream:
-                    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
-                    for task in done:
-                        try:
-                            message = task.result()
-                            if message and isinstance(message, dict) and message.get("type") == "message":
-                                channel = message.get("channel")
-                                data = message.get("data")
-                                if isinstance(data, bytes): data = data.decode('utf-8')
-
-                                if channel == response_channel and data == "new":
-                                    await message_queue.put({"type": "new_response"})
-                                elif channel == control_channel and data in ["STOP", "END_STREAM", "ERROR"]:
-                                    logger.info(f"Received control signal '{data}' for workflow execution {execution_id}")
-                                    await message_queue.put({"type": "control", "data": data})
-                                    return
-
-                        except StopAsyncIteration:
-                            logger.warning(f"Listener {task} stopped.")
-                            await message_queue.put({"type": "error", "data": "Listener stopped unexpectedly"})
-                            return
-                        except Exception as e:
-                            logger.error(f"Error in listener for workflow execution {execution_id}: {e}")
-                            await message_queue.put({"type": "error", "data": "Listener failed"})
-                            return
-                        finally:
-                            if task in tasks:
-                                tasks.remove(task)
-                                if message and isinstance(message, dict) and message.get("channel") == response_channel:
-                                     tasks.append(asyncio.create_task(response_reader.__anext__()))
-                                elif message and isinstance(message, dict) and message.get("channel") == control_channel:
-                                     tasks.append(asyncio.create_task(control_reader.__anext__()))
-
-                for p_task in pending: p_task.cancel()
-                for task in tasks: task.cancel()
-
-            listener_task = asyncio.create_task(listen_messages())
-            while not terminate_stream:
-                try:
-                    queue_item = await message_queue.get()
-
-                    if queue_item["type"] == "new_response":
-                        new_start_index = last_processed_index + 1
-                        new_responses_json = await redis.lrange(response_list_key, new_start_index, -1)
-
-                        if new_responses_json:
-                            new_responses = [json.loads(r) for r in new_responses_json]
-                            num_new = len(new_responses)
-                            for response in new_responses:
-                                yield f"data: {json.dumps(response)}\n\n"
-                                if response.get('type') == 'workflow_status' and response.get('status') in ['completed', 'failed', 'stopped']:
-                                    logger.info(f"Detected workflow completion via status message in stream: {response.get('status')}")
-                                    terminate_stream = True
-                                    break
-                            last_processed_index += num_new
-                        if terminate_stream: break
-
-                    elif queue_item["type"] == "control":
-                        control_signal = queue_item["data"]
-                        terminate_stream = True
-                        yield f"data: {json.dumps({'type': 'workflow_status', 'status': control_signal})}\n\n"
-                        break
-
-                    elif queue_item["type"] == "error":
-                        logger.error(f"Listener error for workflow execution {execution_id}: {queue_item['data']}")
-                        terminate_stream = True
-                        yield f"data: {json.dumps({'type': 'workflow_status', 'status': 'error'})}\n\n"
-                        break
-
-                except asyncio.CancelledError:
-                     logger.info(f"Stream generator main loop cancelled for workflow execution {execution_id}")
-                     terminate_stream = True
-                     break
-                except Exception as loop_err:
-                    logger.error(f"Error in stream generator main loop for workflow execution {execution_id}: {loop_err}", exc_info=True)
-                    terminate_stream = True
-                    yield f"data: {json.dumps({'type': 'workflow_status', 'status': 'error', 'message': f'Stream failed: {loop_err}'})}\n\n"
-                    break
-
+            async for event in response_stream.sse_events(stream_key, resume_from, is_running, is_final_response, status_type='workflow_status'):
+                initial_yield_complete = True
+                yield event
+        except asyncio.CancelledError:
+            logger.info(f"Stream generator cancelled for workflow execution {execution_id}")
         except Exception as e:
-            logger.error(f"Error setting up stream for workflow execution {execution_id}: {e}", exc_info=True)
+            logger.error(f"Error streaming workflow execution {execution_id}: {e}", exc_info=True)
             if not initial_yield_complete:
-                 yield f"data: {json.dumps({'type': 'workflow_status', 'status': 'error', 'message': f'Failed to start stream: {e}'})}\n\n"
+                yield f"data: {json.dumps({'type': 'workflow_status', 'status': 'error', 'message': f'Failed to start stream: {e}'})}\n\n"
+            else:
+                yield f"data: {json.dumps({'type': 'workflow_status', 'status': 'error', 'message': f'Stream failed: {e}'})}\n\n"
         finally:
-            terminate_stream = True
-            if pubsub_response: await pubsub_response.unsubscribe(response_channel)
-            if pubsub_control: await pubsub_control.unsubscribe(control_channel)
-            if pubsub_response: await pubsub_response.close()
-            if pubsub_control: await pubsub_control.close()
-
-            if listener_task:
-                listener_task.cancel()
-                try:
-                    await listener_task
-                except asyncio.CancelledError:
-                    pass
-                except Exception as e:
-                    logger.debug(f"listener_task ended with: {e}")
-            await asyncio.sleep(0.1)
             logger.debug(f"Streaming cleanup complete for workflow execution: {execution_id}")
 
     return StreamingResponse(stream_generator(), media_type="text/event-stream", headers={
@@ -1476,8 +1476,7 @@ INSTRUCTIONS:
                 "thread_id": thread_id,
                 "type": "user",
                 "is_llm_message": True,
-                "content": json.dumps({"role": "user", "content": initial_message}),
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "content": json.dumps({"role": "user", "content": initial_message})
             }
             
             await client.table('messages').insert(message_data).execute()
@@ -1509,8 +1508,8 @@ INSTRUCTIONS:
                 # Sandbox ID exists, try to ensure it's running
                 logger.info(f"Sandbox {sandbox_id} already exists for workflow project {project_id}, ensuring it's active")
                 try:
-                    from sandbox.sandbox import get_or_start_sandbox
-                    await get_or_start_sandbox(sandbox_id)
+                    from sandbox.registry import sandbox_registry
+                    await sandbox_registry.get_sandbox(sandbox_id, refresh=True)
                     logger.info(f"Sandbox {sandbox_id} is now active for workflow project {project_id}")
                 except Exception as sandbox_error:
                     # If sandbox doesn't exist in Daytona, create a new one
@@ -1532,13 +1531,13 @@ INSTRUCTIONS:
         
         # Create a new sandbox
         sandbox_pass = str(uuid.uuid4())
-        sandbox = create_sandbox(sandbox_pass, project_id)
+        sandbox = await create_sandbox(sandbox_pass, project_id)
         sandbox_id = sandbox.id
         logger.info(f"Created new sandbox {sandbox_id} for workflow project {project_id}")
         
         # Get preview links
-        vnc_link = sandbox.get_preview_link(6080)
-        website_link = sandbox.get_preview_link(8080)
+        vnc_link = await sandbox.get_preview_link(6080)
+        website_link = await sandbox.get_preview_link(8080)
         vnc_url = vnc_link.url if hasattr(vnc_link, 'url') else str(vnc_link).split("url='")[1].split("'")[0]
         website_url = website_link.url if hasattr(website_link, 'url') else str(website_link).split("url='")[1].split("'")[0]
         token = None